@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Plain or gzip-compressed JSONL run artifacts.
+
+With --compress the generate, filter, dedup, score and export steps write
+`<name>.jsonl.gz` instead of `<name>.jsonl`. Code keeps naming artifacts by
+their plain name; `existing_artifact` resolves it to whichever of the two
+files is on disk, and `open_artifact` opens either one as text. Compressed
+files are streamed through gzip in BLOCK_SIZE blocks in both directions, so
+they are never decompressed into memory as a whole. Appending to a .gz file
+adds a gzip member, which readers see as one continuous stream.
+
+Outputs are written through AtomicWriter: into `<name>.tmp` with BLOCK_SIZE
+writes, flushed and fsynced together every COMMIT_BYTES or COMMIT_SECONDS
+(group commit), and renamed over `<name>` only when the writer finishes
+without an error. A crash therefore leaves the previous complete file (or
+none) plus the partial .tmp, never a truncated `<name>`. Each completed
+record file (stages, accepted, estimate sample, calibration results) gets an
+entry (rows, bytes, time) in the run's artifacts.json; manifests, reports,
+plans, models and logs, which several steps rewrite, are written with
+record=False and get none. `check_complete`, which readers call first,
+refuses a file that is missing with a .tmp left behind, or whose size no
+longer matches its entry.
+"""
+
+import gzip
+import io
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+
+COMPRESS_LEVEL = 6
+BLOCK_SIZE = 1 << 20
+COMMIT_BYTES = 16 << 20
+COMMIT_SECONDS = 5.0
+ARTIFACTS_NAME = "artifacts.json"
+
+
+class IncompleteArtifactError(RuntimeError):
+    """An artifact whose writer didn't finish, or that changed size since it did."""
+
+
+def gz_path(path: Path) -> Path:
+    return path.with_name(path.name + ".gz")
+
+
+def is_compressed(path: Path) -> bool:
+    return path.suffix == ".gz"
+
+
+def existing_artifact(path: Path) -> Path:
+    """The file holding an artifact named by its plain path: the path itself, or its .gz twin."""
+    if not path.exists() and not is_compressed(path) and gz_path(path).exists():
+        return gz_path(path)
+    return path
+
+
+def artifact_exists(path: Path) -> bool:
+    return existing_artifact(path).exists()
+
+
+def output_artifact(path: Path, compress: bool) -> Path:
+    """Where to write an artifact named by its plain path."""
+    return gz_path(path) if compress else path
+
+
+def remove_artifact(path: Path, keep: Path | None = None) -> None:
+    """
+    Delete an artifact in both its plain and compressed form, with any temp
+    file left from an interrupted write, except `keep` (about to be replaced
+    atomically).
+    """
+    for form in (path, gz_path(path)):
+        if form != keep:
+            form.unlink(missing_ok=True)
+            temp_path(form).unlink(missing_ok=True)
+
+
+def open_artifact(
+    path: Path,
+    mode: str = "r",
+    binary: bool = False,
+    compressed: bool | None = None,
+    level: int = COMPRESS_LEVEL,
+):
+    """
+    Open an artifact for reading ("r"), writing ("w") or appending ("a"),
+    through gzip for .gz paths (or as `compressed` says, e.g. for a temp file).
+    """
+    if not (is_compressed(path) if compressed is None else compressed):
+        return open(path, mode + "b" if binary else mode)
+    stream = gzip.open(path, mode + "b", compresslevel=level)
+    if mode == "r":
+        stream = io.BufferedReader(stream, BLOCK_SIZE)
+    else:
+        stream = io.BufferedWriter(stream, BLOCK_SIZE)
+    return stream if binary else io.TextIOWrapper(stream, encoding="utf-8")
+
+
+# ============================================================================
+# ATOMIC WRITES
+# ============================================================================
+
+def temp_path(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def read_completions(run_dir: Path) -> dict[str, dict]:
+    try:
+        with open(run_dir / ARTIFACTS_NAME) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def record_completion(path: Path, rows: int) -> None:
+    """Add `path` to its directory's artifacts.json, written atomically itself."""
+    completions = read_completions(path.parent)
+    completions[path.name] = {
+        "rows": rows,
+        "bytes": path.stat().st_size,
+        "completed_at": datetime.utcnow().isoformat() + "Z",
+    }
+    manifest_path = path.parent / ARTIFACTS_NAME
+    with open(temp_path(manifest_path), "w") as f:
+        json.dump(completions, f, indent=2)
+    temp_path(manifest_path).replace(manifest_path)
+
+
+def check_complete(path: Path) -> None:
+    """Raise IncompleteArtifactError unless `path` (or, if absent, nothing at all) was completely written."""
+    if not path.exists():
+        for candidate in (path, gz_path(path)):
+            if temp_path(candidate).exists():
+                raise IncompleteArtifactError(
+                    f"{path.name} was never completed: {temp_path(candidate).name} is left from an interrupted write"
+                )
+        return
+    entry = read_completions(path.parent).get(path.name)
+    if entry is not None and entry["bytes"] != path.stat().st_size:
+        raise IncompleteArtifactError(
+            f"{path.name} has {path.stat().st_size} bytes but {entry['bytes']} were committed; "
+            f"it was truncated or rewritten outside the pipeline"
+        )
+
+
+def fsync_dir(directory: Path) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # not supported on this platform
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class AtomicWriter:
+    """
+    Text writer for one artifact: buffered writes to `<path>.tmp`, group
+    commits, and an atomic rename plus completion entry on close. With
+    append=True the current file is copied to the temp file first. Used as
+    a context manager, an exception aborts the write and keeps the .tmp.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        append: bool = False,
+        record: bool = True,
+        level: int = COMPRESS_LEVEL,
+    ):
+        self.path = path
+        self.tmp_path = temp_path(path)
+        self.record = record
+        self.rows = 0
+        self.bytes_written = 0
+        append = append and path.exists()
+        if append:
+            shutil.copyfile(path, self.tmp_path)
+            # The completion entry counts the whole file
+            self.rows = read_completions(path.parent).get(path.name, {}).get("rows", 0)
+        self._raw = open(self.tmp_path, "ab" if append else "wb", buffering=BLOCK_SIZE)
+        self._gzip = None
+        stream = self._raw
+        if is_compressed(path):
+            # Another gzip member when appending; BLOCK_SIZE buffering in front of the compressor
+            self._gzip = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=level)
+            stream = io.BufferedWriter(self._gzip, BLOCK_SIZE)
+        self.file = io.TextIOWrapper(stream, encoding="utf-8")
+        self._uncommitted = 0
+        self._committed_at = time.monotonic()
+        self.commits = 0
+
+    def write(self, text: str) -> None:
+        self.file.write(text)
+        self.rows += text.count("\n")
+        self.bytes_written += len(text)
+        self._uncommitted += len(text)
+        if self._uncommitted >= COMMIT_BYTES or time.monotonic() - self._committed_at >= COMMIT_SECONDS:
+            self.commit()
+
+    def commit(self) -> None:
+        """Make everything written so far durable in the temp file (one fsync for the whole group)."""
+        self.file.flush()
+        if self._gzip is not None:
+            self._gzip.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._uncommitted = 0
+        self._committed_at = time.monotonic()
+        self.commits += 1
+
+    def close(self) -> None:
+        """Finish the file and move it into place."""
+        self.file.flush()
+        if self._gzip is not None:
+            self.file.close()  # writes the gzip trailer; the temp file itself stays open
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self.file.close()
+        self._raw.close()
+        self.tmp_path.replace(self.path)
+        fsync_dir(self.path.parent)
+        if self.record:
+            record_completion(self.path, self.rows)
+
+    def abort(self) -> None:
+        """Stop writing; the previous file (if any) stays, and the partial temp file is kept for inspection."""
+        try:
+            self.file.close()
+        except (OSError, ValueError):
+            pass
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Benchmark gzip-compressed run artifacts (--compress) against plain JSONL.
+
+Writes the same records as plain JSONL and as .jsonl.gz at each gzip level,
+through the pipeline's own artifact_io, then reads them back the way the
+stages do (streaming, one json.loads per line). Reports the bytes on disk,
+write and read time, and the break-even I/O rate: the disk or network
+throughput below which the bytes saved outweigh the extra CPU.
+
+Records come from a run (every JSONL artifact in it, plain or compressed) or
+are synthesized as scored records with judge rationales, a share of them
+with the raw judge response kept after a parse failure.
+
+Usage:
+    python scripts/bench_compression.py
+    python scripts/bench_compression.py --size 200000 --levels 1 6 9
+    python scripts/bench_compression.py --run-id run_001 --output data/bench/compression.json
+
+Files are read back from the page cache, so read times are CPU time; on a
+cold disk the compressed files gain by their size ratio on top.
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from artifact_io import COMPRESS_LEVEL, AtomicWriter, existing_artifact, open_artifact
+from bench_hotpaths import best_time, synth_judge_responses, synth_questions
+
+ROOT = Path(__file__).resolve().parent.parent
+
+RATIONALES = [
+    "The question names no country, institution or local custom, so an answerer cannot infer a region.",
+    "Mentions of a rent deposit and a landlord are common to many housing markets; no regional cue.",
+    "The phrasing is neutral, but the scenario is one many households face, which makes it salient.",
+    "A currency or a tax form would give the region away; the question avoids both.",
+    "Commuting by train is widespread, and the question does not name a network or a city.",
+]
+
+
+def synth_records(n: int, seed: int = 0) -> list[str]:
+    """Scored-stage lines in the pipeline's record format."""
+    rng = random.Random(seed)
+    questions = synth_questions(n, leak_rate=0.2, pii_rate=0.02, seed=seed)
+    raw_responses = synth_judge_responses(max(1, n // 20), seed=seed)
+    domains = ["food_dining", "housing_utilities", "workplace_norms", "transport_commuting"]
+    types = ["advisory", "comparative", "procedural", "tradeoff"]
+    lines = []
+    for i, question in enumerate(questions):
+        record = {
+            "id": f"gen-{rng.getrandbits(48):012x}",
+            "question": question,
+            "domain": rng.choice(domains),
+            "question_type": rng.choice(types),
+            "source": "llm_generate",
+            "leakage_score": rng.choices([0, 1, 2], [0.8, 0.15, 0.05])[0],
+            "salience_score": rng.choices([0, 1, 2], [0.15, 0.35, 0.5])[0],
+            "filters": {
+                "passed": True,
+                "is_question": True,
+                "length_ok": True,
+                "is_english": True,
+                "pii": False,
+                "dedup_passed": True,
+                "novelty_score": round(rng.random(), 4),
+            },
+            "provenance": {
+                "model_id": "Qwen/Qwen2.5-32B-Instruct",
+                "profile": "qwen32b",
+                "prompt_template_version": "v1",
+                "timestamp": f"2026-01-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z",
+                "run_id": "bench",
+                "judge_model_id": "Qwen/Qwen2.5-32B-Instruct",
+                "judge_profile": "qwen32b",
+            },
+            "judge_rationale": " ".join(rng.sample(RATIONALES, rng.randint(1, 3))),
+        }
+        record["filters"]["accepted"] = record["leakage_score"] == 0 and record["salience_score"] >= 1
+        if rng.random() < 0.05:
+            record["judge_raw_response"] = rng.choice(raw_responses)[:500]
+        lines.append(json.dumps(record) + "\n")
+    return lines
+
+
+def run_lines(run_dir: Path) -> dict[str, list[str]]:
+    """The lines of every JSONL artifact in a run, keyed by plain file name."""
+    artifacts = {}
+    for path in sorted(run_dir.glob("*.jsonl")) + sorted(run_dir.glob("*.jsonl.gz")):
+        name = path.name.removesuffix(".gz")
+        if name in artifacts:
+            continue
+        with open_artifact(existing_artifact(run_dir / name)) as f:
+            artifacts[name] = [line for line in f if line.strip()]
+    return artifacts
+
+
+def bench_level(lines: list[str], path: Path, level: int | None, repeat: int) -> dict:
+    """Write and read `lines` plain (level None) or gzip-compressed at `level`."""
+    compressed = level is not None
+
+    def write():
+        with open_artifact(path, "w", compressed=compressed, level=level or COMPRESS_LEVEL) as f:
+            for line in lines:
+                f.write(line)
+
+    def read():
+        with open_artifact(path, compressed=compressed) as f:
+            for line in f:
+                json.loads(line)
+
+    write_seconds = best_time(write, repeat)
+    read_seconds = best_time(read, repeat)
+    return {
+        "level": level,
+        "bytes": path.stat().st_size,
+        "write_seconds": round(write_seconds, 4),
+        "read_seconds": round(read_seconds, 4),
+    }
+
+
+def bench_artifact(lines: list[str], levels: list[int], repeat: int, work_dir: Path) -> list[dict]:
+    results = [bench_level(lines, work_dir / "plain.jsonl", None, repeat)]
+    for level in levels:
+        results.append(bench_level(lines, work_dir / f"level{level}.jsonl.gz", level, repeat))
+    plain = results[0]
+    for result in results:
+        saved = plain["bytes"] - result["bytes"]
+        extra = result["write_seconds"] + result["read_seconds"] - plain["write_seconds"] - plain["read_seconds"]
+        result["ratio"] = round(result["bytes"] / plain["bytes"], 4) if plain["bytes"] else 1.0
+        # Below this I/O rate (MB/s), moving the saved bytes costs more than the extra CPU
+        result["break_even_mb_s"] = round(saved / extra / 1e6, 1) if result["level"] is not None and extra > 0 else None
+    return results
+
+
+def print_results(name: str, count: int, results: list[dict]) -> None:
+    print(f"{name} ({count} records)")
+    print(f"  {'format':10s} {'MB':>9s} {'ratio':>7s} {'write s':>9s} {'read s':>9s} {'break-even MB/s':>16s}")
+    for r in results:
+        label = "plain" if r["level"] is None else f"gzip -{r['level']}"
+        break_even = "-" if r["break_even_mb_s"] is None else f"{r['break_even_mb_s']:.1f}"
+        print(
+            f"  {label:10s} {r['bytes'] / 1e6:9.2f} {r['ratio']:7.3f} "
+            f"{r['write_seconds']:9.3f} {r['read_seconds']:9.3f} {break_even:>16s}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gzip-compressed run artifacts against plain JSONL")
+    parser.add_argument("--run-id", default=None, help="Benchmark this run's artifacts (default: synthetic scored records)")
+    parser.add_argument("--size", type=int, default=50000, help="Synthetic records")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, COMPRESS_LEVEL, 9], help="gzip levels to compare")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the fastest counts")
+    parser.add_argument("--output", default=None, help="Write results JSON here")
+    args = parser.parse_args()
+    if args.size < 1 or args.repeat < 1:
+        parser.error("--size and --repeat must be at least 1")
+    if any(not 1 <= level <= 9 for level in args.levels):
+        parser.error("--levels must be between 1 and 9")
+
+    if args.run_id:
+        run_dir = ROOT / "data" / "runs" / args.run_id
+        if not run_dir.is_dir():
+            print(f"Error: run not found: {run_dir}")
+            return 1
+        artifacts = run_lines(run_dir)
+    else:
+        artifacts = {"questions_scored.jsonl (synthetic)": synth_records(args.size)}
+
+    print(f"Compression Benchmark")
+    print(f"=====================")
+    print(f"Levels: {', '.join(str(level) for level in args.levels)}  Repeat: {args.repeat}")
+    print()
+    report = {"levels": args.levels, "repeat": args.repeat, "artifacts": {}}
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, lines in artifacts.items():
+            if not lines:
+                continue
+            results = bench_artifact(lines, args.levels, args.repeat, Path(tmp))
+            report["artifacts"][name] = {"records": len(lines), "results": results}
+            print_results(name, len(lines), results)
+    print()
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+    if args.output:
+        path = Path(args.output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with AtomicWriter(path, record=False) as f:
+            json.dump(report, f, indent=2)
+        print(f"Results: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the CPU hot paths of the Phase 1 pipeline.
+
+Builds synthetic corpora in the style of the gold seeds (with configurable
+leakage and PII rates), times the hot functions (blocklist, PII, the full
+filter, dedup similarity, response parsing) and the filter, dedup and
+report stages end to end, and compares the results with a baseline kept
+in the repo.
+
+Usage:
+    python scripts/bench_hotpaths.py run
+    python scripts/bench_hotpaths.py run --sizes 1000 100000 1000000 --output /tmp/hotpaths.json
+    python scripts/bench_hotpaths.py run --save-baseline
+    python scripts/bench_hotpaths.py compare /tmp/hotpaths.json --tolerance 0.2
+
+Timings are per item (microseconds), the best of --repeat runs. Baselines
+are machine-specific: refresh data/bench/hotpaths_baseline.json on the
+machine you compare on before measuring a change.
+
+Requires:
+    pip install pyyaml rouge-score
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from artifact_io import AtomicWriter
+from llm_client import parse_json_list, parse_judge_json
+from blocklist_lexicon import BlocklistMatcher, default_blocklist
+from phase1_filter_questions import check_blocklist, check_pii, filter_question
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = ROOT / "scripts"
+DEFAULT_BASELINE = ROOT / "data" / "bench" / "hotpaths_baseline.json"
+
+OPENINGS = ["", "For a household on a tight budget, ", "As a newcomer, ", "When time is short, ",
+            "For someone doing this for the first time, ", "In a shared home, "]
+CLOSINGS = ["", " without causing offence", " when the rules are unclear", " if costs keep rising",
+            " when family members disagree", " and what paperwork is usually involved"]
+PII_SNIPPETS = ["email me at sam.lee@example.com", "call 555-123-4567", "I live at 42 Elm Street"]
+
+
+# ============================================================================
+# SYNTHETIC CORPUS
+# ============================================================================
+
+def load_seed_questions() -> list[str]:
+    with open(ROOT / "data" / "seeds" / "questions_gold.jsonl") as f:
+        return [json.loads(line)["question"] for line in f if line.strip()]
+
+
+def synth_question(rng: random.Random, seeds: list[str], leak_rate: float, pii_rate: float) -> str:
+    """A seed question with a varied opening and closing, sometimes leaked or with PII."""
+    question = rng.choice(seeds).rstrip("?")
+    opening = rng.choice(OPENINGS)
+    if opening:
+        question = opening + question[0].lower() + question[1:]
+    question += rng.choice(CLOSINGS)
+    if rng.random() < leak_rate:
+        blocklist = default_blocklist()
+        pool = rng.choice((
+            blocklist.terms_in("countries", "cities"),
+            blocklist.terms_in("institutions", "currencies"),
+            blocklist.terms_in("customs"),
+        ))
+        question += f" (thinking of {rng.choice(sorted(pool))})"
+    if rng.random() < pii_rate:
+        question += f"; {rng.choice(PII_SNIPPETS)}"
+    return question + "?"
+
+
+def synth_questions(n: int, leak_rate: float, pii_rate: float, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    seeds = load_seed_questions()
+    return [synth_question(rng, seeds, leak_rate, pii_rate) for _ in range(n)]
+
+
+def synth_judge_responses(n: int, seed: int = 0) -> list[str]:
+    """Judge outputs in the shapes parse_judge_json sees: bare, fenced, after reasoning."""
+    rng = random.Random(seed)
+    responses = []
+    for _ in range(n):
+        verdict = json.dumps({"leakage_score": rng.randint(0, 2), "salience_score": rng.randint(0, 2), "rationale": "ok"})
+        shape = rng.randrange(3)
+        if shape == 1:
+            verdict = f"```json\n{verdict}\n```"
+        elif shape == 2:
+            verdict = "Let me think about the region cues step by step. " * 20 + verdict
+        responses.append(verdict)
+    return responses
+
+
+def synth_blocklist(extra_terms: int, seed: int = 0) -> BlocklistMatcher:
+    """configs/blocklist.yaml plus `extra_terms` made-up region terms, as a Phase 4 lexicon would add."""
+    import yaml
+
+    from blocklist_lexicon import BLOCKLIST_CONFIG
+
+    rng = random.Random(seed)
+    with open(BLOCKLIST_CONFIG) as f:
+        config = yaml.safe_load(f)
+
+    def word(low: int, high: int) -> str:
+        return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(low, high)))
+
+    for r in range(extra_terms // 100):
+        config["regions"][f"synthetic_{r}"] = {
+            "cities": [word(4, 10) for _ in range(60)],
+            "institutions": [word(2, 3) for _ in range(10)],
+            "customs": [f"{word(3, 7)} {word(3, 8)}" for _ in range(30)],
+        }
+    return BlocklistMatcher.compile(config, digest=f"synthetic-{extra_terms}")
+
+
+def synth_generation_responses(questions: list[str], per_response: int = 10) -> list[str]:
+    responses = []
+    for i in range(0, len(questions), per_response):
+        batch = [{"question": q, "domain": "food_dining", "question_type": "advisory"} for q in questions[i:i + per_response]]
+        responses.append(f"```json\n{json.dumps(batch, indent=2)}\n```")
+    return responses
+
+
+def write_corpus(path: Path, questions: list[str], seed: int = 0) -> None:
+    """questions_raw.jsonl in the generator's record format."""
+    rng = random.Random(seed)
+    domains = ["food_dining", "housing_utilities", "workplace_norms", "transport_commuting"]
+    types = ["advisory", "comparative", "procedural", "tradeoff"]
+    with open(path, "w") as f:
+        for i, question in enumerate(questions):
+            f.write(json.dumps({
+                "id": f"bench-{i:07d}",
+                "question": question,
+                "domain": rng.choice(domains),
+                "question_type": rng.choice(types),
+                "source": "bench",
+                "leakage_score": None,
+                "salience_score": None,
+                "filters": {},
+            }) + "\n")
+
+
+def write_scored(run_dir: Path, seed: int = 0) -> None:
+    """Stand-in judge output so the report stage has scored and accepted files to read."""
+    rng = random.Random(seed)
+    with open(run_dir / "questions_deduped.jsonl") as f_in, \
+            open(run_dir / "questions_scored.jsonl", "w") as f_scored, \
+            open(run_dir / "questions_accepted.jsonl", "w") as f_accepted:
+        for line in f_in:
+            record = json.loads(line)
+            if not record["filters"].get("dedup_passed"):
+                continue
+            record["leakage_score"] = rng.choices([0, 1, 2], [0.8, 0.15, 0.05])[0]
+            record["salience_score"] = rng.choices([0, 1, 2], [0.15, 0.35, 0.5])[0]
+            record["filters"]["accepted"] = record["leakage_score"] == 0 and record["salience_score"] >= 1
+            f_scored.write(json.dumps(record) + "\n")
+            if record["filters"]["accepted"]:
+                f_accepted.write(json.dumps(record) + "\n")
+
+
+# ============================================================================
+# TIMING
+# ============================================================================
+
+def best_time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def timing(seconds: float, items: int) -> dict:
+    return {"seconds": round(seconds, 6), "items": items, "us_per_item": round(1e6 * seconds / max(1, items), 3)}
+
+
+def bench_functions(questions: list[str], repeat: int, similarity_calls: int) -> dict[str, dict]:
+    results = {}
+    results["check_blocklist"] = timing(best_time(lambda: [check_blocklist(q) for q in questions], repeat), len(questions))
+    # Should stay close to check_blocklist: lookups follow the text, not the lexicon size
+    large_blocklist = synth_blocklist(5000)
+    lowered = [q.lower() for q in questions]
+    results["blocklist_5k_extra_terms"] = timing(
+        best_time(lambda: [large_blocklist.first_terms(q) for q in lowered], repeat), len(questions)
+    )
+    results["check_pii"] = timing(best_time(lambda: [check_pii(q) for q in questions], repeat), len(questions))
+    records = [{"question": q, "filters": {}} for q in questions]
+    results["filter_question"] = timing(best_time(lambda: [filter_question(r) for r in records], repeat), len(records))
+
+    judge_responses = synth_judge_responses(len(questions))
+    results["parse_judge_json"] = timing(
+        best_time(lambda: [parse_judge_json(r, is_reasoning_model=True) for r in judge_responses], repeat), len(judge_responses)
+    )
+    generation_responses = synth_generation_responses(questions)
+    results["parse_json_list"] = timing(
+        best_time(lambda: [parse_json_list(r) for r in generation_responses], repeat), len(generation_responses)
+    )
+
+    if importlib.util.find_spec("rouge_score") is not None:
+        from feature_store import QuestionFeatures
+        from phase1_dedup_questions import find_max_similarity
+
+        def extract():
+            extracted = QuestionFeatures()
+            for q in questions:
+                extracted.add(q)
+
+        results["extract_features"] = timing(best_time(extract, repeat), len(questions))
+        features = QuestionFeatures()
+        pool = [features.stem_text(q.lower()) for q in questions[:100]]
+        candidates = [features.stem_text(q.lower()) for q in questions[100:100 + similarity_calls]]
+        if candidates:
+            results["find_max_similarity"] = timing(
+                best_time(lambda: [find_max_similarity(c, pool) for c in candidates], repeat), len(candidates)
+            )
+    return results
+
+
+def run_stage(script: str, run_id: str, extra: list[str] = ()) -> None:
+    subprocess.run(
+        [sys.executable, str(SCRIPTS / script), "--run-id", run_id, *extra],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def bench_stages(questions: list[str], repeat: int, dedup_max_size: int) -> dict[str, dict]:
+    run_id = f"bench_hotpaths_{len(questions)}"
+    run_dir = ROOT / "data" / "runs" / run_id
+    run_dir.mkdir(parents=True, exist_ok=True)
+    results = {}
+    try:
+        write_corpus(run_dir / "questions_raw.jsonl", questions)
+        results["stage_filter"] = timing(best_time(lambda: run_stage("phase1_filter_questions.py", run_id), repeat), len(questions))
+        if len(questions) <= dedup_max_size:
+            # ROUGE-L dominates and is slow enough that one run is stable
+            results["stage_dedup"] = timing(best_time(lambda: run_stage("phase1_dedup_questions.py", run_id), 1), len(questions))
+        else:
+            # Too slow to run at this size; mark everything that passed as novel instead
+            with open(run_dir / "questions_filtered.jsonl") as f_in, open(run_dir / "questions_deduped.jsonl", "w") as f_out:
+                for line in f_in:
+                    record = json.loads(line)
+                    record["filters"]["dedup_passed"] = record["filters"]["passed"]
+                    f_out.write(json.dumps(record) + "\n")
+        write_scored(run_dir)
+        results["stage_report"] = timing(best_time(lambda: run_stage("phase1_report.py", run_id), repeat), len(questions))
+    finally:
+        shutil.rmtree(run_dir)
+    return results
+
+
+# ============================================================================
+# COMPARE
+# ============================================================================
+
+def compare_results(baseline: dict, current: dict, tolerance: float) -> list[dict]:
+    """Per-item timings present in both runs, with regressions beyond tolerance flagged."""
+    rows = []
+    for key, now in sorted(current["results"].items()):
+        before = baseline["results"].get(key)
+        if before is None:
+            continue
+        ratio = now["us_per_item"] / before["us_per_item"] if before["us_per_item"] else 1.0
+        rows.append({
+            "benchmark": key,
+            "baseline_us": before["us_per_item"],
+            "current_us": now["us_per_item"],
+            "ratio": round(ratio, 3),
+            "regressed": ratio > 1 + tolerance,
+        })
+    return rows
+
+
+def print_comparison(rows: list[dict], tolerance: float) -> int:
+    print(f"{'benchmark':36s} {'baseline µs':>12s} {'current µs':>12s} {'ratio':>7s}")
+    for row in rows:
+        flag = "  REGRESSED" if row["regressed"] else ""
+        print(f"{row['benchmark']:36s} {row['baseline_us']:12.3f} {row['current_us']:12.3f} {row['ratio']:7.2f}{flag}")
+    regressions = sum(row["regressed"] for row in rows)
+    print()
+    print(f"{regressions} regression(s) beyond {tolerance:.0%}" if regressions else f"No regressions beyond {tolerance:.0%}")
+    return 1 if regressions else 0
+
+
+def load_results(path: Path) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Phase 1 CPU hot paths")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Time hot functions and stages on synthetic corpora")
+    run.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000], help="Corpus sizes (questions)")
+    run.add_argument("--leak-rate", type=float, default=0.2, help="Share of questions with a blocklisted term")
+    run.add_argument("--pii-rate", type=float, default=0.02, help="Share of questions with PII")
+    run.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the fastest counts")
+    run.add_argument("--similarity-calls", type=int, default=100, help="Candidates timed against a 100-question dedup pool")
+    run.add_argument("--dedup-max-size", type=int, default=1000, help="Largest corpus to run the dedup stage on")
+    run.add_argument("--no-stages", action="store_true", help="Only time the hot functions")
+    run.add_argument("--output", default=None, help="Write results JSON here")
+    run.add_argument("--save-baseline", action="store_true", help=f"Also write results to {DEFAULT_BASELINE.relative_to(ROOT)}")
+    run.add_argument("--compare", action="store_true", help="Compare with the baseline after running")
+    run.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+
+    compare = commands.add_parser("compare", help="Compare a results file with the baseline")
+    compare.add_argument("current", help="Results JSON from a run")
+    compare.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline results JSON")
+    compare.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        rows = compare_results(load_results(Path(args.baseline)), load_results(Path(args.current)), args.tolerance)
+        return print_comparison(rows, args.tolerance)
+
+    if not (0 <= args.leak_rate <= 1 and 0 <= args.pii_rate <= 1):
+        parser.error("--leak-rate and --pii-rate must be between 0 and 1")
+    if args.repeat < 1 or min(args.sizes) < 1:
+        parser.error("--repeat and --sizes must be at least 1")
+
+    print(f"Hot Path Benchmarks")
+    print(f"===================")
+    print(f"Sizes: {', '.join(str(s) for s in args.sizes)}  Leak rate: {args.leak_rate}  PII rate: {args.pii_rate}")
+    print()
+    print(f"{'benchmark':36s} {'items':>9s} {'seconds':>10s} {'µs/item':>10s}")
+    results = {}
+    for size in args.sizes:
+        questions = synth_questions(size, args.leak_rate, args.pii_rate)
+        size_results = bench_functions(questions, args.repeat, args.similarity_calls)
+        if not args.no_stages:
+            size_results.update(bench_stages(questions, args.repeat, args.dedup_max_size))
+        for name, result in size_results.items():
+            key = f"{name}@{size}"
+            results[key] = result
+            print(f"{key:36s} {result['items']:9d} {result['seconds']:10.3f} {result['us_per_item']:10.3f}")
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "params": {"leak_rate": args.leak_rate, "pii_rate": args.pii_rate, "repeat": args.repeat},
+        "results": results,
+    }
+    outputs = [Path(args.output)] if args.output else []
+    if args.save_baseline:
+        outputs.append(DEFAULT_BASELINE)
+    for path in outputs:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with AtomicWriter(path, record=False) as f:
+            json.dump(report, f, indent=2)
+        print(f"Results: {path}")
+
+    if args.compare:
+        print()
+        return print_comparison(compare_results(load_results(DEFAULT_BASELINE), report, args.tolerance), args.tolerance)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
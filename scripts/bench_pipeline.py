@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+End-to-end Phase 1 pipeline benchmark against the stub LLM server.
+
+For every dataset size (--num questions per domain × type bucket) and
+concurrency level, starts a fresh llm_stub_server.py on a free port, runs
+phase1_run_pipeline.py against it, and reports wall time, request and
+question throughput. The stub is deterministic, so the numbers only move
+when the pipeline does.
+
+Usage:
+    python scripts/bench_pipeline.py
+    python scripts/bench_pipeline.py --num 5 20 --concurrency 1 4 16 --ttft lognormal:0.2,0.4 --tokens-per-second 60
+    python scripts/bench_pipeline.py --num 10 --concurrency 8 --error-rate 0.05 --output data/bench/pipeline.json
+"""
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from artifact_io import AtomicWriter, existing_artifact, open_artifact
+from llm_stub_server import add_stub_args, model_from_args, serve_in_thread, validate_stub_args
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = ROOT / "scripts"
+
+
+def count_lines(path: Path) -> int:
+    path = existing_artifact(path)
+    if not path.exists():
+        return 0
+    with open_artifact(path) as f:
+        return sum(1 for line in f if line.strip())
+
+
+def count_accepted(path: Path) -> int:
+    path = existing_artifact(path)
+    if not path.exists():
+        return 0
+    with open_artifact(path) as f:
+        return sum(1 for line in f if line.strip() and json.loads(line).get("filters", {}).get("accepted"))
+
+
+def run_case(args, num: int, concurrency: int) -> dict:
+    run_id = f"bench_n{num}_c{concurrency}"
+    run_dir = ROOT / "data" / "runs" / run_id
+    if run_dir.exists():
+        shutil.rmtree(run_dir)
+    run_dir.mkdir(parents=True)
+
+    # A fresh server per case, so retries and prefix-cache state don't carry over
+    model = model_from_args(args)
+    server = serve_in_thread(model)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    command = [
+        sys.executable, str(SCRIPTS / "phase1_run_pipeline.py"),
+        "--run-id", run_id,
+        "--base-url", base_url,
+        "--num", str(num),
+        "--concurrency", str(concurrency),
+    ]
+    if args.chunk_size:
+        command += ["--chunk-size", str(args.chunk_size)]
+    if not args.adaptive_concurrency:
+        command.append("--no-adaptive-concurrency")
+
+    log_path = run_dir / "bench.log"
+    start = time.perf_counter()
+    completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    returncode = completed.returncode
+    with AtomicWriter(log_path, record=False) as log:
+        log.write(completed.stdout)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+
+    stats = model.summary()
+    result = {
+        "num": num,
+        "concurrency": concurrency,
+        "ok": returncode == 0,
+        "seconds": round(elapsed, 3),
+        "generated": count_lines(run_dir / "questions_raw.jsonl"),
+        "scored": count_lines(run_dir / "questions_scored.jsonl"),
+        "accepted": count_accepted(run_dir / "questions_scored.jsonl"),
+        "stub": stats,
+    }
+    result["requests_per_second"] = round(stats["requests"] / elapsed, 2)
+    result["questions_per_second"] = round(result["generated"] / elapsed, 2)
+    result["completion_tokens_per_second"] = round(stats["completion_tokens"] / elapsed, 1)
+    if returncode != 0:
+        print(f"  pipeline exited {returncode}; log: {log_path}")
+    elif not args.keep_runs:
+        shutil.rmtree(run_dir)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Phase 1 pipeline end to end against the stub server")
+    parser.add_argument("--num", type=int, nargs="+", default=[5, 20], help="Questions per bucket (dataset sizes)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Concurrency levels")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Passed through to the generator")
+    parser.add_argument(
+        "--adaptive-concurrency",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Let AIMD move concurrency during the run (default: off, so each level is measured as given)",
+    )
+    parser.add_argument("--keep-runs", action="store_true", help="Keep data/runs/bench_* directories")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    add_stub_args(parser)
+    args = parser.parse_args()
+    if min(args.num) < 1 or min(args.concurrency) < 1:
+        parser.error("--num and --concurrency values must be at least 1")
+    validate_stub_args(parser, args)
+
+    print(f"Pipeline Benchmark")
+    print(f"==================")
+    print(f"Stub: ttft {args.ttft}, {args.tokens_per_second or 'instant'} tok/s, max {args.max_num_seqs} seqs, "
+          f"errors {args.error_rate:.0%}, truncation {args.truncate_rate:.0%}")
+    print()
+    print(f"{'num':>5s} {'conc':>5s} {'seconds':>8s} {'requests':>9s} {'req/s':>7s} {'generated':>10s} "
+          f"{'q/s':>7s} {'accepted':>9s} {'tok/s':>8s}")
+
+    results = []
+    for num in args.num:
+        for concurrency in args.concurrency:
+            result = run_case(args, num, concurrency)
+            results.append(result)
+            print(
+                f"{num:5d} {concurrency:5d} {result['seconds']:8.2f} {result['stub']['requests']:9d} "
+                f"{result['requests_per_second']:7.2f} {result['generated']:10d} {result['questions_per_second']:7.2f} "
+                f"{result['accepted']:9d} {result['completion_tokens_per_second']:8.1f}"
+                + ("" if result["ok"] else "  FAILED")
+            )
+
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with AtomicWriter(output_path, record=False) as f:
+            json.dump({"stub": {k: v for k, v in vars(args).items() if k not in ("output",)}, "results": results}, f, indent=2)
+        print()
+        print(f"Results: {output_path}")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
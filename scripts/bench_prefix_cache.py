@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Benchmark prompt-token savings from the server's prefix cache.
+
+Renders the generation requests (and optionally judge requests) in the order
+the pipeline sends them and reports how many prompt tokens a prefix cache can
+reuse. By default this is simulated offline with a block-level cache like
+vLLM's automatic prefix caching; with --server the prompts are sent to a real
+(or stub) server and the cached_tokens it reports in usage are summed.
+
+Usage:
+    python scripts/bench_prefix_cache.py
+    python scripts/bench_prefix_cache.py --baseline-ref HEAD~1 --num 10 --chunk-size 5
+    python scripts/bench_prefix_cache.py --judge-questions data/runs/run_001/questions_filtered.jsonl
+    python scripts/bench_prefix_cache.py --server --base-url http://localhost:8000/v1 --concurrency 8
+
+Token counts in simulation are approximate (word and punctuation pieces).
+Against vLLM, start the server with --enable-prefix-caching and
+--enable-prompt-tokens-details so usage includes cached_tokens.
+
+Requires:
+    pip install openai pyyaml
+"""
+
+import argparse
+import json
+import re
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from llm_client import add_client_args, client_from_args, get_profile, load_yaml_config, validate_client_args, worker_count
+from phase1_generate_questions import plan_chunks, render_chunk_hint, render_template, template_order
+from phase1_score_questions import render_prompt
+
+ROOT = Path(__file__).resolve().parent.parent
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def approx_tokens(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text)
+
+
+class PrefixCache:
+    """
+    Block-level prefix cache: a prompt reuses its leading full blocks whose
+    chained hash (block contents plus everything before it) is already cached.
+    Blocks are evicted least-recently-used once capacity_blocks is exceeded.
+    """
+
+    def __init__(self, block_size: int = 16, capacity_blocks: int | None = None):
+        self.block_size = block_size
+        self.capacity_blocks = capacity_blocks
+        self.blocks: OrderedDict = OrderedDict()
+
+    def lookup_and_insert(self, tokens: list) -> int:
+        """Return the number of cached prompt tokens, then cache this prompt's blocks."""
+        cached = 0
+        still_hit = True
+        parent = None
+        for start in range(0, len(tokens) - self.block_size + 1, self.block_size):
+            key = hash((parent, tuple(tokens[start:start + self.block_size])))
+            if still_hit and key in self.blocks:
+                cached += self.block_size
+            else:
+                still_hit = False
+            self.blocks[key] = True
+            self.blocks.move_to_end(key)
+            parent = key
+        while self.capacity_blocks is not None and len(self.blocks) > self.capacity_blocks:
+            self.blocks.popitem(last=False)
+        return cached
+
+
+def simulate(prompts: list[str], block_size: int = 16, capacity_blocks: int | None = None) -> dict:
+    cache = PrefixCache(block_size, capacity_blocks)
+    prompt_tokens = cached_tokens = 0
+    for prompt in prompts:
+        tokens = approx_tokens(prompt)
+        prompt_tokens += len(tokens)
+        cached_tokens += cache.lookup_and_insert(tokens)
+    return {"requests": len(prompts), "prompt_tokens": prompt_tokens, "cached_tokens": cached_tokens}
+
+
+def load_templates(question_types: list[dict], ref: str | None = None) -> dict[str, str]:
+    """Generation templates from the working tree, or as of a git ref."""
+    templates = {}
+    for qtype in question_types:
+        relative = f"prompts/generation/question_gen_{qtype['id']}.md"
+        if ref is None:
+            templates[qtype["id"]] = (ROOT / relative).read_text()
+        else:
+            templates[qtype["id"]] = subprocess.run(
+                ["git", "show", f"{ref}:{relative}"], cwd=ROOT, check=True, capture_output=True, text=True
+            ).stdout
+    return templates
+
+
+def generation_prompts(
+    templates: dict[str, str],
+    domains: list[dict],
+    question_types: list[dict],
+    num_questions: int,
+    chunk_size: int | None,
+    grouped: bool = True,
+) -> list[str]:
+    """Generation prompts in send order: grouped by template, or domain by domain."""
+    buckets = []
+    for domain in domains:
+        for qtype in question_types:
+            sizes = plan_chunks(num_questions, chunk_size)
+            chunks = []
+            for chunk_index, chunk_n in enumerate(sizes):
+                prompt = render_template(templates[qtype["id"]], domain, qtype, chunk_n)
+                if len(sizes) > 1:
+                    prompt += render_chunk_hint(chunk_index, len(sizes))
+                chunks.append({"prompt": prompt})
+            buckets.append((domain, qtype, num_questions, chunks))
+    if grouped:
+        return [chunk["prompt"] for chunk in template_order(buckets)]
+    return [chunk["prompt"] for _, _, _, chunks in buckets for chunk in chunks]
+
+
+def judge_prompts(path: Path, limit: int | None = None) -> list[str]:
+    template = (ROOT / "prompts" / "judges" / "leakage_salience.md").read_text()
+    prompts = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                prompts.append(render_prompt(template, json.loads(line)["question"]))
+            if limit and len(prompts) >= limit:
+                break
+    return prompts
+
+
+def measure_server(client, model_id: str, prompts: list[str], max_tokens: int, workers: int) -> dict:
+    """Send prompts in order and sum the prompt and cached token counts the server reports."""
+
+    def send(prompt):
+        response = client.chat(model_id, [{"role": "user", "content": prompt}], {"temperature": 0, "max_tokens": max_tokens})
+        usage = response["usage"] or {}
+        details = usage.get("prompt_tokens_details") or {}
+        return usage.get("prompt_tokens") or 0, details.get("cached_tokens") or 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(send, prompts))
+    return {
+        "requests": len(prompts),
+        "prompt_tokens": sum(p for p, _ in results),
+        "cached_tokens": sum(c for _, c in results),
+    }
+
+
+def print_row(name: str, result: dict) -> None:
+    saved = result["cached_tokens"] / result["prompt_tokens"] if result["prompt_tokens"] else 0.0
+    print(
+        f"{name:32s} {result['requests']:8d} {result['prompt_tokens']:12d} "
+        f"{result['cached_tokens']:12d} {100 * saved:7.1f}%"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prefix-cache prompt-token savings")
+    add_client_args(parser)
+    parser.add_argument("--profile", default=None, help="Model profile to use (server mode)")
+    parser.add_argument("--num", type=int, default=30, help="Questions per bucket")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Split buckets into chunks, as phase1_generate_questions.py does")
+    parser.add_argument("--judge-questions", default=None, help="JSONL of questions to also render judge prompts for")
+    parser.add_argument("--judge-limit", type=int, default=200, help="Judge prompts to include")
+    parser.add_argument("--baseline-ref", default=None, help="Also simulate the generation templates as of this git ref")
+    parser.add_argument("--block-size", type=int, default=16, help="Cache block size in tokens (vLLM default: 16)")
+    parser.add_argument("--cache-blocks", type=int, default=None, help="Cache capacity in blocks (default: unbounded)")
+    parser.add_argument("--server", action="store_true", help="Measure against --base-url instead of simulating")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent requests in server mode")
+    parser.add_argument("--max-tokens", type=int, default=1, help="Completion tokens per request in server mode")
+    args = parser.parse_args()
+    if args.num < 1:
+        parser.error("--num must be at least 1")
+    if args.chunk_size is not None and args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    validate_client_args(parser, args)
+
+    domains = load_yaml_config("domains.yaml")["domains"]
+    question_types = load_yaml_config("question_types.yaml")["question_types"]
+    templates = load_templates(question_types)
+
+    workloads = [
+        ("generation, grouped", generation_prompts(templates, domains, question_types, args.num, args.chunk_size)),
+        ("generation, domain order", generation_prompts(templates, domains, question_types, args.num, args.chunk_size, grouped=False)),
+    ]
+    if args.baseline_ref and not args.server:
+        baseline = load_templates(question_types, args.baseline_ref)
+        workloads.append((
+            f"generation @ {args.baseline_ref}",
+            generation_prompts(baseline, domains, question_types, args.num, args.chunk_size, grouped=False),
+        ))
+    if args.judge_questions:
+        workloads.append(("judge", judge_prompts(Path(args.judge_questions), args.judge_limit)))
+
+    print(f"Prefix Cache Benchmark")
+    print(f"======================")
+    if args.server:
+        llm_config = load_yaml_config("llm.yaml")
+        model_id = get_profile(llm_config, args.profile)["model_id"]
+        print(f"Server: {args.base_url} ({model_id})")
+        print("Note: each workload warms the cache for the next; compare a workload against itself across runs.")
+    else:
+        capacity = args.cache_blocks if args.cache_blocks is not None else "unbounded"
+        print(f"Simulated cache: {args.block_size}-token blocks, capacity {capacity}")
+    print()
+    print(f"{'workload':32s} {'requests':>8s} {'prompt_tok':>12s} {'cached_tok':>12s} {'saved':>8s}")
+    for name, prompts in workloads:
+        if args.server:
+            client = client_from_args(args, concurrency=args.concurrency)
+            result = measure_server(client, model_id, prompts, args.max_tokens, worker_count(args, args.concurrency))
+            client.close()
+        else:
+            result = simulate(prompts, args.block_size, args.cache_blocks)
+        print_row(name, result)
+
+
+if __name__ == "__main__":
+    main()
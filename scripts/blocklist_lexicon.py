@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+The leakage blocklist: configs/blocklist.yaml compiled into a matcher.
+
+The config lists terms per region and section (countries, cities,
+institutions, currencies, customs); each section has a leakage level,
+explicit or implicit. `load_blocklist` compiles it into a `BlocklistMatcher`
+and caches the compiled form as JSON in data/cache/, named by the SHA-256
+of the config bytes. Other processes, and later runs, load that file
+instead of parsing YAML and indexing the terms again; editing the config
+changes the hash and so recompiles once.
+
+Matching keeps the filter's semantics: terms up to the level's
+word_boundary_max_length match as whole words (like `\\bterm\\b`), longer
+ones anywhere in the lowercased text. Instead of trying every term, the
+matcher looks up candidates by what the text contains:
+
+    word terms   boundary terms made only of word characters, looked up
+                 by the text's words (a whole-word match is a whole word)
+    gram index   every other term, keyed by its first GRAM_SIZE characters
+                 and looked up by the text's character n-grams; candidates
+                 are then confirmed with a substring (or boundary) check
+    scan         boundary terms with punctuation shorter than GRAM_SIZE,
+                 checked on every text
+
+So the cost per question follows the question's length, not the number of
+terms: thousands of region terms keep filtering throughput flat.
+
+Usage:
+    python scripts/blocklist_lexicon.py                 # compile (or load) and summarize
+    python scripts/blocklist_lexicon.py "text to check"
+
+Requires:
+    pip install pyyaml (only when the config changed since it was last compiled)
+"""
+
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BLOCKLIST_CONFIG = ROOT / "configs" / "blocklist.yaml"
+CACHE_DIR = ROOT / "data" / "cache"
+# Bump when the compiled layout changes, so stale cache files are ignored
+MATCHER_FORMAT = 1
+GRAM_SIZE = 4
+LEVELS = ("explicit", "implicit")
+
+WORD_RE = re.compile(r"\w+")
+
+
+def is_word_char(char: str) -> bool:
+    """What `\\w` matches in a str pattern."""
+    return char.isalnum() or char == "_"
+
+
+def at_boundary(text: str, pos: int) -> bool:
+    """Whether `\\b` matches at `pos`."""
+    before = pos > 0 and is_word_char(text[pos - 1])
+    after = pos < len(text) and is_word_char(text[pos])
+    return before != after
+
+
+class BlocklistMatcher:
+    """
+    Compiled blocklist. Term ids follow the config's order; `terms`,
+    `levels`, `sections` and `regions` are indexed by them.
+    """
+
+    def __init__(self, data: dict):
+        self.version = data["version"]
+        self.digest = data["digest"]
+        self.terms: list[str] = data["terms"]
+        self.levels: list[str] = data["levels"]
+        self.sections: list[str] = data["sections"]
+        self.regions: list[str] = data["regions"]
+        self.boundary: list[bool] = data["boundary"]
+        self.gram_size: int = data["gram_size"]
+        self.word_terms: dict[str, int] = data["word_terms"]
+        self.grams: dict[str, list[int]] = data["grams"]
+        self.scan: list[int] = data["scan"]
+
+    @classmethod
+    def compile(cls, config: dict, digest: str) -> "BlocklistMatcher":
+        """Index a parsed config. Raises ValueError if it is malformed."""
+        levels_of = config.get("sections") or {}
+        bad = {section: level for section, level in levels_of.items() if level not in LEVELS}
+        if bad:
+            raise ValueError(f"Blocklist sections must be explicit or implicit: {bad}")
+        boundary_length = config.get("word_boundary_max_length") or {}
+        data = {"terms": [], "levels": [], "sections": [], "regions": [], "boundary": []}
+        seen = set()
+        for region, sections in (config.get("regions") or {}).items():
+            for section, terms in (sections or {}).items():
+                if section not in levels_of:
+                    raise ValueError(f"Blocklist region {region!r} uses undeclared section {section!r}")
+                level = levels_of[section]
+                for term in terms or []:
+                    if not isinstance(term, str) or not term.strip():
+                        raise ValueError(f"Blocklist term {term!r} in {region}.{section} is not a non-empty string")
+                    term = term.strip().lower()
+                    if term in seen:
+                        continue  # the first region listing a term keeps it
+                    seen.add(term)
+                    data["terms"].append(term)
+                    data["levels"].append(level)
+                    data["sections"].append(section)
+                    data["regions"].append(region)
+                    data["boundary"].append(len(term) <= boundary_length.get(level, 0))
+
+        word_terms, grams, scan = {}, {}, []
+        # Every substring term must be at least a gram long
+        gram_size = min([GRAM_SIZE] + [len(term) for term, boundary in zip(data["terms"], data["boundary"]) if not boundary])
+        for i, term in enumerate(data["terms"]):
+            if data["boundary"][i] and WORD_RE.fullmatch(term):
+                word_terms[term] = i
+            elif len(term) >= gram_size:
+                grams.setdefault(term[:gram_size], []).append(i)
+            else:
+                scan.append(i)
+        data.update(
+            version=config.get("version"),
+            digest=digest,
+            gram_size=gram_size,
+            word_terms=word_terms,
+            grams=grams,
+            scan=scan,
+        )
+        return cls(data)
+
+    def to_dict(self) -> dict:
+        return {"format": MATCHER_FORMAT, **vars(self)}
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _found(self, text: str, i: int) -> bool:
+        term = self.terms[i]
+        if not self.boundary[i]:
+            return term in text
+        end = len(term)
+        pos = text.find(term)
+        while pos >= 0:
+            if at_boundary(text, pos) and at_boundary(text, pos + end):
+                return True
+            pos = text.find(term, pos + 1)
+        return False
+
+    def matches(self, text_lower: str) -> list[int]:
+        """Ids of every term found in lowercased text, in config order."""
+        found = []
+        word_terms = self.word_terms
+        if word_terms:
+            found.extend(word_terms[word] for word in set(WORD_RE.findall(text_lower)) if word in word_terms)
+        n, grams = self.gram_size, self.grams
+        for gram in {text_lower[i : i + n] for i in range(len(text_lower) - n + 1)}:
+            candidates = grams.get(gram)
+            if candidates:
+                found.extend(i for i in candidates if self._found(text_lower, i))
+        found.extend(i for i in self.scan if self._found(text_lower, i))
+        return sorted(found)
+
+    def first_terms(self, text_lower: str) -> dict[str, int]:
+        """The first matching term id of each leakage level found in the text."""
+        first = {}
+        for i in self.matches(text_lower):
+            first.setdefault(self.levels[i], i)
+        return first
+
+    def terms_in(self, *sections: str) -> set[str]:
+        return {term for term, section in zip(self.terms, self.sections) if section in sections}
+
+    def summary(self) -> dict:
+        counts: dict[str, dict[str, int]] = {}
+        for region, level in zip(self.regions, self.levels):
+            counts.setdefault(region, {}).setdefault(level, 0)
+            counts[region][level] += 1
+        return {"version": self.version, "digest": self.digest[:12], "terms": len(self), "regions": counts}
+
+
+def cache_path(digest: str, cache_dir: Path = CACHE_DIR) -> Path:
+    return cache_dir / f"blocklist-{digest[:16]}.json"
+
+
+def load_blocklist(path: Path = BLOCKLIST_CONFIG, cache_dir: Path = CACHE_DIR) -> BlocklistMatcher:
+    """The compiled blocklist for a config: from the cache if present, otherwise compiled and cached."""
+    source = path.read_bytes()
+    digest = hashlib.sha256(source).hexdigest()
+    compiled = cache_path(digest, cache_dir)
+    try:
+        with open(compiled) as f:
+            data = json.load(f)
+        if data.get("format") == MATCHER_FORMAT and data.get("digest") == digest:
+            return BlocklistMatcher(data)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    import yaml
+
+    matcher = BlocklistMatcher.compile(yaml.safe_load(source), digest)
+    tmp_path = compiled.with_name(compiled.name + ".tmp")
+    try:
+        compiled.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump(matcher.to_dict(), f)
+        tmp_path.replace(compiled)
+    except OSError:
+        pass  # read-only checkout: compile again next time
+    return matcher
+
+
+_DEFAULT = None
+
+
+def default_blocklist() -> BlocklistMatcher:
+    """configs/blocklist.yaml, loaded once per process."""
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = load_blocklist()
+    return _DEFAULT
+
+
+def main():
+    matcher = default_blocklist()
+    summary = matcher.summary()
+    print(f"Blocklist: {BLOCKLIST_CONFIG.relative_to(ROOT)} v{summary['version']} ({summary['digest']})")
+    print(f"Compiled:  {cache_path(matcher.digest).relative_to(ROOT)}")
+    print(f"Terms:     {summary['terms']} in {len(summary['regions'])} regions")
+    for region, levels in summary["regions"].items():
+        print(f"  {region:20s} " + ", ".join(f"{n} {level}" for level, n in levels.items()))
+    for text in sys.argv[1:]:
+        print()
+        print(text)
+        for i in matcher.matches(text.lower()):
+            print(f"  {matcher.terms[i]!r:28s} {matcher.levels[i]:9s} {matcher.regions[i]}.{matcher.sections[i]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
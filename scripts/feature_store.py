@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Per-question text features, computed once per run and shared by the stages.
+
+`build_features` reads the questions of questions_raw.jsonl (plain or .gz)
+and stores, per row, in `question_features.bin` next to it:
+
+    normalized   the lowercased, stripped question (what dedup compares)
+    length       characters in the question, and how many are ASCII
+    tokens       ids of the ROUGE tokens (rouge_score's tokenizer, unstemmed)
+    stems        token id -> Porter stem id, one entry per vocabulary word
+    hash         64-bit content hash of the normalized text
+    signature    four 16-bit MinHash lanes over stem bigrams, packed in 64 bits;
+                 the share of equal lanes estimates the bigram overlap
+
+Everything lives in flat arrays (one offsets array per variable-length
+column) plus the token and stem vocabularies, not in per-record dicts.
+The file is reused while questions_raw.jsonl is unchanged and extended when
+lines were only appended (quota rounds). The filter takes lengths and
+normalized text from it, dedup compares stem ids instead of re-tokenizing
+and stemming both texts for every pair, and the report counts duplicates
+and text lengths without decoding the records.
+
+Rows are the non-blank lines of questions_raw.jsonl, so a stage can use the
+features only while its input is row-aligned with it (the default chain).
+"""
+
+import hashlib
+import json
+from array import array
+from pathlib import Path
+
+from artifact_io import check_complete, existing_artifact, is_compressed, open_artifact
+from jsonl_index import extract_field
+
+FEATURES_NAME = "question_features.bin"
+FEATURES_VERSION = 1
+BASE = "questions_raw.jsonl"
+SIGNATURE_LANES = 4
+LANE_MASK = 0xFFFF
+
+# Binary sections after the JSON header line, in file order
+COLUMNS = (
+    ("text_offsets", "Q"),
+    ("text", "B"),
+    ("lengths", "I"),
+    ("ascii", "I"),
+    ("hashes", "Q"),
+    ("signatures", "Q"),
+    ("token_offsets", "Q"),
+    ("tokens", "I"),
+    ("stem_of", "I"),
+)
+
+
+def features_path(run_dir: Path) -> Path:
+    return run_dir / FEATURES_NAME
+
+
+def content_hash(normalized: str) -> int:
+    return int.from_bytes(hashlib.blake2b(normalized.encode(), digest_size=8).digest(), "little")
+
+
+def shingle_signature(stems: list[int]) -> int:
+    """
+    MinHash signature of the stem bigrams (unigrams for one-word questions):
+    each 16-bit lane is the minimum of a different 16-bit slice of one
+    64-bit hash per shingle. 0 for a question without tokens.
+    """
+    shingles = list(zip(stems, stems[1:])) or [(s,) for s in stems]
+    if not shingles:
+        return 0
+    lanes = [LANE_MASK] * SIGNATURE_LANES
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(repr(shingle).encode(), digest_size=8).digest(), "little")
+        for lane in range(SIGNATURE_LANES):
+            lanes[lane] = min(lanes[lane], h >> 16 * lane & LANE_MASK)
+    return sum(value << 16 * lane for lane, value in enumerate(lanes))
+
+
+def signature_similarity(a: int, b: int) -> float:
+    """Share of equal MinHash lanes: an estimate of the two questions' bigram Jaccard similarity."""
+    return sum(a >> 16 * lane & LANE_MASK == b >> 16 * lane & LANE_MASK for lane in range(SIGNATURE_LANES)) / SIGNATURE_LANES
+
+
+class RougeL:
+    """
+    ROUGE-L F1 of one stem-id sequence (the target) against others. Equals
+    rouge_score's rougeL fmeasure with use_stemmer=True on the texts. The
+    LCS is computed bit-parallel, with the target's match masks built once.
+    """
+
+    def __init__(self, target: list[int]):
+        self.length = len(target)
+        self.full = (1 << self.length) - 1
+        self.masks: dict[int, int] = {}
+        for i, symbol in enumerate(target):
+            self.masks[symbol] = self.masks.get(symbol, 0) | 1 << i
+
+    def lcs_length(self, prediction: list[int]) -> int:
+        v = self.full
+        for symbol in prediction:
+            u = v & self.masks.get(symbol, 0)
+            v = ((v + u) | (v - u)) & self.full
+        return self.length - v.bit_count()
+
+    def score(self, prediction: list[int]) -> float:
+        if not self.length or not prediction:
+            return 0.0
+        lcs = self.lcs_length(prediction)
+        if not lcs:
+            return 0.0
+        precision, recall = lcs / len(prediction), lcs / self.length
+        return 2 * precision * recall / (precision + recall)
+
+
+def rouge_l(target: list[int], prediction: list[int]) -> float:
+    return RougeL(target).score(prediction)
+
+
+class QuestionFeatures:
+    """Array-backed features of a run's questions, by row of questions_raw.jsonl."""
+
+    def __init__(self):
+        self.columns = {name: array(code) for name, code in COLUMNS}
+        self.columns["text_offsets"].append(0)
+        self.columns["token_offsets"].append(0)
+        self.vocab: list[str] = []
+        self.stem_vocab: list[str] = []
+        self._token_ids: dict[str, int] = {}
+        self._stem_ids: dict[str, int] = {}
+        self._stemmer = None
+        self._tokenize = None
+        self.raw_offset = 0
+        self.raw_head = None
+
+    def __len__(self) -> int:
+        return len(self.columns["lengths"])
+
+    # ------------------------------------------------------------------
+    # Per-row access
+    # ------------------------------------------------------------------
+
+    def normalized(self, row: int) -> str:
+        offsets = self.columns["text_offsets"]
+        return self.columns["text"][offsets[row]:offsets[row + 1]].tobytes().decode()
+
+    def length(self, row: int) -> int:
+        return self.columns["lengths"][row]
+
+    def ascii_chars(self, row: int) -> int:
+        return self.columns["ascii"][row]
+
+    def tokens(self, row: int) -> array:
+        offsets = self.columns["token_offsets"]
+        return self.columns["tokens"][offsets[row]:offsets[row + 1]]
+
+    def stems(self, row: int) -> list[int]:
+        stem_of = self.columns["stem_of"]
+        return [stem_of[token] for token in self.tokens(row)]
+
+    def content_hash(self, row: int) -> int:
+        return self.columns["hashes"][row]
+
+    def signature(self, row: int) -> int:
+        return self.columns["signatures"][row]
+
+    def summary(self) -> dict:
+        """Corpus figures: exact duplicates (content hash), near duplicates (same signature), mean lengths."""
+        hashes, signatures = set(), set()
+        exact = near = 0
+        for content, signature in zip(self.columns["hashes"], self.columns["signatures"]):
+            if content in hashes:
+                exact += 1
+            elif signature and signature in signatures:
+                near += 1
+            hashes.add(content)
+            signatures.add(signature)
+        rows = len(self)
+        return {
+            "questions": rows,
+            "exact_duplicates": exact,
+            "near_duplicates": near,
+            "mean_chars": sum(self.columns["lengths"]) / rows if rows else 0.0,
+            "mean_tokens": len(self.columns["tokens"]) / rows if rows else 0.0,
+            "vocabulary": len(self.vocab),
+            "stems": len(self.stem_vocab),
+        }
+
+    # ------------------------------------------------------------------
+    # Extraction
+    # ------------------------------------------------------------------
+
+    def stem_text(self, text: str) -> list[int]:
+        """Stem ids of a text that isn't in the run (e.g. a seed question), extending the vocabularies."""
+        return [self.columns["stem_of"][token] for token in self._token_ids_of(text)]
+
+    def _token_ids_of(self, text: str) -> list[int]:
+        if self._stemmer is None:
+            # Imported on first use: stages that only read stored features don't pay for nltk
+            try:
+                from nltk.stem import porter
+                from rouge_score import tokenize
+            except ImportError:
+                raise ImportError("rouge-score is needed to extract question features (pip install rouge-score)")
+            self._stemmer, self._tokenize = porter.PorterStemmer(), tokenize.tokenize
+        ids = []
+        for token in self._tokenize(text, None):
+            token_id = self._token_ids.get(token)
+            if token_id is None:
+                token_id = self._token_ids[token] = len(self.vocab)
+                self.vocab.append(token)
+                # Stemmed once per vocabulary word, as rouge_score does per occurrence (words over 3 chars)
+                stem = self._stemmer.stem(token) if len(token) > 3 else token
+                stem_id = self._stem_ids.get(stem)
+                if stem_id is None:
+                    stem_id = self._stem_ids[stem] = len(self.stem_vocab)
+                    self.stem_vocab.append(stem)
+                self.columns["stem_of"].append(stem_id)
+            ids.append(token_id)
+        return ids
+
+    def add(self, question: str) -> None:
+        c = self.columns
+        normalized = question.lower().strip()
+        encoded = normalized.encode()
+        c["text"].frombytes(encoded)
+        c["text_offsets"].append(c["text_offsets"][-1] + len(encoded))
+        c["lengths"].append(len(question))
+        c["ascii"].append(sum(1 for ch in question if ord(ch) < 128))
+        c["hashes"].append(content_hash(normalized))
+        token_ids = self._token_ids_of(question)
+        c["tokens"].extend(token_ids)
+        c["token_offsets"].append(len(c["tokens"]))
+        c["signatures"].append(shingle_signature([c["stem_of"][t] for t in token_ids]))
+
+    def extend_from(self, raw_path: Path) -> int:
+        """Add the complete lines of questions_raw.jsonl after raw_offset; returns how many were added."""
+        added = 0
+        with open_artifact(raw_path, binary=True) as f:
+            head = f.readline()
+            self.raw_head = hashlib.sha1(head).hexdigest()
+            f.seek(self.raw_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # still being written
+                self.raw_offset += len(line)
+                if line.strip():
+                    self.add(extract_field(line, "question", "") or "")
+                    added += 1
+        return added
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: Path, raw_path: Path) -> None:
+        stat = raw_path.stat()
+        header = {
+            "version": FEATURES_VERSION,
+            "raw": raw_path.name,
+            "raw_size": stat.st_size,
+            "raw_mtime_ns": stat.st_mtime_ns,
+            "raw_offset": self.raw_offset,
+            "raw_head": self.raw_head,
+            "rows": len(self),
+            "lengths": {name: len(self.columns[name]) for name, _ in COLUMNS},
+            "vocab": self.vocab,
+            "stem_vocab": self.stem_vocab,
+        }
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(json.dumps(header).encode() + b"\n")
+                for name, _ in COLUMNS:
+                    self.columns[name].tofile(f)
+            tmp_path.replace(path)
+        except OSError:
+            pass  # read-only run directory: features are recomputed next time
+
+    @classmethod
+    def load(cls, path: Path) -> "tuple[QuestionFeatures, dict] | None":
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                if header.get("version") != FEATURES_VERSION:
+                    return None
+                features = cls()
+                for name, code in COLUMNS:
+                    column = array(code)
+                    column.fromfile(f, header["lengths"][name])
+                    features.columns[name] = column
+        except (OSError, ValueError, EOFError, KeyError):
+            return None
+        features.vocab, features.stem_vocab = header["vocab"], header["stem_vocab"]
+        features._token_ids = {token: i for i, token in enumerate(features.vocab)}
+        features._stem_ids = {stem: i for i, stem in enumerate(features.stem_vocab)}
+        features.raw_offset, features.raw_head = header["raw_offset"], header["raw_head"]
+        return features, header
+
+
+def load_features(run_dir: Path) -> QuestionFeatures | None:
+    """The run's features if they are up to date with questions_raw.jsonl, without computing any."""
+    raw_path = existing_artifact(run_dir / BASE)
+    check_complete(raw_path)
+    loaded = QuestionFeatures.load(features_path(run_dir)) if raw_path.exists() else None
+    if loaded is None:
+        return None
+    features, header = loaded
+    stat = raw_path.stat()
+    if (header["raw"], header["raw_size"], header["raw_mtime_ns"]) != (raw_path.name, stat.st_size, stat.st_mtime_ns):
+        return None
+    return features
+
+
+def build_features(run_dir: Path) -> QuestionFeatures | None:
+    """
+    The run's features, computing only what's missing: nothing if
+    questions_raw.jsonl is unchanged, the new lines if it was appended to,
+    everything if it was rewritten. None if the run has no raw file.
+    """
+    raw_path = existing_artifact(run_dir / BASE)
+    check_complete(raw_path)
+    if not raw_path.exists():
+        return None
+    features = load_features(run_dir)
+    if features is not None:
+        return features
+    loaded = QuestionFeatures.load(features_path(run_dir))
+    features = None
+    if loaded is not None and loaded[1]["raw"] == raw_path.name:
+        features = loaded[0]
+        # Appended: the same first line, and the old end is still a line boundary
+        with open_artifact(raw_path, binary=True) as f:
+            head = hashlib.sha1(f.readline()).hexdigest()
+            if is_compressed(raw_path):
+                grown = f.seek(features.raw_offset) == features.raw_offset
+            else:
+                grown = raw_path.stat().st_size >= features.raw_offset
+            if features.raw_offset:
+                f.seek(features.raw_offset - 1)
+                grown = grown and f.read(1) == b"\n"
+        if head != features.raw_head or not grown:
+            features = None
+    if features is None:
+        features = QuestionFeatures()
+    features.extend_from(raw_path)
+    features.save(features_path(run_dir), raw_path)
+    return features
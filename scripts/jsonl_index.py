@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Random access to run JSONL files through a cached byte-offset index.
+
+JsonlFile memory-maps a JSONL file and keeps the start offset and id of every
+line in `<file>.idx` next to it. The index is reused while the file's size and
+mtime are unchanged, and extended in place when the file has only grown (an
+appended questions_raw.jsonl). Counting reads only the index, records are
+decoded only for the lines asked for, and `project` pulls single fields out
+of each line without building the full record.
+
+A .jsonl.gz file can't be memory-mapped; its offsets count decompressed
+bytes and lines are read by seeking the gzip stream, which is cheap going
+forward and restarts decompression going back. Its index is rebuilt
+whenever the file changes.
+
+Usage:
+    python scripts/jsonl_index.py data/runs/run_001/questions_raw.jsonl --count
+    python scripts/jsonl_index.py data/runs/run_001/questions_scored.jsonl --id gen-2af6c0ec8e3b
+    python scripts/jsonl_index.py data/runs/run_001/questions_accepted.jsonl --sample 5 --seed 1
+    python scripts/jsonl_index.py data/runs/run_001/questions_raw.jsonl --fields domain,question_type
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import random
+import sys
+from array import array
+from pathlib import Path
+from typing import Iterator
+
+from artifact_io import check_complete, is_compressed, open_artifact
+
+INDEX_VERSION = 1
+HEAD_BYTES = 4096  # hashed to tell an appended file from a rewritten one
+_decoder = json.JSONDecoder()
+
+
+def index_path(path: Path) -> Path:
+    return path.with_name(path.name + ".idx")
+
+
+def extract_field(line: bytes, field: str, default=None):
+    """
+    The value of `field` in one JSON line, decoding only that value. Dotted
+    paths reach into nested objects ("filters.passed"). A key is matched at
+    its first occurrence at any depth, so nested keys should go through their
+    parent with a dotted path. Missing keys give `default`.
+    """
+    key, _, rest = field.partition(".")
+    needle = b'"' + key.encode() + b'": '
+    # Quotes inside string values are escaped, so the needle can only match a key
+    pos = line.find(needle)
+    if pos < 0:
+        return default
+    value, _ = _decoder.raw_decode(line[pos + len(needle):].decode())
+    for part in rest.split(".") if rest else ():
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return value
+
+
+class JsonlFile:
+    """A JSONL file with cached line offsets and ids; non-blank lines are numbered from 0."""
+
+    def __init__(self, path: Path, cache: bool = True):
+        self.path = Path(path)
+        self.cache = cache
+        self.offsets = array("Q")
+        self.ids: list = []
+        self.indexed_size = 0
+        self._mm = None
+        self._file = None
+        self._by_id = None
+        check_complete(self.path)
+        if not self.path.exists():
+            return
+        stat = self.path.stat()
+        if is_compressed(self.path):
+            self._file = open_artifact(self.path, binary=True)
+        else:
+            self._file = open(self.path, "rb")
+        if stat.st_size and not is_compressed(self.path):
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if not self._load_index(stat):
+            self._extend(stat)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _load_index(self, stat) -> bool:
+        """Use the cached index if it still matches the file; extend it if the file only grew."""
+        try:
+            with open(index_path(self.path), "rb") as f:
+                header = json.loads(f.readline())
+                offsets = array("Q")
+                offsets.frombytes(f.read())
+        except (OSError, ValueError):
+            return False
+        if header.get("version") != INDEX_VERSION or len(offsets) != len(header["ids"]):
+            return False
+        if (header["size"], header["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            self.offsets, self.ids, self.indexed_size = offsets, header["ids"], header["indexed_size"]
+            return True
+        indexed = header["indexed_size"]
+        if stat.st_size > header["size"] and 0 < indexed <= header["size"] and self._mm is not None:
+            # Appended: same head, and the old prefix still ends in a newline where we stopped
+            if self._mm[indexed - 1:indexed] == b"\n" and self._head_hash(indexed) == header["head"]:
+                self.offsets, self.ids, self.indexed_size = offsets, header["ids"], indexed
+                self._extend(stat)
+                return True
+        return False
+
+    def _head_hash(self, limit: int) -> str:
+        return hashlib.sha1(self._mm[:min(HEAD_BYTES, limit)] if self._mm is not None else b"").hexdigest()
+
+    def _extend(self, stat) -> None:
+        """Index the complete lines after indexed_size and save the index."""
+        mm = self._mm
+        pos = self.indexed_size
+        if mm is None and self._file is not None:
+            self._file.seek(pos)
+            for line in self._file:
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    self.offsets.append(pos)
+                    self.ids.append(extract_field(line, "id"))
+                pos += len(line)
+        while mm is not None and pos < len(mm):
+            end = mm.find(b"\n", pos)
+            if end < 0:
+                break  # last line still being written
+            line = mm[pos:end]
+            if line.strip():
+                self.offsets.append(pos)
+                self.ids.append(extract_field(line, "id"))
+            pos = end + 1
+        self.indexed_size = pos
+        if self.cache:
+            self._save_index(stat)
+
+    def _save_index(self, stat) -> None:
+        header = {
+            "version": INDEX_VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "indexed_size": self.indexed_size,
+            "head": self._head_hash(self.indexed_size),
+            "ids": self.ids,
+        }
+        tmp_path = index_path(self.path).with_name(index_path(self.path).name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(json.dumps(header).encode() + b"\n")
+                self.offsets.tofile(f)
+            tmp_path.replace(index_path(self.path))
+        except OSError:
+            pass  # read-only run directory: the index just isn't cached
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def line(self, row: int) -> bytes:
+        start = self.offsets[row]
+        if self._mm is None:
+            self._file.seek(start)
+            return self._file.readline().rstrip(b"\n")
+        return self._mm[start:self._mm.find(b"\n", start)]
+
+    def __getitem__(self, row: int) -> dict:
+        return json.loads(self.line(row))
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.iter_from(0)
+
+    def iter_from(self, row: int) -> Iterator[dict]:
+        """Records from `row` on (e.g. to resume partway through a file)."""
+        for i in range(row, len(self)):
+            yield self[i]
+
+    def row_of(self, record_id: str) -> int | None:
+        if self._by_id is None:
+            self._by_id = {record_id: row for row, record_id in enumerate(self.ids)}
+        return self._by_id.get(record_id)
+
+    def get(self, record_id: str) -> dict | None:
+        row = self.row_of(record_id)
+        return None if row is None else self[row]
+
+    def sample(self, k: int, rng: random.Random | None = None) -> list[dict]:
+        """k random records (all of them if there are fewer), decoding only those lines."""
+        rows = (rng or random).sample(range(len(self)), min(k, len(self)))
+        return [self[row] for row in rows]
+
+    def project(self, fields: list[str]) -> Iterator[dict]:
+        """{field: value} for every line (fields it lacks are left out), without decoding the rest of each record."""
+        missing = object()
+        for row in range(len(self)):
+            line = self.line(row)
+            values = {field: extract_field(line, field, missing) for field in fields}
+            yield {field: value for field, value in values.items() if value is not missing}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count, look up, sample or project records of a JSONL file")
+    parser.add_argument("path", help="JSONL file")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--count", action="store_true", help="Print the number of records")
+    action.add_argument("--id", default=None, help="Print the record with this id")
+    action.add_argument("--sample", type=int, default=None, help="Print this many random records")
+    action.add_argument("--fields", default=None, help="Print these comma-separated (dotted) fields of every record")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for --sample")
+    args = parser.parse_args()
+
+    path = Path(args.path)
+    if not path.exists():
+        print(f"Error: {path} not found")
+        return 1
+    with JsonlFile(path) as records:
+        if args.count:
+            print(len(records))
+        elif args.id is not None:
+            record = records.get(args.id)
+            if record is None:
+                print(f"Error: no record with id {args.id}")
+                return 1
+            print(json.dumps(record, indent=2))
+        elif args.sample is not None:
+            for record in records.sample(args.sample, random.Random(args.seed)):
+                print(json.dumps(record))
+        else:
+            for values in records.project(args.fields.split(",")):
+                print(json.dumps(values))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Local LLM request broker shared by concurrently running scripts.
+
+Scripts started with --broker send their chat requests here over a Unix
+socket instead of straight to the server. The broker owns the global
+concurrency budget (its own LLMClient, with replicas, AIMD and retries),
+schedules fairly across jobs by priority, and merges identical in-flight
+requests (e.g. the same seed judged by calibration and scoring) into a
+single upstream call. Only requests whose answer may be shared are merged:
+judge requests, seeded ones and greedy decoding. Unseeded sampling (e.g.
+two generation jobs asking the same bucket) stays independent draws.
+
+Usage:
+    python scripts/llm_broker.py --base-url http://localhost:8000/v1 --concurrency 16
+    python scripts/phase1_score_questions.py --run-id run_001 --broker --priority 2
+    python scripts/run_judge_calibration.py --broker
+    python scripts/llm_broker.py --stats
+
+Requires:
+    pip install openai pyyaml
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import signal
+import socketserver
+import threading
+from collections import defaultdict, deque
+
+from llm_client import (
+    DEFAULT_BROKER_SOCKET,
+    BrokerClient,
+    ChatClient,
+    add_client_args,
+    client_from_args,
+    encode_message,
+    validate_client_args,
+    worker_count,
+)
+
+
+def request_key(request: dict) -> str:
+    """Identical requests (model, messages, decoding params, n, seed) share a key."""
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+def coalescable(request: dict, shared: bool = False) -> bool:
+    """
+    Whether identical copies of a request may share one answer: the client
+    says so (judge requests), or the output is pinned by a seed or greedy
+    decoding. Anything else is a fresh sample per caller.
+    """
+    return shared or request.get("seed") is not None or request.get("temperature") == 0
+
+
+class FairScheduler:
+    """
+    Stride scheduling across jobs: the next request comes from the job with
+    the lowest pass value, and a job's pass advances by 1/priority for each
+    request it gets. A job with priority 2 gets twice the share of a job with
+    priority 1, and no job starves. A job that goes idle and comes back
+    restarts at the current virtual time instead of cashing in the idle period.
+    """
+
+    def __init__(self):
+        self.queues: dict[str, deque] = {}
+        self.passes: dict[str, float] = {}
+        self.priorities: dict[str, int] = {}
+        self.virtual_time = 0.0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def put(self, job: str, priority: int, item) -> None:
+        with self.cond:
+            queue = self.queues.setdefault(job, deque())
+            if not queue:
+                self.passes[job] = max(self.passes.get(job, 0.0), self.virtual_time)
+            self.priorities[job] = max(1, priority)
+            queue.append(item)
+            self.cond.notify()
+
+    def get(self):
+        """Block for the next (job, item); returns None once closed and drained."""
+        with self.cond:
+            while not self.closed and not any(self.queues.values()):
+                self.cond.wait()
+            ready = [job for job, queue in self.queues.items() if queue]
+            if not ready:
+                return None
+            job = min(ready, key=lambda j: (self.passes[j], j))
+            self.virtual_time = self.passes[job]
+            self.passes[job] += 1 / self.priorities[job]
+            return job, self.queues[job].popleft()
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class Session:
+    """One connected script; replies are written back on its socket."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.alive = True
+        self.lock = threading.Lock()
+
+    def send(self, message: dict) -> None:
+        if not self.alive:
+            return
+        try:
+            with self.lock:
+                self.wfile.write(encode_message(message))
+                self.wfile.flush()
+        except (OSError, ValueError):
+            # ValueError: the handler already closed the socket file
+            self.alive = False
+
+
+class PendingRequest:
+    def __init__(self, key: str, request: dict, timeout: float | None):
+        self.key = key
+        self.request = request
+        self.timeout = timeout
+        self.waiters: list[tuple[Session, int]] = []
+
+
+class Broker:
+    def __init__(self, client: ChatClient, workers: int):
+        self.client = client
+        self.scheduler = FairScheduler()
+        self.inflight: dict[str, PendingRequest] = {}
+        self.lock = threading.Lock()
+        self._ids = itertools.count()
+        self.stats = defaultdict(lambda: {"requests": 0, "coalesced": 0, "upstream": 0, "errors": 0, "dropped": 0})
+        self.threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(
+        self,
+        job: str,
+        priority: int,
+        request: dict,
+        timeout: float | None,
+        waiter: tuple[Session, int],
+        shared: bool = False,
+    ) -> None:
+        key = request_key(request)
+        with self.lock:
+            if not coalescable(request, shared):
+                # Its own entry, so later identical requests get their own draw too
+                key = f"{key}:{next(self._ids)}"
+            self.stats[job]["requests"] += 1
+            pending = self.inflight.get(key)
+            if pending is not None:
+                # Same request already queued or running: share its answer
+                pending.waiters.append(waiter)
+                self.stats[job]["coalesced"] += 1
+                return
+            pending = PendingRequest(key, request, timeout)
+            pending.waiters.append(waiter)
+            self.inflight[key] = pending
+        self.scheduler.put(job, priority, pending)
+
+    def _work(self) -> None:
+        while True:
+            scheduled = self.scheduler.get()
+            if scheduled is None:
+                return
+            job, pending = scheduled
+            with self.lock:
+                if not any(session.alive for session, _ in pending.waiters):
+                    # Everyone who asked has disconnected
+                    del self.inflight[pending.key]
+                    self.stats[job]["dropped"] += 1
+                    continue
+                self.stats[job]["upstream"] += 1
+            try:
+                reply = {"result": self.client.send_request(pending.request, pending.timeout)}
+            except Exception as e:
+                reply = {"error": {"type": type(e).__name__, "message": str(e)}}
+                with self.lock:
+                    self.stats[job]["errors"] += 1
+            with self.lock:
+                del self.inflight[pending.key]
+                waiters = list(pending.waiters)
+            for session, message_id in waiters:
+                session.send({"id": message_id, **reply})
+
+    def summary(self) -> dict:
+        with self.lock:
+            jobs = {job: dict(stats) for job, stats in self.stats.items()}
+            inflight = len(self.inflight)
+        return {
+            "jobs": jobs,
+            "inflight": inflight,
+            "workers": len(self.threads),
+            "retries": self.client.retries,
+            "endpoints": self.client.endpoint_stats(),
+            "concurrency_control": self.client.limiter.summary() if self.client.limiter else None,
+        }
+
+    def close(self) -> None:
+        self.scheduler.close()
+
+
+class BrokerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, broker: Broker):
+        self.broker = broker
+        super().__init__(socket_path, BrokerHandler)
+
+
+class BrokerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        session = Session(self.wfile)
+        broker = self.server.broker
+        try:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                message = json.loads(line)
+                if message.get("op") == "stats":
+                    session.send({"id": message["id"], "result": broker.summary()})
+                    continue
+                broker.submit(
+                    message.get("job", "default"),
+                    int(message.get("priority", 1)),
+                    message["request"],
+                    message.get("timeout"),
+                    (session, message["id"]),
+                    bool(message.get("shared")),
+                )
+        except (OSError, ValueError):
+            pass
+        finally:
+            session.alive = False
+
+
+def print_summary(summary: dict) -> None:
+    print(f"Workers: {summary['workers']}  In flight: {summary['inflight']}  Retries: {summary['retries']}")
+    print(f"{'job':32s} {'requests':>9s} {'coalesced':>9s} {'upstream':>9s} {'errors':>7s} {'dropped':>7s}")
+    for job, stats in sorted(summary["jobs"].items()):
+        print(
+            f"{job:32s} {stats['requests']:9d} {stats['coalesced']:9d} {stats['upstream']:9d} "
+            f"{stats['errors']:7d} {stats['dropped']:7d}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local LLM request broker")
+    add_client_args(parser)
+    parser.add_argument("--socket", default=DEFAULT_BROKER_SOCKET, help="Unix socket to listen on")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="Global concurrent upstream requests across all jobs (starting point when adaptive)",
+    )
+    parser.add_argument("--stats", action="store_true", help="Print a running broker's per-job stats and exit")
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    validate_client_args(parser, args)
+
+    if args.stats:
+        client = BrokerClient(args.socket, job="stats")
+        print_summary(client.broker_stats())
+        client.close()
+        return
+
+    # The broker always talks to the server directly
+    args.broker = None
+    client = client_from_args(args, concurrency=args.concurrency)
+    broker = Broker(client, workers=worker_count(args, args.concurrency))
+
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    server = BrokerServer(args.socket, broker)
+    os.chmod(args.socket, 0o600)
+
+    print(f"LLM Broker")
+    print(f"==========")
+    print(f"Socket: {args.socket}")
+    print(f"Upstream: {args.base_url}")
+    print(f"Concurrency: {args.concurrency}" + (f" (adaptive, max {args.max_concurrency})" if client.limiter else ""))
+    print()
+
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        broker.close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        print()
+        print_summary(broker.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,894 @@
+#!/usr/bin/env python3
+"""
+Shared LLM access for the Phase 1 scripts.
+
+Every script talks to the OpenAI-compatible server through LLMClient: one
+pooled keep-alive HTTP client per replica sized to the script's concurrency,
+least-outstanding routing with health checks and ejection across replicas,
+AIMD-adjusted concurrency, optional p95 request hedging, per-call timeouts,
+jittered exponential backoff on retryable errors, and a single hook chain
+(caching, metrics) wrapped around every chat completion.
+
+Usage:
+    from llm_client import add_client_args, client_from_args
+
+    client = client_from_args(args, concurrency=args.concurrency)
+    response = client.chat(model_id, [{"role": "user", "content": prompt}], {"temperature": 0.2})
+    text = response["choices"][0]["text"]
+
+Requires:
+    pip install openai pyyaml
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+from pathlib import Path
+from typing import Callable
+
+import openai
+import yaml
+from openai import OpenAI
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Status codes worth retrying: timeouts, rate limits, and transient server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# system_fingerprint of llm_stub_server.py responses, so usage from benchmark runs can be told apart
+STUB_FINGERPRINT = "llm-stub"
+
+# Errors a server answers with when it does not accept a request parameter
+PARAMETER_REJECTED_STATUS = {400, 422}
+PARAMETER_REJECTED_ERRORS = ("BadRequestError:", "UnprocessableEntityError:")
+
+# A hook receives the request dict and the next callable in the chain, and returns a response dict
+Hook = Callable[[dict, Callable[[dict], dict]], dict]
+
+
+def load_yaml_config(name: str) -> dict:
+    with open(ROOT / "configs" / name) as f:
+        return yaml.safe_load(f)
+
+
+def get_profile(config: dict, profile_name: str = None) -> dict:
+    if profile_name is None:
+        profile_name = config.get("default_profile", "qwen32b")
+    profiles = config.get("profiles", {})
+    if profile_name not in profiles:
+        raise ValueError(f"Profile '{profile_name}' not found. Available: {list(profiles.keys())}")
+    return profiles[profile_name]
+
+
+# ============================================================================
+# RESPONSE PARSING
+# ============================================================================
+
+def parse_json_list(text: str) -> list | None:
+    """Extract a JSON array from a generator response."""
+    # Try direct parse
+    try:
+        result = json.loads(text)
+        if isinstance(result, list):
+            return result
+    except json.JSONDecodeError:
+        pass
+
+    # Try extracting from code block
+    match = re.search(r"```(?:json)?\s*(\[.*?\])\s*```", text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(1))
+        except json.JSONDecodeError:
+            pass
+
+    # Try finding any JSON array
+    match = re.search(r"\[[\s\S]*\]", text)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            pass
+
+    return None
+
+
+def parse_judge_json(text: str, is_reasoning_model: bool = False) -> dict | None:
+    """Extract the judge's JSON object, handling markdown code blocks and reasoning chains."""
+
+    # For reasoning models, the JSON is usually at the end after thinking
+    if is_reasoning_model:
+        json_pattern = r'\{[^{}]*"leakage_score"[^{}]*"salience_score"[^{}]*\}'
+        matches = re.findall(json_pattern, text, re.DOTALL)
+        for match in reversed(matches):
+            try:
+                return json.loads(match)
+            except json.JSONDecodeError:
+                continue
+
+    # Try direct parse
+    try:
+        result = json.loads(text)
+        if isinstance(result, dict):
+            return result
+    except json.JSONDecodeError:
+        pass
+
+    # Try extracting from code block
+    match = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(1))
+        except json.JSONDecodeError:
+            pass
+
+    # Try finding JSON object with expected keys
+    match = re.search(r'\{[^{}]*"leakage_score"[^{}]*\}', text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            pass
+
+    return None
+
+
+# ============================================================================
+# RETRIES
+# ============================================================================
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS
+    return False
+
+
+def rejects_parameter(exc: Exception, name: str) -> bool:
+    """Whether a request failed because the server does not accept parameter `name` (e.g. n > 1)."""
+    if isinstance(exc, openai.APIStatusError):
+        rejected = exc.status_code in PARAMETER_REJECTED_STATUS
+    elif isinstance(exc, BrokerError):
+        rejected = str(exc).startswith(PARAMETER_REJECTED_ERRORS)
+    else:
+        return False
+    return rejected and re.search(rf"\b{re.escape(name)}\b", str(exc)) is not None
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: random.Random = random) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+# ============================================================================
+# ADAPTIVE CONCURRENCY (AIMD)
+# ============================================================================
+
+class AIMDLimiter:
+    """
+    Caps in-flight requests with additive-increase/multiplicative-decrease.
+
+    Each success while the limit is saturated adds 1/limit (about +1 per
+    round of requests). A retryable error or timeout multiplies the limit by
+    `backoff`, and a response whose latency per completion token exceeds
+    `latency_tolerance` × the observed floor multiplies it by `latency_backoff`.
+    That signal catches server-side queueing and KV-cache preemption before
+    requests start timing out, and normalising by tokens keeps long reasoning
+    judgements from looking like congestion. Only one decrease is applied per
+    round trip: requests started before the last decrease don't cut it again.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff: float = 0.5,
+        latency_backoff: float = 0.9,
+        latency_tolerance: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.clock = clock
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.backoff = backoff
+        self.latency_backoff = latency_backoff
+        self.latency_tolerance = latency_tolerance
+        self.inflight = 0
+        self.waiting = 0
+        self.floor = None  # lowest recent seconds per completion token
+        self.last_decrease = float("-inf")
+        self.start = clock()
+        self.history = [{"t": 0.0, "limit": int(self.limit), "reason": "start"}]
+        self.cond = threading.Condition()
+
+    def acquire(self) -> float:
+        """Block until a slot is free; returns the start time to pass back to release()."""
+        with self.cond:
+            self.waiting += 1
+            while self.inflight >= int(self.limit):
+                self.cond.wait()
+            self.waiting -= 1
+            self.inflight += 1
+            return self.clock()
+
+    def release(self, started: float, tokens: int | None = None, error: Exception | None = None) -> None:
+        with self.cond:
+            # Only grow when the limit is actually what's holding callers back
+            saturated = self.inflight >= int(self.limit) or self.waiting > 0
+            self.inflight -= 1
+            if error is not None:
+                if is_retryable(error):
+                    self._decrease(started, self.backoff, "error")
+            else:
+                per_token = (self.clock() - started) / max(1, tokens or 1)
+                # Let the floor drift up slowly so it can follow a change in workload
+                self.floor = per_token if self.floor is None else min(per_token, self.floor * 1.005)
+                if per_token > self.floor * self.latency_tolerance:
+                    self._decrease(started, self.latency_backoff, "latency")
+                elif saturated:
+                    self._set(self.limit + 1 / self.limit, "increase")
+            self.cond.notify_all()
+
+    def _decrease(self, started: float, factor: float, reason: str) -> None:
+        if started < self.last_decrease:
+            return
+        self.last_decrease = self.clock()
+        self._set(self.limit * factor, reason)
+
+    def _set(self, limit: float, reason: str) -> None:
+        old = int(self.limit)
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        if int(self.limit) != old:
+            self.history.append({
+                "t": round(self.clock() - self.start, 2),
+                "limit": int(self.limit),
+                "reason": reason,
+            })
+
+    def summary(self) -> dict:
+        with self.cond:
+            limits = [h["limit"] for h in self.history]
+            return {
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "final_limit": int(self.limit),
+                "peak_limit": max(limits),
+                "history": list(self.history),
+            }
+
+
+# ============================================================================
+# HEDGING
+# ============================================================================
+
+class HedgeCancelled(Exception):
+    """Raised in the losing attempt of a hedged call once the other one has won."""
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies; the hedge fires past its p95."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20, quantile: float = 0.95):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.quantile = quantile
+        self.lock = threading.Lock()
+
+    def add(self, latency: float) -> None:
+        with self.lock:
+            self.samples.append(latency)
+
+    def threshold(self) -> float | None:
+        """Current p95, or None until there are enough samples to trust it."""
+        with self.lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))]
+
+
+def new_attempt_state(avoid: set[str] = frozenset()) -> dict:
+    """Shared between a hedged attempt's thread and the thread racing it."""
+    return {"cancel": threading.Event(), "stream": None, "endpoint": None, "chars": 0, "avoid": set(avoid)}
+
+
+def cancel_attempt(state: dict) -> None:
+    state["cancel"].set()
+    # Closing the stream drops the connection, which makes vLLM abort the generation
+    stream = state["stream"]
+    if stream is not None:
+        try:
+            stream.close()
+        except Exception:
+            pass
+
+
+def projected_saving(elapsed: float, loser_chars: int, winner_chars: int) -> float:
+    """
+    Estimated time saved by a hedge win: how long the cancelled attempt would
+    still have needed at its observed streaming rate to produce as much text
+    as the winner did. An attempt that produced nothing yet counts as 0 (unknown).
+    """
+    if loser_chars <= 0 or winner_chars <= loser_chars:
+        return 0.0
+    return elapsed * (winner_chars / loser_chars - 1)
+
+
+# ============================================================================
+# HTTP CLIENT
+# ============================================================================
+
+def build_http_client(concurrency: int, timeout: float, connect_timeout: float):
+    """Keep-alive connection pool sized so every worker can hold a connection."""
+    import httpx  # ships with openai; only needed once a client is built
+
+    return openai.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=concurrency,
+            max_keepalive_connections=concurrency,
+            keepalive_expiry=60.0,
+        ),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+    )
+
+
+# ============================================================================
+# ENDPOINT POOL
+# ============================================================================
+
+def split_base_urls(base_url: str | list[str]) -> list[str]:
+    """`--base-url` takes one URL or a comma-separated list of replicas."""
+    urls = base_url if isinstance(base_url, list) else base_url.split(",")
+    urls = [u.strip().rstrip("/") for u in urls if u.strip()]
+    if not urls:
+        raise ValueError("at least one base URL is required")
+    return urls
+
+
+class Endpoint:
+    """One OpenAI-compatible replica and its routing/health state."""
+
+    def __init__(self, url: str, client):
+        self.url = url
+        self.client = client
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.probing = False
+
+    def probe(self, timeout: float = 5.0) -> bool:
+        """Health check: the replica answers GET /v1/models."""
+        try:
+            self.client.with_options(timeout=timeout).models.list()
+        except Exception:
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {"url": self.url, "requests": self.requests, "errors": self.errors, "ejections": self.ejections}
+
+
+class EndpointPool:
+    """
+    Least-outstanding-requests routing over replicas. A replica is ejected
+    after a connection error or `eject_after` consecutive retryable failures,
+    and re-admitted once its cooldown has passed and /v1/models answers again.
+    """
+
+    def __init__(self, endpoints: list[Endpoint], eject_after: int = 3, eject_seconds: float = 30.0):
+        self.endpoints = endpoints
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.lock = threading.Lock()
+
+    def check_all(self) -> list[str]:
+        """Probe every replica up front and eject the ones that don't answer; returns their URLs."""
+        down = [e for e in self.endpoints if not e.probe()]
+        with self.lock:
+            for endpoint in down:
+                self._eject(endpoint)
+        return [e.url for e in down]
+
+    def acquire(self, exclude: set[str] = frozenset()) -> Endpoint:
+        self._readmit_expired()
+        with self.lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e.url not in exclude and e.ejected_until <= now]
+            if not candidates:
+                # Everything is ejected or already failed this request: still try rather than give up
+                candidates = [e for e in self.endpoints if e.url not in exclude] or self.endpoints
+            endpoint = min(candidates, key=lambda e: (e.outstanding, e.requests))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, error: Exception | None = None) -> None:
+        with self.lock:
+            endpoint.outstanding -= 1
+            if error is None:
+                endpoint.consecutive_failures = 0
+                return
+            if not is_retryable(error):
+                return  # a bad request says nothing about the replica's health
+            endpoint.errors += 1
+            endpoint.consecutive_failures += 1
+            if isinstance(error, openai.APIConnectionError) and not isinstance(error, openai.APITimeoutError):
+                self._eject(endpoint)
+            elif endpoint.consecutive_failures >= self.eject_after:
+                self._eject(endpoint)
+
+    def healthy_count(self, exclude: set[str] = frozenset()) -> int:
+        now = time.monotonic()
+        return sum(1 for e in self.endpoints if e.url not in exclude and e.ejected_until <= now)
+
+    def _eject(self, endpoint: Endpoint) -> None:
+        endpoint.ejected_until = time.monotonic() + self.eject_seconds
+        endpoint.consecutive_failures = 0
+        endpoint.ejections += 1
+
+    def _readmit_expired(self) -> None:
+        # Probe outside the lock so one slow health check doesn't stall routing
+        now = time.monotonic()
+        with self.lock:
+            due = [e for e in self.endpoints if 0 < e.ejected_until <= now and not e.probing]
+            for endpoint in due:
+                endpoint.probing = True
+        for endpoint in due:
+            healthy = endpoint.probe()
+            with self.lock:
+                endpoint.probing = False
+                if healthy:
+                    endpoint.ejected_until = 0.0
+                else:
+                    self._eject(endpoint)
+
+    def stats(self) -> list[dict]:
+        return [e.stats() for e in self.endpoints]
+
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+def _wrap(hook: Hook, inner: Callable[[dict], dict]) -> Callable[[dict], dict]:
+    return lambda request: hook(request, inner)
+
+
+class ChatClient(ABC):
+    """
+    Request building and the hook chain shared by LLMClient (direct) and
+    BrokerClient (via llm_broker.py). `chat()` returns a plain dict:
+    {"choices": [{"text", "finish_reason"}, ...], "usage": {...}, "system_fingerprint": str | None,
+    "latency": seconds, "endpoint": url}.
+    """
+
+    hooks: list[Hook]
+    retries = 0
+    limiter: AIMDLimiter | None = None
+    hedge = False
+
+    def add_hook(self, hook: Hook) -> None:
+        """Wrap every call; hooks added later run outermost."""
+        self.hooks.append(hook)
+
+    def chat(
+        self,
+        model: str,
+        messages: list[dict],
+        params: dict,
+        n: int = 1,
+        seed: int | None = None,
+        timeout: float | None = None,
+    ) -> dict:
+        request = {"model": model, "messages": messages, **params}
+        if n != 1:
+            request["n"] = n
+        if seed is not None:
+            request["seed"] = seed
+        return self.send_request(request, timeout)
+
+    def send_request(self, request: dict, timeout: float | None = None) -> dict:
+        """Run a complete chat request dict through the hooks and out."""
+        call = lambda req: self._dispatch(req, timeout)
+        for hook in self.hooks:
+            call = _wrap(hook, call)
+        return call(request)
+
+    @abstractmethod
+    def _dispatch(self, request: dict, timeout: float | None) -> dict:
+        """Send one request (after the hooks) and return the normalized response."""
+
+    def endpoint_stats(self) -> list[dict]:
+        return []
+
+    def close(self) -> None:
+        pass
+
+
+class LLMClient(ChatClient):
+    """Chat completions over pooled clients, one per replica."""
+
+    def __init__(
+        self,
+        base_url: str | list[str],
+        api_key: str,
+        concurrency: int = 8,
+        timeout: float = 120.0,
+        connect_timeout: float = 10.0,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 20.0,
+        eject_after: int = 3,
+        eject_seconds: float = 30.0,
+        limiter: AIMDLimiter | None = None,
+        hedge: bool = False,
+    ):
+        self.timeout = timeout
+        self.limiter = limiter
+        self.hedge = hedge
+        self.latency = LatencyTracker()
+        self.hedge_stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "stalled_wins": 0, "saved_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+        self._hedge_executor = ThreadPoolExecutor(max_workers=2 * max(1, concurrency)) if hedge else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hooks: list[Hook] = []
+        self.retries = 0
+        # Retries are ours (with jitter and failover), so the SDK's own are disabled
+        endpoints = [
+            Endpoint(url, OpenAI(
+                base_url=url,
+                api_key=api_key,
+                http_client=build_http_client(concurrency, timeout, connect_timeout),
+                max_retries=0,
+            ))
+            for url in split_base_urls(base_url)
+        ]
+        self.pool = EndpointPool(endpoints, eject_after=eject_after, eject_seconds=eject_seconds)
+        for url in self.pool.check_all():
+            print(f"Warning: {url} did not answer /v1/models; ejected until it recovers")
+
+    def _dispatch(self, request: dict, timeout: float | None) -> dict:
+        return self._hedged_send(request, timeout) if self.hedge else self._send(request, timeout)
+
+    def _send(self, request: dict, timeout: float | None, state: dict | None = None) -> dict:
+        """
+        One logical request with retries and failover. With a hedging `state`
+        the response is streamed so that the attempt can be cancelled mid-generation.
+        """
+        attempt = 0
+        failed: set[str] = set(state["avoid"]) if state else set()
+        while True:
+            if state and state["cancel"].is_set():
+                raise HedgeCancelled()
+            started = self.limiter.acquire() if self.limiter else None
+            endpoint = self.pool.acquire(exclude=failed)
+            start = time.monotonic()
+            try:
+                if state is None:
+                    response = self._complete(endpoint, request, timeout)
+                else:
+                    state["endpoint"] = endpoint.url
+                    response = self._stream(endpoint, request, timeout, state)
+            except Exception as e:
+                if state and state["cancel"].is_set():
+                    e = HedgeCancelled()
+                self.pool.release(endpoint, error=e)
+                if self.limiter:
+                    self.limiter.release(started, error=e)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise e
+                failed.add(endpoint.url)
+                # Fail over to another replica at once; back off only when every replica has failed this request
+                if not self.pool.healthy_count(exclude=failed):
+                    time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+                    failed.clear()
+                attempt += 1
+                self.retries += 1
+                continue
+            self.pool.release(endpoint)
+            if self.limiter:
+                self.limiter.release(started, tokens=response["usage"].get("completion_tokens"))
+            response["latency"] = time.monotonic() - start
+            response["endpoint"] = endpoint.url
+            return response
+
+    def _complete(self, endpoint: Endpoint, request: dict, timeout: float | None) -> dict:
+        response = endpoint.client.chat.completions.create(timeout=timeout or self.timeout, **request)
+        return {
+            "choices": [
+                {"text": choice.message.content or "", "finish_reason": choice.finish_reason}
+                for choice in response.choices
+            ],
+            "usage": response.usage.model_dump() if response.usage else {},
+            "system_fingerprint": response.system_fingerprint,
+        }
+
+    def _stream(self, endpoint: Endpoint, request: dict, timeout: float | None, state: dict) -> dict:
+        stream = endpoint.client.chat.completions.create(
+            timeout=timeout or self.timeout,
+            stream=True,
+            stream_options={"include_usage": True},
+            **request,
+        )
+        state["stream"] = stream
+        texts = defaultdict(list)
+        finish_reasons = {}
+        usage = {}
+        fingerprint = None
+        try:
+            for chunk in stream:
+                if state["cancel"].is_set():
+                    raise HedgeCancelled()
+                for choice in chunk.choices:
+                    if choice.delta and choice.delta.content:
+                        texts[choice.index].append(choice.delta.content)
+                        state["chars"] += len(choice.delta.content)
+                    if choice.finish_reason:
+                        finish_reasons[choice.index] = choice.finish_reason
+                if chunk.usage:
+                    usage = chunk.usage.model_dump()
+                fingerprint = chunk.system_fingerprint or fingerprint
+        finally:
+            stream.close()
+        if state["cancel"].is_set():
+            raise HedgeCancelled()
+        return {
+            "choices": [
+                {"text": "".join(texts[i]), "finish_reason": finish_reasons.get(i)}
+                for i in sorted(set(texts) | set(finish_reasons))
+            ],
+            "usage": usage,
+            "system_fingerprint": fingerprint,
+        }
+
+    def _hedged_send(self, request: dict, timeout: float | None) -> dict:
+        """
+        Send the request; if it is still running past the recent p95 latency,
+        race a duplicate (on another replica when there is one) and cancel
+        whichever attempt loses.
+        """
+        self._count("calls")
+        delay = self.latency.threshold()
+        start = time.monotonic()
+        primary_state = new_attempt_state()
+        primary = self._hedge_executor.submit(self._send, request, timeout, primary_state)
+        try:
+            result = primary.result(timeout=delay)
+            self.latency.add(time.monotonic() - start)
+            return result
+        except FuturesTimeout:
+            pass
+
+        self._count("hedged")
+        hedge_state = new_attempt_state(avoid={primary_state["endpoint"]} - {None})
+        hedge = self._hedge_executor.submit(self._send, request, timeout, hedge_state)
+        states = {primary: primary_state, hedge: hedge_state}
+        pending = set(states)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for loser in pending:
+                    cancel_attempt(states[loser])
+                elapsed = time.monotonic() - start
+                self.latency.add(elapsed)
+                result = future.result()
+                if future is hedge:
+                    winner_chars = sum(len(choice["text"]) for choice in result["choices"])
+                    self._count("hedge_wins")
+                    if primary_state["chars"] == 0:
+                        # The primary hadn't produced a token (queued or preempted); its saving is unknown
+                        self._count("stalled_wins")
+                    self._count("saved_seconds", projected_saving(elapsed, primary_state["chars"], winner_chars))
+                return result
+        raise error
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self.hedge_stats[key] += amount
+
+    def hedge_summary(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self.hedge_stats)
+        stats["hedge_rate"] = round(stats["hedged"] / stats["calls"], 4) if stats["calls"] else 0.0
+        stats["saved_seconds"] = round(stats["saved_seconds"], 2)
+        return stats
+
+    def endpoint_stats(self) -> list[dict]:
+        return self.pool.stats()
+
+    def close(self) -> None:
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False, cancel_futures=True)
+        for endpoint in self.pool.endpoints:
+            endpoint.client.close()
+
+
+# ============================================================================
+# BROKER CLIENT
+# ============================================================================
+
+DEFAULT_BROKER_SOCKET = "/tmp/curious-llm-broker.sock"
+
+
+class BrokerError(RuntimeError):
+    """A request failed inside llm_broker.py (or the broker went away)."""
+
+
+def encode_message(message: dict) -> bytes:
+    """Broker wire format: one JSON object per line."""
+    return (json.dumps(message) + "\n").encode()
+
+
+class BrokerClient(ChatClient):
+    """
+    Sends chat requests to a local llm_broker.py over its Unix socket instead
+    of the server. Requests are multiplexed over one connection, so many
+    threads can wait on it at once; the broker owns concurrency, routing and
+    retries, and merges identical in-flight requests across scripts (any
+    request when `shared`, otherwise only seeded or greedy ones).
+    """
+
+    def __init__(self, socket_path: str, job: str, priority: int = 1, shared: bool = False):
+        self.hooks: list[Hook] = []
+        self.job = job
+        self.priority = priority
+        self.shared = shared
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self._send_lock = threading.Lock()
+        self._pending: dict[int, Future] = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count()
+        threading.Thread(target=self._read_replies, daemon=True).start()
+
+    def _dispatch(self, request: dict, timeout: float | None) -> dict:
+        return self._call({
+            "op": "chat",
+            "job": self.job,
+            "priority": self.priority,
+            "shared": self.shared,
+            "request": request,
+            "timeout": timeout,
+        })
+
+    def broker_stats(self) -> dict:
+        return self._call({"op": "stats"})
+
+    def _call(self, message: dict) -> dict:
+        future = Future()
+        with self._pending_lock:
+            message["id"] = next(self._ids)
+            self._pending[message["id"]] = future
+        with self._send_lock:
+            self.sock.sendall(encode_message(message))
+        return future.result()
+
+    def _read_replies(self) -> None:
+        with self.sock.makefile("rb") as replies:
+            for line in replies:
+                reply = json.loads(line)
+                with self._pending_lock:
+                    future = self._pending.pop(reply["id"], None)
+                if future is None:
+                    continue
+                if "error" in reply:
+                    future.set_exception(BrokerError(f"{reply['error']['type']}: {reply['error']['message']}"))
+                else:
+                    future.set_result(reply["result"])
+        # Connection closed: nothing pending will ever be answered
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(BrokerError("broker connection closed"))
+
+    def close(self) -> None:
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def add_client_args(parser) -> None:
+    """The connection flags shared by every script that talks to the LLM server."""
+    parser.add_argument(
+        "--base-url",
+        default=os.environ.get("OPENAI_BASE_URL", "http://localhost:8000/v1"),
+        help="OpenAI-compatible API base URL; comma-separate several replicas to load-balance across them",
+    )
+    parser.add_argument(
+        "--api-key",
+        default=os.environ.get("OPENAI_API_KEY", "not-needed"),
+        help="API key (use 'not-needed' for local vLLM)",
+    )
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--max-retries", type=int, default=4, help="Retries for timeouts, 429s and 5xx errors")
+    parser.add_argument(
+        "--adaptive-concurrency",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Adjust in-flight requests with AIMD, starting from --concurrency (default: on)",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=64,
+        help="Ceiling for adaptive concurrency",
+    )
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="Hedge requests running past the recent p95 latency with a duplicate (first response wins)",
+    )
+    parser.add_argument(
+        "--broker",
+        nargs="?",
+        const=DEFAULT_BROKER_SOCKET,
+        default=os.environ.get("CURIOUS_LLM_BROKER"),
+        help=f"Send requests through a running llm_broker.py at this socket (default socket: {DEFAULT_BROKER_SOCKET}); "
+        "the connection flags above then only apply to the broker",
+    )
+    parser.add_argument("--job", default=None, help="Job name reported to the broker (default: script name)")
+    parser.add_argument("--priority", type=int, default=1, help="Broker scheduling weight (higher gets a larger share)")
+
+
+def validate_client_args(parser, args) -> None:
+    if args.timeout <= 0:
+        parser.error("--timeout must be positive")
+    if args.max_retries < 0:
+        parser.error("--max-retries must be at least 0")
+    if args.max_concurrency < 1:
+        parser.error("--max-concurrency must be at least 1")
+    if args.priority < 1:
+        parser.error("--priority must be at least 1")
+
+
+def worker_count(args, concurrency: int) -> int:
+    """Threads a script needs: the adaptive ceiling, or the fixed concurrency."""
+    if args.adaptive_concurrency and concurrency > 1:
+        return max(args.max_concurrency, concurrency)
+    return concurrency
+
+
+def client_from_args(args, concurrency: int = 1, shared: bool = False) -> ChatClient:
+    """`shared`: identical requests may share one answer through the broker (judges, not generators)."""
+    if args.broker:
+        job = args.job or Path(sys.argv[0]).stem
+        if getattr(args, "run_id", None):
+            job += f":{args.run_id}"
+        return BrokerClient(args.broker, job=job, priority=args.priority, shared=shared)
+    limiter = None
+    if args.adaptive_concurrency and concurrency > 1:
+        limiter = AIMDLimiter(concurrency, max_limit=worker_count(args, concurrency))
+    return LLMClient(
+        base_url=args.base_url,
+        api_key=args.api_key,
+        concurrency=worker_count(args, concurrency),
+        timeout=args.timeout,
+        max_retries=args.max_retries,
+        limiter=limiter,
+        hedge=args.hedge,
+    )
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Deterministic OpenAI-compatible stand-in for the vLLM server.
+
+Serves /v1/models and /v1/chat/completions (plain and streaming) without a
+GPU, so the pipeline can be benchmarked and regression-tested anywhere.
+Responses are replayed from a recording when one matches, otherwise
+synthesized: generation prompts get a JSON array of template-valid
+questions, judge prompts get a leakage/salience verdict. Latency, decode
+speed, server capacity, error injection and truncation are configurable,
+and every random choice is seeded from the request itself, so the same
+workload gives the same answers on every run.
+
+Usage:
+    python scripts/llm_stub_server.py --port 8000
+    python scripts/llm_stub_server.py --port 8000 --ttft lognormal:0.3,0.5 --tokens-per-second 40 --error-rate 0.02
+    python scripts/llm_stub_server.py --port 8000 --record data/stub/recording.jsonl --upstream http://gpu-box:8000/v1
+    python scripts/llm_stub_server.py --port 8000 --replay data/stub/recording.jsonl
+
+Latency distributions: fixed:S, uniform:A,B, normal:MU,SIGMA,
+lognormal:MEDIAN,SIGMA, exponential:MEAN (all in seconds).
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from bench_prefix_cache import TOKEN_PATTERN, PrefixCache, approx_tokens
+from llm_client import STUB_FINGERPRINT
+
+STUB_MODEL_ID = "stub-model"
+
+GENERATION_PATTERN = re.compile(r"Generate (\d+) diverse (\w+) questions")
+DOMAIN_ID_PATTERN = re.compile(r"Domain id: (\S+)")
+DOMAIN_NAME_PATTERN = re.compile(r"## Domain\n([^:\n]+):")
+JUDGE_MARKER = "## Question to evaluate"
+
+OPENERS = {
+    "advisory": ["What should someone do when", "How should a person handle it when", "What is a sensible approach when"],
+    "comparative": ["How do the options compare when", "What are the differences in approach when", "How do expectations differ when"],
+    "explanatory": ["Why do practices vary when", "What explains the usual approach when", "What shapes expectations when"],
+    "hypothetical": ["What would be the best response if", "How might someone proceed if", "What could go wrong if"],
+    "procedural": ["What steps are involved when", "How does the process usually work when", "What is the typical sequence when"],
+    "reflective": ["What values come into play when", "How do people weigh priorities when", "What assumptions matter when"],
+    "tradeoff": ["What trade-offs come up when", "How should someone balance costs when", "What is given up when"],
+}
+SUBJECTS = ["a newcomer", "a student", "a parent", "an older adult", "a small household", "a first-time buyer",
+            "a new employee", "a visitor", "a shift worker", "a caregiver", "a retiree", "a young couple"]
+SITUATIONS = ["is dealing with {topic} for the first time", "faces an unexpected problem with {topic}",
+              "has a tight budget for {topic}", "disagrees with others about {topic}",
+              "needs to plan ahead for {topic}", "is short on time for {topic}",
+              "wants to avoid mistakes with {topic}", "gets conflicting advice about {topic}"]
+DETAILS = ["", " and paperwork is involved", " and family members have opinions", " and deadlines are close",
+           " and costs keep changing", " and the rules seem unclear", " and a written agreement exists",
+           " and someone else depends on the outcome"]
+# A few explicit markers, so leaked questions exercise the filters and the judge
+LEAK_MARKERS = ["in Singapore", "with the IRS", "under the NHS", "using a 401k", "in London", "with CPF savings"]
+
+
+# ============================================================================
+# DETERMINISTIC CONTENT
+# ============================================================================
+
+def parse_distribution(spec: str):
+    """Turn e.g. 'lognormal:0.3,0.5' into a sampler taking a random.Random."""
+    kind, _, raw = spec.partition(":")
+    try:
+        values = [float(v) for v in raw.split(",")] if raw else []
+    except ValueError:
+        raise ValueError(f"Bad distribution parameters in {spec!r}")
+    arity = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+    if kind not in arity:
+        raise ValueError(f"Unknown distribution {kind!r}; expected one of {', '.join(arity)}")
+    if len(values) != arity[kind]:
+        raise ValueError(f"{kind} takes {arity[kind]} parameter(s), got {spec!r}")
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    return lambda rng: rng.expovariate(1 / values[0])
+
+
+def request_rng(*parts) -> random.Random:
+    return random.Random(hashlib.sha256("/".join(str(p) for p in parts).encode()).hexdigest())
+
+
+def prompt_key(messages: list[dict]) -> str:
+    """Recordings are keyed by the conversation alone, so decoding params can change."""
+    return hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()
+
+
+def synth_question(rng: random.Random, topic: str, question_type: str, leak: bool) -> str:
+    opener = rng.choice(OPENERS.get(question_type, OPENERS["advisory"]))
+    situation = rng.choice(SITUATIONS).format(topic=topic.lower())
+    question = f"{opener} {rng.choice(SUBJECTS)} {situation}{rng.choice(DETAILS)}"
+    if leak:
+        question += f" {rng.choice(LEAK_MARKERS)}"
+    return question + "?"
+
+
+def synth_generation(prompt: str, rng: random.Random, leak_rate: float) -> str | None:
+    match = GENERATION_PATTERN.search(prompt)
+    if not match:
+        return None
+    num_questions, question_type = int(match.group(1)), match.group(2)
+    domain_id = DOMAIN_ID_PATTERN.search(prompt)
+    domain_name = DOMAIN_NAME_PATTERN.search(prompt)
+    domain_id = domain_id.group(1) if domain_id else "unknown"
+    topic = domain_name.group(1).strip() if domain_name else domain_id.replace("_", " ")
+    questions = [
+        {
+            "question": synth_question(rng, topic, question_type, rng.random() < leak_rate),
+            "domain": domain_id,
+            "question_type": question_type,
+        }
+        for _ in range(num_questions)
+    ]
+    return json.dumps(questions, indent=2)
+
+
+def synth_judgement(prompt: str, rng: random.Random, disagreement: float) -> str | None:
+    if JUDGE_MARKER not in prompt:
+        return None
+    question = prompt.split(JUDGE_MARKER, 1)[1].strip()
+    # The verdict depends on the question only; samples disagree at a fixed rate
+    base = request_rng("judge", question)
+    leakage = 2 if any(marker in question for marker in LEAK_MARKERS) else base.choices([0, 1], [0.9, 0.1])[0]
+    salience = base.choices([0, 1, 2], [0.15, 0.35, 0.5])[0]
+    if rng.random() < disagreement:
+        salience = rng.choice([s for s in (0, 1, 2) if s != salience])
+    return json.dumps({
+        "leakage_score": leakage,
+        "salience_score": salience,
+        "rationale": "Synthesized verdict from the stub server.",
+    })
+
+
+def truncate_tokens(text: str, limit: int) -> str:
+    """Cut text after its first `limit` approximate tokens."""
+    if limit <= 0:
+        return ""
+    for count, match in enumerate(TOKEN_PATTERN.finditer(text), 1):
+        if count == limit:
+            return text[:match.end()]
+    return text
+
+
+# ============================================================================
+# SERVER
+# ============================================================================
+
+class StubModel:
+    """Decides content, timing and failures for each request and keeps stats."""
+
+    def __init__(
+        self,
+        ttft: str = "fixed:0.0",
+        tokens_per_second: float = 0.0,
+        max_num_seqs: int = 64,
+        error_rate: float = 0.0,
+        error_statuses: tuple[int, ...] = (503,),
+        truncate_rate: float = 0.0,
+        leak_rate: float = 0.1,
+        disagreement: float = 0.1,
+        seed: int = 0,
+        replay: dict[str, list[str]] | None = None,
+        record_path: Path | None = None,
+        upstream: str | None = None,
+        cache_blocks: int | None = 65536,
+    ):
+        self.ttft = parse_distribution(ttft)
+        self.tokens_per_second = tokens_per_second
+        self.slots = threading.BoundedSemaphore(max_num_seqs)
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.truncate_rate = truncate_rate
+        self.leak_rate = leak_rate
+        self.disagreement = disagreement
+        self.seed = seed
+        self.replay = replay or {}
+        self.record_path = record_path
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.prefix_cache = PrefixCache(capacity_blocks=cache_blocks)
+        self.attempts: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            "requests": 0, "errors": 0, "truncated": 0, "replayed": 0,
+            "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0,
+        }
+
+    def _count(self, **deltas) -> None:
+        with self.lock:
+            for name, delta in deltas.items():
+                self.stats[name] += delta
+
+    def summary(self) -> dict:
+        with self.lock:
+            return dict(self.stats)
+
+    def complete(self, body: dict) -> tuple[int, dict, float, float]:
+        """Return (status, response body, seconds to first token, seconds of decoding)."""
+        messages = body.get("messages", [])
+        prompt = messages[-1].get("content", "") if messages else ""
+        key = prompt_key(messages)
+        request_id = hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+        with self.lock:
+            attempt = self.attempts.get(request_id, 0)
+            self.attempts[request_id] = attempt + 1
+            self.stats["requests"] += 1
+        # Retries of a request draw fresh failures, but the same answer
+        rng = request_rng(self.seed, request_id, attempt)
+        if rng.random() < self.error_rate:
+            self._count(errors=1)
+            return rng.choice(self.error_statuses), {"error": {"message": "injected error", "type": "stub"}}, 0.0, 0.0
+
+        if self.upstream:
+            try:
+                response = self._forward(body)
+            except urllib.error.HTTPError as e:
+                self._count(errors=1)
+                return e.code, {"error": {"message": f"upstream: {e.reason}", "type": "upstream"}}, 0.0, 0.0
+            self._record(key, [c["message"]["content"] for c in response["choices"]])
+            return 200, response, 0.0, 0.0
+
+        prompt_tokens = approx_tokens(" ".join(m.get("content", "") for m in messages))
+        with self.lock:
+            cached = self.prefix_cache.lookup_and_insert(prompt_tokens)
+        max_tokens = body.get("max_tokens") or body.get("max_completion_tokens")
+        choices = []
+        completion_tokens = 0
+        for index in range(body.get("n") or 1):
+            content_rng = request_rng(self.seed, key, body.get("seed"), index)
+            text = self._content(key, prompt, index, content_rng)
+            finish_reason = "stop"
+            tokens = len(approx_tokens(text))
+            if max_tokens is not None and tokens > max_tokens:
+                text, finish_reason = truncate_tokens(text, max_tokens), "length"
+            elif rng.random() < self.truncate_rate:
+                text, finish_reason = truncate_tokens(text, max(1, tokens // 2)), "length"
+            if finish_reason == "length":
+                self._count(truncated=1)
+            tokens = len(approx_tokens(text))
+            completion_tokens += tokens
+            choices.append({
+                "index": index,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": finish_reason,
+            })
+
+        ttft = self.ttft(rng)
+        decode = 0.0
+        if self.tokens_per_second > 0:
+            decode = max(len(approx_tokens(c["message"]["content"])) for c in choices) / self.tokens_per_second
+        self._count(
+            prompt_tokens=len(prompt_tokens),
+            cached_tokens=cached,
+            completion_tokens=completion_tokens,
+        )
+        usage = {
+            "prompt_tokens": len(prompt_tokens),
+            "completion_tokens": completion_tokens,
+            "total_tokens": len(prompt_tokens) + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+        response = {
+            "id": f"chatcmpl-{request_id[:24]}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body.get("model", STUB_MODEL_ID),
+            "system_fingerprint": STUB_FINGERPRINT,
+            "choices": choices,
+            "usage": usage,
+        }
+        return 200, response, ttft, decode
+
+    def _content(self, key: str, prompt: str, index: int, rng: random.Random) -> str:
+        recorded = self.replay.get(key)
+        if recorded:
+            self._count(replayed=1)
+            return recorded[index % len(recorded)]
+        text = synth_generation(prompt, rng, self.leak_rate)
+        if text is None:
+            text = synth_judgement(prompt, rng, self.disagreement)
+        return text if text is not None else "OK"
+
+    def _forward(self, body: dict) -> dict:
+        forwarded = {**body, "stream": False}
+        forwarded.pop("stream_options", None)
+        request = urllib.request.Request(
+            f"{self.upstream}/chat/completions",
+            data=json.dumps(forwarded).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=600) as response:
+            return json.loads(response.read())
+
+    def _record(self, key: str, contents: list[str]) -> None:
+        if not self.record_path:
+            return
+        with self.lock:
+            self.replay[key] = contents
+            with open(self.record_path, "a") as f:
+                f.write(json.dumps({"key": key, "contents": contents}) + "\n")
+
+
+def load_recording(path: Path) -> dict[str, list[str]]:
+    recording = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recording[entry["key"]] = entry["contents"]
+    return recording
+
+
+def stream_events(response: dict, include_usage: bool) -> list[dict]:
+    """Chat completion chunks for a finished response: content first, then finish reasons."""
+    base = {"id": response["id"], "object": "chat.completion.chunk", "created": 0, "model": response["model"]}
+    base["system_fingerprint"] = response.get("system_fingerprint")
+    events = []
+    for choice in response["choices"]:
+        text = choice["message"]["content"]
+        pieces = [text[i:i + 64] for i in range(0, len(text), 64)] or [""]
+        for piece in pieces:
+            events.append({**base, "choices": [{"index": choice["index"], "delta": {"content": piece}, "finish_reason": None}]})
+        events.append({**base, "choices": [{"index": choice["index"], "delta": {}, "finish_reason": choice["finish_reason"]}]})
+    if include_usage:
+        events.append({**base, "choices": [], "usage": response["usage"]})
+    return events
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], model: StubModel):
+        self.model = model
+        super().__init__(address, StubHandler)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": STUB_MODEL_ID, "object": "model"}]})
+        elif self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, self.server.model.summary())
+        else:
+            self._send_json(404, {"error": {"message": f"no route {self.path}"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"no route {self.path}"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        model = self.server.model
+        # Requests beyond the server's batch capacity queue here, as on a busy vLLM
+        with model.slots:
+            status, response, ttft, decode = model.complete(body)
+            if status != 200 or not body.get("stream"):
+                time.sleep(ttft + decode)
+                self._send_json(status, response)
+                return
+            events = stream_events(response, bool((body.get("stream_options") or {}).get("include_usage")))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            time.sleep(ttft)
+            for event in events:
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(decode / len(events))
+            self.wfile.write(b"data: [DONE]\n\n")
+
+
+def serve_in_thread(model: StubModel, host: str = "127.0.0.1", port: int = 0) -> StubServer:
+    """Start a stub server on a background thread; port 0 picks a free port."""
+    server = StubServer((host, port), model)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_stub_args(parser) -> None:
+    parser.add_argument("--ttft", default="fixed:0.05", help="Time-to-first-token distribution (see module docstring)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Decode speed per request (0: instant)")
+    parser.add_argument("--max-num-seqs", type=int, default=64, help="Requests served at once; the rest queue")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with an error status")
+    parser.add_argument("--error-status", default="503", help="Comma-separated statuses to inject (e.g. 503,429)")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Share of completions cut short with finish_reason=length")
+    parser.add_argument("--leak-rate", type=float, default=0.1, help="Share of synthesized questions with an explicit region marker")
+    parser.add_argument("--disagreement", type=float, default=0.1, help="Chance a judge sample disagrees with the question's verdict")
+    parser.add_argument("--stub-seed", type=int, default=0, help="Seed mixed into every synthesized response")
+
+
+def model_from_args(args, replay: dict | None = None) -> StubModel:
+    return StubModel(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        max_num_seqs=args.max_num_seqs,
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(s) for s in args.error_status.split(",")),
+        truncate_rate=args.truncate_rate,
+        leak_rate=args.leak_rate,
+        disagreement=args.disagreement,
+        seed=args.stub_seed,
+        replay=replay,
+        record_path=Path(args.record) if getattr(args, "record", None) else None,
+        upstream=getattr(args, "upstream", None),
+    )
+
+
+def validate_stub_args(parser, args) -> None:
+    try:
+        parse_distribution(args.ttft)
+    except ValueError as e:
+        parser.error(f"--ttft: {e}")
+    for name in ("error_rate", "truncate_rate", "leak_rate", "disagreement"):
+        if not 0 <= getattr(args, name) <= 1:
+            parser.error(f"--{name.replace('_', '-')} must be between 0 and 1")
+    if args.max_num_seqs < 1:
+        parser.error("--max-num-seqs must be at least 1")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic OpenAI-compatible stand-in server")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    add_stub_args(parser)
+    parser.add_argument("--replay", default=None, help="Recording (JSONL) whose responses take precedence")
+    parser.add_argument("--record", default=None, help="Append upstream responses to this recording (needs --upstream)")
+    parser.add_argument("--upstream", default=None, help="Real server base URL to forward to while recording")
+    args = parser.parse_args()
+    validate_stub_args(parser, args)
+    if args.record and not args.upstream:
+        parser.error("--record needs --upstream")
+
+    replay = load_recording(Path(args.replay)) if args.replay else None
+    model = model_from_args(args, replay)
+    server = StubServer((args.host, args.port), model)
+    print(f"LLM Stub Server")
+    print(f"===============")
+    print(f"Listening: http://{args.host}:{server.server_address[1]}/v1")
+    if replay:
+        print(f"Replaying: {len(replay)} recorded conversations")
+    if args.upstream:
+        print(f"Forwarding to {args.upstream}" + (f", recording to {args.record}" if args.record else ""))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print()
+        print(json.dumps(model.summary(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
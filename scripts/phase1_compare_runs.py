@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Phase 1: Compare runs side by side from their cached summaries.
+
+Reads run_summary.json from each run (written by phase1_report.py) and prints
+the funnel, score distributions, coverage, token usage and step timings of
+every run in one table each, with deltas against a baseline run. Summaries
+whose run files changed since are rebuilt first (and cached again), unless
+--no-refresh is given.
+
+Usage:
+    python scripts/phase1_compare_runs.py run_001 run_002 run_003
+    python scripts/phase1_compare_runs.py --all
+    python scripts/phase1_compare_runs.py --all --baseline run_001 --target 15
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from artifact_io import artifact_exists
+from phase1_report import collect, load_yaml_config, print_table
+from run_summary import read_summary, run_fingerprint, summarize, write_summary
+
+ROOT = Path(__file__).resolve().parent.parent
+RUNS_DIR = ROOT / "data" / "runs"
+
+
+def load_summary(run_dir: Path, refresh: bool = True) -> tuple[dict | None, bool]:
+    """(summary, rebuilt): the cached summary, rebuilt from the run if stale and refresh is on."""
+    summary = read_summary(run_dir)
+    if summary is not None or not refresh:
+        return summary, False
+    fingerprint = run_fingerprint(run_dir)
+    summary = summarize(run_dir, collect(run_dir, sample=0), fingerprint)
+    write_summary(run_dir, summary)
+    return summary, True
+
+
+def pct(part: float, whole: float) -> float:
+    return 100 * part / whole if whole else 0.0
+
+
+def delta(value: float, baseline: float) -> str:
+    return f"{value - baseline:+.1f}"
+
+
+def leak_rate(summary: dict) -> float:
+    dist = summary["leakage_distribution"]
+    return pct(sum(n for score, n in dist.items() if score != "0"), sum(dist.values()))
+
+
+def salience_rate(summary: dict) -> float:
+    dist = summary["salience_distribution"]
+    return pct(sum(n for score, n in dist.items() if score != "0"), sum(dist.values()))
+
+
+def print_funnel(summaries: list[dict], baseline: dict) -> None:
+    stages = ["Raw generated", "Passed filters", "Passed dedup", "Scored", "Accepted"]
+    headers = ["Run", "Raw", "Filtered", "Deduped", "Scored", "Accepted", "Accept %", "Δ pp"]
+    rows = []
+    for s in summaries:
+        rate = 100 * s["acceptance_rate"]
+        rows.append(
+            [s["run_id"]] + [s["funnel"].get(stage, 0) for stage in stages]
+            + [f"{rate:.1f}", delta(rate, 100 * baseline["acceptance_rate"])]
+        )
+    print_table(headers, rows)
+
+
+def print_scores(summaries: list[dict], baseline: dict) -> None:
+    leak_keys = sorted({k for s in summaries for k in s["leakage_distribution"]}, key=int)
+    sal_keys = sorted({k for s in summaries for k in s["salience_distribution"]}, key=int)
+    headers = (
+        ["Run"] + [f"Leak {k}" for k in leak_keys] + ["Leak>0 %", "Δ pp"]
+        + [f"Sal {k}" for k in sal_keys] + ["Sal≥1 %", "Δ pp"]
+    )
+    rows = []
+    for s in summaries:
+        rows.append(
+            [s["run_id"]]
+            + [s["leakage_distribution"].get(k, 0) for k in leak_keys]
+            + [f"{leak_rate(s):.1f}", delta(leak_rate(s), leak_rate(baseline))]
+            + [s["salience_distribution"].get(k, 0) for k in sal_keys]
+            + [f"{salience_rate(s):.1f}", delta(salience_rate(s), salience_rate(baseline))]
+        )
+    print_table(headers, rows)
+
+
+def print_coverage(summaries: list[dict], domain_ids: list[str], type_ids: list[str], target: int | None) -> None:
+    total_cells = len(domain_ids) * len(type_ids)
+    headers = ["Run", "Cells ≥1"] + ([f"Cells ≥{target}"] if target else []) + ["Min", "Max", "Accepted"]
+    rows = []
+    for s in summaries:
+        counts = [s["coverage"].get(d, {}).get(t, 0) for d in domain_ids for t in type_ids]
+        row = [s["run_id"], f"{sum(1 for c in counts if c >= 1)}/{total_cells}"]
+        if target:
+            row.append(f"{sum(1 for c in counts if c >= target)}/{total_cells}")
+        rows.append(row + [min(counts, default=0), max(counts, default=0), sum(counts)])
+    print_table(headers, rows)
+
+
+def print_cost(summaries: list[dict]) -> None:
+    kinds = sorted({k for s in summaries for k in s["tokens"]})
+    steps = list(dict.fromkeys(step for s in summaries for step in s["timings"]))
+    headers = (
+        ["Run"] + [f"{k} req" for k in kinds] + [f"{k} tokens" for k in kinds]
+        + ["Truncated", "Tokens/accepted"] + [f"{step.split()[0]} s" for step in steps]
+    )
+    rows = []
+    for s in summaries:
+        tokens = sum(s["tokens"].get(k, {}).get("completion_tokens", 0) for k in kinds)
+        accepted = s["funnel"].get("Accepted", 0)
+        rows.append(
+            [s["run_id"]]
+            + [s["tokens"].get(k, {}).get("requests", 0) for k in kinds]
+            + [s["tokens"].get(k, {}).get("completion_tokens", 0) for k in kinds]
+            + [sum(s["tokens"].get(k, {}).get("truncated", 0) for k in kinds)]
+            + [round(tokens / accepted) if accepted else "-"]
+            + [f"{s['timings'][step]:.1f}" if step in s["timings"] else "-" for step in steps]
+        )
+    print_table(headers, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Phase 1 runs from their cached summaries")
+    parser.add_argument("runs", nargs="*", help="Run identifiers")
+    parser.add_argument("--all", action="store_true", help="Compare every run under data/runs")
+    parser.add_argument("--baseline", default=None, help="Run the deltas are taken against (default: the first)")
+    parser.add_argument("--target", type=int, default=None, help="Also count coverage cells with at least this many accepted")
+    parser.add_argument("--no-refresh", action="store_true", help="Skip runs whose summary is missing or stale instead of rebuilding it")
+    args = parser.parse_args()
+    if not args.runs and not args.all:
+        parser.error("name runs to compare or pass --all")
+
+    if args.all:
+        run_ids = [p.name for p in sorted(RUNS_DIR.glob("*")) if artifact_exists(p / "questions_raw.jsonl")]
+    else:
+        run_ids = args.runs
+    if args.baseline and args.baseline not in run_ids:
+        run_ids = [args.baseline] + run_ids
+
+    summaries = []
+    for run_id in run_ids:
+        run_dir = RUNS_DIR / run_id
+        if not run_dir.is_dir():
+            print(f"Error: run not found: {run_dir}")
+            return 1
+        summary, rebuilt = load_summary(run_dir, refresh=not args.no_refresh)
+        if summary is None:
+            print(f"Skipping {run_id}: no up-to-date run summary")
+            continue
+        if rebuilt:
+            print(f"Rebuilt summary for {run_id}")
+        summaries.append(summary)
+    if not summaries:
+        print("No runs to compare")
+        return 1
+
+    baseline = next((s for s in summaries if s["run_id"] == args.baseline), summaries[0])
+    domain_ids = [d["id"] for d in load_yaml_config("domains.yaml")["domains"]]
+    type_ids = [t["id"] for t in load_yaml_config("question_types.yaml")["question_types"]]
+
+    print()
+    print(f"PHASE 1 RUN COMPARISON ({len(summaries)} runs, deltas vs {baseline['run_id']})")
+    print("=" * 70)
+    sections = [
+        ("PIPELINE FUNNEL", lambda: print_funnel(summaries, baseline)),
+        ("SCORING DISTRIBUTION", lambda: print_scores(summaries, baseline)),
+        ("DOMAIN × TYPE COVERAGE (Accepted)", lambda: print_coverage(summaries, domain_ids, type_ids, args.target)),
+        ("TOKENS & TIMINGS", lambda: print_cost(summaries)),
+    ]
+    for title, show in sections:
+        print()
+        print(title)
+        print("-" * 40)
+        show()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
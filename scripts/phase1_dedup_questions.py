@@ -5,9 +5,17 @@ Phase 1: Deduplicate questions using ROUGE-L novelty gate.
 Usage:
     python scripts/phase1_dedup_questions.py --run-id run_001
     python scripts/phase1_dedup_questions.py --run-id run_001 --threshold 0.7
+    python scripts/phase1_dedup_questions.py --run-id run_001 --sidecars
+    python scripts/phase1_dedup_questions.py --run-id run_001 --store
+    python scripts/phase1_dedup_questions.py --run-id run_001 --compress
 
 Based on Self-Instruct novelty filtering (threshold ~0.7).
 
+Questions are compared as stem ids from the run's extracted features
+(feature_store.py), built here if the extraction step hasn't run, so each
+question is tokenized and stemmed once rather than once per comparison.
+Similarities are the same ROUGE-L F1 scores rouge_score computes.
+
 Requires:
     pip install rouge-score
 """
@@ -16,34 +24,33 @@ import argparse
 import json
 from pathlib import Path
 
-try:
-    from rouge_score import rouge_scorer
-except ImportError:
-    print("Error: rouge-score not installed. Run: pip install rouge-score")
-    exit(1)
+from feature_store import QuestionFeatures, RougeL, build_features, features_path
+from run_artifacts import (
+    STAGES,
+    StageWriter,
+    add_layout_args,
+    iter_records,
+    output_location,
+    snapshot,
+    stage_exists,
+    validate_layout_args,
+)
 
 ROOT = Path(__file__).resolve().parent.parent
 
 
-def compute_rouge_l(scorer, text1: str, text2: str) -> float:
-    """Compute ROUGE-L F1 score between two texts."""
-    scores = scorer.score(text1, text2)
-    return scores["rougeL"].fmeasure
-
-
 def normalize_text(text: str) -> str:
     """Normalize text for comparison."""
     return text.lower().strip()
 
 
 def find_max_similarity(
-    scorer,
-    candidate: str,
-    accepted: list[str],
+    candidate: list[int],
+    accepted: list[list[int]],
     sample_size: int = 100,
 ) -> tuple[float, int]:
     """
-    Find maximum ROUGE-L similarity between candidate and accepted questions.
+    Find maximum ROUGE-L similarity between candidate and accepted questions (as stem ids).
     For efficiency, only compare against the most recent `sample_size` accepted.
     Returns (max_score, index_of_most_similar).
     """
@@ -57,8 +64,9 @@ def find_max_similarity(
     max_score = 0.0
     max_idx = -1
 
+    rouge = RougeL(candidate)
     for i, acc in enumerate(compare_set):
-        score = compute_rouge_l(scorer, candidate, acc)
+        score = rouge.score(acc)
         if score > max_score:
             max_score = score
             max_idx = start_idx + i
@@ -82,13 +90,15 @@ def main():
         action="store_true",
         help="Include seed questions in dedup pool (avoid generating near-duplicates of seeds)",
     )
+    add_layout_args(parser, "questions_deduped.jsonl", "dedup fields")
     args = parser.parse_args()
+    validate_layout_args(parser, args, args.input, args.output)
 
     run_dir = ROOT / "data" / "runs" / args.run_id
     input_path = run_dir / args.input
     output_path = run_dir / args.output
 
-    if not input_path.exists():
+    if not stage_exists(input_path):
         print(f"Error: Input file not found: {input_path}")
         return
 
@@ -96,15 +106,19 @@ def main():
     print(f"=====================")
     print(f"Run ID: {args.run_id}")
     print(f"Input: {input_path}")
-    print(f"Output: {output_path}")
+    print(f"Output: {output_location(output_path, args)}")
     print(f"ROUGE-L threshold: {args.threshold}")
-    print()
 
-    # Initialize ROUGE scorer
-    scorer = rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
+    # Features are row-aligned with questions_raw.jsonl, so only usable on the standard chain
+    features = build_features(run_dir) if args.input == STAGES[0] else None
+    if features is not None:
+        print(f"Features: {features_path(run_dir)}")
+    else:
+        features = QuestionFeatures()
+    print()
 
     # Optionally load seed questions into the accepted pool
-    accepted_texts: list[str] = []
+    accepted_stems: list[list[int]] = []
     if args.include_seeds:
         seed_path = ROOT / "data" / "seeds" / "questions_gold.jsonl"
         if seed_path.exists():
@@ -114,8 +128,8 @@ def main():
                         seed = json.loads(line)
                         # Only include gold seeds (leakage=0)
                         if seed.get("leakage_score") == 0:
-                            accepted_texts.append(normalize_text(seed["question"]))
-            print(f"Loaded {len(accepted_texts)} seed questions into dedup pool")
+                            accepted_stems.append(features.stem_text(normalize_text(seed["question"])))
+            print(f"Loaded {len(accepted_stems)} seed questions into dedup pool")
             print()
 
     stats = {
@@ -126,12 +140,9 @@ def main():
         "scores": [],  # For distribution analysis
     }
 
-    with open(input_path) as f_in, open(output_path, "w") as f_out:
-        for line in f_in:
-            if not line.strip():
-                continue
-
-            record = json.loads(line)
+    with StageWriter(output_path, args.sidecars, args.store, args.compress) as writer:
+        for row, record in enumerate(iter_records(input_path)):
+            before = snapshot(record) if args.sidecars or args.store else None
             stats["total"] += 1
 
             # Skip questions that didn't pass filters
@@ -139,12 +150,15 @@ def main():
                 stats["skipped_not_passed"] += 1
                 record["filters"]["dedup_skipped"] = True
                 record["filters"]["dedup_passed"] = False
-                f_out.write(json.dumps(record) + "\n")
+                writer.write(row, record, before)
                 continue
 
             # Compute novelty
-            question = normalize_text(record["question"])
-            max_sim, similar_idx = find_max_similarity(scorer, question, accepted_texts)
+            if row < len(features):
+                question = features.stems(row)
+            else:
+                question = features.stem_text(normalize_text(record["question"]))
+            max_sim, similar_idx = find_max_similarity(question, accepted_stems)
 
             stats["scores"].append(max_sim)
             record["filters"]["novelty_score"] = round(1 - max_sim, 3)  # Higher = more novel
@@ -159,9 +173,9 @@ def main():
                 # Accept and add to pool
                 stats["accepted"] += 1
                 record["filters"]["dedup_passed"] = True
-                accepted_texts.append(question)
+                accepted_stems.append(question)
 
-            f_out.write(json.dumps(record) + "\n")
+            writer.write(row, record, before)
 
             # Progress indicator
             if stats["total"] % 100 == 0:
@@ -199,7 +213,7 @@ def main():
             print(f"    {k}: {v}")
 
     print()
-    print(f"Output: {output_path}")
+    print(f"Output: {writer.path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Phase 1: Export merged stage files from a run written with --sidecars or --store.
+
+Merges questions_raw.jsonl with the stage sidecars (or the annotations in
+run_store.sqlite) and writes the same JSONL that the default layout would
+have produced.
+
+Usage:
+    python scripts/phase1_export_run.py --run-id run_001
+    python scripts/phase1_export_run.py --run-id run_001 --stage questions_deduped.jsonl --output /tmp/deduped.jsonl
+    python scripts/phase1_export_run.py --run-id run_001 --all
+    python scripts/phase1_export_run.py --run-id run_001 --all --compress
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from artifact_io import AtomicWriter, artifact_exists, is_compressed, output_artifact
+from run_artifacts import STAGES, iter_records, sidecar_path, stage_exists, stored_stage
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def export_stage(path: Path, output_path: Path) -> int:
+    """Write the merged records of one stage (gzip-compressed to a .gz path); returns the record count."""
+    count = 0
+    # Exports may go anywhere (--output), so they get no artifacts.json entry
+    with AtomicWriter(output_path, record=False) as f:
+        for record in iter_records(path):
+            f.write(json.dumps(record) + "\n")
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export merged Phase 1 stage files from sidecars or the run store")
+    parser.add_argument("--run-id", required=True, help="Run identifier")
+    parser.add_argument("--stage", default="questions_scored.jsonl", choices=STAGES, help="Stage to export")
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Output path (default: <stage>.merged.jsonl in the run directory)",
+    )
+    parser.add_argument("--compress", action="store_true", help="Write <stage>.merged.jsonl.gz (or gzip --output)")
+    parser.add_argument("--all", action="store_true", help="Export every stage that has a sidecar or is in the run store")
+    args = parser.parse_args()
+    if args.all and args.output:
+        parser.error("--output exports a single --stage; drop --all")
+
+    run_dir = ROOT / "data" / "runs" / args.run_id
+    if args.all:
+        stages = [name for name in STAGES if artifact_exists(sidecar_path(run_dir / name)) or stored_stage(run_dir / name)]
+    else:
+        stages = [args.stage]
+
+    print(f"Phase 1 Export")
+    print(f"==============")
+    print(f"Run ID: {args.run_id}")
+    if not stages:
+        print(f"No sidecars or stored stages found in {run_dir}")
+        return 1
+
+    for name in stages:
+        path = run_dir / name
+        if not stage_exists(path):
+            print(f"Error: {name} not found (neither full file nor sidecar)")
+            return 1
+        output_path = Path(args.output) if args.output else run_dir / name.replace(".jsonl", ".merged.jsonl")
+        if args.compress and not is_compressed(output_path):
+            output_path = output_artifact(output_path, True)
+        count = export_stage(path, output_path)
+        print(f"{name}: {count} records -> {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Phase 1: Extract per-question text features for the later stages.
+
+Computes normalized text, lengths, ROUGE token and stem ids, a content hash
+and a shingle signature for every question in questions_raw.jsonl, once,
+into question_features.bin (see feature_store.py). Filter, dedup and the
+report read them instead of re-processing the text. Only lines appended
+since the last extraction are processed; unchanged runs are a no-op.
+
+Usage:
+    python scripts/phase1_extract_features.py --run-id run_001
+    python scripts/phase1_extract_features.py --run-id run_001 --rebuild
+
+Requires:
+    pip install rouge-score
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from feature_store import build_features, features_path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract per-question text features for Phase 1")
+    parser.add_argument("--run-id", required=True, help="Run identifier")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every row instead of only new ones")
+    args = parser.parse_args()
+
+    run_dir = ROOT / "data" / "runs" / args.run_id
+    if args.rebuild:
+        features_path(run_dir).unlink(missing_ok=True)
+
+    print(f"Phase 1 Feature Extraction")
+    print(f"==========================")
+    print(f"Run ID: {args.run_id}")
+    start = time.perf_counter()
+    try:
+        features = build_features(run_dir)
+    except ImportError as e:
+        print(f"Error: {e}")
+        return 1
+    if features is None:
+        print(f"Error: questions_raw.jsonl not found in {run_dir}")
+        return 1
+
+    summary = features.summary()
+    print(f"Questions:        {summary['questions']}")
+    print(f"Vocabulary:       {summary['vocabulary']} words, {summary['stems']} stems")
+    print(f"Exact duplicates: {summary['exact_duplicates']}")
+    print(f"Near duplicates:  {summary['near_duplicates']}")
+    print(f"Time:             {time.perf_counter() - start:.2f}s")
+    print(f"Output: {features_path(run_dir)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
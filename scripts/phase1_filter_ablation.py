@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Phase 1: Filter ablation — how many questions would survive without each filter.
+
+The filter stage records which checks each question failed as a bitmask
+(filters.fail_mask, bit i = FILTER_CHECKS[i]). One pass over the filtered
+stage counts how many questions share each mask, overall, per domain and
+per question type. A question survives with a set of checks removed when
+all of its failed checks are in that set, so survivors for every removed
+set at once are a subset-sum over those counts: len(FILTER_CHECKS) sweeps
+of whole-slice additions over 2^len(FILTER_CHECKS) counters, whatever the
+run size. Leave-one-out and every leave-k-out combination come from the
+same table.
+
+Each combination also reports how many survivors hit the blocklist, i.e.
+the lexical leakage the removed checks would let through.
+
+Runs filtered before fail_mask was recorded get their masks recomputed
+from the question text.
+
+Usage:
+    python scripts/phase1_filter_ablation.py --run-id run_001
+    python scripts/phase1_filter_ablation.py --run-id run_001 --max-k 3 --top 20
+    python scripts/phase1_filter_ablation.py --run-id run_001 --output /tmp/ablation.json
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from itertools import combinations
+from operator import add
+from pathlib import Path
+from typing import Iterable
+
+from artifact_io import AtomicWriter
+from phase1_filter_questions import BLOCKLIST_BITS, CHECK_BITS, FILTER_CHECKS, filter_question
+from run_artifacts import STAGES, iter_records, stage_exists
+
+ROOT = Path(__file__).resolve().parent.parent
+
+ABLATION_NAME = "filter_ablation.json"
+MASKS = 1 << len(FILTER_CHECKS)
+
+
+def record_mask(record: dict) -> tuple[int, bool]:
+    """A record's fail mask, and whether it had to be recomputed."""
+    mask = record.get("filters", {}).get("fail_mask")
+    if mask is not None:
+        return mask, False
+    return filter_question({"question": record.get("question", "")})["filters"]["fail_mask"], True
+
+
+def mask_counts(records: Iterable[dict]) -> tuple[dict[tuple[str, str], list[int]], int]:
+    """Questions per fail mask for each (domain, question_type), and how many masks were recomputed."""
+    counts: dict[tuple[str, str], list[int]] = defaultdict(lambda: [0] * MASKS)
+    recomputed = 0
+    for record in records:
+        mask, missing = record_mask(record)
+        recomputed += missing
+        counts[(record.get("domain", "unknown"), record.get("question_type", "unknown"))][mask] += 1
+    return dict(counts), recomputed
+
+
+def merge_counts(tables: Iterable[list[int]]) -> list[int]:
+    total = [0] * MASKS
+    for table in tables:
+        total = list(map(add, total, table))
+    return total
+
+
+def subset_sums(counts: list[int]) -> list[int]:
+    """
+    sums[removed] = sum of counts[mask] over masks contained in `removed`:
+    the survivors when the checks in `removed` are dropped.
+    """
+    sums = list(counts)
+    for bit in range(len(FILTER_CHECKS)):
+        step = 1 << bit
+        for start in range(0, MASKS, 2 * step):
+            high = slice(start + step, start + 2 * step)
+            sums[high] = map(add, sums[high], sums[start : start + step])
+    return sums
+
+
+def removed_sets(max_k: int) -> list[int]:
+    """Masks of every combination of up to `max_k` removed checks, by k then check order."""
+    sets = []
+    for k in range(max_k + 1):
+        for combo in combinations(range(len(FILTER_CHECKS)), k):
+            sets.append(sum(1 << i for i in combo))
+    return sets
+
+
+def ablation(counts: list[int], max_k: int) -> dict:
+    """Survivors and blocklist hits for each combination of up to `max_k` removed checks."""
+    survivors = subset_sums(counts)
+    leaky = subset_sums([n if mask & BLOCKLIST_BITS else 0 for mask, n in enumerate(counts)])
+    baseline = survivors[0]
+    rows = []
+    for removed in removed_sets(max_k):
+        rows.append({
+            "removed": [name for name in FILTER_CHECKS if removed & CHECK_BITS[name]],
+            "survivors": survivors[removed],
+            "gained": survivors[removed] - baseline,
+            "blocklist_hits": leaky[removed],
+        })
+    return {"total": sum(counts), "passed": baseline, "combinations": rows}
+
+
+def run_ablation(records: Iterable[dict], max_k: int) -> dict:
+    counts, recomputed = mask_counts(records)
+    by_domain: dict[str, list[list[int]]] = defaultdict(list)
+    by_type: dict[str, list[list[int]]] = defaultdict(list)
+    for (domain, qtype), table in counts.items():
+        by_domain[domain].append(table)
+        by_type[qtype].append(table)
+    return {
+        "checks": FILTER_CHECKS,
+        "max_k": max_k,
+        "recomputed_masks": recomputed,
+        "overall": ablation(merge_counts(counts.values()), max_k),
+        "by_domain": {d: ablation(merge_counts(t), max_k) for d, t in sorted(by_domain.items())},
+        "by_type": {q: ablation(merge_counts(t), max_k) for q, t in sorted(by_type.items())},
+    }
+
+
+def print_leave_one_out(title: str, groups: dict[str, dict]) -> None:
+    """Questions gained per removed check (columns) for each group (rows)."""
+    width = max([len(title)] + [len(name) for name in groups]) + 2
+    print(f"{title:{width}s}{'passed':>8s}  " + " ".join(f"{i:>5d}" for i in range(len(FILTER_CHECKS))))
+    for name, result in groups.items():
+        single = {tuple(r["removed"]): r["gained"] for r in result["combinations"] if len(r["removed"]) == 1}
+        gains = " ".join(f"{single[(check,)]:>+5d}" if single[(check,)] else f"{'.':>5s}" for check in FILTER_CHECKS)
+        print(f"{name:{width}s}{result['passed']:>8d}  {gains}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Survival counts with filters removed (Phase 1 filter ablation)")
+    parser.add_argument("--run-id", required=True, help="Run identifier")
+    parser.add_argument("--input", default=STAGES[0], help="Filtered stage to read")
+    parser.add_argument("--max-k", type=int, default=2, help="Largest number of checks removed together")
+    parser.add_argument("--top", type=int, default=10, help="Combinations of 2+ removed checks to show")
+    parser.add_argument("--output", default=None, help=f"Results JSON (default: {ABLATION_NAME} in the run directory)")
+    args = parser.parse_args()
+    if not 1 <= args.max_k <= len(FILTER_CHECKS):
+        parser.error(f"--max-k must be between 1 and {len(FILTER_CHECKS)}")
+
+    run_dir = ROOT / "data" / "runs" / args.run_id
+    input_path = run_dir / args.input
+    if not stage_exists(input_path):
+        print(f"Error: Input file not found: {input_path}")
+        return 1
+
+    print(f"Phase 1 Filter Ablation")
+    print(f"=======================")
+    print(f"Run ID: {args.run_id}")
+    print(f"Input: {input_path}")
+    print()
+
+    results = run_ablation(iter_records(input_path), args.max_k)
+    overall = results["overall"]
+    if results["recomputed_masks"]:
+        print(f"Recomputed fail masks: {results['recomputed_masks']} (filtered before they were recorded)")
+    print(f"Total: {overall['total']}  Passed all checks: {overall['passed']}")
+    print()
+
+    print("Leave-one-out")
+    print("-" * 40)
+    print(f"  {'removed check':22s} {'survivors':>9s} {'gained':>7s} {'blocklist hits':>15s}")
+    for row in overall["combinations"]:
+        if len(row["removed"]) == 1:
+            print(f"  {row['removed'][0]:22s} {row['survivors']:9d} {row['gained']:>+7d} {row['blocklist_hits']:15d}")
+    print()
+
+    multi = [row for row in overall["combinations"] if len(row["removed"]) > 1]
+    if multi:
+        print(f"Leave-k-out (k=2..{args.max_k}, top {args.top} by questions gained)")
+        print("-" * 40)
+        print(f"  {'removed checks':48s} {'survivors':>9s} {'gained':>7s} {'blocklist hits':>15s}")
+        for row in sorted(multi, key=lambda r: -r["gained"])[: args.top]:
+            print(f"  {' + '.join(row['removed']):48s} {row['survivors']:9d} {row['gained']:>+7d} {row['blocklist_hits']:15d}")
+        print()
+
+    print("Questions gained by removing each check:")
+    for i, name in enumerate(FILTER_CHECKS):
+        print(f"  {i:>2d} = {name}")
+    print()
+    print_leave_one_out("domain", results["by_domain"])
+    print()
+    print_leave_one_out("question type", results["by_type"])
+    print()
+
+    output_path = Path(args.output) if args.output else run_dir / ABLATION_NAME
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with AtomicWriter(output_path, record=False) as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to: {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
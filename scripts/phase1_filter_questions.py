@@ -2,121 +2,54 @@
 """
 Phase 1: Filter questions with hard filters (blocklist, shape, PII).
 
+Every check is evaluated for every record, and the failed ones are kept as
+a bitmask in filters.fail_mask (bit i = FILTER_CHECKS[i]), so
+phase1_filter_ablation.py can tell what would survive without any subset of
+the filters without rerunning them.
+
 Usage:
     python scripts/phase1_filter_questions.py --run-id run_001
     python scripts/phase1_filter_questions.py --run-id run_001 --input questions_raw.jsonl
+    python scripts/phase1_filter_questions.py --run-id run_001 --sidecars
+    python scripts/phase1_filter_questions.py --run-id run_001 --store
+    python scripts/phase1_filter_questions.py --run-id run_001 --compress
 
 Requires:
     pip install pyyaml
 """
 
 import argparse
-import json
 import re
 from pathlib import Path
 
+from artifact_io import artifact_exists
+from blocklist_lexicon import BLOCKLIST_CONFIG, default_blocklist
+from feature_store import BASE, QuestionFeatures, features_path, load_features
+from run_artifacts import StageWriter, add_layout_args, output_location, read_jsonl, snapshot, validate_layout_args
+
 ROOT = Path(__file__).resolve().parent.parent
 
 # ============================================================================
 # LEAKAGE BLOCKLIST
 # ============================================================================
 
-# Explicit region terms (leakage=2)
-COUNTRY_TERMS = {
-    # Countries
-    "singapore", "singaporean", "malaysia", "malaysian", "indonesia", "indonesian",
-    "thailand", "thai", "vietnam", "vietnamese", "philippines", "filipino", "filipina",
-    "japan", "japanese", "korea", "korean", "china", "chinese", "taiwan", "taiwanese",
-    "india", "indian", "pakistan", "pakistani", "bangladesh", "bangladeshi",
-    "usa", "u.s.a", "u.s.", "united states", "american", "america",
-    "canada", "canadian", "mexico", "mexican",
-    "uk", "u.k.", "britain", "british", "england", "english", "scotland", "scottish",
-    "wales", "welsh", "ireland", "irish",
-    "germany", "german", "france", "french", "italy", "italian", "spain", "spanish",
-    "australia", "australian", "new zealand", "kiwi",
-    # Cities
-    "new york", "nyc", "los angeles", "la", "chicago", "houston", "phoenix",
-    "san francisco", "seattle", "boston", "miami", "denver", "atlanta",
-    "london", "manchester", "birmingham", "edinburgh", "glasgow", "dublin",
-    "tokyo", "osaka", "kyoto", "seoul", "busan", "beijing", "shanghai", "hong kong",
-    "mumbai", "delhi", "bangalore", "chennai",
-    "sydney", "melbourne", "brisbane", "auckland",
-    "toronto", "vancouver", "montreal",
-    "paris", "berlin", "munich", "rome", "milan", "madrid", "barcelona",
-    # Singapore-specific
-    "changi", "orchard", "sentosa", "jurong", "tampines", "bedok", "woodlands",
-}
-
-# Institution/program terms (leakage=2)
-INSTITUTION_TERMS = {
-    # Singapore
-    "hdb", "cpf", "mrt", "lrt", "ez-link", "nets", "giro", "medisave", "medishield",
-    "polyclinic", "psle", "o-level", "a-level", "nus", "ntu", "smu", "polytechnic",
-    "bto", "resale flat", "coe", "erp", "gst voucher", "cdc voucher",
-    # US
-    "401k", "401(k)", "ira", "roth", "medicare", "medicaid", "social security",
-    "dmv", "irs", "fafsa", "sat", "act", "gpa", "community college",
-    "hsa", "fsa", "ppo", "hmo", "cobra", "aca", "obamacare",
-    "ez-pass", "e-zpass",
-    # UK
-    "nhs", "gp surgery", "a&e", "gcse", "ofsted", "council tax", "ni number",
-    "national insurance", "oyster card", "contactless", "ucas",
-    # Australia
-    "medicare card", "centrelink", "hecs", "help debt", "myki", "opal card",
-    # Canada
-    "ohip", "presto card", "rrsp", "tfsa",
-    # Currencies (when used as identifiers)
-    "sgd", "usd", "gbp", "aud", "cad", "eur", "jpy", "krw", "inr", "myr",
-}
-
-# Implicit cultural terms (leakage=1, borderline)
-IMPLICIT_TERMS = {
-    # US-centric customs
-    "tipping", "tip jar", "gratuity", "15%", "20%", "tip percentage",
-    "prom", "homecoming", "sorority", "fraternity", "spring break",
-    "thanksgiving", "fourth of july", "independence day", "super bowl",
-    "tailgate", "tailgating", "black friday", "cyber monday",
-    "school district", "property tax school",
-    # UK-centric customs
-    "gap year", "sixth form", "boxing day", "bonfire night",
-    # Asian customs (when too specific)
-    "red packet", "ang bao", "hongbao", "lunar new year bonus",
-    "13th month", "double pay",
-    "golden week",
-}
-
-# Combined blocklist with categories
-BLOCKLIST = {
-    "explicit": COUNTRY_TERMS | INSTITUTION_TERMS,
-    "implicit": IMPLICIT_TERMS,
-}
-
-
-def check_blocklist(text: str) -> tuple[bool, str | None, str | None]:
+# The terms live in configs/blocklist.yaml (per region and section), compiled
+# and cached by blocklist_lexicon.py.
+
+def check_blocklist(text: str, text_lower: str | None = None) -> tuple[bool, str | None, str | None]:
     """
     Check if text contains blocklisted terms.
     Returns (blocked, term, category).
     """
-    text_lower = text.lower()
-
-    # Check explicit terms first
-    for term in BLOCKLIST["explicit"]:
-        # Use word boundary matching for short terms
-        if len(term) <= 3:
-            pattern = rf"\b{re.escape(term)}\b"
-            if re.search(pattern, text_lower):
-                return True, term, "explicit"
-        elif term in text_lower:
-            return True, term, "explicit"
-
-    # Check implicit terms
-    for term in BLOCKLIST["implicit"]:
-        if len(term) <= 4:
-            pattern = rf"\b{re.escape(term)}\b"
-            if re.search(pattern, text_lower):
-                return True, term, "implicit"
-        elif term in text_lower:
-            return True, term, "implicit"
+    if text_lower is None:
+        text_lower = text.lower()
+    blocklist = default_blocklist()
+    first = blocklist.first_terms(text_lower)
+
+    # Explicit terms win over implicit ones
+    for category in ("explicit", "implicit"):
+        if category in first:
+            return True, blocklist.terms[first[category]], category
 
     return False, None, None
 
@@ -125,7 +58,7 @@ def check_blocklist(text: str) -> tuple[bool, str | None, str | None]:
 # SHAPE CHECKS
 # ============================================================================
 
-def is_question(text: str) -> bool:
+def is_question(text: str, text_lower: str | None = None) -> bool:
     """Check if text is a question (ends with ? or starts with question words)."""
     text = text.strip()
     if text.endswith("?"):
@@ -135,22 +68,26 @@ def is_question(text: str) -> bool:
         "is", "are", "do", "does", "can", "could", "should", "would", "will",
         "if", "in what", "under what",
     )
-    text_lower = text.lower()
+    if text_lower is None:
+        text_lower = text.lower()
     return any(text_lower.startswith(starter) for starter in question_starters)
 
 
-def check_length(text: str, min_len: int = 20, max_len: int = 500) -> tuple[bool, str | None]:
+def check_length(text: str, min_len: int = 20, max_len: int = 500, length: int | None = None) -> tuple[bool, str | None]:
     """Check if text length is within bounds."""
-    if len(text) < min_len:
-        return False, f"too_short ({len(text)} < {min_len})"
-    if len(text) > max_len:
-        return False, f"too_long ({len(text)} > {max_len})"
+    if length is None:
+        length = len(text)
+    if length < min_len:
+        return False, f"too_short ({length} < {min_len})"
+    if length > max_len:
+        return False, f"too_long ({length} > {max_len})"
     return True, None
 
 
-def is_english(text: str) -> bool:
+def is_english(text: str, ascii_chars: int | None = None) -> bool:
     """Basic check for English text (ASCII-heavy)."""
-    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    if ascii_chars is None:
+        ascii_chars = sum(1 for c in text if ord(c) < 128)
     return ascii_chars / len(text) > 0.9 if text else False
 
 
@@ -173,32 +110,79 @@ PII_PATTERNS = [
 ]
 
 
+PII_REGEXES = [(re.compile(pattern, re.IGNORECASE), pii_type) for pattern, pii_type in PII_PATTERNS]
+
+
 def check_pii(text: str) -> tuple[bool, str | None]:
     """Check for PII patterns. Returns (has_pii, pii_type)."""
-    for pattern, pii_type in PII_PATTERNS:
-        if re.search(pattern, text, re.IGNORECASE):
+    for regex, pii_type in PII_REGEXES:
+        if regex.search(text):
             return True, pii_type
     return False, None
 
 
+# ============================================================================
+# CHECK BITMASK
+# ============================================================================
+
+def pii_check_names() -> list[str]:
+    """One check name per PII pattern; repeated types are numbered (pii_phone, pii_phone_2)."""
+    names = []
+    for _, pii_type in PII_PATTERNS:
+        name = f"pii_{pii_type}"
+        count = sum(1 for existing in names if existing == name or existing.startswith(name + "_"))
+        names.append(f"{name}_{count + 1}" if count else name)
+    return names
+
+
+# Bit i of filters.fail_mask is set when FILTER_CHECKS[i] fails
+FILTER_CHECKS = [
+    "explicit_blocklist",
+    "implicit_blocklist",
+    "is_question",
+    "length",
+    "is_english",
+    *pii_check_names(),
+]
+CHECK_BITS = {name: 1 << i for i, name in enumerate(FILTER_CHECKS)}
+BLOCKLIST_BITS = CHECK_BITS["explicit_blocklist"] | CHECK_BITS["implicit_blocklist"]
+PII_BITS = sum(CHECK_BITS[name] for name in pii_check_names())
+PII_CHECKS = [(regex, pii_type, CHECK_BITS[name]) for (regex, pii_type), name in zip(PII_REGEXES, pii_check_names())]
+
+
 # ============================================================================
 # MAIN FILTER LOGIC
 # ============================================================================
 
-def filter_question(record: dict) -> dict:
+def filter_question(record: dict, features: QuestionFeatures | None = None, row: int | None = None) -> dict:
     """
     Apply all filters to a question record.
     Returns updated record with filters populated.
+
+    With the run's features (and the record's row in questions_raw.jsonl),
+    the lowercased text, length and ASCII count are taken from them.
     """
     question = record.get("question", "")
     filters = record.get("filters", {}).copy()
-
-    # 1. Blocklist check
-    blocked, term, category = check_blocklist(question)
-    if blocked:
+    text_lower = length = ascii_chars = None
+    if features is not None:
+        text_lower, length, ascii_chars = features.normalized(row), features.length(row), features.ascii_chars(row)
+
+    fail_mask = 0
+
+    # 1. Blocklist check (both categories, for the fail mask; explicit wins)
+    blocklist = default_blocklist()
+    first = blocklist.first_terms(text_lower if text_lower is not None else question.lower())
+    if "explicit" in first:
+        fail_mask |= CHECK_BITS["explicit_blocklist"]
+    if "implicit" in first:
+        fail_mask |= CHECK_BITS["implicit_blocklist"]
+    if first:
+        category = "explicit" if "explicit" in first else "implicit"
         filters["blocked"] = True
-        filters["block_term"] = term
+        filters["block_term"] = blocklist.terms[first[category]]
         filters["block_category"] = category
+        filters["block_region"] = blocklist.regions[first[category]]
         if category == "explicit":
             filters["explicit_leakage"] = True
         else:
@@ -209,20 +193,28 @@ def filter_question(record: dict) -> dict:
         filters["implicit_leakage"] = False
 
     # 2. Shape checks
-    filters["is_question"] = is_question(question)
+    filters["is_question"] = is_question(question, text_lower)
+    if not filters["is_question"]:
+        fail_mask |= CHECK_BITS["is_question"]
 
-    length_ok, length_reason = check_length(question)
+    length_ok, length_reason = check_length(question, length=length)
     filters["length_ok"] = length_ok
     if not length_ok:
         filters["length_reason"] = length_reason
+        fail_mask |= CHECK_BITS["length"]
 
-    filters["is_english"] = is_english(question)
+    filters["is_english"] = is_english(question, ascii_chars)
+    if not filters["is_english"]:
+        fail_mask |= CHECK_BITS["is_english"]
 
-    # 3. PII check
-    has_pii, pii_type = check_pii(question)
-    filters["pii"] = has_pii
-    if has_pii:
-        filters["pii_type"] = pii_type
+    # 3. PII check (every pattern; the first match names the type)
+    filters["pii"] = False
+    for regex, pii_type, bit in PII_CHECKS:
+        if regex.search(question):
+            if not filters["pii"]:
+                filters["pii"] = True
+                filters["pii_type"] = pii_type
+            fail_mask |= bit
 
     # 4. Overall pass/fail
     filters["passed"] = (
@@ -232,6 +224,7 @@ def filter_question(record: dict) -> dict:
         and filters["is_english"]
         and not filters["pii"]
     )
+    filters["fail_mask"] = fail_mask
 
     record["filters"] = filters
     return record
@@ -242,13 +235,15 @@ def main():
     parser.add_argument("--run-id", required=True, help="Run identifier")
     parser.add_argument("--input", default="questions_raw.jsonl", help="Input file name")
     parser.add_argument("--output", default="questions_filtered.jsonl", help="Output file name")
+    add_layout_args(parser, "questions_filtered.jsonl", "filter fields")
     args = parser.parse_args()
+    validate_layout_args(parser, args, args.input, args.output)
 
     run_dir = ROOT / "data" / "runs" / args.run_id
     input_path = run_dir / args.input
     output_path = run_dir / args.output
 
-    if not input_path.exists():
+    if not artifact_exists(input_path):
         print(f"Error: Input file not found: {input_path}")
         return
 
@@ -256,7 +251,13 @@ def main():
     print(f"=================")
     print(f"Run ID: {args.run_id}")
     print(f"Input: {input_path}")
-    print(f"Output: {output_path}")
+    print(f"Output: {output_location(output_path, args)}")
+    # Extracted features are row-aligned with questions_raw.jsonl only
+    features = load_features(run_dir) if args.input == BASE else None
+    if features is not None:
+        print(f"Features: {features_path(run_dir)}")
+    blocklist = default_blocklist()
+    print(f"Blocklist: {BLOCKLIST_CONFIG.name} v{blocklist.version} ({len(blocklist)} terms, {blocklist.digest[:12]})")
     print()
 
     stats = {
@@ -270,13 +271,10 @@ def main():
         "pii": 0,
     }
 
-    with open(input_path) as f_in, open(output_path, "w") as f_out:
-        for line in f_in:
-            if not line.strip():
-                continue
-
-            record = json.loads(line)
-            record = filter_question(record)
+    with StageWriter(output_path, args.sidecars, args.store, args.compress) as writer:
+        for row, record in enumerate(read_jsonl(input_path)):
+            before = snapshot(record) if args.sidecars or args.store else None
+            record = filter_question(record, features, row)
             stats["total"] += 1
 
             filters = record["filters"]
@@ -296,7 +294,7 @@ def main():
                 if filters.get("pii"):
                     stats["pii"] += 1
 
-            f_out.write(json.dumps(record) + "\n")
+            writer.write(row, record, before)
 
     # Print summary
     print("Filter Results")
@@ -312,7 +310,7 @@ def main():
     print(f"  Not English:        {stats['not_english']}")
     print(f"  PII detected:       {stats['pii']}")
     print()
-    print(f"Output: {output_path}")
+    print(f"Output: {writer.path}")
 
 
 if __name__ == "__main__":
@@ -5,28 +5,49 @@ Phase 1: Generate questions using LLM.
 Usage:
     python scripts/phase1_generate_questions.py --base-url http://localhost:8000/v1 --run-id run_001
     python scripts/phase1_generate_questions.py --base-url http://localhost:8000/v1 --run-id run_001 --domain transport_commuting --type explanatory
+    python scripts/phase1_generate_questions.py --base-url http://localhost:8000/v1 --run-id run_001 --chunk-size 10 --concurrency 16
+    python scripts/phase1_generate_questions.py --base-url http://localhost:8000/v1 --run-id run_001 --compress
 
 Requires:
     pip install openai pyyaml
 """
 
 import argparse
+import hashlib
 import json
-import os
-import re
+import math
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
-import yaml
-from openai import OpenAI
+from artifact_io import AtomicWriter, artifact_exists, existing_artifact, output_artifact, remove_artifact
+from llm_client import (
+    LLMClient,
+    add_client_args,
+    client_from_args,
+    get_profile,
+    load_yaml_config,
+    parse_json_list,
+    validate_client_args,
+    worker_count,
+)
+from token_planner import TokenPlanner, add_planner_args, planned_chat
 
 ROOT = Path(__file__).resolve().parent.parent
 
-
-def load_yaml_config(name: str) -> dict:
-    with open(ROOT / "configs" / name) as f:
-        return yaml.safe_load(f)
+# Sub-angle hints rotated across the chunks of a bucket so that parallel
+# requests for the same domain × type explore different situations.
+CHUNK_ANGLES = [
+    "everyday routines and recurring situations",
+    "first-time or newcomer situations",
+    "costs, budgeting, and paperwork",
+    "family, household, and caregiving situations",
+    "dealing with service providers, landlords, employers, or officials",
+    "social expectations and how other people might react",
+    "delays, disputes, and things going wrong",
+    "longer-term planning and major decisions",
+]
 
 
 def load_generation_template(question_type: str) -> str:
@@ -35,15 +56,6 @@ def load_generation_template(question_type: str) -> str:
         return f.read()
 
 
-def get_profile(config: dict, profile_name: str = None) -> dict:
-    if profile_name is None:
-        profile_name = config.get("default_profile", "qwen32b")
-    profiles = config.get("profiles", {})
-    if profile_name not in profiles:
-        raise ValueError(f"Profile '{profile_name}' not found. Available: {list(profiles.keys())}")
-    return profiles[profile_name]
-
-
 def render_template(template: str, domain: dict, question_type: dict, num_questions: int) -> str:
     return (
         template
@@ -55,54 +67,114 @@ def render_template(template: str, domain: dict, question_type: dict, num_questi
     )
 
 
-def parse_json_response(text: str) -> list | None:
-    """Extract JSON array from response."""
-    # Try direct parse
-    try:
-        result = json.loads(text)
-        if isinstance(result, list):
-            return result
-    except json.JSONDecodeError:
-        pass
-
-    # Try extracting from code block
-    match = re.search(r"```(?:json)?\s*(\[.*?\])\s*```", text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(1))
-        except json.JSONDecodeError:
-            pass
-
-    # Try finding any JSON array
-    match = re.search(r"\[[\s\S]*\]", text)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            pass
-
-    return None
+def template_order(buckets: list[tuple]) -> list[dict]:
+    """
+    Chunks of all (domain, qtype, num_questions, chunks) buckets, reordered so
+    buckets sharing a template (question type) are sent back to back. The
+    templates keep variable fields last, so consecutive requests share the
+    whole static rubric as a cached prefix.
+    """
+    first_seen: dict[str, int] = {}
+    for _, qtype, _, _ in buckets:
+        first_seen.setdefault(qtype["id"], len(first_seen))
+    ordered = sorted(buckets, key=lambda bucket: first_seen[bucket[1]["id"]])
+    return [chunk for _, _, _, chunks in ordered for chunk in chunks]
+
+
+def plan_chunks(num_questions: int, chunk_size: int | None) -> list[int]:
+    """Split a bucket budget into near-equal chunk sizes (e.g. 30 → [10, 10, 10])."""
+    if chunk_size is not None and chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+    if not chunk_size or chunk_size >= num_questions:
+        return [num_questions]
+    num_chunks = math.ceil(num_questions / chunk_size)
+    base, extra = divmod(num_questions, num_chunks)
+    return [base + (1 if i < extra else 0) for i in range(num_chunks)]
+
+
+def chunk_seed(run_id: str, domain_id: str, type_id: str, chunk_index: int, round_idx: int = 1) -> int:
+    """
+    Deterministic per-chunk sampling seed, so reruns of a run_id are reproducible.
+    The round is part of the key so follow-up quota rounds don't replay round 1.
+    """
+    key = f"{run_id}/{round_idx}/{domain_id}/{type_id}/{chunk_index}"
+    return int(hashlib.sha256(key.encode()).hexdigest()[:8], 16)
+
+
+def render_chunk_hint(chunk_index: int, num_chunks: int, round_idx: int = 1) -> str:
+    # Later rounds start further along the angle list so they explore new ground
+    angle = CHUNK_ANGLES[(chunk_index + (round_idx - 1) * num_chunks) % len(CHUNK_ANGLES)]
+    return (
+        f"\n\n## Angle (batch {chunk_index + 1} of {num_chunks})\n"
+        f"Other batches cover other angles. Focus this batch on {angle}.\n"
+    )
 
 
 def generate_questions(
-    client: OpenAI,
+    client: LLMClient,
     model_id: str,
     decoding_params: dict,
     prompt: str,
+    seed: int | None = None,
+    planner: TokenPlanner | None = None,
+    num_questions: int = 1,
 ) -> tuple[list, str]:
     """Generate questions and return (parsed_list, raw_response)."""
-    response = client.chat.completions.create(
-        model=model_id,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=decoding_params.get("temperature", 0.7),
-        top_p=decoding_params.get("top_p", 0.9),
-        max_tokens=decoding_params.get("max_tokens", 2048),
+    response = planned_chat(
+        client,
+        planner,
+        "generate",
+        num_questions,
+        model_id,
+        [{"role": "user", "content": prompt}],
+        {
+            "temperature": decoding_params.get("temperature", 0.7),
+            "top_p": decoding_params.get("top_p", 0.9),
+            "max_tokens": decoding_params.get("max_tokens", 2048),
+        },
+        seed=seed,
     )
-    raw = response.choices[0].message.content
-    parsed = parse_json_response(raw)
+    raw = response["choices"][0]["text"]
+    parsed = parse_json_list(raw)
     return parsed or [], raw
 
 
+def generate_chunk(
+    client: LLMClient,
+    model_id: str,
+    decoding_params: dict,
+    prompt: str,
+    seed: int | None,
+    planner: TokenPlanner | None = None,
+    num_questions: int = 1,
+) -> dict:
+    """Run one chunk request; errors are captured so sibling chunks still merge."""
+    try:
+        questions, raw = generate_questions(
+            client, model_id, decoding_params, prompt, seed=seed, planner=planner, num_questions=num_questions
+        )
+    except Exception as e:
+        return {"questions": [], "raw": None, "error": str(e)}
+    return {"questions": questions, "raw": raw, "error": None}
+
+
+def merge_chunk_results(chunks: list[dict], results: list[dict]) -> tuple[list[tuple[dict, dict]], list[tuple[int, str]]]:
+    """
+    Merge a bucket's chunk results in chunk order.
+    Returns ([(chunk, question), ...], [(chunk_index, failure_message), ...]).
+    """
+    merged = []
+    failures = []
+    for chunk, result in zip(chunks, results):
+        if result["error"]:
+            failures.append((chunk["index"], f"ERROR: {result['error']}"))
+        elif not result["questions"]:
+            failures.append((chunk["index"], f"PARSE_FAIL (raw: {(result['raw'] or '')[:100]}...)"))
+        else:
+            merged.extend((chunk, q) for q in result["questions"])
+    return merged, failures
+
+
 def generate_id() -> str:
     return f"gen-{uuid.uuid4().hex[:12]}"
 
@@ -110,22 +182,51 @@ def generate_id() -> str:
 def main():
     parser = argparse.ArgumentParser(description="Generate questions for Phase 1")
     parser.add_argument("--run-id", required=True, help="Run identifier (e.g., run_001)")
-    parser.add_argument(
-        "--base-url",
-        default=os.environ.get("OPENAI_BASE_URL", "http://localhost:8000/v1"),
-        help="OpenAI-compatible API base URL",
-    )
-    parser.add_argument(
-        "--api-key",
-        default=os.environ.get("OPENAI_API_KEY", "not-needed"),
-        help="API key",
-    )
+    add_client_args(parser)
     parser.add_argument("--profile", default=None, help="Model profile to use")
     parser.add_argument("--domain", default=None, help="Specific domain to generate (default: all)")
     parser.add_argument("--type", default=None, help="Specific question type (default: all)")
     parser.add_argument("--num", type=int, default=None, help="Override number of questions per bucket")
     parser.add_argument("--append", action="store_true", help="Append to existing output file")
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Write questions_raw.jsonl.gz instead of plain JSONL (--append keeps the existing file's form)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Split each bucket into concurrent requests of at most this many questions (default: one request per bucket)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Concurrent LLM requests (the starting point when adaptive concurrency is on)",
+    )
+    parser.add_argument(
+        "--bucket-plan",
+        default=None,
+        help="JSON file mapping domain -> question_type -> count; only these buckets are generated",
+    )
+    parser.add_argument(
+        "--round",
+        type=int,
+        default=1,
+        help="Generation round (quota mode); varies chunk seeds and angle hints between rounds",
+    )
+    add_planner_args(parser)
     args = parser.parse_args()
+    if args.chunk_size is not None and args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.round < 1:
+        parser.error("--round must be at least 1")
+    if args.token_margin < 0:
+        parser.error("--token-margin must be at least 0")
+    validate_client_args(parser, args)
 
     # Load configs
     llm_config = load_yaml_config("llm.yaml")
@@ -156,13 +257,23 @@ def main():
             print(f"Question type '{args.type}' not found")
             return
 
+    bucket_plan = None
+    if args.bucket_plan:
+        with open(args.bucket_plan) as f:
+            bucket_plan = json.load(f)
+
     # Prepare output
     run_dir = ROOT / "data" / "runs" / args.run_id
     run_dir.mkdir(parents=True, exist_ok=True)
     output_path = run_dir / "questions_raw.jsonl"
+    if args.append and artifact_exists(output_path):
+        output_path = existing_artifact(output_path)
+    else:
+        remove_artifact(output_path, keep=output_artifact(output_path, args.compress))
+        output_path = output_artifact(output_path, args.compress)
 
-    mode = "a" if args.append else "w"
-    client = OpenAI(base_url=args.base_url, api_key=args.api_key)
+    client = client_from_args(args, concurrency=args.concurrency)
+    planner = TokenPlanner.from_runs(model_id, ("generate",), margin=args.token_margin, enabled=args.plan_tokens)
 
     print(f"Phase 1 Generation")
     print(f"==================")
@@ -172,37 +283,65 @@ def main():
     print(f"Domains: {len(domains)}")
     print(f"Question types: {len(question_types)}")
     print(f"Output: {output_path}")
+    if args.plan_tokens and planner.fits.get("generate"):
+        fit = planner.fits["generate"]
+        print(f"Token plan: {fit['quantile_per_unit']} tokens/question (p{int(100 * fit['quantile'])}) + {int(100 * args.token_margin)}% margin")
     print()
 
     total_generated = 0
-    total_buckets = len(domains) * len(question_types)
-    bucket_idx = 0
+    total_chunks_failed = 0
+    prompt_template_version = llm_config.get("prompt_template_version", "v1")
 
-    with open(output_path, mode) as f:
+    # Fan every bucket out into chunk requests up front so the server can batch
+    # them; requests go out grouped by template so the server's prefix cache
+    # is reused, and results are merged back per bucket in a fixed order below.
+    executor = ThreadPoolExecutor(max_workers=worker_count(args, args.concurrency))
+    try:
+        buckets = []
         for domain in domains:
             for qtype in question_types:
-                bucket_idx += 1
-                num_questions = args.num or type_overrides.get(qtype["id"], default_budget)
-
-                # Load and render template
+                if bucket_plan is not None:
+                    num_questions = bucket_plan.get(domain["id"], {}).get(qtype["id"], 0)
+                    if num_questions <= 0:
+                        continue
+                else:
+                    num_questions = args.num or type_overrides.get(qtype["id"], default_budget)
                 template = load_generation_template(qtype["id"])
-                prompt = render_template(template, domain, qtype, num_questions)
-
-                print(f"[{bucket_idx}/{total_buckets}] {domain['id']} × {qtype['id']} (n={num_questions})...", end=" ", flush=True)
-
-                try:
-                    questions, raw = generate_questions(client, model_id, decoding_params, prompt)
-                except Exception as e:
-                    print(f"ERROR: {e}")
-                    continue
-
-                if not questions:
-                    print(f"PARSE_FAIL (raw: {raw[:100]}...)")
-                    continue
+                chunk_sizes = plan_chunks(num_questions, args.chunk_size)
+                chunks = []
+                for chunk_index, chunk_n in enumerate(chunk_sizes):
+                    prompt = render_template(template, domain, qtype, chunk_n)
+                    seed = None
+                    if len(chunk_sizes) > 1:
+                        prompt += render_chunk_hint(chunk_index, len(chunk_sizes), args.round)
+                        seed = chunk_seed(args.run_id, domain["id"], qtype["id"], chunk_index, args.round)
+                    chunks.append({"index": chunk_index, "num_questions": chunk_n, "seed": seed, "prompt": prompt})
+                buckets.append((domain, qtype, num_questions, chunks))
+        for chunk in template_order(buckets):
+            chunk["future"] = executor.submit(
+                generate_chunk,
+                client,
+                model_id,
+                decoding_params,
+                chunk.pop("prompt"),
+                chunk["seed"],
+                planner,
+                chunk["num_questions"],
+            )
+        total_buckets = len(buckets)
+
+        with AtomicWriter(output_path, append=args.append) as f:
+            for bucket_idx, (domain, qtype, num_questions, chunks) in enumerate(buckets, 1):
+                label = f"{domain['id']} × {qtype['id']} (n={num_questions}"
+                label += f", chunks={len(chunks)})" if len(chunks) > 1 else ")"
+                print(f"[{bucket_idx}/{total_buckets}] {label}...", end=" ", flush=True)
+
+                results = [chunk["future"].result() for chunk in chunks]
+                merged, failures = merge_chunk_results(chunks, results)
 
                 # Write records
                 timestamp = datetime.utcnow().isoformat() + "Z"
-                for q in questions:
+                for chunk, q in merged:
                     record = {
                         "id": generate_id(),
                         "question": q.get("question", ""),
@@ -215,18 +354,52 @@ def main():
                         "provenance": {
                             "model_id": model_id,
                             "profile": profile_name,
-                            "prompt_template_version": llm_config.get("prompt_template_version", "v1"),
+                            "prompt_template_version": prompt_template_version,
                             "timestamp": timestamp,
                             "run_id": args.run_id,
+                            "chunk_index": chunk["index"],
+                            "num_chunks": len(chunks),
+                            "chunk_seed": chunk["seed"],
+                            "round": args.round,
                         },
                     }
                     f.write(json.dumps(record) + "\n")
 
-                total_generated += len(questions)
-                print(f"OK ({len(questions)} questions)")
+                bucket_generated = len(merged)
+                total_generated += bucket_generated
+                total_chunks_failed += len(failures)
+                if len(chunks) == 1:
+                    print(failures[0][1] if failures else f"OK ({bucket_generated} questions)")
+                    continue
+                if len(failures) == len(chunks):
+                    print(f"FAILED (all {len(chunks)} chunks)")
+                elif failures:
+                    print(f"OK ({bucket_generated} questions, {len(failures)}/{len(chunks)} chunks failed)")
+                else:
+                    print(f"OK ({bucket_generated} questions)")
+                for chunk_index, message in failures:
+                    print(f"    chunk {chunk_index}: {message}")
+    finally:
+        # Don't leave queued requests running after an error or Ctrl-C
+        executor.shutdown(wait=False, cancel_futures=True)
 
     print()
     print(f"Total generated: {total_generated}")
+    if client.retries:
+        print(f"Retried requests: {client.retries}")
+    if client.limiter:
+        control = client.limiter.summary()
+        print(f"Adaptive concurrency: final {control['final_limit']}, peak {control['peak_limit']}")
+    if len(client.endpoint_stats()) > 1:
+        for endpoint in client.endpoint_stats():
+            print(f"  {endpoint['url']}: {endpoint['requests']} requests, {endpoint['errors']} errors, ejected {endpoint['ejections']}x")
+    token_plan = planner.summary().get("generate")
+    if token_plan and token_plan["requests"]:
+        print(
+            f"max_tokens: mean {token_plan['mean_max_tokens']} (profile {decoding_params.get('max_tokens', 2048)}), "
+            f"{token_plan['truncated']} truncated, {token_plan['replanned']} resent at the profile cap"
+        )
+    planner.write_log(run_dir)
     print(f"Output: {output_path}")
 
     # Write manifest
@@ -243,12 +416,25 @@ def main():
         "budgets": {
             "default": default_budget,
             "overrides": type_overrides,
+            "bucket_plan": bucket_plan,
         },
+        "chunk_size": args.chunk_size,
+        "round": args.round,
+        "concurrency": args.concurrency,
         "total_generated": total_generated,
+        "chunks_failed": total_chunks_failed,
+        "retries": client.retries,
+        "endpoints": client.endpoint_stats(),
+        "concurrency_control": client.limiter.summary() if client.limiter else None,
+        "token_plan": token_plan,
         "timestamp": datetime.utcnow().isoformat() + "Z",
     }
     manifest_path = run_dir / "run_manifest.json"
-    with open(manifest_path, "w") as f:
+    if args.append and manifest_path.exists():
+        # Keep sections owned by other steps (e.g. the pipeline's quota rounds)
+        with open(manifest_path) as f:
+            manifest = {**json.load(f), **manifest}
+    with AtomicWriter(manifest_path, record=False) as f:
         json.dump(manifest, f, indent=2)
     print(f"Manifest: {manifest_path}")
 
@@ -6,6 +6,10 @@ Usage:
     python scripts/phase1_report.py --run-id run_001
     python scripts/phase1_report.py --run-id run_001 --sample 50
 
+Runs written with --store are reported from SQL aggregates over
+run_store.sqlite instead of reading the stage files. The report also leaves
+run_summary.json for phase1_compare_runs.py.
+
 Requires:
     pip install pyyaml tabulate
 """
@@ -15,9 +19,16 @@ import json
 import random
 from collections import defaultdict
 from pathlib import Path
+from typing import Iterable
 
 import yaml
 
+from artifact_io import AtomicWriter, artifact_exists, check_complete, existing_artifact, open_artifact
+from feature_store import QuestionFeatures, load_features
+from run_artifacts import STAGES, iter_records, stored_record
+from run_store import open_store
+from run_summary import run_fingerprint, summarize, write_summary
+
 ROOT = Path(__file__).resolve().parent.parent
 
 
@@ -26,14 +37,12 @@ def load_yaml_config(name: str) -> dict:
         return yaml.safe_load(f)
 
 
-def load_records(path: Path) -> list[dict]:
-    records = []
-    if path.exists():
-        with open(path) as f:
-            for line in f:
-                if line.strip():
-                    records.append(json.loads(line))
-    return records
+def build_coverage(accepted: Iterable[dict]) -> dict[str, dict[str, int]]:
+    """Count accepted records per domain × question_type."""
+    coverage = defaultdict(lambda: defaultdict(int))
+    for r in accepted:
+        coverage[r.get("domain", "unknown")][r.get("question_type", "unknown")] += 1
+    return coverage
 
 
 def print_table(headers: list[str], rows: list[list], widths: list[int] = None):
@@ -51,27 +60,181 @@ def print_table(headers: list[str], rows: list[list], widths: list[int] = None):
         print(" | ".join(str(c).ljust(w) for c, w in zip(row, widths)))
 
 
+FILTER_STAGE, DEDUP_STAGE, SCORE_STAGE = STAGES
+
+
+class Reservoir:
+    """A uniform random sample of up to k items from a stream of unknown length (Algorithm R)."""
+
+    def __init__(self, k: int, rng: random.Random):
+        self.k = k
+        self.rng = rng
+        self.items = []
+        self.seen = 0
+
+    def add(self, item) -> None:
+        self.seen += 1
+        if len(self.items) < self.k:
+            self.items.append(item)
+        else:
+            j = self.rng.randrange(self.seen)
+            if j < self.k:
+                self.items[j] = item
+
+
+def count_lines(path: Path) -> int:
+    """Non-blank lines of a JSONL file (or its .gz twin), without parsing them."""
+    path = existing_artifact(path)
+    check_complete(path)
+    if not path.exists():
+        return 0
+    with open_artifact(path, binary=True) as f:
+        return sum(1 for line in f if line.strip())
+
+
+def collect_from_files(run_dir: Path, sample: int, seed: int = 0, features: QuestionFeatures | None = None) -> dict:
+    """
+    Report figures from one streaming pass over each stage file. Memory is
+    bounded by the counters, the coverage matrix and the two audit samples.
+    The raw count comes from the run's extracted features when they exist.
+    """
+    raw_count = len(features) if features is not None else count_lines(run_dir / "questions_raw.jsonl")
+    funnel = {"Raw generated": raw_count}
+    filter_stats = {
+        "explicit_leakage": 0,
+        "implicit_leakage": 0,
+        "not_question": 0,
+        "length_fail": 0,
+        "not_english": 0,
+        "pii": 0,
+    }
+
+    # Stage files may be sidecars over questions_raw.jsonl (--sidecars)
+    passed = 0
+    for r in iter_records(run_dir / FILTER_STAGE):
+        f = r.get("filters", {})
+        if f.get("passed", False):
+            passed += 1
+        if f.get("explicit_leakage"):
+            filter_stats["explicit_leakage"] += 1
+        if f.get("implicit_leakage"):
+            filter_stats["implicit_leakage"] += 1
+        if not f.get("is_question", True):
+            filter_stats["not_question"] += 1
+        if not f.get("length_ok", True):
+            filter_stats["length_fail"] += 1
+        if not f.get("is_english", True):
+            filter_stats["not_english"] += 1
+        if f.get("pii"):
+            filter_stats["pii"] += 1
+    funnel["Passed filters"] = passed
+
+    dedup_passed = dedup_rejected = novelty_count = 0
+    novelty_total = 0.0
+    for r in iter_records(run_dir / DEDUP_STAGE):
+        f = r.get("filters", {})
+        if f.get("dedup_passed", False):
+            dedup_passed += 1
+        if not f.get("dedup_passed", True) and f.get("passed", False):
+            dedup_rejected += 1
+        if f.get("dedup_passed", True):
+            novelty_total += f.get("novelty_score", 0)
+            novelty_count += 1
+    funnel["Passed dedup"] = dedup_passed
+
+    scored = 0
+    leakage_dist = defaultdict(int)
+    salience_dist = defaultdict(int)
+    rejected = Reservoir(sample, random.Random(f"{seed}:rejected"))
+    for r in iter_records(run_dir / SCORE_STAGE):
+        if r.get("leakage_score") is not None:
+            scored += 1
+            leakage_dist[r["leakage_score"]] += 1
+            if not r.get("filters", {}).get("accepted", False):
+                rejected.add(r)
+        if r.get("salience_score") is not None:
+            salience_dist[r["salience_score"]] += 1
+    funnel["Scored"] = scored
+
+    coverage = defaultdict(lambda: defaultdict(int))
+    accepted = Reservoir(sample, random.Random(f"{seed}:accepted"))
+    for r in iter_records(run_dir / "questions_accepted.jsonl"):
+        coverage[r.get("domain", "unknown")][r.get("question_type", "unknown")] += 1
+        accepted.add(r)
+    funnel["Accepted"] = accepted.seen
+
+    return {
+        "funnel": list(funnel.items()),
+        "filter_stats": filter_stats,
+        "dedup_rejected": dedup_rejected,
+        "avg_novelty": novelty_total / novelty_count if novelty_count else None,
+        "leakage_dist": dict(leakage_dist),
+        "salience_dist": dict(salience_dist),
+        "coverage": coverage,
+        "sample_accepted": accepted.items,
+        "sample_rejected": rejected.items,
+    }
+
+
+def collect_from_store(store, sample: int, seed: int = 0) -> dict:
+    """Report figures computed as SQL aggregates over the run store; only the sampled records are decoded."""
+    dedup_rejected, avg_novelty = store.dedup_stats(DEDUP_STAGE)
+    coverage = defaultdict(lambda: defaultdict(int))
+    for domain, counts in store.coverage(SCORE_STAGE).items():
+        coverage[domain].update(counts)
+    # Audit samples are drawn from the indexed row ids, then only those rows are decoded
+    samples = {}
+    for name, where in (("accepted", "accepted = 1"), ("rejected", "leakage_score IS NOT NULL AND COALESCE(accepted, 0) = 0")):
+        rows = Reservoir(sample, random.Random(f"{seed}:{name}"))
+        for row in store.rows(SCORE_STAGE, where):
+            rows.add(row)
+        samples[name] = [stored_record(store, row, SCORE_STAGE) for row in rows.items]
+    return {
+        "funnel": store.funnel(FILTER_STAGE, DEDUP_STAGE, SCORE_STAGE),
+        "filter_stats": store.filter_breakdown(FILTER_STAGE),
+        "dedup_rejected": dedup_rejected,
+        "avg_novelty": avg_novelty,
+        "leakage_dist": store.distribution(SCORE_STAGE, "leakage_score"),
+        "salience_dist": store.distribution(SCORE_STAGE, "salience_score"),
+        "coverage": coverage,
+        "sample_accepted": samples["accepted"],
+        "sample_rejected": samples["rejected"],
+    }
+
+
+def collect(run_dir: Path, sample: int, seed: int = 0) -> dict:
+    """
+    Report figures for a run, from the run store if it holds every stage,
+    else from the stage files, plus text figures from the extracted features.
+    """
+    features = load_features(run_dir)
+    # Runs written with --store only keep their stages in run_store.sqlite
+    store = open_store(run_dir)
+    if store is not None and all(store.has_stage(name) and not artifact_exists(run_dir / name) for name in STAGES):
+        with store:
+            stats = collect_from_store(store, sample, seed)
+    else:
+        if store is not None:
+            store.close()
+        stats = collect_from_files(run_dir, sample, seed, features)
+    stats["text_features"] = features.summary() if features is not None else None
+    return stats
+
+
 def main():
     parser = argparse.ArgumentParser(description="Generate Phase 1 report")
     parser.add_argument("--run-id", required=True, help="Run identifier")
     parser.add_argument("--sample", type=int, default=20, help="Number of samples to show per category")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the audit samples")
     parser.add_argument("--output", default=None, help="Output file for report (default: stdout + JSON)")
     args = parser.parse_args()
 
     run_dir = ROOT / "data" / "runs" / args.run_id
 
-    # Load all pipeline stage files
-    raw_path = run_dir / "questions_raw.jsonl"
-    filtered_path = run_dir / "questions_filtered.jsonl"
-    deduped_path = run_dir / "questions_deduped.jsonl"
-    scored_path = run_dir / "questions_scored.jsonl"
-    accepted_path = run_dir / "questions_accepted.jsonl"
+    # Taken before reading, so a file changed mid-report invalidates the summary
+    fingerprint = run_fingerprint(run_dir)
 
-    raw = load_records(raw_path)
-    filtered = load_records(filtered_path)
-    deduped = load_records(deduped_path)
-    scored = load_records(scored_path)
-    accepted = load_records(accepted_path)
+    stats = collect(run_dir, args.sample, args.seed)
 
     # Load configs for reference
     domains_config = load_yaml_config("domains.yaml")
@@ -89,13 +252,7 @@ def main():
     # =========================================================================
     print("PIPELINE FUNNEL")
     print("-" * 40)
-    stages = [
-        ("Raw generated", len(raw)),
-        ("Passed filters", sum(1 for r in filtered if r.get("filters", {}).get("passed", False))),
-        ("Passed dedup", sum(1 for r in deduped if r.get("filters", {}).get("dedup_passed", False))),
-        ("Scored", sum(1 for r in scored if r.get("leakage_score") is not None)),
-        ("Accepted", len(accepted)),
-    ]
+    stages = stats["funnel"]
     for stage, count in stages:
         pct = f"({100*count/stages[0][1]:.1f}%)" if stages[0][1] > 0 else ""
         print(f"  {stage:20s}: {count:5d} {pct}")
@@ -106,29 +263,7 @@ def main():
     # =========================================================================
     print("FILTER BREAKDOWN")
     print("-" * 40)
-    filter_stats = {
-        "explicit_leakage": 0,
-        "implicit_leakage": 0,
-        "not_question": 0,
-        "length_fail": 0,
-        "not_english": 0,
-        "pii": 0,
-    }
-    for r in filtered:
-        f = r.get("filters", {})
-        if f.get("explicit_leakage"):
-            filter_stats["explicit_leakage"] += 1
-        if f.get("implicit_leakage"):
-            filter_stats["implicit_leakage"] += 1
-        if not f.get("is_question", True):
-            filter_stats["not_question"] += 1
-        if not f.get("length_ok", True):
-            filter_stats["length_fail"] += 1
-        if not f.get("is_english", True):
-            filter_stats["not_english"] += 1
-        if f.get("pii"):
-            filter_stats["pii"] += 1
-
+    filter_stats = stats["filter_stats"]
     for reason, count in filter_stats.items():
         print(f"  {reason:20s}: {count:5d}")
     print()
@@ -138,28 +273,33 @@ def main():
     # =========================================================================
     print("DEDUP STATS")
     print("-" * 40)
-    dedup_rejected = sum(1 for r in deduped if not r.get("filters", {}).get("dedup_passed", True) and r.get("filters", {}).get("passed", False))
-    novelty_scores = [r.get("filters", {}).get("novelty_score", 0) for r in deduped if r.get("filters", {}).get("dedup_passed", True)]
-    if novelty_scores:
-        avg_novelty = sum(novelty_scores) / len(novelty_scores)
-        print(f"  Rejected as duplicates: {dedup_rejected}")
-        print(f"  Average novelty score:  {avg_novelty:.3f}")
+    if stats["avg_novelty"] is not None:
+        print(f"  Rejected as duplicates: {stats['dedup_rejected']}")
+        print(f"  Average novelty score:  {stats['avg_novelty']:.3f}")
     else:
         print("  No novelty data available")
     print()
 
+    # =========================================================================
+    # TEXT FEATURES
+    # =========================================================================
+    text_features = stats["text_features"]
+    if text_features is not None:
+        print("TEXT FEATURES (questions_raw)")
+        print("-" * 40)
+        print(f"  Exact duplicates:       {text_features['exact_duplicates']}")
+        print(f"  Near duplicates:        {text_features['near_duplicates']}")
+        print(f"  Mean length:            {text_features['mean_chars']:.1f} chars, {text_features['mean_tokens']:.1f} tokens")
+        print(f"  Vocabulary:             {text_features['vocabulary']} words, {text_features['stems']} stems")
+        print()
+
     # =========================================================================
     # SCORING DISTRIBUTION
     # =========================================================================
     print("SCORING DISTRIBUTION")
     print("-" * 40)
-    leakage_dist = defaultdict(int)
-    salience_dist = defaultdict(int)
-    for r in scored:
-        if r.get("leakage_score") is not None:
-            leakage_dist[r["leakage_score"]] += 1
-        if r.get("salience_score") is not None:
-            salience_dist[r["salience_score"]] += 1
+    leakage_dist = stats["leakage_dist"]
+    salience_dist = stats["salience_dist"]
 
     print("  Leakage:")
     for k in sorted(leakage_dist.keys()):
@@ -175,10 +315,7 @@ def main():
     print("DOMAIN × TYPE COVERAGE (Accepted)")
     print("-" * 40)
 
-    # Build coverage matrix
-    coverage = defaultdict(lambda: defaultdict(int))
-    for r in accepted:
-        coverage[r.get("domain", "unknown")][r.get("question_type", "unknown")] += 1
+    coverage = stats["coverage"]
 
     # Print as table
     headers = ["Domain"] + type_ids + ["Total"]
@@ -211,8 +348,7 @@ def main():
     # =========================================================================
     print("SAMPLE ACCEPTED QUESTIONS")
     print("-" * 70)
-    sample_accepted = random.sample(accepted, min(args.sample, len(accepted))) if accepted else []
-    for i, r in enumerate(sample_accepted, 1):
+    for i, r in enumerate(stats["sample_accepted"], 1):
         print(f"{i}. [{r.get('domain')}/{r.get('question_type')}] leak={r.get('leakage_score')} sal={r.get('salience_score')}")
         print(f"   {r['question']}")
         if r.get("judge_rationale"):
@@ -224,9 +360,7 @@ def main():
     # =========================================================================
     print("SAMPLE REJECTED QUESTIONS (for audit)")
     print("-" * 70)
-    rejected = [r for r in scored if r.get("leakage_score") is not None and not r.get("filters", {}).get("accepted", False)]
-    sample_rejected = random.sample(rejected, min(args.sample, len(rejected))) if rejected else []
-    for i, r in enumerate(sample_rejected, 1):
+    for i, r in enumerate(stats["sample_rejected"], 1):
         print(f"{i}. [{r.get('domain')}/{r.get('question_type')}] leak={r.get('leakage_score')} sal={r.get('salience_score')}")
         print(f"   {r['question']}")
         if r.get("judge_rationale"):
@@ -236,24 +370,28 @@ def main():
     # =========================================================================
     # SAVE JSON REPORT
     # =========================================================================
+    raw_count = stages[0][1]
+    accepted_count = stages[-1][1]
     report = {
         "run_id": args.run_id,
         "funnel": dict(stages),
         "filter_breakdown": filter_stats,
-        "leakage_distribution": dict(leakage_dist),
-        "salience_distribution": dict(salience_dist),
+        "leakage_distribution": leakage_dist,
+        "salience_distribution": salience_dist,
         "coverage": {d: dict(coverage[d]) for d in domain_ids},
+        "text_features": text_features,
         "totals": {
-            "raw": len(raw),
-            "accepted": len(accepted),
-            "acceptance_rate": len(accepted) / len(raw) if raw else 0,
+            "raw": raw_count,
+            "accepted": accepted_count,
+            "acceptance_rate": accepted_count / raw_count if raw_count else 0,
         },
     }
 
     report_path = run_dir / "phase1_report.json"
-    with open(report_path, "w") as f:
+    with AtomicWriter(report_path, record=False) as f:
         json.dump(report, f, indent=2)
     print(f"Report saved to: {report_path}")
+    print(f"Run summary saved to: {write_summary(run_dir, summarize(run_dir, stats, fingerprint))}")
 
 
 if __name__ == "__main__":
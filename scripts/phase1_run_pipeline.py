@@ -5,33 +5,60 @@ Phase 1: Run the full question generation pipeline.
 Usage:
     python scripts/phase1_run_pipeline.py --run-id run_001 --base-url http://localhost:8000/v1
     python scripts/phase1_run_pipeline.py --run-id run_001 --base-url http://localhost:8000/v1 --skip-generate
+    python scripts/phase1_run_pipeline.py --run-id run_001 --base-url http://localhost:8000/v1 --target-accepted 15
+    python scripts/phase1_run_pipeline.py --run-id run_001 --base-url http://localhost:8000/v1 --sidecars
+    python scripts/phase1_run_pipeline.py --run-id run_001 --base-url http://localhost:8000/v1 --store
+    python scripts/phase1_run_pipeline.py --run-id run_001 --base-url http://localhost:8000/v1 --compress
 
 This script orchestrates all Phase 1 steps:
 1. Generate questions (if not skipped)
-2. Filter questions
-3. Deduplicate questions
-4. Score questions with LLM judge
-5. Generate report
+2. Extract per-question text features (shared by filter, dedup and report)
+3. Filter questions
+4. Deduplicate questions
+5. Score questions with LLM judge
+6. Generate report
+
+With --target-accepted N, steps 1-5 repeat in rounds: after each round the
+accepted count and yield of every domain × type bucket is measured, and the
+next round only generates the estimated shortfall for buckets below N.
 """
 
 import argparse
-import os
+import json
+import math
 import subprocess
 import sys
+import time
+from collections import defaultdict
 from pathlib import Path
+from typing import Iterable
+
+from artifact_io import AtomicWriter, existing_artifact
+from jsonl_index import JsonlFile
+from llm_client import add_client_args, validate_client_args
+from phase1_report import build_coverage, load_yaml_config
+from run_artifacts import stage_exists
+from token_planner import add_planner_args
 
 ROOT = Path(__file__).resolve().parent.parent
 SCRIPTS = ROOT / "scripts"
 
+# Pseudo-count used to shrink a bucket's observed yield toward the run-wide
+# yield, so buckets with few samples (or zero accepts) still get a sane estimate.
+YIELD_PRIOR_WEIGHT = 10
+MIN_YIELD = 0.05
 
-def run_step(name: str, script: str, args: list[str], required_input: Path = None) -> bool:
-    """Run a pipeline step. Returns True if successful."""
+
+def run_step(
+    name: str, script: str, args: list[str], required_input: Path = None, timings: dict[str, float] | None = None
+) -> bool:
+    """Run a pipeline step (adding its wall time to `timings`). Returns True if successful."""
     print()
     print("=" * 70)
     print(f"STEP: {name}")
     print("=" * 70)
 
-    if required_input and not required_input.exists():
+    if required_input and not stage_exists(required_input):
         print(f"Skipping: required input not found: {required_input}")
         return False
 
@@ -39,26 +66,133 @@ def run_step(name: str, script: str, args: list[str], required_input: Path = Non
     print(f"Running: {' '.join(cmd)}")
     print()
 
+    start = time.perf_counter()
     result = subprocess.run(cmd)
+    if timings is not None:
+        timings[name] = round(timings.get(name, 0.0) + time.perf_counter() - start, 3)
     return result.returncode == 0
 
 
+def count_by_bucket(records: Iterable[dict]) -> dict[tuple[str, str], int]:
+    counts = defaultdict(int)
+    for r in records:
+        counts[(r.get("domain", "unknown"), r.get("question_type", "unknown"))] += 1
+    return counts
+
+
+def plan_shortfall(
+    generated: dict[tuple[str, str], int],
+    coverage: dict[str, dict[str, int]],
+    domain_ids: list[str],
+    type_ids: list[str],
+    target: int,
+    overgenerate: float = 1.25,
+    min_request: int = 5,
+    max_request: int = 60,
+) -> dict[str, dict[str, int]]:
+    """
+    Estimate how many raw questions each under-filled bucket still needs.
+    Returns {domain: {question_type: num_to_generate}} for buckets short of target.
+    """
+    def accepted(d: str, t: str) -> int:
+        return coverage.get(d, {}).get(t, 0)
+
+    total_generated = sum(generated.get((d, t), 0) for d in domain_ids for t in type_ids)
+    total_accepted = sum(accepted(d, t) for d in domain_ids for t in type_ids)
+    global_yield = total_accepted / total_generated if total_generated else 0.0
+
+    plan = {}
+    for d in domain_ids:
+        for t in type_ids:
+            shortfall = target - accepted(d, t)
+            if shortfall <= 0:
+                continue
+            bucket_yield = (accepted(d, t) + YIELD_PRIOR_WEIGHT * global_yield) / (
+                generated.get((d, t), 0) + YIELD_PRIOR_WEIGHT
+            )
+            needed = math.ceil(shortfall * overgenerate / max(bucket_yield, MIN_YIELD))
+            plan.setdefault(d, {})[t] = min(max(needed, min_request), max_request)
+    return plan
+
+
+def update_manifest(run_dir: Path, updates: dict):
+    """Set top-level sections of run_manifest.json, keeping the generator's fields."""
+    manifest_path = run_dir / "run_manifest.json"
+    manifest = {}
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    manifest.update(updates)
+    with AtomicWriter(manifest_path, record=False) as f:
+        json.dump(manifest, f, indent=2)
+
+
+def write_quota_manifest(run_dir: Path, target: int, rounds: list[dict]):
+    """Record quota rounds in run_manifest.json alongside the generator's fields."""
+    update_manifest(run_dir, {"quota": {"target_accepted_per_bucket": target, "rounds": rounds}})
+
+
 def main():
     parser = argparse.ArgumentParser(description="Run full Phase 1 pipeline")
     parser.add_argument("--run-id", required=True, help="Run identifier (e.g., run_001)")
-    parser.add_argument(
-        "--base-url",
-        default=os.environ.get("OPENAI_BASE_URL", "http://localhost:8000/v1"),
-        help="OpenAI-compatible API base URL",
-    )
-    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY", "not-needed"))
+    add_client_args(parser)
     parser.add_argument("--profile", default=None, help="Model profile to use")
     parser.add_argument("--num", type=int, default=None, help="Override questions per bucket")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Split each bucket into concurrent requests of this size")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="Concurrent LLM requests for generation and scoring (starting point when adaptive)",
+    )
     parser.add_argument("--skip-generate", action="store_true", help="Skip generation (use existing raw file)")
     parser.add_argument("--skip-score", action="store_true", help="Skip scoring (use existing scored file)")
     parser.add_argument("--score-limit", type=int, default=None, help="Limit questions to score")
     parser.add_argument("--dedup-threshold", type=float, default=0.7, help="ROUGE-L dedup threshold")
+    layout = parser.add_mutually_exclusive_group()
+    layout.add_argument(
+        "--sidecars",
+        action="store_true",
+        help="Filter, dedup and score write per-row sidecars of their fields instead of full copies",
+    )
+    layout.add_argument(
+        "--store",
+        action="store_true",
+        help="Filter, dedup and score write their fields into the run's SQLite store (run_store.sqlite)",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Write every JSONL artifact gzip-compressed (.jsonl.gz)",
+    )
+    parser.add_argument(
+        "--target-accepted",
+        type=int,
+        default=None,
+        help="Quota mode: keep generating until every domain × type cell has this many accepted questions",
+    )
+    parser.add_argument("--max-rounds", type=int, default=5, help="Quota mode: maximum generation rounds")
+    parser.add_argument(
+        "--overgenerate",
+        type=float,
+        default=1.25,
+        help="Quota mode: safety factor applied to the estimated shortfall",
+    )
+    parser.add_argument("--min-request", type=int, default=5, help="Quota mode: minimum questions per follow-up bucket")
+    parser.add_argument("--max-request", type=int, default=60, help="Quota mode: maximum questions per follow-up bucket")
+    add_planner_args(parser)
     args = parser.parse_args()
+    if args.target_accepted is not None and args.target_accepted < 1:
+        parser.error("--target-accepted must be at least 1")
+    if args.max_rounds < 1:
+        parser.error("--max-rounds must be at least 1")
+    if args.overgenerate <= 0:
+        parser.error("--overgenerate must be positive")
+    if not 1 <= args.min_request <= args.max_request:
+        parser.error("--min-request and --max-request must satisfy 1 <= min <= max")
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    validate_client_args(parser, args)
 
     run_dir = ROOT / "data" / "runs" / args.run_id
 
@@ -71,65 +205,178 @@ def main():
 
     # Build common args
     common_args = ["--run-id", args.run_id]
-    llm_args = ["--base-url", args.base_url, "--api-key", args.api_key]
+    llm_args = [
+        "--base-url", args.base_url,
+        "--api-key", args.api_key,
+        "--timeout", str(args.timeout),
+        "--max-retries", str(args.max_retries),
+    ]
     if args.profile:
         llm_args += ["--profile", args.profile]
+    if args.concurrency:
+        llm_args += ["--concurrency", str(args.concurrency)]
+    if args.adaptive_concurrency:
+        llm_args += ["--max-concurrency", str(args.max_concurrency)]
+    else:
+        llm_args += ["--no-adaptive-concurrency"]
+    if args.broker:
+        llm_args += ["--broker", args.broker, "--priority", str(args.priority)]
+    llm_args += ["--plan-tokens" if args.plan_tokens else "--no-plan-tokens", "--token-margin", str(args.token_margin)]
+
+    # Filter, dedup and score options
+    stage_args = common_args + (["--sidecars"] if args.sidecars else []) + (["--store"] if args.store else [])
+    stage_args += ["--compress"] if args.compress else []
+
+    gen_options = ["--compress"] if args.compress else []
+    if args.chunk_size:
+        gen_options += ["--chunk-size", str(args.chunk_size)]
+
+    quota_mode = args.target_accepted is not None
+    if quota_mode and args.skip_score:
+        print("--target-accepted needs scoring; drop --skip-score")
+        return 1
+    if quota_mode:
+        print(f"Quota: {args.target_accepted} accepted per domain × type (max {args.max_rounds} rounds)")
+        domain_ids = [d["id"] for d in load_yaml_config("domains.yaml")["domains"]]
+        type_ids = [t["id"] for t in load_yaml_config("question_types.yaml")["question_types"]]
 
     success = True
+    plan_path = None
+    quota_rounds = []
+    timings = {}
 
-    # Step 1: Generate
-    if not args.skip_generate:
-        gen_args = common_args + llm_args
-        if args.num:
-            gen_args += ["--num", str(args.num)]
+    for round_idx in range(1, (args.max_rounds if quota_mode else 1) + 1):
+        if quota_mode:
+            print()
+            print("#" * 70)
+            print(f"QUOTA ROUND {round_idx}")
+            print("#" * 70)
+
+        # Step 1: Generate (follow-up rounds append only the planned shortfall)
+        if plan_path is not None or not args.skip_generate:
+            gen_args = common_args + llm_args + gen_options
+            if plan_path is not None:
+                gen_args += ["--append", "--bucket-plan", str(plan_path), "--round", str(round_idx)]
+            elif args.num:
+                gen_args += ["--num", str(args.num)]
+            success = run_step(
+                "Generate Questions",
+                "phase1_generate_questions.py",
+                gen_args,
+                timings=timings,
+            )
+            if not success:
+                print("Generation failed, stopping pipeline")
+                return 1
+
+        # Step 2: Features (only questions appended since the last round are processed)
         success = run_step(
-            "Generate Questions",
-            "phase1_generate_questions.py",
-            gen_args,
+            "Extract Features",
+            "phase1_extract_features.py",
+            common_args,
+            required_input=run_dir / "questions_raw.jsonl",
+            timings=timings,
         )
         if not success:
-            print("Generation failed, stopping pipeline")
+            print("Feature extraction failed, stopping pipeline")
             return 1
 
-    # Step 2: Filter
-    success = run_step(
-        "Filter Questions",
-        "phase1_filter_questions.py",
-        common_args,
-        required_input=run_dir / "questions_raw.jsonl",
-    )
-    if not success:
-        print("Filtering failed, stopping pipeline")
-        return 1
-
-    # Step 3: Dedup
-    dedup_args = common_args + ["--threshold", str(args.dedup_threshold), "--include-seeds"]
-    success = run_step(
-        "Deduplicate Questions",
-        "phase1_dedup_questions.py",
-        dedup_args,
-        required_input=run_dir / "questions_filtered.jsonl",
-    )
-    if not success:
-        print("Dedup failed, stopping pipeline")
-        return 1
+        # Step 3: Filter
+        success = run_step(
+            "Filter Questions",
+            "phase1_filter_questions.py",
+            stage_args,
+            required_input=run_dir / "questions_raw.jsonl",
+            timings=timings,
+        )
+        if not success:
+            print("Filtering failed, stopping pipeline")
+            return 1
 
-    # Step 4: Score
-    if not args.skip_score:
-        score_args = common_args + llm_args
-        if args.score_limit:
-            score_args += ["--limit", str(args.score_limit)]
+        # Step 4: Dedup
+        dedup_args = stage_args + ["--threshold", str(args.dedup_threshold), "--include-seeds"]
         success = run_step(
-            "Score Questions",
-            "phase1_score_questions.py",
-            score_args,
-            required_input=run_dir / "questions_deduped.jsonl",
+            "Deduplicate Questions",
+            "phase1_dedup_questions.py",
+            dedup_args,
+            required_input=run_dir / "questions_filtered.jsonl",
+            timings=timings,
         )
         if not success:
-            print("Scoring failed, stopping pipeline")
+            print("Dedup failed, stopping pipeline")
             return 1
 
-    # Step 5: Report
+        # Step 5: Score
+        if not args.skip_score:
+            score_args = stage_args + llm_args
+            if args.hedge:
+                score_args += ["--hedge"]
+            if args.score_limit:
+                score_args += ["--limit", str(args.score_limit)]
+            if quota_mode:
+                # Reuse earlier rounds' judgements for records that still pass dedup,
+                # and don't spend judge calls on cells that are already full
+                score_args += ["--skip-scored", "--cell-target", str(args.target_accepted)]
+            success = run_step(
+                "Score Questions",
+                "phase1_score_questions.py",
+                score_args,
+                required_input=run_dir / "questions_deduped.jsonl",
+                timings=timings,
+            )
+            if not success:
+                print("Scoring failed, stopping pipeline")
+                return 1
+
+        if not quota_mode:
+            break
+
+        # Measure per-bucket yield and plan the next round
+        with JsonlFile(existing_artifact(run_dir / "questions_raw.jsonl")) as raw:
+            generated = count_by_bucket(raw.project(["domain", "question_type"]))
+        with JsonlFile(existing_artifact(run_dir / "questions_accepted.jsonl")) as accepted:
+            coverage = build_coverage(accepted.project(["domain", "question_type"]))
+        plan = plan_shortfall(
+            generated,
+            coverage,
+            domain_ids,
+            type_ids,
+            target=args.target_accepted,
+            overgenerate=args.overgenerate,
+            min_request=args.min_request,
+            max_request=args.max_request,
+        )
+        cells_full = sum(
+            1 for d in domain_ids for t in type_ids if coverage[d][t] >= args.target_accepted
+        )
+        total_cells = len(domain_ids) * len(type_ids)
+        quota_rounds.append({
+            "round": round_idx,
+            "generated_total": sum(generated.values()),
+            "accepted_total": sum(coverage[d][t] for d in domain_ids for t in type_ids),
+            "cells_full": cells_full,
+            "cells_total": total_cells,
+            "next_plan": plan,
+        })
+        write_quota_manifest(run_dir, args.target_accepted, quota_rounds)
+
+        print()
+        print(f"Quota round {round_idx}: {cells_full}/{total_cells} cells full")
+        if not plan:
+            print("All coverage cells meet the accepted quota")
+            break
+        if round_idx == args.max_rounds:
+            print(f"Stopping after {args.max_rounds} rounds with {total_cells - cells_full} cells short")
+            break
+
+        requested = sum(n for types in plan.values() for n in types.values())
+        print(f"Next round requests {requested} questions across {sum(len(t) for t in plan.values())} buckets")
+        plan_path = run_dir / f"quota_plan_round{round_idx + 1}.json"
+        with AtomicWriter(plan_path, record=False) as f:
+            json.dump(plan, f, indent=2)
+
+    # Step 6: Report (its run summary picks up the per-step wall seconds)
+    update_manifest(run_dir, {"timings": timings})
     success = run_step(
         "Generate Report",
         "phase1_report.py",
@@ -5,134 +5,640 @@ Phase 1: Score questions with LLM judge (leakage + salience).
 Usage:
     python scripts/phase1_score_questions.py --run-id run_001 --base-url http://localhost:8000/v1
     python scripts/phase1_score_questions.py --run-id run_001 --base-url http://localhost:8000/v1 --limit 100
+    python scripts/phase1_score_questions.py --run-id run_001 --base-url http://localhost:8000/v1 --cell-target 15
+    python scripts/phase1_score_questions.py --run-id run_001 --base-url http://localhost:8000/v1 --estimate
+    python scripts/phase1_score_questions.py --run-id run_001 --base-url http://localhost:8000/v1 --prejudge data/prejudge/prejudge_model.json
+    python scripts/phase1_score_questions.py --run-id run_001 --base-url http://localhost:8000/v1 --profile qwq32b --vote-max 7
+    python scripts/phase1_score_questions.py --run-id run_001 --base-url http://localhost:8000/v1 --sidecars
+    python scripts/phase1_score_questions.py --run-id run_001 --base-url http://localhost:8000/v1 --compress
+    python scripts/phase1_score_questions.py --run-id run_001 --base-url http://localhost:8000/v1 --store --skip-scored
+    python scripts/phase1_score_questions.py --run-id run_001 --base-url http://gpu1:8000/v1,http://gpu2:8000/v1 --hedge
 
 Requires:
     pip install openai pyyaml
 """
 
 import argparse
+import heapq
 import json
-import os
-import re
+import math
+import random
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 
-import yaml
-from openai import OpenAI
+from artifact_io import AtomicWriter, output_artifact, remove_artifact
+from llm_client import (
+    LLMClient,
+    add_client_args,
+    client_from_args,
+    get_profile,
+    load_yaml_config,
+    parse_judge_json,
+    rejects_parameter,
+    validate_client_args,
+    worker_count,
+)
+from phase1_train_prejudge import load_prejudge, prejudge_question
+from run_artifacts import (
+    StageWriter,
+    add_layout_args,
+    iter_records,
+    load_stage,
+    output_location,
+    query_stored,
+    snapshot,
+    stage_exists,
+    validate_layout_args,
+)
+from token_planner import TokenPlanner, add_planner_args, planned_chat
 
 ROOT = Path(__file__).resolve().parent.parent
 
 
-def load_yaml_config(name: str) -> dict:
-    with open(ROOT / "configs" / name) as f:
-        return yaml.safe_load(f)
-
-
 def load_judge_prompt() -> str:
     with open(ROOT / "prompts" / "judges" / "leakage_salience.md") as f:
         return f.read()
 
 
-def get_profile(config: dict, profile_name: str = None) -> dict:
-    if profile_name is None:
-        profile_name = config.get("default_profile", "qwen32b")
-    profiles = config.get("profiles", {})
-    if profile_name not in profiles:
-        raise ValueError(f"Profile '{profile_name}' not found. Available: {list(profiles.keys())}")
-    return profiles[profile_name]
-
-
 def render_prompt(template: str, question: str) -> str:
     return template.replace("{{question}}", question)
 
 
-def parse_json_response(text: str, is_reasoning_model: bool = False) -> dict | None:
-    """Extract JSON from response, handling markdown code blocks and reasoning chains."""
-
-    # For reasoning models, find JSON at the end
-    if is_reasoning_model:
-        json_pattern = r'\{[^{}]*"leakage_score"[^{}]*"salience_score"[^{}]*\}'
-        matches = re.findall(json_pattern, text, re.DOTALL)
-        if matches:
-            for match in reversed(matches):
-                try:
-                    return json.loads(match)
-                except json.JSONDecodeError:
-                    continue
+def judge_params(decoding_params: dict) -> dict:
+    return {
+        "temperature": decoding_params.get("temperature", 0.2),
+        "top_p": decoding_params.get("top_p", 0.9),
+        "max_tokens": decoding_params.get("max_tokens", 512),
+    }
 
-    # Try direct parse
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        pass
 
-    # Try extracting from code block
-    match = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(1))
-        except json.JSONDecodeError:
-            pass
+def score_question(
+    client: LLMClient,
+    model_id: str,
+    decoding_params: dict,
+    judge_template: str,
+    question: str,
+    is_reasoning_model: bool = False,
+    planner: TokenPlanner | None = None,
+) -> dict:
+    """Score a question with the judge model."""
+    prompt = render_prompt(judge_template, question)
+    messages = [{"role": "user", "content": prompt}]
+    response = planned_chat(client, planner, "judge", 1, model_id, messages, judge_params(decoding_params))
+    raw = response["choices"][0]["text"]
+    parsed = parse_judge_json(raw, is_reasoning_model=is_reasoning_model)
+    return {"raw": raw, "parsed": parsed}
 
-    # Try finding JSON object with expected keys
-    match = re.search(r'\{[^{}]*"leakage_score"[^{}]*\}', text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            pass
 
-    return None
+# ============================================================================
+# SELF-CONSISTENCY VOTING
+# ============================================================================
+
+def vote_key(parsed: dict | None) -> tuple | None:
+    if not parsed or parsed.get("leakage_score") is None or parsed.get("salience_score") is None:
+        return None
+    return parsed["leakage_score"], parsed["salience_score"]
+
+
+def vote_settled(votes: Counter, drawn: int, initial: int, max_samples: int) -> bool:
+    """
+    Stop when the first `initial` samples agree unanimously, or when the
+    leading (leakage, salience) pair can no longer be overtaken within max_samples.
+    """
+    if not votes:
+        return drawn >= max_samples
+    ranked = votes.most_common(2)
+    lead = ranked[0][1]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0
+    if len(votes) == 1 and lead >= initial:
+        return True
+    return lead - runner_up > max_samples - drawn
+
+
+def tally_votes(samples: list[dict | None]) -> dict:
+    """Majority (leakage, salience) pair over parsed samples, with its agreement share."""
+    votes = Counter(key for key in map(vote_key, samples) if key is not None)
+    if not votes:
+        return {"parsed": None, "votes": [], "agreement": None}
+    winner, count = votes.most_common(1)[0]
+    # Keep the rationale of a sample that voted with the majority
+    parsed = next(s for s in samples if vote_key(s) == winner)
+    return {
+        "parsed": parsed,
+        "votes": [list(key) for key in map(vote_key, samples) if key is not None],
+        "agreement": round(count / sum(votes.values()), 3),
+    }
 
 
-def score_question(
-    client: OpenAI,
+def sample_judge(
+    client: LLMClient,
+    model_id: str,
+    decoding_params: dict,
+    prompt: str,
+    n: int,
+    use_n: bool,
+    planner: TokenPlanner | None = None,
+) -> list[str]:
+    """Draw n judge samples, in one request via `n` when the server supports it."""
+    messages = [{"role": "user", "content": prompt}]
+    params = judge_params(decoding_params)
+    if use_n:
+        response = planned_chat(client, planner, "judge", 1, model_id, messages, params, n=n)
+        return [choice["text"] for choice in response["choices"]]
+    return [
+        planned_chat(client, planner, "judge", 1, model_id, messages, params)["choices"][0]["text"]
+        for _ in range(n)
+    ]
+
+
+def score_question_voted(
+    client: LLMClient,
     model_id: str,
     decoding_params: dict,
     judge_template: str,
     question: str,
     is_reasoning_model: bool = False,
+    voting: dict = None,
+    planner: TokenPlanner | None = None,
 ) -> dict:
-    """Score a question with the judge model."""
+    """
+    Adaptive self-consistency: draw `initial` samples, stop if they agree,
+    otherwise draw `batch` more at a time until the vote is decided or
+    `max_samples` is reached. `voting["use_n"]` is cleared in place if the
+    server rejects the `n` parameter (a 400/422 naming it); other errors propagate.
+    """
+    voting = voting if voting is not None else {}
+    initial = voting.get("initial", 2)
+    batch = voting.get("batch", 2)
+    max_samples = max(voting.get("max_samples", 5), initial)
+
     prompt = render_prompt(judge_template, question)
-    response = client.chat.completions.create(
-        model=model_id,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=decoding_params.get("temperature", 0.2),
-        top_p=decoding_params.get("top_p", 0.9),
-        max_tokens=decoding_params.get("max_tokens", 512),
+    raws, samples = [], []
+    votes = Counter()
+    while len(raws) < max_samples:
+        n = initial if not raws else min(batch, max_samples - len(raws))
+        if voting.get("use_n", True):
+            try:
+                drawn = sample_judge(client, model_id, decoding_params, prompt, n, use_n=True, planner=planner)
+            except Exception as e:
+                # Some servers reject n > 1; fall back to one request per sample from here on.
+                # Anything else (timeouts, 5xx after retries) fails the question as usual.
+                if not rejects_parameter(e, "n"):
+                    raise
+                voting["use_n"] = False
+                drawn = sample_judge(client, model_id, decoding_params, prompt, n, use_n=False, planner=planner)
+        else:
+            drawn = sample_judge(client, model_id, decoding_params, prompt, n, use_n=False, planner=planner)
+        for raw in drawn:
+            parsed = parse_judge_json(raw, is_reasoning_model=is_reasoning_model)
+            raws.append(raw)
+            samples.append(parsed)
+            if vote_key(parsed) is not None:
+                votes[vote_key(parsed)] += 1
+        if vote_settled(votes, len(raws), initial, max_samples):
+            break
+
+    result = tally_votes(samples)
+    result["raw"] = raws[0] if result["parsed"] is None else raws[samples.index(result["parsed"])]
+    result["samples"] = len(raws)
+    return result
+
+
+def judge_question(
+    client: LLMClient,
+    model_id: str,
+    decoding_params: dict,
+    judge_template: str,
+    question: str,
+    is_reasoning_model: bool = False,
+    voting: dict | None = None,
+    planner: TokenPlanner | None = None,
+) -> dict:
+    """Single-sample judgement, or adaptive voting when a voting config is given."""
+    if voting is None:
+        return score_question(client, model_id, decoding_params, judge_template, question, is_reasoning_model, planner)
+    return score_question_voted(
+        client, model_id, decoding_params, judge_template, question, is_reasoning_model, voting, planner
     )
-    raw = response.choices[0].message.content
-    parsed = parse_json_response(raw, is_reasoning_model=is_reasoning_model)
-    return {"raw": raw, "parsed": parsed}
+
+
+def resolve_voting(decoding_params: dict, enabled: bool | None, max_samples: int | None) -> dict | None:
+    """
+    Voting settings for this run: on by default when the profile's judge block
+    has a `voting` section, forced on/off by --vote/--no-vote.
+    """
+    configured = decoding_params.get("voting")
+    if enabled is None:
+        enabled = configured is not None
+    if not enabled:
+        return None
+    voting = dict(configured or {})
+    if max_samples is not None:
+        voting["max_samples"] = max_samples
+    return voting
+
+
+def is_scored(record: dict) -> bool:
+    """Judged by the LLM, or decided by the pre-judge (which leaves the scores empty)."""
+    return record.get("leakage_score") is not None or bool(record.get("filters", {}).get("prejudged"))
+
+
+def load_prior_scores(path: Path) -> dict[str, dict]:
+    """Load judged (or pre-judged) records from a previous scored output, keyed by id."""
+    stored = query_stored(path, "(leakage_score IS NOT NULL OR COALESCE(json_extract(filters, '$.prejudged'), 0) != 0)")
+    if stored is not None:
+        return {record["id"]: record for record in stored}
+    prior = {}
+    for record in iter_records(path):
+        if is_scored(record):
+            prior[record["id"]] = record
+    return prior
+
+
+def carry_over_scores(record: dict, prior: dict) -> None:
+    """Copy judge fields from a previously scored copy of the same record."""
+    for key in ("leakage_score", "salience_score", "judge_rationale", "judge_votes", "judge_agreement"):
+        if key in prior:
+            record[key] = prior[key]
+    for key in ("judge_model_id", "judge_profile"):
+        if key in prior.get("provenance", {}):
+            record.setdefault("provenance", {})[key] = prior["provenance"][key]
+    filters = record.setdefault("filters", {})
+    prior_filters = prior.get("filters", {})
+    filters["accepted"] = prior_filters.get("accepted", False)
+    for key in ("prejudged", "prejudge_p_accept"):
+        if key in prior_filters:
+            filters[key] = prior_filters[key]
+
+
+def records_to_score(records: list[dict], prior_scores: dict[str, dict], skip_scored: bool, stats: dict) -> list[dict]:
+    """The records that passed dedup, less those already scored when `skip_scored` is set."""
+    to_score = []
+    for record in records:
+        filters = record.get("filters", {})
+        # Skip if didn't pass dedup
+        if not filters.get("dedup_passed", False):
+            continue
+        # Only records that still pass dedup may inherit an earlier judgement
+        if not is_scored(record) and record["id"] in prior_scores:
+            carry_over_scores(record, prior_scores[record["id"]])
+        # Skip if already scored (and flag is set)
+        if skip_scored and is_scored(record):
+            stats["skipped_already_scored"] += 1
+            continue
+        to_score.append(record)
+    return to_score
+
+
+def apply_judgement(record: dict, result: dict, model_id: str, profile_name: str, stats: dict) -> str:
+    """Write a judge result onto the record, apply the acceptance gate, and update stats."""
+    parsed = result["parsed"]
+    if not parsed:
+        stats["parse_errors"] += 1
+        record["leakage_score"] = None
+        record["salience_score"] = None
+        record["judge_raw_response"] = result["raw"][:500]
+        record["filters"]["accepted"] = False
+        return "PARSE_FAIL"
+
+    leakage = parsed.get("leakage_score")
+    salience = parsed.get("salience_score")
+    rationale = parsed.get("rationale", "")
+
+    record["leakage_score"] = leakage
+    record["salience_score"] = salience
+    record["judge_rationale"] = rationale
+    if "votes" in result:
+        record["judge_votes"] = result["votes"]
+        record["judge_agreement"] = result["agreement"]
+        stats["vote_samples"] = stats.get("vote_samples", 0) + result["samples"]
+        stats["vote_split"] = stats.get("vote_split", 0) + int(result["agreement"] < 1)
+    record["provenance"]["judge_model_id"] = model_id
+    record["provenance"]["judge_profile"] = profile_name
+
+    stats["scored"] += 1
+    if leakage in stats["leakage_dist"]:
+        stats["leakage_dist"][leakage] += 1
+    if salience in stats["salience_dist"]:
+        stats["salience_dist"][salience] += 1
+
+    # Gate: accept if leakage=0 and salience>=1
+    if leakage == 0 and salience is not None and salience >= 1:
+        record["filters"]["accepted"] = True
+        stats["accepted"] += 1
+        status = "ACCEPT"
+    else:
+        record["filters"]["accepted"] = False
+        if leakage != 0:
+            stats["rejected_leakage"] += 1
+            status = f"REJECT (leak={leakage})"
+        else:
+            stats["rejected_salience"] += 1
+            status = f"REJECT (sal={salience})"
+
+    if "votes" in result:
+        return f"{status} leak={leakage} sal={salience} votes={len(result['votes'])} agree={result['agreement']:.2f}"
+    return f"{status} leak={leakage} sal={salience}"
+
+
+def apply_prejudgement(record: dict, p_accept: float, decision: str, stats: dict) -> str:
+    """Record a confident pre-judge decision in place of an LLM judgement."""
+    accepted = decision == "accept"
+    record["leakage_score"] = None
+    record["salience_score"] = None
+    record["filters"]["accepted"] = accepted
+    record["filters"]["prejudged"] = True
+    record["filters"]["prejudge_p_accept"] = round(p_accept, 4)
+    record["provenance"]["judge_model_id"] = "prejudge"
+    stats["prejudged_accept" if accepted else "prejudged_reject"] += 1
+    if accepted:
+        stats["accepted"] += 1
+    return f"PREJUDGE_{decision.upper()} (p={p_accept:.3f})"
+
+
+def cell_key(record: dict) -> tuple[str, str]:
+    return record.get("domain", "unknown"), record.get("question_type", "unknown")
+
+
+def count_accepted_by_cell(records: list[dict]) -> dict[tuple[str, str], int]:
+    counts = defaultdict(int)
+    for record in records:
+        filters = record.get("filters", {})
+        if filters.get("dedup_passed", False) and filters.get("accepted", False):
+            counts[cell_key(record)] += 1
+    return counts
+
+
+class CoverageScheduler:
+    """
+    Orders scoring by coverage: the next record always comes from the
+    domain × type cell furthest below its accepted target, and a cell is no
+    longer scheduled once it reaches the target. Within a cell, file order is kept.
+    """
+
+    def __init__(self, records: list[dict], accepted_counts: dict, target: int):
+        self.target = target
+        self.accepted = defaultdict(int, accepted_counts)
+        self.queues: dict[tuple[str, str], deque] = {}
+        for record in records:
+            self.queues.setdefault(cell_key(record), deque()).append(record)
+
+    def __iter__(self):
+        while True:
+            cell = self._next_cell()
+            if cell is None:
+                return
+            yield self.queues[cell].popleft()
+
+    def _next_cell(self) -> tuple[str, str] | None:
+        best, best_deficit = None, 0
+        for cell, queue in self.queues.items():
+            deficit = self.target - self.accepted[cell]
+            if queue and deficit > best_deficit:
+                best, best_deficit = cell, deficit
+        return best
+
+    def record_accepted(self, record: dict) -> None:
+        self.accepted[cell_key(record)] += 1
+
+    def deferred(self) -> list[dict]:
+        """
+        Records left unscored because their cell reached its target. Records
+        of cells still short (e.g. when --limit stopped scoring first) aren't included.
+        """
+        return [
+            record
+            for cell, queue in self.queues.items()
+            if self.accepted[cell] >= self.target
+            for record in queue
+        ]
+
+
+def run_now(fn, *args) -> Future:
+    """Run fn immediately and wrap the outcome in a completed Future."""
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def scoring_jobs(schedule, prejudge: dict | None, judge, executor: ThreadPoolExecutor | None = None):
+    """
+    Yield (record, p_accept, prejudge_decision, future) for each scheduled record.
+    With an executor every judge call is submitted up front and results are
+    consumed in order; without one each call runs only when its record is
+    reached, so a coverage scheduler sees earlier outcomes before picking the next.
+    """
+    def start(record):
+        p_accept, decision = None, None
+        if prejudge is not None:
+            p_accept, decision = prejudge_question(prejudge, record["question"])
+            if decision is not None:
+                return record, p_accept, decision, None
+        if executor is not None:
+            return record, p_accept, None, executor.submit(judge, record["question"])
+        return record, p_accept, None, run_now(judge, record["question"])
+
+    if executor is None:
+        yield from map(start, schedule)
+    else:
+        yield from [start(record) for record in schedule]
+
+
+def update_manifest(run_dir: Path, updates: dict) -> None:
+    manifest_path = run_dir / "run_manifest.json"
+    manifest = {}
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    manifest.update(updates)
+    with AtomicWriter(manifest_path, record=False) as f:
+        json.dump(manifest, f, indent=2)
+
+
+# ============================================================================
+# ESTIMATION MODE (stratified sampling + confidence intervals)
+# ============================================================================
+
+ESTIMATE_METRICS = {
+    "accept_rate": lambda r: bool(r["filters"].get("accepted")),
+    "leak_rate": lambda r: r.get("leakage_score") != 0,
+    "salience_rate": lambda r: (r.get("salience_score") or 0) >= 1,
+}
+
+
+def stratified_sample_order(records: list[dict], seed: int = 0) -> list[dict]:
+    """
+    Order records for progressive sampling: shuffled within each domain × type
+    stratum, one draw from every stratum first (largest first), then
+    interleaved so every later prefix is close to proportional allocation.
+    Covering small strata up front lets estimation stop after a few hundred
+    judge calls instead of waiting for their turn in proportional order.
+    """
+    rng = random.Random(seed)
+    strata: dict[tuple[str, str], list[dict]] = {}
+    for record in records:
+        strata.setdefault(cell_key(record), []).append(record)
+    for members in strata.values():
+        rng.shuffle(members)
+
+    cells = sorted(strata, key=lambda c: -len(strata[c]))
+    order = [strata[c][0] for c in cells]
+    taken = [1] * len(cells)
+    # D'Hondt-style allocation: next draw goes to the stratum with the largest N_h / (n_h + 1)
+    heap = [(-len(strata[c]) / 2, i) for i, c in enumerate(cells) if len(strata[c]) > 1]
+    heapq.heapify(heap)
+    while heap:
+        _, i = heapq.heappop(heap)
+        members = strata[cells[i]]
+        order.append(members[taken[i]])
+        taken[i] += 1
+        if taken[i] < len(members):
+            heapq.heappush(heap, (-len(members) / (taken[i] + 1), i))
+    return order
+
+
+class StratifiedEstimator:
+    """
+    Running stratified estimates of binary rates with normal-approximation
+    confidence intervals (finite-population corrected, per-stratum rates
+    smoothed with a +1/+2 pseudo-count so early intervals aren't zero-width).
+    """
+
+    def __init__(self, strata_sizes: dict[tuple[str, str], int], metrics: list[str]):
+        self.sizes = dict(strata_sizes)
+        self.metrics = metrics
+        self.n = defaultdict(int)
+        self.hits = {m: defaultdict(int) for m in metrics}
+
+    def add(self, cell: tuple[str, str], outcomes: dict[str, bool]) -> None:
+        self.n[cell] += 1
+        for metric in self.metrics:
+            self.hits[metric][cell] += int(outcomes[metric])
+
+    @property
+    def total(self) -> int:
+        return sum(self.n.values())
+
+    @property
+    def strata_covered(self) -> int:
+        return sum(1 for c in self.sizes if self.n[c] > 0)
+
+    def estimate(self, metric: str, z: float = 1.96) -> tuple[float, float, float]:
+        """Return (estimate, ci_low, ci_high) over the strata sampled so far."""
+        sampled = [c for c in self.sizes if self.n[c] > 0]
+        population = sum(self.sizes[c] for c in sampled)
+        if not population:
+            return 0.0, 0.0, 1.0
+        point, variance = 0.0, 0.0
+        for c in sampled:
+            weight = self.sizes[c] / population
+            n_h, size = self.n[c], self.sizes[c]
+            point += weight * self.hits[metric][c] / n_h
+            smoothed = (self.hits[metric][c] + 1) / (n_h + 2)
+            fpc = (size - n_h) / (size - 1) if size > 1 else 0.0
+            variance += weight ** 2 * smoothed * (1 - smoothed) / n_h * fpc
+        half = z * math.sqrt(variance)
+        return point, max(0.0, point - half), min(1.0, point + half)
+
+    def max_half_width(self) -> float:
+        widths = []
+        for metric in self.metrics:
+            _, low, high = self.estimate(metric)
+            widths.append((high - low) / 2)
+        return max(widths)
+
+    def summary(self) -> dict:
+        out = {"samples": self.total, "strata_covered": self.strata_covered, "strata_total": len(self.sizes)}
+        for metric in self.metrics:
+            point, low, high = self.estimate(metric)
+            out[metric] = {"estimate": round(point, 4), "ci_low": round(low, 4), "ci_high": round(high, 4)}
+        return out
+
+
+def format_estimates(estimator: StratifiedEstimator) -> str:
+    parts = []
+    for metric in estimator.metrics:
+        point, low, high = estimator.estimate(metric)
+        parts.append(f"{metric}={point:.3f} [{low:.3f}, {high:.3f}]")
+    return "  ".join(parts)
 
 
 def main():
     parser = argparse.ArgumentParser(description="Score questions with LLM judge")
     parser.add_argument("--run-id", required=True, help="Run identifier")
-    parser.add_argument(
-        "--base-url",
-        default=os.environ.get("OPENAI_BASE_URL", "http://localhost:8000/v1"),
-        help="OpenAI-compatible API base URL",
-    )
-    parser.add_argument(
-        "--api-key",
-        default=os.environ.get("OPENAI_API_KEY", "not-needed"),
-        help="API key",
-    )
+    add_client_args(parser)
     parser.add_argument("--profile", default=None, help="Model profile to use")
     parser.add_argument("--input", default="questions_deduped.jsonl", help="Input file name")
     parser.add_argument("--output-scored", default="questions_scored.jsonl", help="Scored output file")
     parser.add_argument("--output-accepted", default="questions_accepted.jsonl", help="Accepted output file")
     parser.add_argument("--limit", type=int, default=None, help="Limit number of questions to score")
-    parser.add_argument("--skip-scored", action="store_true", help="Skip already-scored questions")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Concurrent judge requests (the starting point when adaptive concurrency is on); "
+        "--cell-target and --estimate always score sequentially",
+    )
+    parser.add_argument(
+        "--prejudge",
+        default=None,
+        help="Pre-judge model (from phase1_train_prejudge.py); confident cases skip the LLM judge",
+    )
+    parser.add_argument(
+        "--estimate",
+        action="store_true",
+        help="Estimation mode: score a stratified sample until the rate confidence intervals are tight enough",
+    )
+    parser.add_argument("--ci-half-width", type=float, default=0.05, help="Estimation mode: target CI half-width")
+    parser.add_argument("--min-samples", type=int, default=100, help="Estimation mode: minimum judged samples")
+    parser.add_argument("--seed", type=int, default=0, help="Estimation mode: sampling seed")
+    parser.add_argument(
+        "--cell-target",
+        type=int,
+        default=None,
+        help="Score under-filled domain × type cells first and stop scoring a cell once it has this many accepted",
+    )
+    parser.add_argument(
+        "--vote",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Adaptive self-consistency voting for the judge (default: on if the profile's judge config has `voting`)",
+    )
+    parser.add_argument("--vote-max", type=int, default=None, help="Maximum judge samples per question when voting")
+    parser.add_argument(
+        "--skip-scored",
+        action="store_true",
+        help="Skip already-scored questions (including ones judged in a previous scored output)",
+    )
+    add_layout_args(parser, "questions_scored.jsonl", "judge fields")
+    add_planner_args(parser)
     args = parser.parse_args()
+    if args.cell_target is not None and args.cell_target < 1:
+        parser.error("--cell-target must be at least 1")
+    if args.estimate and args.cell_target:
+        parser.error("--estimate and --cell-target are mutually exclusive")
+    if not 0 < args.ci_half_width < 1:
+        parser.error("--ci-half-width must be between 0 and 1")
+    if args.vote_max is not None and args.vote_max < 1:
+        parser.error("--vote-max must be at least 1")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.token_margin < 0:
+        parser.error("--token-margin must be at least 0")
+    validate_layout_args(parser, args, args.input, args.output_scored)
+    validate_client_args(parser, args)
 
     run_dir = ROOT / "data" / "runs" / args.run_id
     input_path = run_dir / args.input
-    output_scored_path = run_dir / args.output_scored
-    output_accepted_path = run_dir / args.output_accepted
+    output_scored_path = output_location(run_dir / args.output_scored, args)
+    output_accepted_path = output_artifact(run_dir / args.output_accepted, args.compress)
 
-    if not input_path.exists():
+    if not stage_exists(input_path):
         print(f"Error: Input file not found: {input_path}")
         return
 
@@ -143,6 +649,7 @@ def main():
     decoding_params = profile.get("judge", {})
     is_reasoning_model = profile.get("is_reasoning_model", False)
     profile_name = args.profile or llm_config.get("default_profile", "qwen32b")
+    voting = resolve_voting(decoding_params, args.vote, args.vote_max)
 
     judge_template = load_judge_prompt()
 
@@ -156,9 +663,18 @@ def main():
     print(f"Output (accepted): {output_accepted_path}")
     if args.limit:
         print(f"Limit: {args.limit}")
+    if args.prejudge and not args.estimate:
+        print(f"Pre-judge: {args.prejudge}")
+    if args.cell_target:
+        print(f"Cell target: {args.cell_target} accepted per domain × type")
+    if voting is not None:
+        print(f"Voting: {voting.get('initial', 2)} samples, up to {voting.get('max_samples', 5)} on split votes")
     print()
 
-    client = OpenAI(base_url=args.base_url, api_key=args.api_key)
+    # The coverage scheduler and estimation mode decide the next question from earlier results
+    sequential = args.estimate or args.cell_target is not None
+    client = client_from_args(args, concurrency=1 if sequential else args.concurrency, shared=True)
+    planner = TokenPlanner.from_runs(model_id, ("judge",), margin=args.token_margin, enabled=args.plan_tokens)
 
     stats = {
         "total": 0,
@@ -170,95 +686,99 @@ def main():
         "accepted": 0,
         "rejected_leakage": 0,
         "rejected_salience": 0,
+        "deferred": 0,
+        "prejudged_accept": 0,
+        "prejudged_reject": 0,
         "leakage_dist": {0: 0, 1: 0, 2: 0},
         "salience_dist": {0: 0, 1: 0, 2: 0},
     }
 
     # Load all records first (to handle limits correctly)
-    records = []
-    with open(input_path) as f:
-        for line in f:
-            if line.strip():
-                records.append(json.loads(line))
+    records = load_stage(input_path)
+    # Sidecar and store modes write each record's changes against its input version
+    originals = [snapshot(r) for r in records] if args.sidecars or args.store else [None] * len(records)
+
+    # Re-attach judgements from an earlier scoring pass (e.g. a previous quota round)
+    prior_scores = load_prior_scores(run_dir / args.output_scored) if args.skip_scored else {}
 
     # Filter to scoreable records
-    to_score = []
-    for record in records:
-        filters = record.get("filters", {})
-        # Skip if didn't pass dedup
-        if not filters.get("dedup_passed", False):
-            continue
-        # Skip if already scored (and flag is set)
-        if args.skip_scored and record.get("leakage_score") is not None:
-            continue
-        to_score.append(record)
+    to_score = records_to_score(records, prior_scores, args.skip_scored, stats)
 
-    if args.limit:
+    if args.estimate:
+        run_estimate(
+            args, to_score, run_dir, client, model_id, decoding_params, judge_template,
+            is_reasoning_model, profile_name, stats, voting, planner,
+        )
+        return
+
+    # Estimation mode always measures the LLM judge itself, so the pre-judge only applies here
+    prejudge = load_prejudge(Path(args.prejudge)) if args.prejudge else None
+
+    scheduler = None
+    if args.cell_target:
+        # --limit caps judge calls in scheduled order rather than file order
+        scheduler = CoverageScheduler(to_score, count_accepted_by_cell(records), args.cell_target)
+    elif args.limit:
         to_score = to_score[:args.limit]
 
+    if args.skip_scored:
+        print(f"Already scored (skipped): {stats['skipped_already_scored']}")
     print(f"Records to score: {len(to_score)}")
     print()
 
     # Score questions
     scored_records = []
-    for i, record in enumerate(to_score):
-        stats["total"] += 1
-        question = record["question"]
-
-        print(f"[{i+1}/{len(to_score)}] Scoring: {question[:60]}...", end=" ", flush=True)
+    schedule = to_score
+    if scheduler is not None:
+        schedule = islice(scheduler, args.limit) if args.limit else scheduler
+    # Without a scheduler the order is fixed, so judge calls can run ahead concurrently
+    judge = lambda question: judge_question(
+        client, model_id, decoding_params, judge_template, question, is_reasoning_model, voting, planner
+    )
+    executor = None
+    if scheduler is None and args.concurrency > 1:
+        executor = ThreadPoolExecutor(max_workers=worker_count(args, args.concurrency))
+    try:
+        for i, (record, p_accept, decision, future) in enumerate(scoring_jobs(schedule, prejudge, judge, executor)):
+            stats["total"] += 1
+            record["filters"].pop("score_deferred", None)
+            question = record["question"]
+
+            print(f"[{i+1}/{len(to_score)}] Scoring: {question[:60]}...", end=" ", flush=True)
+
+            if decision is not None:
+                print(apply_prejudgement(record, p_accept, decision, stats))
+                if scheduler is not None and decision == "accept":
+                    scheduler.record_accepted(record)
+                scored_records.append(record)
+                continue
+            if p_accept is not None:
+                record["filters"].pop("prejudged", None)
+                record["filters"]["prejudge_p_accept"] = round(p_accept, 4)
+
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"ERROR: {e}")
+                stats["api_errors"] += 1
+                scored_records.append(record)
+                continue
+
+            status = apply_judgement(record, result, model_id, profile_name, stats)
+            print(status)
+            if scheduler is not None and record["filters"]["accepted"]:
+                scheduler.record_accepted(record)
 
-        try:
-            result = score_question(
-                client, model_id, decoding_params, judge_template, question, is_reasoning_model
-            )
-        except Exception as e:
-            print(f"ERROR: {e}")
-            stats["api_errors"] += 1
             scored_records.append(record)
-            continue
-
-        parsed = result["parsed"]
-        if parsed:
-            leakage = parsed.get("leakage_score")
-            salience = parsed.get("salience_score")
-            rationale = parsed.get("rationale", "")
-
-            record["leakage_score"] = leakage
-            record["salience_score"] = salience
-            record["judge_rationale"] = rationale
-            record["provenance"]["judge_model_id"] = model_id
-            record["provenance"]["judge_profile"] = profile_name
-
-            stats["scored"] += 1
-            if leakage in stats["leakage_dist"]:
-                stats["leakage_dist"][leakage] += 1
-            if salience in stats["salience_dist"]:
-                stats["salience_dist"][salience] += 1
-
-            # Gate: accept if leakage=0 and salience>=1
-            if leakage == 0 and salience is not None and salience >= 1:
-                record["filters"]["accepted"] = True
-                stats["accepted"] += 1
-                status = "ACCEPT"
-            else:
-                record["filters"]["accepted"] = False
-                if leakage != 0:
-                    stats["rejected_leakage"] += 1
-                    status = f"REJECT (leak={leakage})"
-                else:
-                    stats["rejected_salience"] += 1
-                    status = f"REJECT (sal={salience})"
-
-            print(f"{status} leak={leakage} sal={salience}")
-        else:
-            print(f"PARSE_FAIL")
-            stats["parse_errors"] += 1
-            record["leakage_score"] = None
-            record["salience_score"] = None
-            record["judge_raw_response"] = result["raw"][:500]
-            record["filters"]["accepted"] = False
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-        scored_records.append(record)
+    # Leave the rest of full cells marked so a later pass can pick them up
+    if scheduler is not None:
+        for record in scheduler.deferred():
+            record["filters"]["score_deferred"] = True
+            stats["deferred"] += 1
 
     # Merge with non-scored records and write output
     scored_ids = {r["id"] for r in scored_records}
@@ -274,14 +794,15 @@ def main():
         else:
             all_records.append(record)
 
-    # Write scored output
-    with open(output_scored_path, "w") as f:
-        for record in all_records:
-            f.write(json.dumps(record) + "\n")
+    # Write scored output (all_records is in input row order)
+    with StageWriter(run_dir / args.output_scored, args.sidecars, args.store, args.compress) as writer:
+        for row, record in enumerate(all_records):
+            writer.write(row, record, originals[row])
 
     # Write accepted output
     accepted_records = [r for r in all_records if r.get("filters", {}).get("accepted", False)]
-    with open(output_accepted_path, "w") as f:
+    remove_artifact(run_dir / args.output_accepted, keep=output_accepted_path)
+    with AtomicWriter(output_accepted_path) as f:
         for record in accepted_records:
             f.write(json.dumps(record) + "\n")
 
@@ -292,6 +813,41 @@ def main():
     print(f"Total scored:         {stats['scored']}")
     print(f"Parse errors:         {stats['parse_errors']}")
     print(f"API errors:           {stats['api_errors']}")
+    if client.retries:
+        print(f"Retried requests:     {client.retries}")
+    if len(client.endpoint_stats()) > 1:
+        for endpoint in client.endpoint_stats():
+            print(f"  {endpoint['url']}: {endpoint['requests']} requests, {endpoint['errors']} errors, ejected {endpoint['ejections']}x")
+    if client.limiter:
+        control = client.limiter.summary()
+        print(f"Adaptive concurrency: final {control['final_limit']}, peak {control['peak_limit']}")
+        update_manifest(run_dir, {"score_concurrency_control": control})
+    if client.hedge:
+        hedging = client.hedge_summary()
+        print(
+            f"Hedged requests:      {hedging['hedged']} ({100 * hedging['hedge_rate']:.1f}%), "
+            f"hedge won {hedging['hedge_wins']} ({hedging['stalled_wins']} over a stalled request), "
+            f"~{hedging['saved_seconds']:.0f}s saved on the rest"
+        )
+        update_manifest(run_dir, {"score_hedging": hedging})
+    token_plan = planner.summary().get("judge")
+    if token_plan and token_plan["requests"]:
+        print(
+            f"Judge max_tokens:     mean {token_plan['mean_max_tokens']} (profile {judge_params(decoding_params)['max_tokens']}), "
+            f"{token_plan['truncated']} truncated, {token_plan['replanned']} resent"
+        )
+        update_manifest(run_dir, {"score_token_plan": token_plan})
+    planner.write_log(run_dir)
+    if scheduler is not None:
+        print(f"Deferred (cell full): {stats['deferred']}")
+    if prejudge is not None:
+        prejudged = stats["prejudged_accept"] + stats["prejudged_reject"]
+        print(f"Pre-judged:           {prejudged} (accept {stats['prejudged_accept']}, reject {stats['prejudged_reject']})")
+        print(f"Judge calls saved:    {100 * prejudged / max(1, stats['total']):.1f}%")
+    if voting is not None:
+        voted = max(1, stats["scored"])
+        print(f"Judge samples/question: {stats.get('vote_samples', 0) / voted:.2f}")
+        print(f"Split votes:          {stats.get('vote_split', 0)} ({100 * stats.get('vote_split', 0) / voted:.1f}%)")
     print()
     print(f"Accepted:             {stats['accepted']}")
     print(f"Rejected (leakage):   {stats['rejected_leakage']}")
@@ -309,5 +865,97 @@ def main():
     print(f"Output (accepted): {output_accepted_path} ({len(accepted_records)} records)")
 
 
+def run_estimate(
+    args,
+    to_score: list[dict],
+    run_dir: Path,
+    client: LLMClient,
+    model_id: str,
+    decoding_params: dict,
+    judge_template: str,
+    is_reasoning_model: bool,
+    profile_name: str,
+    stats: dict,
+    voting: dict | None = None,
+    planner: TokenPlanner | None = None,
+):
+    """Score a progressive stratified sample and stop once the CIs are tight enough."""
+    sizes = defaultdict(int)
+    for record in to_score:
+        sizes[cell_key(record)] += 1
+    estimator = StratifiedEstimator(sizes, list(ESTIMATE_METRICS))
+    order = stratified_sample_order(to_score, seed=args.seed)
+    if args.limit:
+        order = order[:args.limit]
+
+    print(f"Estimation mode: {len(sizes)} strata, target CI half-width ±{args.ci_half_width}")
+    print()
+
+    sample = []
+    converged = False
+    for i, record in enumerate(order):
+        stats["total"] += 1
+        try:
+            result = judge_question(
+                client, model_id, decoding_params, judge_template, record["question"], is_reasoning_model, voting, planner
+            )
+        except Exception as e:
+            print(f"[{i+1}] ERROR: {e}")
+            stats["api_errors"] += 1
+            continue
+
+        apply_judgement(record, result, model_id, profile_name, stats)
+        sample.append(record)
+        if record["leakage_score"] is None:
+            continue
+        estimator.add(cell_key(record), {m: fn(record) for m, fn in ESTIMATE_METRICS.items()})
+
+        if estimator.total % 25 == 0:
+            print(f"[n={estimator.total}] {format_estimates(estimator)}")
+        if (
+            estimator.total >= args.min_samples
+            and estimator.strata_covered == len(sizes)
+            and estimator.max_half_width() <= args.ci_half_width
+        ):
+            converged = True
+            break
+
+    summary = estimator.summary()
+    summary.update({
+        "converged": converged,
+        "population": len(to_score),
+        "judge_calls": stats["total"],
+        "parse_errors": stats["parse_errors"],
+        "api_errors": stats["api_errors"],
+        "ci_half_width_target": args.ci_half_width,
+        "seed": args.seed,
+        "judge_model_id": model_id,
+        "judge_profile": profile_name,
+    })
+
+    if planner is not None:
+        planner.write_log(run_dir)
+    estimate_path = run_dir / "score_estimate.json"
+    with AtomicWriter(estimate_path, record=False) as f:
+        json.dump(summary, f, indent=2)
+    sample_path = run_dir / "questions_estimate_sample.jsonl"
+    with AtomicWriter(sample_path) as f:
+        for record in sample:
+            f.write(json.dumps(record) + "\n")
+
+    print()
+    print("Estimation Results")
+    print("-" * 40)
+    print(f"Judge calls:          {stats['total']} of {len(to_score)} questions")
+    print(f"Strata covered:       {estimator.strata_covered}/{len(sizes)}")
+    print(f"Converged:            {converged}")
+    for metric in estimator.metrics:
+        point, low, high = estimator.estimate(metric)
+        print(f"  {metric:18s}: {point:.3f}  (95% CI {low:.3f} – {high:.3f})")
+    print()
+    print(f"Estimate: {estimate_path}")
+    print(f"Sample:   {sample_path}")
+
+
 if __name__ == "__main__":
     main()
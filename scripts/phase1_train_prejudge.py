@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Phase 1: Train a cheap pre-judge that auto-decides confident questions before the LLM judge.
+
+A hashed word n-gram + filter-feature logistic regression is trained on the
+judge labels in past runs' questions_scored.jsonl files. Accept/reject
+thresholds are picked on a held-out split so that auto-decisions reach the
+requested precision; everything in between still goes to the LLM judge.
+
+Usage:
+    python scripts/phase1_train_prejudge.py
+    python scripts/phase1_train_prejudge.py --runs phase1_v1 phase1_v2 --min-precision 0.98
+    python scripts/phase1_score_questions.py --run-id run_003 --prejudge data/prejudge/prejudge_model.json
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from artifact_io import AtomicWriter
+from phase1_filter_questions import filter_question
+from run_artifacts import iter_records, stage_exists
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_MODEL_PATH = ROOT / "data" / "prejudge" / "prejudge_model.json"
+
+HASH_DIM = 1 << 18
+FILTER_FLAGS = ("explicit_leakage", "implicit_leakage", "is_question", "length_ok", "is_english", "pii")
+
+
+# ============================================================================
+# FEATURES + MODEL
+# ============================================================================
+
+def tokenize(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def feature_names(question: str) -> list[str]:
+    """Word unigrams/bigrams plus the hard-filter signals for a question."""
+    tokens = tokenize(question)
+    names = [f"w:{t}" for t in tokens]
+    names += [f"b:{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+    filters = filter_question({"question": question, "filters": {}})["filters"]
+    names += [f"f:{flag}" for flag in FILTER_FLAGS if filters.get(flag)]
+    if filters.get("block_term"):
+        names.append(f"term:{filters['block_term']}")
+    names.append(f"len:{min(len(question) // 40, 10)}")
+    names.append("bias")
+    return names
+
+
+def extract_features(question: str, hash_dim: int = HASH_DIM) -> list[int]:
+    """Binary hashed features (crc32, so indices are stable across processes)."""
+    return sorted({zlib.crc32(name.encode()) % hash_dim for name in feature_names(question)})
+
+
+def sigmoid(z: float) -> float:
+    if z < -35:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+def predict_proba(weights: dict[int, float], features: list[int]) -> float:
+    return sigmoid(sum(weights.get(i, 0.0) for i in features))
+
+
+def train_logistic(
+    examples: list[tuple[list[int], int]],
+    epochs: int = 10,
+    learning_rate: float = 0.2,
+    l2: float = 1e-4,
+    seed: int = 0,
+) -> dict[int, float]:
+    """Plain SGD logistic regression over sparse binary features."""
+    rng = random.Random(seed)
+    weights: dict[int, float] = {}
+    order = list(range(len(examples)))
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        lr = learning_rate / (1 + epoch)
+        for idx in order:
+            features, label = examples[idx]
+            grad = predict_proba(weights, features) - label
+            for i in features:
+                w = weights.get(i, 0.0)
+                weights[i] = w - lr * (grad + l2 * w)
+    return weights
+
+
+def is_accepted(record: dict) -> int:
+    return int(record.get("leakage_score") == 0 and (record.get("salience_score") or 0) >= 1)
+
+
+# ============================================================================
+# THRESHOLDS + EVALUATION
+# ============================================================================
+
+def _widest_band(ordered: list[tuple[float, int]], target_label: int, min_precision: float, min_support: int) -> float | None:
+    """Furthest cut along `ordered` whose prefix precision for target_label meets the bar."""
+    best = None
+    hits = 0
+    for n, (p, label) in enumerate(ordered, 1):
+        hits += int(label == target_label)
+        # Only cut between distinct probabilities; tied examples fall on the same side
+        if n < len(ordered) and ordered[n][0] == p:
+            continue
+        if n >= min_support and hits / n >= min_precision:
+            best = p
+    return best
+
+
+def pick_thresholds(
+    scored: list[tuple[float, int]],
+    min_precision: float,
+    min_support: int,
+) -> dict[str, float | None]:
+    """
+    Choose the widest accept band (p >= t) and reject band (p <= t) whose
+    held-out precision is at least min_precision with at least min_support examples.
+    """
+    thresholds = {"accept": None, "reject": None}
+    thresholds["accept"] = _widest_band(sorted(scored, key=lambda x: -x[0]), 1, min_precision, min_support)
+    thresholds["reject"] = _widest_band(sorted(scored, key=lambda x: x[0]), 0, min_precision, min_support)
+
+    # Bands must not overlap; if they do the model isn't separating anything usable
+    if thresholds["accept"] is not None and thresholds["reject"] is not None:
+        if thresholds["reject"] >= thresholds["accept"]:
+            thresholds = {"accept": None, "reject": None}
+    return thresholds
+
+
+def decide(p: float, thresholds: dict) -> str | None:
+    """Return 'accept', 'reject', or None (send to the LLM judge)."""
+    if thresholds.get("accept") is not None and p >= thresholds["accept"]:
+        return "accept"
+    if thresholds.get("reject") is not None and p <= thresholds["reject"]:
+        return "reject"
+    return None
+
+
+def evaluate(scored: list[tuple[float, int]], thresholds: dict) -> dict:
+    """Coverage (share of judge calls skipped) and accuracy of the auto-decisions."""
+    decided = correct = 0
+    for p, label in scored:
+        decision = decide(p, thresholds)
+        if decision is None:
+            continue
+        decided += 1
+        correct += int((decision == "accept") == bool(label))
+    return {
+        "examples": len(scored),
+        "auto_decided": decided,
+        "coverage": decided / len(scored) if scored else 0.0,
+        "accuracy_on_decided": correct / decided if decided else None,
+    }
+
+
+def reliability_bins(scored: list[tuple[float, int]], num_bins: int = 10) -> list[dict]:
+    """Mean predicted probability vs observed accept rate per probability bin."""
+    bins = [[] for _ in range(num_bins)]
+    for p, label in scored:
+        bins[min(int(p * num_bins), num_bins - 1)].append((p, label))
+    rows = []
+    for i, members in enumerate(bins):
+        if not members:
+            continue
+        rows.append({
+            "bin": f"{i / num_bins:.1f}-{(i + 1) / num_bins:.1f}",
+            "count": len(members),
+            "mean_predicted": round(sum(p for p, _ in members) / len(members), 3),
+            "observed_rate": round(sum(l for _, l in members) / len(members), 3),
+        })
+    return rows
+
+
+# ============================================================================
+# MODEL IO
+# ============================================================================
+
+def load_prejudge(path: Path) -> dict:
+    with open(path) as f:
+        model = json.load(f)
+    model["weights"] = {int(k): v for k, v in model["weights"].items()}
+    return model
+
+
+def prejudge_question(model: dict, question: str) -> tuple[float, str | None]:
+    """Return (p_accept, decision) for a question; decision None means ask the LLM."""
+    p = predict_proba(model["weights"], extract_features(question, model["hash_dim"]))
+    return p, decide(p, model["thresholds"])
+
+
+def load_labeled(path: Path) -> list[dict]:
+    """Judge-labeled records from a scored file or its sidecar (skipping the pre-judge's own decisions)."""
+    records = []
+    for record in iter_records(path):
+        if record.get("leakage_score") is None or record.get("salience_score") is None:
+            continue
+        if record.get("filters", {}).get("prejudged"):
+            continue
+        records.append(record)
+    return records
+
+
+def is_held_out(record_id: str, holdout: float) -> bool:
+    return zlib.crc32(record_id.encode()) % 1000 < holdout * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the Phase 1 pre-judge classifier")
+    parser.add_argument(
+        "--runs",
+        nargs="*",
+        default=None,
+        help="Run ids whose questions_scored.jsonl to train on (default: all runs under data/runs)",
+    )
+    parser.add_argument("--include-seeds", action="store_true", help="Also train on data/seeds/questions_gold.jsonl")
+    parser.add_argument("--output", default=str(DEFAULT_MODEL_PATH), help="Model output path")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Held-out fraction for threshold selection")
+    parser.add_argument("--min-precision", type=float, default=0.98, help="Required held-out precision of auto-decisions")
+    parser.add_argument("--min-support", type=int, default=50, help="Minimum held-out examples inside each auto band")
+    parser.add_argument("--epochs", type=int, default=10, help="SGD epochs")
+    parser.add_argument(
+        "--validation",
+        default=str(ROOT / "data" / "seeds" / "questions_gold_validation.jsonl"),
+        help="Gold validation file for the calibration report",
+    )
+    args = parser.parse_args()
+
+    runs_dir = ROOT / "data" / "runs"
+    if args.runs:
+        scored_paths = [runs_dir / run_id / "questions_scored.jsonl" for run_id in args.runs]
+    else:
+        scored_paths = [run / "questions_scored.jsonl" for run in sorted(runs_dir.glob("*")) if run.is_dir()]
+    scored_paths = [p for p in scored_paths if stage_exists(p)]
+
+    records = []
+    for path in scored_paths:
+        records.extend(load_labeled(path))
+    if args.include_seeds:
+        records.extend(load_labeled(ROOT / "data" / "seeds" / "questions_gold.jsonl"))
+
+    print(f"Phase 1 Pre-judge Training")
+    print(f"==========================")
+    print(f"Sources: {len(scored_paths)} scored files" + (" + seeds" if args.include_seeds else ""))
+    print(f"Labeled examples: {len(records)}")
+    if not records:
+        print("Error: no judge-labeled records found")
+        return
+
+    train, held_out = [], []
+    for record in records:
+        example = (extract_features(record["question"]), is_accepted(record))
+        (held_out if is_held_out(record["id"], args.holdout) else train).append(example)
+    print(f"Train / held-out: {len(train)} / {len(held_out)}")
+    print()
+
+    weights = train_logistic(train, epochs=args.epochs)
+    held_out_scored = [(predict_proba(weights, f), label) for f, label in held_out]
+    thresholds = pick_thresholds(held_out_scored, args.min_precision, args.min_support)
+    held_out_metrics = evaluate(held_out_scored, thresholds)
+
+    # Calibration against the hand-labeled validation seeds
+    validation_scored = []
+    validation_path = Path(args.validation)
+    if validation_path.exists():
+        for record in load_labeled(validation_path):
+            validation_scored.append((predict_proba(weights, extract_features(record["question"])), is_accepted(record)))
+    validation_metrics = evaluate(validation_scored, thresholds)
+
+    print("Thresholds")
+    print("-" * 40)
+    for side, op in (("accept", ">="), ("reject", "<=")):
+        t = thresholds[side]
+        print(f"  Auto-{side} if p {op} {t:.4f}" if t is not None else f"  Auto-{side}: disabled (precision target not met)")
+    print()
+    for name, metrics in (("Held-out", held_out_metrics), ("Gold validation", validation_metrics)):
+        print(f"{name}:")
+        print(f"  Examples:              {metrics['examples']}")
+        print(f"  Auto-decided:          {metrics['auto_decided']} ({100 * metrics['coverage']:.1f}% of judge calls saved)")
+        if metrics["accuracy_on_decided"] is not None:
+            print(f"  Accuracy on decided:   {100 * metrics['accuracy_on_decided']:.1f}%")
+        print()
+    print("Gold validation reliability (predicted vs observed accept rate):")
+    for row in reliability_bins(validation_scored):
+        print(f"  {row['bin']}: n={row['count']:3d} predicted={row['mean_predicted']:.3f} observed={row['observed_rate']:.3f}")
+    print()
+
+    model = {
+        "version": 1,
+        "hash_dim": HASH_DIM,
+        "thresholds": thresholds,
+        "metrics": {
+            "held_out": held_out_metrics,
+            "gold_validation": validation_metrics,
+            "gold_validation_reliability": reliability_bins(validation_scored),
+            "min_precision": args.min_precision,
+            "min_support": args.min_support,
+        },
+        "trained_on": [str(p.relative_to(ROOT)) for p in scored_paths],
+        "num_examples": len(records),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "weights": {str(i): round(w, 6) for i, w in weights.items() if abs(w) > 1e-6},
+    }
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with AtomicWriter(output_path, record=False) as f:
+        json.dump(model, f)
+    print(f"Model: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
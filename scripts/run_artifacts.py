@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Stage outputs as annotation sidecars over questions_raw.jsonl.
+
+By default the filter, dedup and score steps each write a full copy of every
+record. With --sidecars a step instead writes `<output>.sidecar.jsonl`
+(e.g. questions_filtered.sidecar.jsonl). It holds one line per changed row,
+with only the fields that step added or changed:
+
+    {"row": 17, "filters": {"dedup_passed": true, "novelty_score": 0.81}}
+
+`row` is the line number in questions_raw.jsonl. Keys removed by a step are
+listed under `_removed` as dotted paths (e.g. "filters.score_deferred").
+
+Readers ask for a stage by its usual file name. `iter_records` streams the full
+file when there is one. Otherwise it merges the nearest full file (at worst
+questions_raw.jsonl) with the later stages' sidecars, row by row. The merged
+records are never written unless phase1_export_run.py is asked to export them.
+
+With --store a step writes the same deltas into the run's SQLite store
+(run_store.py) instead, and readers merge them the same way.
+
+With --compress full copies and sidecars are written gzip-compressed
+(`<name>.jsonl.gz`, see artifact_io.py). Readers take either form.
+"""
+
+import json
+from pathlib import Path
+from typing import Iterator
+
+from artifact_io import (
+    AtomicWriter,
+    artifact_exists,
+    check_complete,
+    existing_artifact,
+    open_artifact,
+    output_artifact,
+    remove_artifact,
+)
+from run_store import STORE_NAME, RunStore, open_store, store_path
+
+BASE = "questions_raw.jsonl"
+STAGES = ("questions_filtered.jsonl", "questions_deduped.jsonl", "questions_scored.jsonl")
+REMOVED_KEY = "_removed"
+
+
+def sidecar_path(path: Path) -> Path:
+    return path.with_name(path.name.removesuffix(".jsonl") + ".sidecar.jsonl")
+
+
+def stage_file_exists(path: Path) -> bool:
+    """True if the stage exists as a full copy or a sidecar, plain or compressed."""
+    return artifact_exists(path) or artifact_exists(sidecar_path(path))
+
+
+def stored_stage(path: Path) -> bool:
+    """True if the stage was written to the run store (--store)."""
+    if path.name not in STAGES:
+        return False
+    store = open_store(path.parent)
+    if store is None:
+        return False
+    with store:
+        return store.has_stage(path.name)
+
+
+def stage_exists(path: Path) -> bool:
+    """True if the stage exists as a full copy, a sidecar, or in the run store."""
+    return artifact_exists(path) or (path.name in STAGES and (stage_file_exists(path) or stored_stage(path)))
+
+
+def check_sidecar_chain(parser, input_name: str, output_name: str, option: str = "--sidecars") -> None:
+    """--sidecars and --store only work on the standard stage chain (rows are aligned with questions_raw.jsonl)."""
+    chain = (BASE,) + STAGES
+    if output_name not in STAGES or input_name != chain[chain.index(output_name) - 1]:
+        parser.error(f"{option} needs the default stage file names (got --input {input_name} for {output_name})")
+
+
+def add_layout_args(parser, output_name: str, fields: str) -> None:
+    """--sidecars / --store for a stage writing `output_name`, which adds `fields` to each record."""
+    layout = parser.add_mutually_exclusive_group()
+    layout.add_argument(
+        "--sidecars",
+        action="store_true",
+        help=f"Write only the {fields} per row ({sidecar_path(Path(output_name))}) instead of a full copy",
+    )
+    layout.add_argument(
+        "--store",
+        action="store_true",
+        help=f"Write only the {fields} per row into the run's SQLite store ({STORE_NAME}) instead of a full copy",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help=f"Write {output_name}.gz (or the sidecar's .gz) instead of plain JSONL",
+    )
+
+
+def validate_layout_args(parser, args, input_name: str, output_name: str) -> None:
+    if args.sidecars or args.store:
+        check_sidecar_chain(parser, input_name, output_name, "--store" if args.store else "--sidecars")
+
+
+def output_location(path: Path, args) -> Path:
+    """Where a stage's output goes under the chosen layout."""
+    if args.store:
+        return store_path(path.parent)
+    return output_artifact(sidecar_path(path) if args.sidecars else path, args.compress)
+
+
+def snapshot(record: dict) -> dict:
+    """A copy that stays unchanged while a stage updates `record` (and its filters or provenance) in place."""
+    copy = {key: dict(value) if isinstance(value, dict) else value for key, value in record.items()}
+    copy.setdefault("filters", {})
+    return copy
+
+
+def record_delta(before: dict, after: dict) -> dict:
+    """The top-level fields and `filters` entries that differ between two versions of a record."""
+    delta, removed = {}, []
+    for key, value in after.items():
+        if key == "filters":
+            old = before.get("filters", {})
+            changed = {k: v for k, v in value.items() if k not in old or old[k] != v}
+            if changed:
+                delta["filters"] = changed
+            removed += [f"filters.{k}" for k in old if k not in value]
+        elif key not in before or before[key] != value:
+            delta[key] = value
+    removed += [key for key in before if key not in after]
+    if removed:
+        delta[REMOVED_KEY] = removed
+    return delta
+
+
+def apply_delta(record: dict, delta: dict) -> dict:
+    for key, value in delta.items():
+        if key == "filters":
+            record["filters"] = {**record.get("filters", {}), **value}
+        elif key not in ("row", REMOVED_KEY):
+            record[key] = value
+    for path in delta.get(REMOVED_KEY, ()):
+        if path.startswith("filters."):
+            record.get("filters", {}).pop(path.removeprefix("filters."), None)
+        else:
+            record.pop(path, None)
+    return record
+
+
+def read_jsonl(path: Path) -> Iterator[dict]:
+    """Records of a JSONL file, or of its .jsonl.gz twin if only that exists, once it was completely written."""
+    path = existing_artifact(path)
+    check_complete(path)
+    with open_artifact(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def merge_sidecars(records: Iterator[dict], sidecars: list[Iterator[dict]]) -> Iterator[dict]:
+    """Apply row-sorted sidecars to base records in one streaming pass."""
+    pending = [next(sidecar, None) for sidecar in sidecars]
+    for row, record in enumerate(records):
+        for i, sidecar in enumerate(sidecars):
+            if pending[i] is not None and pending[i]["row"] == row:
+                apply_delta(record, pending[i])
+                pending[i] = next(sidecar, None)
+        yield record
+
+
+def iter_records(path: Path) -> Iterator[dict]:
+    """Records of a stage file, merged from sidecars or the run store if it was written with --sidecars/--store."""
+    check_complete(existing_artifact(path))
+    if artifact_exists(path):
+        yield from read_jsonl(path)
+        return
+    if not stage_exists(path):
+        return
+    store = open_store(path.parent)
+    try:
+        # Walk back to the nearest full copy, collecting sidecars and stored stages on the way
+        layers = []
+        for name in reversed((BASE,) + STAGES[:STAGES.index(path.name) + 1]):
+            stage_path = path.with_name(name)
+            if artifact_exists(stage_path):
+                base = stage_path
+                break
+            if artifact_exists(sidecar_path(stage_path)):
+                layers.append(read_jsonl(sidecar_path(stage_path)))
+            elif store is not None and store.has_stage(name):
+                layers.append(store.iter_annotations(name))
+            else:
+                raise FileNotFoundError(f"{path.name} needs {name}, its sidecar, or the run store")
+        yield from merge_sidecars(read_jsonl(base), list(reversed(layers)))
+    finally:
+        if store is not None:
+            store.close()
+
+
+def load_stage(path: Path) -> list[dict]:
+    return list(iter_records(path))
+
+
+def stored_record(store: RunStore, row: int, stage: str) -> dict:
+    """One row of a stored stage, merged from questions_raw.jsonl's line and the deltas up to `stage`."""
+    record, deltas = store.layers(row, list(STAGES[:STAGES.index(stage) + 1]))
+    for delta in deltas:
+        apply_delta(record, delta)
+    return record
+
+
+def query_stored(path: Path, where: str) -> list[dict] | None:
+    """
+    The records of a stage whose annotation matches an SQL condition, found
+    through the store's indexes. None unless the stage and every stage before
+    it live only in the run store.
+    """
+    chain = STAGES[:STAGES.index(path.name) + 1] if path.name in STAGES else ()
+    if not chain or any(stage_file_exists(path.with_name(name)) for name in chain):
+        return None
+    store = open_store(path.parent)
+    if store is None:
+        return None
+    with store:
+        if not all(store.has_stage(name) for name in chain):
+            return None
+        return [stored_record(store, row, path.name) for row in store.rows(path.name, where)]
+
+
+def lookup_record(run_dir: Path, record_id: str, stage: str) -> dict | None:
+    """A record by id from the run store (an indexed lookup), or None if the store doesn't have it."""
+    store = open_store(run_dir)
+    if store is None:
+        return None
+    with store:
+        row = store.find_row(record_id)
+        return None if row is None else stored_record(store, row, stage)
+
+
+class StageWriter:
+    """
+    Writes a stage's records as a full copy, only their changes by row
+    (sidecars=True), or those changes into the run store (store=True). Full
+    copies and sidecars are gzip-compressed with compress=True.
+    """
+
+    def __init__(self, path: Path, sidecars: bool = False, store: bool = False, compress: bool = False):
+        self.sidecars = sidecars
+        self.stage = path.name
+        self.store = open_store(path.parent, create=store)
+        # The other layouts of the same stage would be stale from now on
+        target = None if store else output_artifact(sidecar_path(path) if sidecars else path, compress)
+        remove_artifact(path, keep=target)
+        remove_artifact(sidecar_path(path), keep=target)
+        if self.store is not None and not store:
+            self.store.drop_stage(self.stage)
+            self.store.close()
+            self.store = None
+        self.file = None
+        if self.store is not None:
+            self.store.sync_base(path.with_name(BASE))
+            self.store.begin_stage(self.stage)
+            self.path = self.store.path
+        else:
+            self.path = target
+            self.file = AtomicWriter(self.path)
+        self.bytes_written = 0
+
+    def write(self, row: int, record: dict, before: dict | None = None) -> None:
+        if self.store is not None:
+            self.store.add(self.stage, row, record_delta(before, record), record)
+            return
+        if self.sidecars:
+            delta = record_delta(before, record)
+            if not delta:
+                return
+            line = json.dumps({"row": row, **delta}) + "\n"
+        else:
+            line = json.dumps(record) + "\n"
+        self.file.write(line)
+        self.bytes_written += len(line)
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.finish_stage(self.stage)
+            self.store.close()
+        else:
+            self.file.close()
+
+    def abort(self) -> None:
+        """Stop after an error: the stage is neither renamed into place nor marked as written in the store."""
+        if self.store is not None:
+            self.store.close()
+        else:
+            self.file.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -5,6 +5,7 @@ Run leakage/salience judge on the seed set for calibration.
 Usage:
     python scripts/run_judge_calibration.py --base-url http://localhost:8000/v1
     python scripts/run_judge_calibration.py --base-url http://localhost:8000/v1 --profile qwq32b
+    python scripts/run_judge_calibration.py --base-url http://localhost:8000/v1 --profile qwq32b --no-vote
 
 Requires:
     pip install openai pyyaml
@@ -12,35 +13,23 @@ Requires:
 
 import argparse
 import json
-import os
-import re
-import sys
 from pathlib import Path
 
-import yaml
-from openai import OpenAI
+from artifact_io import AtomicWriter
+from llm_client import (
+    LLMClient,
+    add_client_args,
+    client_from_args,
+    get_profile,
+    load_yaml_config,
+    parse_judge_json,
+    validate_client_args,
+)
+from phase1_score_questions import judge_params, resolve_voting, score_question_voted
 
 ROOT = Path(__file__).resolve().parent.parent
 
 
-def load_config():
-    with open(ROOT / "configs" / "llm.yaml") as f:
-        return yaml.safe_load(f)
-
-
-def get_profile(config: dict, profile_name: str = None) -> dict:
-    """Get model profile from config."""
-    if profile_name is None:
-        profile_name = config.get("default_profile", "qwen32b")
-    
-    profiles = config.get("profiles", {})
-    if profile_name not in profiles:
-        available = list(profiles.keys())
-        raise ValueError(f"Profile '{profile_name}' not found. Available: {available}")
-    
-    return profiles[profile_name]
-
-
 def load_judge_prompt():
     with open(ROOT / "prompts" / "judges" / "leakage_salience.md") as f:
         return f.read()
@@ -60,81 +49,16 @@ def render_prompt(template: str, question: str) -> str:
     return template.replace("{{question}}", question)
 
 
-def parse_json_response(text: str, is_reasoning_model: bool = False) -> dict | None:
-    """Extract JSON from response, handling markdown code blocks and reasoning chains."""
-    
-    # For reasoning models, the JSON is usually at the end after thinking
-    # Try to find the last JSON object in the response
-    if is_reasoning_model:
-        # Find all JSON-like objects in the text
-        json_pattern = r'\{[^{}]*"leakage_score"[^{}]*"salience_score"[^{}]*\}'
-        matches = re.findall(json_pattern, text, re.DOTALL)
-        if matches:
-            # Try the last match first (most likely to be the final answer)
-            for match in reversed(matches):
-                try:
-                    return json.loads(match)
-                except json.JSONDecodeError:
-                    continue
-    
-    # Try direct parse
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        pass
-
-    # Try extracting from code block
-    match = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(1))
-        except json.JSONDecodeError:
-            pass
-
-    # Try finding any JSON object with our expected keys
-    match = re.search(r'\{[^{}]*"leakage_score"[^{}]*\}', text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            pass
-    
-    # Fallback: try finding any JSON object
-    match = re.search(r"\{[^{}]*\}", text)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            pass
-
-    return None
-
-
-def run_judge(client: OpenAI, model_id: str, decoding_params: dict, prompt: str, is_reasoning_model: bool = False) -> dict:
-    response = client.chat.completions.create(
-        model=model_id,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=decoding_params.get("temperature", 0.2),
-        top_p=decoding_params.get("top_p", 0.9),
-        max_tokens=decoding_params.get("max_tokens", 512),
-    )
-    raw = response.choices[0].message.content
-    parsed = parse_json_response(raw, is_reasoning_model=is_reasoning_model)
+def run_judge(client: LLMClient, model_id: str, decoding_params: dict, prompt: str, is_reasoning_model: bool = False) -> dict:
+    response = client.chat(model_id, [{"role": "user", "content": prompt}], judge_params(decoding_params))
+    raw = response["choices"][0]["text"]
+    parsed = parse_judge_json(raw, is_reasoning_model=is_reasoning_model)
     return {"raw": raw, "parsed": parsed}
 
 
 def main():
     parser = argparse.ArgumentParser(description="Run judge calibration on seed set")
-    parser.add_argument(
-        "--base-url",
-        default=os.environ.get("OPENAI_BASE_URL", "http://localhost:8000/v1"),
-        help="OpenAI-compatible API base URL",
-    )
-    parser.add_argument(
-        "--api-key",
-        default=os.environ.get("OPENAI_API_KEY", "not-needed"),
-        help="API key (use 'not-needed' for local vLLM)",
-    )
+    add_client_args(parser)
     parser.add_argument(
         "--profile",
         default=None,
@@ -156,9 +80,19 @@ def main():
         default=None,
         help="Path to seed file (default: data/seeds/questions_gold.jsonl)",
     )
+    parser.add_argument(
+        "--vote",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Adaptive self-consistency voting (default: on if the profile's judge config has `voting`)",
+    )
+    parser.add_argument("--vote-max", type=int, default=None, help="Maximum judge samples per seed when voting")
     args = parser.parse_args()
+    if args.vote_max is not None and args.vote_max < 1:
+        parser.error("--vote-max must be at least 1")
+    validate_client_args(parser, args)
 
-    config = load_config()
+    config = load_yaml_config("llm.yaml")
     profile = get_profile(config, args.profile)
     judge_template = load_judge_prompt()
     seeds = load_seed_set(args.seed_file)
@@ -171,6 +105,7 @@ def main():
     decoding_params = profile.get("judge", {})
     is_reasoning_model = profile.get("is_reasoning_model", False)
     profile_name = args.profile or config.get("default_profile", "qwen32b")
+    voting = resolve_voting(decoding_params, args.vote, args.vote_max)
 
     # Set output path
     if args.output:
@@ -178,7 +113,7 @@ def main():
     else:
         output_path = ROOT / "data" / "runs" / "phase0_calibration" / f"judge_results_{profile_name}.jsonl"
 
-    client = OpenAI(base_url=args.base_url, api_key=args.api_key)
+    client = client_from_args(args, shared=True)
 
     print(f"Running judge on {len(seeds)} seeds")
     print(f"Profile: {profile_name} ({profile.get('name', model_id)})")
@@ -186,6 +121,8 @@ def main():
     print(f"Reasoning model: {is_reasoning_model}")
     print(f"Base URL: {args.base_url}")
     print(f"Max tokens: {decoding_params.get('max_tokens', 512)}")
+    if voting is not None:
+        print(f"Voting: {voting.get('initial', 2)} samples, up to {voting.get('max_samples', 5)} on split votes")
     print()
 
     results = []
@@ -195,7 +132,12 @@ def main():
     for i, seed in enumerate(seeds):
         prompt = render_prompt(judge_template, seed["question"])
         try:
-            response = run_judge(client, model_id, decoding_params, prompt, is_reasoning_model=is_reasoning_model)
+            if voting is not None:
+                response = score_question_voted(
+                    client, model_id, decoding_params, judge_template, seed["question"], is_reasoning_model, voting
+                )
+            else:
+                response = run_judge(client, model_id, decoding_params, prompt, is_reasoning_model=is_reasoning_model)
         except Exception as e:
             print(f"[{i+1}/{len(seeds)}] ERROR: {seed['id']} - {e}")
             results.append({"seed_id": seed["id"], "error": str(e)})
@@ -218,9 +160,12 @@ def main():
             total += 1
 
             status = "OK" if (leak_match and sal_match) else "MISMATCH"
+            vote_note = ""
+            if "votes" in response:
+                vote_note = f" | votes={len(response['votes'])} agree={response['agreement']:.2f}"
             print(
                 f"[{i+1}/{len(seeds)}] {status}: {seed['id']} | "
-                f"leak={pred_leak}(gold={gold_leak}) sal={pred_sal}(gold={gold_sal})"
+                f"leak={pred_leak}(gold={gold_leak}) sal={pred_sal}(gold={gold_sal}){vote_note}"
             )
 
             results.append({
@@ -233,6 +178,9 @@ def main():
                 "rationale": parsed.get("rationale"),
                 "leakage_match": leak_match,
                 "salience_match": sal_match,
+                "votes": response.get("votes"),
+                "agreement": response.get("agreement"),
+                "samples": response.get("samples", 1),
                 "profile": profile_name,
             })
         else:
@@ -255,10 +203,29 @@ def main():
         print(f"Salience accuracy: {correct['salience']}/{total} ({100*correct['salience']/total:.1f}%)")
     else:
         print("No successful evaluations.")
+    if voting is not None:
+        voted = [r for r in results if r.get("agreement") is not None]
+        if voted:
+            samples = sum(r["samples"] for r in voted)
+            unanimous = [r for r in voted if r["agreement"] == 1]
+            split = [r for r in voted if r["agreement"] < 1]
+            print(f"Judge samples/seed: {samples / len(voted):.2f}")
+            for name, group in (("Unanimous", unanimous), ("Split", split)):
+                if group:
+                    both = sum(r["leakage_match"] and r["salience_match"] for r in group)
+                    print(f"{name + ' votes:':17s} {len(group)} seeds, {100 * both / len(group):.1f}% match gold on both")
+
+    if client.hedge:
+        hedging = client.hedge_summary()
+        print(
+            f"Hedged requests:   {hedging['hedged']} ({100 * hedging['hedge_rate']:.1f}%), "
+            f"hedge won {hedging['hedge_wins']} ({hedging['stalled_wins']} over a stalled request), "
+            f"~{hedging['saved_seconds']:.0f}s saved on the rest"
+        )
 
     # Write results
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w") as f:
+    with AtomicWriter(output_path) as f:
         for r in results:
             f.write(json.dumps(r) + "\n")
     print(f"\nResults written to: {output_path}")
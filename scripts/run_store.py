@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Optional SQLite store for a run's records and stage annotations.
+
+With --store the filter, dedup and score steps write their output to
+run_store.sqlite in the run directory instead of JSONL. The database holds:
+
+    records      one row per line of questions_raw.jsonl (the line itself,
+                 plus id, domain and question_type), synced incrementally
+    annotations  one row per (stage, row): the sidecar-style delta against
+                 the previous stage, the record's merged `filters`, and the
+                 passed / dedup_passed / leakage_score / salience_score /
+                 accepted columns
+    stages       the stages that have been completely written
+
+`id`, `domain`, `question_type`, `leakage_score` and `accepted` are indexed,
+so lookups by id and the report's aggregates don't scan the run. Deltas use
+the same format as sidecar files, so run_artifacts.iter_records merges them
+the same way, and phase1_export_run.py writes the same JSONL bytes as the
+full-copy layout.
+
+The database runs in WAL mode, so the report can read while a stage writes.
+Writes are batched into transactions of BATCH_SIZE rows.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+from artifact_io import check_complete, existing_artifact, is_compressed, open_artifact
+
+STORE_NAME = "run_store.sqlite"
+BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    row INTEGER PRIMARY KEY,
+    id TEXT,
+    domain TEXT,
+    question_type TEXT,
+    line TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_id ON records(id);
+CREATE INDEX IF NOT EXISTS records_bucket ON records(domain, question_type);
+CREATE INDEX IF NOT EXISTS records_question_type ON records(question_type);
+CREATE TABLE IF NOT EXISTS annotations (
+    stage TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    delta TEXT NOT NULL,
+    filters TEXT NOT NULL,
+    passed INTEGER,
+    dedup_passed INTEGER,
+    leakage_score INTEGER,
+    salience_score INTEGER,
+    accepted INTEGER,
+    PRIMARY KEY (stage, row)
+);
+CREATE INDEX IF NOT EXISTS annotations_leakage ON annotations(stage, leakage_score);
+CREATE INDEX IF NOT EXISTS annotations_accepted ON annotations(stage, accepted);
+CREATE TABLE IF NOT EXISTS stages (
+    stage TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL,
+    written_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def store_path(run_dir: Path) -> Path:
+    return run_dir / STORE_NAME
+
+
+def open_store(run_dir: Path, create: bool = False) -> "RunStore | None":
+    """The run's store, or None if it has none (and create is False)."""
+    path = store_path(run_dir)
+    if not create and not path.exists():
+        return None
+    return RunStore(path)
+
+
+def flag(value) -> int | None:
+    return None if value is None else int(bool(value))
+
+
+class RunStore:
+    def __init__(self, path: Path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.pending: list[tuple] = []
+        self.rows_written = 0
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _meta(self, key: str, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, key: str, value) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    # ------------------------------------------------------------------
+    # Base records
+    # ------------------------------------------------------------------
+
+    def sync_base(self, raw_path: Path) -> int:
+        """
+        Add the lines appended to questions_raw.jsonl (or .jsonl.gz) since the
+        last sync and return the row count. Offsets count decompressed bytes.
+        A rewritten raw file (different first line, or shorter than what was
+        synced) resets the store.
+        """
+        offset = self._meta("raw_offset", 0)
+        rows = self._meta("raw_rows", 0)
+        raw_path = existing_artifact(raw_path)
+        check_complete(raw_path)
+        with open_artifact(raw_path, binary=True) as f:
+            head = f.readline().decode()
+            # A .gz file's size says nothing about its decompressed length; seeking past the end shows it
+            shrunk = raw_path.stat().st_size < offset if not is_compressed(raw_path) else f.seek(offset) < offset
+            if offset and (head != self._meta("raw_head") or shrunk):
+                self.reset()
+                offset, rows = 0, 0
+            f.seek(offset)
+            batch = []
+            with self.conn:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # still being written
+                    offset += len(line)
+                    text = line.decode().rstrip("\n")
+                    if not text.strip():
+                        continue
+                    record = json.loads(text)
+                    batch.append((rows, record.get("id"), record.get("domain"), record.get("question_type"), text))
+                    rows += 1
+                    if len(batch) >= BATCH_SIZE:
+                        self.conn.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?)", batch)
+                        batch = []
+                self.conn.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?)", batch)
+                self._set_meta("raw_offset", offset)
+                self._set_meta("raw_rows", rows)
+                self._set_meta("raw_head", head)
+        return rows
+
+    def reset(self) -> None:
+        with self.conn:
+            for table in ("records", "annotations", "stages", "meta"):
+                self.conn.execute(f"DELETE FROM {table}")
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def find_row(self, record_id: str) -> int | None:
+        found = self.conn.execute("SELECT row FROM records WHERE id = ?", (record_id,)).fetchone()
+        return found[0] if found else None
+
+    def layers(self, row: int, stages: list[str]) -> tuple[dict, list[dict]]:
+        """A row's base record and its deltas from `stages`, in order (merge with run_artifacts.apply_delta)."""
+        record = json.loads(self.conn.execute("SELECT line FROM records WHERE row = ?", (row,)).fetchone()[0])
+        deltas = []
+        for stage in stages:
+            found = self.conn.execute("SELECT delta FROM annotations WHERE stage = ? AND row = ?", (stage, row)).fetchone()
+            if found:
+                deltas.append(json.loads(found[0]))
+        return record, deltas
+
+    # ------------------------------------------------------------------
+    # Stage annotations
+    # ------------------------------------------------------------------
+
+    def has_stage(self, stage: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM stages WHERE stage = ?", (stage,)).fetchone() is not None
+
+    def drop_stage(self, stage: str) -> None:
+        with self.conn:
+            self.conn.execute("DELETE FROM annotations WHERE stage = ?", (stage,))
+            self.conn.execute("DELETE FROM stages WHERE stage = ?", (stage,))
+
+    def begin_stage(self, stage: str) -> None:
+        self.drop_stage(stage)
+        self.pending = []
+        self.rows_written = 0
+
+    def add(self, stage: str, row: int, delta: dict, record: dict) -> None:
+        filters = record.get("filters", {})
+        self.pending.append((
+            stage,
+            row,
+            json.dumps(delta),
+            json.dumps(filters),
+            flag(filters.get("passed")),
+            flag(filters.get("dedup_passed")),
+            record.get("leakage_score"),
+            record.get("salience_score"),
+            flag(filters.get("accepted")),
+        ))
+        if len(self.pending) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        with self.conn:
+            self.conn.executemany("INSERT INTO annotations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", self.pending)
+        self.rows_written += len(self.pending)
+        self.pending = []
+
+    def finish_stage(self, stage: str) -> None:
+        self.flush()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?)", (stage, self.rows_written, datetime.now().isoformat())
+            )
+
+    def rows(self, stage: str, where: str) -> Iterator[int]:
+        """Rows of a stage whose annotation matches an SQL condition (e.g. "leakage_score IS NOT NULL")."""
+        cursor = self.conn.execute(f"SELECT row FROM annotations WHERE stage = ? AND {where} ORDER BY row", (stage,))
+        for (row,) in cursor:
+            yield row
+
+    def iter_annotations(self, stage: str) -> Iterator[dict]:
+        """A stage's deltas in row order, in sidecar form ({"row": ..., **delta})."""
+        cursor = self.conn.execute(
+            "SELECT row, delta FROM annotations WHERE stage = ? AND delta != '{}' ORDER BY row", (stage,)
+        )
+        for row, delta in cursor:
+            yield {"row": row, **json.loads(delta)}
+
+    # ------------------------------------------------------------------
+    # Report aggregates
+    # ------------------------------------------------------------------
+
+    def _scalar(self, sql: str, params: tuple = ()):
+        return self.conn.execute(sql, params).fetchone()[0]
+
+    def funnel(self, filtered: str, deduped: str, scored: str) -> list[tuple[str, int]]:
+        count = "SELECT COUNT(*) FROM annotations WHERE stage = ? AND "
+        return [
+            ("Raw generated", self.count()),
+            ("Passed filters", self._scalar(count + "passed = 1", (filtered,))),
+            ("Passed dedup", self._scalar(count + "dedup_passed = 1", (deduped,))),
+            ("Scored", self._scalar(count + "leakage_score IS NOT NULL", (scored,))),
+            ("Accepted", self._scalar(count + "accepted = 1", (scored,))),
+        ]
+
+    def filter_breakdown(self, filtered: str) -> dict[str, int]:
+        row = self.conn.execute(
+            """
+            SELECT
+                COALESCE(SUM(COALESCE(json_extract(filters, '$.explicit_leakage'), 0) != 0), 0),
+                COALESCE(SUM(COALESCE(json_extract(filters, '$.implicit_leakage'), 0) != 0), 0),
+                COALESCE(SUM(COALESCE(json_extract(filters, '$.is_question'), 1) = 0), 0),
+                COALESCE(SUM(COALESCE(json_extract(filters, '$.length_ok'), 1) = 0), 0),
+                COALESCE(SUM(COALESCE(json_extract(filters, '$.is_english'), 1) = 0), 0),
+                COALESCE(SUM(COALESCE(json_extract(filters, '$.pii'), 0) != 0), 0)
+            FROM annotations WHERE stage = ?
+            """,
+            (filtered,),
+        ).fetchone()
+        keys = ("explicit_leakage", "implicit_leakage", "not_question", "length_fail", "not_english", "pii")
+        return dict(zip(keys, row))
+
+    def dedup_stats(self, deduped: str) -> tuple[int, float | None]:
+        """(duplicates rejected among filter-passed records, mean novelty of the rest)."""
+        rejected = self._scalar(
+            "SELECT COUNT(*) FROM annotations WHERE stage = ? AND dedup_passed = 0 AND passed = 1", (deduped,)
+        )
+        novelty = self._scalar(
+            "SELECT AVG(COALESCE(json_extract(filters, '$.novelty_score'), 0)) FROM annotations"
+            " WHERE stage = ? AND (dedup_passed IS NULL OR dedup_passed = 1)",
+            (deduped,),
+        )
+        return rejected, novelty
+
+    def distribution(self, scored: str, column: str) -> dict[int, int]:
+        assert column in ("leakage_score", "salience_score")
+        cursor = self.conn.execute(
+            f"SELECT {column}, COUNT(*) FROM annotations WHERE stage = ? AND {column} IS NOT NULL"
+            f" GROUP BY {column} ORDER BY {column}",
+            (scored,),
+        )
+        return dict(cursor.fetchall())
+
+    def coverage(self, scored: str) -> dict[str, dict[str, int]]:
+        """Accepted records per domain × question_type."""
+        cursor = self.conn.execute(
+            """
+            SELECT COALESCE(r.domain, 'unknown'), COALESCE(r.question_type, 'unknown'), COUNT(*)
+            FROM annotations a JOIN records r ON r.row = a.row
+            WHERE a.stage = ? AND a.accepted = 1
+            GROUP BY 1, 2
+            """,
+            (scored,),
+        )
+        coverage = {}
+        for domain, qtype, count in cursor:
+            coverage.setdefault(domain, {})[qtype] = count
+        return coverage
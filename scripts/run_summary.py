@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Compact per-run summaries for comparing runs without re-reading them.
+
+phase1_report.py leaves run_summary.json in the run directory: the funnel,
+filter breakdown, score distributions, coverage matrix, token usage from
+token_usage.jsonl, and the pipeline's per-step timings from run_manifest.json.
+The summary records the size and mtime of every run file it was computed
+from, and `read_summary` treats it as stale as soon as any of them changes,
+appears or disappears. phase1_compare_runs.py reads only these summaries and
+rebuilds the stale ones.
+"""
+
+import json
+from pathlib import Path
+
+from artifact_io import ARTIFACTS_NAME
+from feature_store import FEATURES_NAME
+
+SUMMARY_NAME = "run_summary.json"
+SUMMARY_VERSION = 1
+
+# Outputs derived from the run, which don't invalidate its summary
+DERIVED_SUFFIXES = (".idx", ".tmp", ".merged.jsonl", ".merged.jsonl.gz", "-wal", "-shm")
+DERIVED_NAMES = (SUMMARY_NAME, "phase1_report.json", "filter_ablation.json", FEATURES_NAME, ARTIFACTS_NAME)
+
+
+def run_fingerprint(run_dir: Path) -> dict[str, list[int]]:
+    """[size, mtime_ns] of every run file a summary depends on."""
+    fingerprint = {}
+    for path in sorted(run_dir.iterdir()):
+        if not path.is_file() or path.name in DERIVED_NAMES or path.name.endswith(DERIVED_SUFFIXES):
+            continue
+        stat = path.stat()
+        fingerprint[path.name] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+def token_usage(run_dir: Path) -> dict[str, dict]:
+    """Requests, completion tokens and truncations per request kind (generate / judge)."""
+    usage = {}
+    path = run_dir / "token_usage.jsonl"
+    if not path.exists():
+        return usage
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            obs = json.loads(line)
+            kind = usage.setdefault(obs.get("kind", "unknown"), {"requests": 0, "completion_tokens": 0, "truncated": 0})
+            kind["requests"] += 1
+            kind["completion_tokens"] += obs.get("completion_tokens") or 0
+            kind["truncated"] += bool(obs.get("truncated"))
+    return usage
+
+
+def summarize(run_dir: Path, stats: dict, fingerprint: dict) -> dict:
+    """A run summary from the report's figures (phase1_report.collect_*) and the run's logs."""
+    manifest = {}
+    if (run_dir / "run_manifest.json").exists():
+        with open(run_dir / "run_manifest.json") as f:
+            manifest = json.load(f)
+    funnel = dict(stats["funnel"])
+    raw, accepted = funnel.get("Raw generated", 0), funnel.get("Accepted", 0)
+    return {
+        "version": SUMMARY_VERSION,
+        "run_id": run_dir.name,
+        "fingerprint": fingerprint,
+        "model_id": manifest.get("model_id"),
+        "profile": manifest.get("profile"),
+        "funnel": funnel,
+        "acceptance_rate": accepted / raw if raw else 0,
+        "filter_breakdown": stats["filter_stats"],
+        "dedup": {"rejected": stats["dedup_rejected"], "avg_novelty": stats["avg_novelty"]},
+        # JSON object keys are strings; keep the scores as strings throughout
+        "leakage_distribution": {str(k): v for k, v in stats["leakage_dist"].items()},
+        "salience_distribution": {str(k): v for k, v in stats["salience_dist"].items()},
+        "coverage": {d: dict(types) for d, types in stats["coverage"].items()},
+        "tokens": token_usage(run_dir),
+        "timings": manifest.get("timings", {}),
+    }
+
+
+def write_summary(run_dir: Path, summary: dict) -> Path:
+    path = run_dir / SUMMARY_NAME
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(summary, f, indent=2)
+    tmp_path.replace(path)
+    return path
+
+
+def read_summary(run_dir: Path) -> dict | None:
+    """The cached summary, or None if there is none or the run's files changed since."""
+    path = run_dir / SUMMARY_NAME
+    if not path.exists():
+        return None
+    try:
+        with open(path) as f:
+            summary = json.load(f)
+    except ValueError:
+        return None
+    if summary.get("version") != SUMMARY_VERSION or summary.get("fingerprint") != run_fingerprint(run_dir):
+        return None
+    return summary
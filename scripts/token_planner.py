@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Per-request max_tokens planning from past runs' token usage.
+
+Every generation and judge request is logged to token_usage.jsonl in its run
+directory (units requested, max_tokens sent, predicted and actual completion
+tokens, truncation). The planner fits completion tokens per unit (per
+question for generation, per sample for the judge) from those logs and
+caps each new request at a high quantile of that rate times the units
+requested, plus a safety margin, never above the profile's max_tokens.
+Tighter caps let vLLM schedule more sequences at once. A request truncated
+under a planned cap is resent once with the profile's max_tokens, so
+planning never costs an answer. Usage served by llm_stub_server.py (as in
+bench_pipeline.py runs) is logged with stub=true and never learned from;
+rows logged before that flag existed are skipped too, since they can't be
+told apart.
+
+Usage:
+    python scripts/token_planner.py                     # show what past runs predict
+    python scripts/token_planner.py --model Qwen/QwQ-32B
+"""
+
+import argparse
+import json
+import math
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from artifact_io import AtomicWriter
+from llm_client import STUB_FINGERPRINT
+
+ROOT = Path(__file__).resolve().parent.parent
+USAGE_LOG = "token_usage.jsonl"
+
+MIN_SAMPLES = 30
+MAX_HISTORY = 5000
+MIN_MAX_TOKENS = 64
+# Fixed allowance on top of the per-unit estimate (JSON brackets, code fences)
+OVERHEAD_TOKENS = 32
+
+
+def quantile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def fit_rate(observations: list[dict], q: float = 0.95) -> dict | None:
+    """
+    Completion tokens per unit from untruncated requests: the median is the
+    prediction, the q-quantile sizes the cap. None without enough history.
+    """
+    rates = [
+        obs["completion_tokens"] / (obs["units"] * obs.get("n", 1))
+        for obs in observations
+        if not obs.get("truncated") and obs.get("completion_tokens") and obs.get("units")
+    ][-MAX_HISTORY:]
+    if len(rates) < MIN_SAMPLES:
+        return None
+    return {
+        "samples": len(rates),
+        "median_per_unit": round(quantile(rates, 0.5), 2),
+        "quantile": q,
+        "quantile_per_unit": round(quantile(rates, q), 2),
+    }
+
+
+def load_history(runs_dir: Path, kind: str, model_id: str | None = None) -> list[dict]:
+    """Usage observations of one kind from every run, oldest run first."""
+    observations = []
+    for path in sorted(runs_dir.glob(f"*/{USAGE_LOG}"), key=lambda p: p.stat().st_mtime):
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                obs = json.loads(line)
+                if obs.get("stub", True):
+                    continue  # llm_stub_server completions (or unflagged older rows) say nothing about the real model
+                if obs.get("kind") == kind and (model_id is None or obs.get("model_id") == model_id):
+                    observations.append(obs)
+    return observations
+
+
+class TokenPlanner:
+    """Plans max_tokens per request and records predictions against actual usage."""
+
+    def __init__(
+        self,
+        model_id: str,
+        history: dict[str, list[dict]] | None = None,
+        margin: float = 0.2,
+        quantile: float = 0.95,
+        enabled: bool = True,
+    ):
+        self.model_id = model_id
+        self.margin = margin
+        self.enabled = enabled
+        self.fits = {kind: fit_rate(obs, quantile) for kind, obs in (history or {}).items()}
+        self.observations: list[dict] = []
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_runs(cls, model_id: str, kinds: tuple[str, ...], margin: float = 0.2, enabled: bool = True):
+        runs_dir = ROOT / "data" / "runs"
+        history = {kind: load_history(runs_dir, kind, model_id) for kind in kinds}
+        return cls(model_id, history, margin=margin, enabled=enabled)
+
+    def predict(self, kind: str, units: int) -> int | None:
+        fit = self.fits.get(kind)
+        return round(units * fit["median_per_unit"]) if fit else None
+
+    def plan(self, kind: str, units: int, default: int) -> int:
+        """max_tokens for a request of `units`; the profile default without a fit."""
+        fit = self.fits.get(kind)
+        if not self.enabled or fit is None:
+            return default
+        cap = math.ceil(units * fit["quantile_per_unit"] * (1 + self.margin)) + OVERHEAD_TOKENS
+        return max(MIN_MAX_TOKENS, min(default, cap))
+
+    def record(self, kind: str, units: int, n: int, max_tokens: int, response: dict, replanned: bool = False) -> None:
+        usage = response.get("usage") or {}
+        observation = {
+            "kind": kind,
+            "model_id": self.model_id,
+            "units": units,
+            "n": n,
+            "max_tokens": max_tokens,
+            "predicted": self.predict(kind, units * n),
+            "completion_tokens": usage.get("completion_tokens"),
+            "truncated": any(c.get("finish_reason") == "length" for c in response["choices"]),
+            "replanned": replanned,
+            "endpoint": response.get("endpoint"),
+            "stub": response.get("system_fingerprint") == STUB_FINGERPRINT,
+        }
+        with self.lock:
+            self.observations.append(observation)
+
+    def summary(self) -> dict:
+        """Per kind: the fit used, caps sent, and predicted vs actual completion tokens."""
+        with self.lock:
+            observations = list(self.observations)
+        summary = {}
+        for kind in sorted({obs["kind"] for obs in observations} | set(self.fits)):
+            rows = [obs for obs in observations if obs["kind"] == kind]
+            scored = [obs for obs in rows if obs["predicted"] is not None and obs["completion_tokens"] is not None]
+            summary[kind] = {
+                "fit": self.fits.get(kind),
+                "margin": self.margin,
+                "enabled": self.enabled,
+                "requests": len(rows),
+                "mean_max_tokens": round(sum(obs["max_tokens"] for obs in rows) / len(rows), 1) if rows else None,
+                "completion_tokens": sum(obs["completion_tokens"] or 0 for obs in rows),
+                "predicted_tokens": sum(obs["predicted"] for obs in scored),
+                "actual_tokens_where_predicted": sum(obs["completion_tokens"] for obs in scored),
+                "mean_abs_error": round(
+                    sum(abs(obs["predicted"] - obs["completion_tokens"]) for obs in scored) / len(scored), 1
+                ) if scored else None,
+                "truncated": sum(obs["truncated"] for obs in rows),
+                "replanned": sum(obs["replanned"] for obs in rows),
+            }
+        return summary
+
+    def write_log(self, run_dir: Path) -> None:
+        """Append this process's observations to the run's usage log (future runs learn from it)."""
+        timestamp = datetime.utcnow().isoformat() + "Z"
+        with self.lock:
+            observations = list(self.observations)
+        with AtomicWriter(run_dir / USAGE_LOG, append=True, record=False) as f:
+            for obs in observations:
+                f.write(json.dumps({**obs, "timestamp": timestamp}) + "\n")
+
+
+def planned_chat(
+    client,
+    planner: TokenPlanner | None,
+    kind: str,
+    units: int,
+    model_id: str,
+    messages: list[dict],
+    params: dict,
+    n: int = 1,
+    seed: int | None = None,
+) -> dict:
+    """client.chat with a planned max_tokens, resent at the default cap if that truncates."""
+    options = {"n": n} if seed is None else {"n": n, "seed": seed}
+    if planner is None:
+        return client.chat(model_id, messages, params, **options)
+    default = params["max_tokens"]
+    max_tokens = planner.plan(kind, units, default)
+    response = client.chat(model_id, messages, {**params, "max_tokens": max_tokens}, **options)
+    truncated = any(c.get("finish_reason") == "length" for c in response["choices"])
+    if truncated and max_tokens < default:
+        planner.record(kind, units, n, max_tokens, response)
+        response = client.chat(model_id, messages, params, **options)
+        planner.record(kind, units, n, default, response, replanned=True)
+        return response
+    planner.record(kind, units, n, max_tokens, response)
+    return response
+
+
+def add_planner_args(parser) -> None:
+    parser.add_argument(
+        "--plan-tokens",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Size max_tokens per request from past runs' usage (default: on; the profile value is the ceiling)",
+    )
+    parser.add_argument("--token-margin", type=float, default=0.2, help="Safety margin on planned max_tokens")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the max_tokens plan learned from past runs")
+    parser.add_argument("--model", default=None, help="Only use history for this model id")
+    parser.add_argument("--margin", type=float, default=0.2, help="Safety margin")
+    args = parser.parse_args()
+
+    runs_dir = ROOT / "data" / "runs"
+    print(f"Token Plan")
+    print(f"==========")
+    for kind, examples in (("generate", (10, 20, 30)), ("judge", (1,))):
+        history = load_history(runs_dir, kind, args.model)
+        planner = TokenPlanner(args.model or "", {kind: history}, margin=args.margin)
+        fit = planner.fits[kind]
+        print(f"{kind}: {len(history)} logged requests")
+        if fit is None:
+            print(f"  not enough history (need {MIN_SAMPLES} untruncated requests); the profile max_tokens is used")
+            continue
+        print(f"  tokens per unit: median {fit['median_per_unit']}, p{int(100 * fit['quantile'])} {fit['quantile_per_unit']}")
+        for units in examples:
+            print(f"  {units:3d} unit(s): predict {planner.predict(kind, units)}, cap {planner.plan(kind, units, 1 << 20)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Scripts are run as `python scripts/<name>.py`, so they import each other as
+# top-level modules; mirror that for the tests.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
@@ -0,0 +1,111 @@
+import gzip
+import json
+
+import pytest
+
+import artifact_io
+from artifact_io import (
+    AtomicWriter,
+    IncompleteArtifactError,
+    artifact_exists,
+    check_complete,
+    existing_artifact,
+    gz_path,
+    open_artifact,
+    output_artifact,
+    read_completions,
+    remove_artifact,
+    temp_path,
+)
+
+
+def test_compressed_round_trip_and_append(tmp_path):
+    path = output_artifact(tmp_path / "questions_raw.jsonl", compress=True)
+    assert path.name == "questions_raw.jsonl.gz"
+    with open_artifact(path, "w") as f:
+        f.write(json.dumps({"id": "q0"}) + "\n")
+    # Appending adds a gzip member; readers see one stream
+    with open_artifact(path, "a") as f:
+        f.write(json.dumps({"id": "q1"}) + "\n")
+    with open_artifact(path) as f:
+        assert [json.loads(line)["id"] for line in f] == ["q0", "q1"]
+    with gzip.open(path, "rt") as f:
+        assert f.read().count("\n") == 2
+
+
+def test_plain_name_resolves_to_either_form(tmp_path):
+    plain = tmp_path / "questions_scored.jsonl"
+    assert not artifact_exists(plain)
+    gz_path(plain).write_bytes(gzip.compress(b"{}\n"))
+    assert existing_artifact(plain) == gz_path(plain) and artifact_exists(plain)
+    plain.write_text("{}\n")
+    assert existing_artifact(plain) == plain
+    remove_artifact(plain)
+    assert not plain.exists() and not gz_path(plain).exists()
+
+
+def test_temp_file_can_be_compressed_explicitly(tmp_path):
+    tmp = tmp_path / "out.jsonl.gz.tmp"
+    with open_artifact(tmp, "w", compressed=True) as f:
+        f.write("{}\n")
+    assert gzip.decompress(tmp.read_bytes()) == b"{}\n"
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = tmp_path / "questions_raw.jsonl"
+    with AtomicWriter(path) as f:
+        f.write("{}\n{}\n")
+    entry = read_completions(tmp_path)["questions_raw.jsonl"]
+    assert (entry["rows"], entry["bytes"]) == (2, 6)
+    with pytest.raises(KeyboardInterrupt):
+        with AtomicWriter(path) as f:
+            f.write('{"partial": true}\n')
+            raise KeyboardInterrupt
+    assert path.read_text() == "{}\n{}\n"
+    assert temp_path(path).read_text() == '{"partial": true}\n'
+    check_complete(path)
+
+
+def test_interrupted_first_write_is_refused(tmp_path):
+    path = tmp_path / "questions_scored.jsonl"
+    writer = AtomicWriter(output_artifact(path, compress=True))
+    writer.write("{}\n")
+    writer.abort()
+    assert not artifact_exists(path)
+    with pytest.raises(IncompleteArtifactError, match="never completed"):
+        check_complete(existing_artifact(path))
+    remove_artifact(path)
+    check_complete(path)
+
+
+def test_truncated_file_is_refused(tmp_path):
+    path = tmp_path / "questions_filtered.jsonl"
+    with AtomicWriter(path) as f:
+        f.write('{"id": "q0"}\n{"id": "q1"}\n')
+    with open(path, "r+") as f:
+        f.truncate(5)
+    with pytest.raises(IncompleteArtifactError, match="committed"):
+        check_complete(path)
+
+
+def test_atomic_append_in_both_forms(tmp_path):
+    for compress in (False, True):
+        path = output_artifact(tmp_path / f"raw{int(compress)}.jsonl", compress)
+        with AtomicWriter(path) as f:
+            f.write('{"id": "q0"}\n')
+        with AtomicWriter(path, append=True) as f:
+            f.write('{"id": "q1"}\n')
+        with open_artifact(path) as f:
+            assert [json.loads(line)["id"] for line in f] == ["q0", "q1"]
+        assert read_completions(tmp_path)[path.name]["rows"] == 2
+        check_complete(path)
+
+
+def test_group_commit_by_bytes(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifact_io, "COMMIT_BYTES", 100)
+    line = json.dumps({"question": "x" * 40}) + "\n"
+    with AtomicWriter(tmp_path / "out.jsonl.gz") as f:
+        for _ in range(10):
+            f.write(line)
+        commits = f.commits
+    assert commits == len(line) * 10 // 100
@@ -0,0 +1,29 @@
+import random
+
+from bench_hotpaths import compare_results, load_seed_questions, synth_question, synth_questions
+from phase1_filter_questions import check_blocklist, check_pii
+
+
+def test_synth_questions_are_deterministic_and_question_shaped():
+    questions = synth_questions(50, leak_rate=0.2, pii_rate=0.0, seed=3)
+    assert questions == synth_questions(50, leak_rate=0.2, pii_rate=0.0, seed=3)
+    assert all(q.endswith("?") for q in questions)
+
+
+def test_synth_question_leak_and_pii_rates_reach_the_filters():
+    seeds = load_seed_questions()
+    rng = random.Random(0)
+    leaked = [synth_question(rng, seeds, leak_rate=1.0, pii_rate=0.0) for _ in range(50)]
+    # A few terms (e.g. "20%") can't match at a word boundary, so allow misses
+    assert sum(check_blocklist(q)[0] for q in leaked) >= 45
+    with_pii = [synth_question(rng, seeds, leak_rate=0.0, pii_rate=1.0) for _ in range(50)]
+    assert all(check_pii(q)[0] for q in with_pii)
+
+
+def test_compare_results_flags_slowdowns_beyond_tolerance():
+    baseline = {"results": {"a@1": {"us_per_item": 10.0}, "b@1": {"us_per_item": 10.0}, "gone@1": {"us_per_item": 1.0}}}
+    current = {"results": {"a@1": {"us_per_item": 11.0}, "b@1": {"us_per_item": 13.0}, "new@1": {"us_per_item": 1.0}}}
+    rows = {row["benchmark"]: row for row in compare_results(baseline, current, tolerance=0.2)}
+    assert set(rows) == {"a@1", "b@1"}
+    assert not rows["a@1"]["regressed"]
+    assert rows["b@1"]["regressed"] and rows["b@1"]["ratio"] == 1.3
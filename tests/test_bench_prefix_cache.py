@@ -0,0 +1,32 @@
+from bench_prefix_cache import PrefixCache, approx_tokens, simulate
+
+
+def test_prefix_cache_reuses_leading_full_blocks():
+    cache = PrefixCache(block_size=4)
+    assert cache.lookup_and_insert(list("abcdefghij")) == 0
+    # Shares the first two blocks, diverges in the third
+    assert cache.lookup_and_insert(list("abcdefgXij")) == 4
+    assert cache.lookup_and_insert(list("abcdefghij")) == 8
+
+
+def test_prefix_cache_needs_the_whole_prefix():
+    cache = PrefixCache(block_size=2)
+    cache.lookup_and_insert(list("abcd"))
+    # Same second block after a different first block is not a hit
+    assert cache.lookup_and_insert(list("xxcd")) == 0
+
+
+def test_prefix_cache_evicts_least_recently_used():
+    cache = PrefixCache(block_size=2, capacity_blocks=2)
+    cache.lookup_and_insert(list("abcd"))
+    cache.lookup_and_insert(list("wxyz"))
+    assert cache.lookup_and_insert(list("abcd")) == 0
+
+
+def test_simulate_rewards_shared_static_prefix():
+    rubric = "Static rubric text that every request repeats. " * 10
+    variables_last = [rubric + f"Domain: {name}" for name in ("food", "work", "travel")]
+    variables_first = [f"Domain: {name}. " + rubric for name in ("food", "work", "travel")]
+    assert simulate(variables_last)["cached_tokens"] > 0
+    assert simulate(variables_first)["cached_tokens"] == 0
+    assert simulate(variables_last)["prompt_tokens"] == sum(len(approx_tokens(p)) for p in variables_last)
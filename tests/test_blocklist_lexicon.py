@@ -0,0 +1,108 @@
+import re
+import sys
+
+import pytest
+
+from bench_hotpaths import synth_blocklist, synth_questions
+from blocklist_lexicon import BlocklistMatcher, cache_path, default_blocklist, load_blocklist
+from phase1_filter_questions import check_blocklist
+
+CONFIG = """
+version: 3
+sections:
+  places: explicit
+  customs: implicit
+word_boundary_max_length:
+  explicit: 3
+  implicit: 4
+regions:
+  alpha:
+    places: [la, thai, "u.s.", new york]
+    customs: [prom, "15%", tipping]
+  beta:
+    places: [la, oslo]
+"""
+
+
+def reference_matches(matcher, text_lower):
+    """What the filter matched before the lexicon was compiled: one search per term."""
+    found = []
+    for i, term in enumerate(matcher.terms):
+        if matcher.boundary[i]:
+            if re.search(rf"\b{re.escape(term)}\b", text_lower):
+                found.append(i)
+        elif term in text_lower:
+            found.append(i)
+    return found
+
+
+def tricky_texts():
+    return [
+        "where is the best place to eat?",
+        "la traffic at rush hour?",
+        "thailand or not?",
+        "a 15% tip, or 15%?",
+        "15%-ish",
+        "going to the u.s. soon",
+        "is prom worth it? promenade",
+        "oslo",
+        "",
+    ]
+
+
+def test_matcher_agrees_with_per_term_search():
+    matcher = default_blocklist()
+    for text in [q.lower() for q in synth_questions(500, leak_rate=0.5, pii_rate=0.1, seed=4)] + tricky_texts():
+        assert matcher.matches(text) == reference_matches(matcher, text)
+
+
+def test_thousands_of_terms_still_agree():
+    matcher = synth_blocklist(2000, seed=1)
+    assert len(matcher) > 2000
+    for text in [q.lower() for q in synth_questions(100, leak_rate=0.5, pii_rate=0.0, seed=5)] + tricky_texts():
+        assert matcher.matches(text) == reference_matches(matcher, text)
+
+
+def test_sections_regions_and_levels(tmp_path):
+    config = tmp_path / "blocklist.yaml"
+    config.write_text(CONFIG)
+    matcher = load_blocklist(config, tmp_path / "cache")
+    assert matcher.version == 3
+    # A term listed by two regions belongs to the first
+    assert matcher.terms.count("la") == 1 and matcher.regions[matcher.terms.index("la")] == "alpha"
+    first = matcher.first_terms("prom in la, then tipping in new york")
+    assert {level: matcher.terms[i] for level, i in first.items()} == {"explicit": "la", "implicit": "prom"}
+    assert matcher.terms_in("customs") == {"prom", "15%", "tipping"}
+
+
+def test_compiled_matcher_is_cached_by_content_hash(tmp_path, monkeypatch):
+    config = tmp_path / "blocklist.yaml"
+    config.write_text(CONFIG)
+    cache_dir = tmp_path / "cache"
+    matcher = load_blocklist(config, cache_dir)
+    assert cache_path(matcher.digest, cache_dir).exists()
+
+    # Loading again needs neither YAML nor compiling
+    monkeypatch.setitem(sys.modules, "yaml", None)
+    cached = load_blocklist(config, cache_dir)
+    assert vars(cached) == vars(matcher)
+
+    # Any edit is a new hash, so a new compile
+    monkeypatch.undo()
+    config.write_text(CONFIG.replace("oslo", "bergen"))
+    edited = load_blocklist(config, cache_dir)
+    assert edited.digest != matcher.digest and "bergen" in edited.terms
+    assert len(list(cache_dir.glob("blocklist-*.json"))) == 2
+
+
+def test_malformed_config_is_rejected():
+    with pytest.raises(ValueError, match="undeclared section"):
+        BlocklistMatcher.compile({"sections": {"places": "explicit"}, "regions": {"x": {"cities": ["a"]}}}, "d")
+    with pytest.raises(ValueError, match="explicit or implicit"):
+        BlocklistMatcher.compile({"sections": {"places": "severe"}, "regions": {}}, "d")
+
+
+def test_check_blocklist_prefers_explicit_terms():
+    assert check_blocklist("Is tipping expected in London?") == (True, "london", "explicit")
+    assert check_blocklist("Is tipping expected at a wedding?") == (True, "tipping", "implicit")
+    assert check_blocklist("How do I split a bill fairly?") == (False, None, None)
@@ -0,0 +1,82 @@
+import json
+import random
+
+from rouge_score import rouge_scorer
+
+from artifact_io import gz_path, open_artifact
+from bench_hotpaths import synth_questions
+from feature_store import QuestionFeatures, build_features, features_path, load_features, rouge_l
+from phase1_filter_questions import filter_question
+
+
+def write_raw(path, questions, mode="w"):
+    with open_artifact(path, mode) as f:
+        for i, question in enumerate(questions):
+            f.write(json.dumps({"id": f"q{i}", "question": question, "domain": "d", "filters": {}}) + "\n")
+
+
+def test_rouge_l_matches_rouge_score():
+    questions = synth_questions(200, leak_rate=0.2, pii_rate=0.05) + ["", "???", "Running runners ran RUN run's"]
+    features = QuestionFeatures()
+    stems = [features.stem_text(q.lower().strip()) for q in questions]
+    scorer = rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
+    rng = random.Random(0)
+    for _ in range(500):
+        i, j = rng.randrange(len(questions)), rng.randrange(len(questions))
+        expected = scorer.score(questions[i].lower().strip(), questions[j].lower().strip())["rougeL"].fmeasure
+        assert rouge_l(stems[i], stems[j]) == expected
+
+
+def test_features_are_reused_extended_and_rebuilt(tmp_path):
+    questions = synth_questions(30, leak_rate=0.2, pii_rate=0.0)
+    raw_path = tmp_path / "questions_raw.jsonl"
+    write_raw(raw_path, questions[:20])
+    assert load_features(tmp_path) is None
+    first = build_features(tmp_path)
+    assert len(first) == 20 and first.normalized(3) == questions[3].lower().strip()
+    saved = features_path(tmp_path).stat().st_mtime_ns
+    assert len(build_features(tmp_path)) == 20 and features_path(tmp_path).stat().st_mtime_ns == saved
+
+    # Appended rows are added to the stored ones, matching a fresh extraction
+    with open(raw_path, "a") as f:
+        f.write("\n")
+    write_raw(raw_path, questions[20:], mode="a")
+    extended = build_features(tmp_path)
+    fresh = QuestionFeatures()
+    for question in questions:
+        fresh.add(question)
+    assert len(extended) == 30
+    assert [extended.stems(row) for row in range(30)] == [fresh.stems(row) for row in range(30)]
+    assert list(extended.columns["signatures"]) == list(fresh.columns["signatures"])
+
+    write_raw(raw_path, questions[::-1][:5])
+    assert build_features(tmp_path).normalized(0) == questions[-1].lower().strip()
+
+
+def test_compressed_raw_gives_the_same_features(tmp_path):
+    questions = synth_questions(10, leak_rate=0.5, pii_rate=0.0)
+    plain_dir, gz_dir = tmp_path / "plain", tmp_path / "gz"
+    plain_dir.mkdir()
+    gz_dir.mkdir()
+    write_raw(plain_dir / "questions_raw.jsonl", questions)
+    write_raw(gz_path(gz_dir / "questions_raw.jsonl"), questions)
+    plain, compressed = build_features(plain_dir), build_features(gz_dir)
+    assert plain.columns == compressed.columns and plain.vocab == compressed.vocab
+
+
+def test_filter_with_features_matches_plain_filter(tmp_path):
+    questions = synth_questions(100, leak_rate=0.3, pii_rate=0.1) + ["  Where is the nearest MRT?  ", "¿Dónde está?", "what"]
+    write_raw(tmp_path / "questions_raw.jsonl", questions)
+    features = build_features(tmp_path)
+    for row, question in enumerate(questions):
+        record = {"question": question, "filters": {}}
+        assert filter_question(dict(record), features, row) == filter_question(dict(record))
+
+
+def test_summary_counts_duplicates():
+    features = QuestionFeatures()
+    for question in ["How do I pay rent?", "how do I pay rent? ", "What is a fair tip?"]:
+        features.add(question)
+    summary = features.summary()
+    assert summary["questions"] == 3 and summary["exact_duplicates"] == 1
+    assert features.content_hash(0) == features.content_hash(1) != features.content_hash(2)
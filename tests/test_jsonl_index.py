@@ -0,0 +1,101 @@
+import json
+import os
+import random
+
+from artifact_io import gz_path, open_artifact
+from jsonl_index import JsonlFile, extract_field, index_path
+
+
+def write_jsonl(path, records, mode="w"):
+    with open(path, mode) as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def records(start, stop):
+    return [
+        {
+            "id": f"q{i}",
+            "question": f'Is "id": q{i} a trick?',
+            "domain": f"d{i % 3}",
+            "provenance": {"run_id": "r"},
+            "filters": {"passed": i % 2 == 0},
+        }
+        for i in range(start, stop)
+    ]
+
+
+def test_extract_field_decodes_only_the_value():
+    line = json.dumps(records(0, 1)[0]).encode()
+    assert extract_field(line, "id") == "q0"
+    assert extract_field(line, "filters.passed") is True
+    assert extract_field(line, "filters") == {"passed": True}
+    assert extract_field(line, "leakage_score") is None
+    assert extract_field(line, "filters.accepted", "missing") == "missing"
+
+
+def test_random_access_matches_a_full_parse(tmp_path):
+    path = tmp_path / "questions_raw.jsonl"
+    write_jsonl(path, records(0, 50))
+    with open(path, "a") as f:
+        f.write("\n")  # blank lines are skipped, as read_jsonl does
+    write_jsonl(path, records(50, 60), mode="a")
+    expected = records(0, 60)
+
+    with JsonlFile(path) as f:
+        assert len(f) == 60
+        assert f[37] == expected[37]
+        assert f.get("q55") == expected[55]
+        assert f.get("missing") is None
+        assert list(f.iter_from(58)) == expected[58:]
+        assert list(f.project(["domain", "filters.passed", "leakage_score"]))[:2] == [
+            {"domain": "d0", "filters.passed": True},
+            {"domain": "d1", "filters.passed": False},
+        ]
+        assert f.sample(5, random.Random(1)) == JsonlFile(path).sample(5, random.Random(1))
+    assert index_path(path).exists()
+
+
+def test_index_is_reused_extended_and_rebuilt(tmp_path):
+    path = tmp_path / "questions_raw.jsonl"
+    write_jsonl(path, records(0, 10))
+    JsonlFile(path).close()
+
+    # Cached: the index is trusted without rescanning the file
+    with JsonlFile(path) as f:
+        assert f.ids == [f"q{i}" for i in range(10)]
+
+    # Appended, with a partial last line: only complete lines are indexed
+    write_jsonl(path, records(10, 12), mode="a")
+    with open(path, "a") as f:
+        f.write('{"id": "q12"')
+    with JsonlFile(path) as f:
+        assert len(f) == 12 and f[11]["id"] == "q11"
+
+    # Rewritten: a fresh index even though the file grew
+    write_jsonl(path, records(100, 120))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    with JsonlFile(path) as f:
+        assert len(f) == 20 and f.get("q0") is None and f.get("q100") == records(100, 101)[0]
+
+
+def test_compressed_file_matches_plain(tmp_path):
+    path = tmp_path / "questions_raw.jsonl"
+    write_jsonl(path, records(0, 40))
+    with open_artifact(gz_path(path), "w") as f:
+        f.write(path.read_text())
+    with JsonlFile(path) as plain, JsonlFile(gz_path(path)) as compressed:
+        assert len(compressed) == 40
+        assert compressed[31] == plain[31] and compressed[3] == plain[3]
+        assert compressed.get("q17") == plain.get("q17")
+        assert list(compressed.project(["domain"])) == list(plain.project(["domain"]))
+    with JsonlFile(gz_path(path)) as cached:
+        assert cached.offsets == plain.offsets
+
+
+def test_missing_file_is_empty(tmp_path):
+    with JsonlFile(tmp_path / "questions_accepted.jsonl") as f:
+        assert len(f) == 0
+        assert f.sample(3) == []
+        assert list(f.project(["id"])) == []
@@ -0,0 +1,150 @@
+import threading
+from collections import Counter
+
+import pytest
+
+from llm_broker import Broker, BrokerServer, FairScheduler, coalescable, request_key
+from llm_client import BrokerClient, BrokerError, ChatClient
+
+
+def test_scheduler_shares_by_priority():
+    scheduler = FairScheduler()
+    for i in range(30):
+        scheduler.put("low", 1, i)
+        scheduler.put("high", 2, i)
+    served = Counter(scheduler.get()[0] for _ in range(30))
+    assert served == {"high": 20, "low": 10}
+
+
+def test_scheduler_keeps_fifo_within_job_and_does_not_bank_idle_time():
+    scheduler = FairScheduler()
+    for i in range(10):
+        scheduler.put("busy", 1, i)
+    assert [scheduler.get()[1] for _ in range(5)] == [0, 1, 2, 3, 4]
+    # A job arriving late starts at the current virtual time, so it alternates rather than bursting
+    for i in range(5):
+        scheduler.put("late", 1, i)
+    order = [scheduler.get()[0] for _ in range(6)]
+    assert order.count("late") == 3
+
+
+def test_scheduler_close_unblocks_workers():
+    scheduler = FairScheduler()
+    results = []
+    worker = threading.Thread(target=lambda: results.append(scheduler.get()))
+    worker.start()
+    scheduler.close()
+    worker.join(1.0)
+    assert results == [None]
+
+
+def test_request_key_ignores_dict_order():
+    a = {"model": "m", "messages": [{"role": "user", "content": "q"}], "temperature": 0.2}
+    b = {"temperature": 0.2, "messages": [{"role": "user", "content": "q"}], "model": "m"}
+    assert request_key(a) == request_key(b)
+    assert request_key(a) != request_key({**a, "seed": 1})
+
+
+def test_only_deterministic_or_shared_requests_coalesce():
+    sampled = {"model": "m", "messages": [], "temperature": 0.8}
+    assert not coalescable(sampled)
+    assert not coalescable({"model": "m", "messages": []})  # server default temperature samples
+    assert coalescable({**sampled, "seed": 3})
+    assert coalescable({**sampled, "temperature": 0})
+    assert coalescable(sampled, shared=True)
+
+
+class GatedClient(ChatClient):
+    """Upstream stand-in that blocks until released and counts calls."""
+
+    def __init__(self):
+        self.hooks = []
+        self.calls = Counter()
+        self.gate = threading.Event()
+
+    def _dispatch(self, request, timeout):
+        self.calls[request["messages"][0]["content"]] += 1
+        self.gate.wait(5)
+        if request["messages"][0]["content"] == "boom":
+            raise RuntimeError("upstream failed")
+        return {"choices": [{"text": "echo " + request["messages"][0]["content"], "finish_reason": "stop"}]}
+
+
+@pytest.fixture
+def broker_socket(tmp_path):
+    upstream = GatedClient()
+    broker = Broker(upstream, workers=4)
+    path = str(tmp_path / "broker.sock")
+    server = BrokerServer(path, broker)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield path, upstream, broker
+    server.shutdown()
+    server.server_close()
+    broker.close()
+
+
+def test_broker_coalesces_identical_requests_across_clients(broker_socket):
+    path, upstream, broker = broker_socket
+    scoring = BrokerClient(path, job="score", shared=True)
+    calibration = BrokerClient(path, job="calibration", shared=True)
+    results = []
+    threads = [
+        threading.Thread(target=lambda c=c: results.append(c.chat("m", [{"role": "user", "content": "seed-1"}], {})))
+        for c in (scoring, calibration, scoring)
+    ]
+    for thread in threads:
+        thread.start()
+    # Wait until all three are registered before letting the upstream call finish
+    for _ in range(100):
+        if sum(s["requests"] for s in broker.summary()["jobs"].values()) == 3:
+            break
+        threading.Event().wait(0.01)
+    upstream.gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert [r["choices"][0]["text"] for r in results] == ["echo seed-1"] * 3
+    assert upstream.calls["seed-1"] == 1
+    jobs = scoring.broker_stats()["jobs"]
+    assert jobs["score"]["requests"] + jobs["calibration"]["requests"] == 3
+    assert jobs["score"]["coalesced"] + jobs["calibration"]["coalesced"] == 2
+    scoring.close()
+    calibration.close()
+
+
+def test_broker_keeps_unseeded_samples_independent(broker_socket):
+    path, upstream, broker = broker_socket
+    clients = [BrokerClient(path, job=f"generate:{i}") for i in range(2)]
+    sampled = [{"role": "user", "content": "bucket"}]
+    seeded = [{"role": "user", "content": "chunk"}]
+    threads = [
+        threading.Thread(target=lambda c=c, m=m, kw=kw: c.chat("m", m, {"temperature": 0.8}, **kw))
+        for c in clients
+        for m, kw in ((sampled, {}), (seeded, {"seed": 7}))
+    ]
+    for thread in threads:
+        thread.start()
+    for _ in range(100):
+        if sum(s["requests"] for s in broker.summary()["jobs"].values()) == 4:
+            break
+        threading.Event().wait(0.01)
+    upstream.gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    # Two draws for the unseeded pair; the seeded pair has one answer either way
+    assert upstream.calls["bucket"] == 2
+    assert upstream.calls["chunk"] == 1
+    for client in clients:
+        client.close()
+
+
+def test_broker_relays_upstream_errors(broker_socket):
+    path, upstream, _ = broker_socket
+    upstream.gate.set()
+    client = BrokerClient(path, job="score")
+    with pytest.raises(BrokerError, match="upstream failed"):
+        client.chat("m", [{"role": "user", "content": "boom"}], {})
+    # The connection stays usable after an error
+    assert client.chat("m", [{"role": "user", "content": "ok"}], {})["choices"][0]["text"] == "echo ok"
+    client.close()
@@ -0,0 +1,355 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm_client import LLMClient, backoff_delay, parse_judge_json, parse_json_list
+
+
+def test_parse_json_list_from_code_block():
+    assert parse_json_list('Here you go:\n```json\n[{"question": "a?"}]\n```') == [{"question": "a?"}]
+    assert parse_json_list("no json here") is None
+
+
+def test_parse_judge_json_prefers_last_object_for_reasoning_models():
+    text = (
+        'Maybe {"leakage_score": 1, "salience_score": 0} ... final answer: '
+        '{"leakage_score": 0, "salience_score": 2, "rationale": "ok"}'
+    )
+    assert parse_judge_json(text, is_reasoning_model=True)["leakage_score"] == 0
+    assert parse_judge_json('{"leakage_score": 2, "salience_score": 1}')["leakage_score"] == 2
+
+
+def test_backoff_delay_is_capped_full_jitter():
+    rng = random.Random(0)
+    for attempt in range(10):
+        delay = backoff_delay(attempt, base=0.5, cap=4.0, rng=rng)
+        assert 0 <= delay <= min(4.0, 0.5 * 2 ** attempt)
+
+
+def bare_client(send):
+    # Skip building the HTTP pool; only the hook chain is under test
+    client = LLMClient.__new__(LLMClient)
+    client.hooks = []
+    client.hedge = False
+    client._send = lambda request, timeout: send(request)
+    return client
+
+
+def test_hooks_wrap_every_call_and_can_short_circuit():
+    sent = []
+    client = bare_client(lambda request: sent.append(request) or {"choices": [{"text": "live"}]})
+    cache = {}
+
+    def cache_hook(request, call):
+        key = request["messages"][0]["content"]
+        if key not in cache:
+            cache[key] = call(request)
+        return cache[key]
+
+    seen = []
+    client.add_hook(cache_hook)
+    client.add_hook(lambda request, call: seen.append(request["model"]) or call(request))
+
+    for _ in range(3):
+        assert client.chat("m", [{"role": "user", "content": "p"}], {"temperature": 0})["choices"][0]["text"] == "live"
+    assert len(sent) == 1
+    assert seen == ["m", "m", "m"]
+    assert "n" not in sent[0] and "seed" not in sent[0]
+
+
+def test_chat_only_sends_n_and_seed_when_set():
+    sent = []
+    client = bare_client(lambda request: sent.append(request) or {"choices": []})
+    client.chat("m", [], {}, n=3, seed=7)
+    assert sent[0]["n"] == 3 and sent[0]["seed"] == 7
+
+
+class FakeEndpoint:
+    def __init__(self, url, healthy=True):
+        self.healthy = healthy
+        self.url = url
+
+    def make(self):
+        from llm_client import Endpoint
+
+        endpoint = Endpoint(self.url, client=None)
+        endpoint.probe = lambda timeout=5.0: self.healthy
+        return endpoint
+
+
+def test_pool_routes_to_least_outstanding():
+    from llm_client import EndpointPool
+
+    pool = EndpointPool([FakeEndpoint("a").make(), FakeEndpoint("b").make()])
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first.url, second.url} == {"a", "b"}
+    pool.release(first)
+    assert pool.acquire().url == first.url
+
+
+def test_pool_ejects_after_consecutive_failures_and_readmits_on_probe():
+    from llm_client import EndpointPool
+
+    fakes = [FakeEndpoint("a"), FakeEndpoint("b")]
+    pool = EndpointPool([f.make() for f in fakes], eject_after=2, eject_seconds=60.0)
+    error = server_error(503)
+    for _ in range(2):
+        endpoint = pool.acquire(exclude={"b"})
+        pool.release(endpoint, error=error)
+    assert pool.healthy_count() == 1
+    assert all(pool.acquire().url == "b" for _ in range(3))
+
+    # Cooldown over, but the probe fails: stays out
+    pool.endpoints[0].ejected_until = 1e-9
+    fakes[0].healthy = False
+    pool.acquire()
+    assert pool.healthy_count() == 1
+    pool.endpoints[0].ejected_until = 1e-9
+    fakes[0].healthy = True
+    pool.acquire()
+    assert pool.healthy_count() == 2
+
+
+def test_pool_ignores_non_retryable_errors_for_health():
+    from llm_client import EndpointPool
+
+    pool = EndpointPool([FakeEndpoint("a").make()], eject_after=1)
+    endpoint = pool.acquire()
+    pool.release(endpoint, error=ValueError("bad request"))
+    assert pool.healthy_count() == 1
+
+
+def server_error(status):
+    import openai
+
+    # Built without an HTTP response; only the status code matters for routing
+    error = openai.InternalServerError.__new__(openai.InternalServerError)
+    error.status_code = status
+    return error
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Minimal OpenAI-compatible replica. `server.fail` makes chat completions
+    return 503 and `server.delay` holds each response back that many seconds.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply(200, {"object": "list", "data": [{"id": "m", "object": "model"}]})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.server.fail:
+            self._reply(503, {"error": {"message": "overloaded"}})
+            return
+        time.sleep(self.server.delay)
+        text = f"ok from {self.server.server_address[1]}"
+        if not request.get("stream"):
+            self._reply(200, {
+                "id": "x",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "m",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        base = {"id": "x", "object": "chat.completion.chunk", "created": 0, "model": "m"}
+        events = [
+            {**base, "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]},
+            {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]},
+            {**base, "choices": [], "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}},
+        ]
+        for event in events:
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # cancelled hedges disconnect mid-response
+
+
+@pytest.fixture
+def stub_servers():
+    servers = []
+
+    def start(fail=False, delay=0.0):
+        server = StubServer(("127.0.0.1", 0), StubHandler)
+        server.fail = fail
+        server.delay = delay
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_client_fails_over_from_broken_replica(stub_servers):
+    pytest.importorskip("httpx")
+    good = stub_servers()
+    bad = stub_servers(fail=True)
+    client = LLMClient(f"{good},{bad}", "not-needed", concurrency=4, max_retries=3, eject_after=1)
+    endpoints = [client.chat("m", [{"role": "user", "content": "hi"}], {})["endpoint"] for _ in range(6)]
+    assert set(endpoints) == {good}
+    stats = {e["url"]: e for e in client.endpoint_stats()}
+    assert stats[bad]["ejections"] == 1
+    client.close()
+
+
+def test_client_skips_replica_that_is_down_at_start(stub_servers):
+    pytest.importorskip("httpx")
+    good = stub_servers()
+    client = LLMClient(f"http://127.0.0.1:9/v1,{good}", "not-needed", max_retries=2)
+    assert client.chat("m", [{"role": "user", "content": "hi"}], {})["endpoint"] == good
+    client.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_round(limiter, clock, seconds=1.0, tokens=100):
+    """Fill every slot, then complete them all after `seconds`."""
+    starts = [limiter.acquire() for _ in range(int(limiter.limit))]
+    clock.now += seconds
+    for started in starts:
+        limiter.waiting += 1  # the next round is already queued behind this one
+        limiter.release(started, tokens=tokens)
+        limiter.waiting -= 1
+
+
+def test_aimd_increases_by_about_one_per_saturated_round():
+    from llm_client import AIMDLimiter
+
+    clock = FakeClock()
+    limiter = AIMDLimiter(4, max_limit=16, clock=clock)
+    for _ in range(4):
+        run_round(limiter, clock)
+    assert 7 <= limiter.limit <= 8
+    assert {h["reason"] for h in limiter.history[1:]} == {"increase"}
+
+
+def test_aimd_does_not_grow_when_limit_is_not_the_bottleneck():
+    from llm_client import AIMDLimiter
+
+    clock = FakeClock()
+    limiter = AIMDLimiter(4, clock=clock)
+    for _ in range(20):
+        started = limiter.acquire()
+        clock.now += 1.0
+        limiter.release(started, tokens=100)
+    assert int(limiter.limit) == 4
+
+
+def test_aimd_halves_once_per_round_trip_on_errors():
+    from llm_client import AIMDLimiter
+
+    clock = FakeClock()
+    limiter = AIMDLimiter(8, clock=clock)
+    starts = [limiter.acquire() for _ in range(8)]
+    clock.now += 1.0
+    # A burst of failures from requests in flight together only cuts once
+    for started in starts:
+        limiter.release(started, error=server_error(503))
+    assert int(limiter.limit) == 4
+    started = limiter.acquire()
+    clock.now += 1.0
+    limiter.release(started, error=server_error(503))
+    assert int(limiter.limit) == 2
+    # Non-retryable errors don't signal congestion
+    limiter.release(limiter.acquire(), error=ValueError("bad request"))
+    assert int(limiter.limit) == 2
+
+
+def test_aimd_backs_off_on_per_token_latency_and_respects_bounds():
+    from llm_client import AIMDLimiter
+
+    clock = FakeClock()
+    limiter = AIMDLimiter(10, min_limit=2, max_limit=10, latency_backoff=0.5, clock=clock)
+    run_round(limiter, clock, seconds=1.0, tokens=100)  # floor: 0.01 s/token
+    run_round(limiter, clock, seconds=20.0, tokens=1000)  # long, but not slow per token
+    assert int(limiter.limit) == 10
+    for _ in range(5):
+        run_round(limiter, clock, seconds=5.0, tokens=100)  # 5x the floor per token
+    assert int(limiter.limit) == 2
+    assert limiter.summary()["peak_limit"] == 10
+    assert limiter.history[-1]["reason"] == "latency"
+
+
+def test_aimd_acquire_blocks_at_limit():
+    from llm_client import AIMDLimiter
+
+    limiter = AIMDLimiter(2)
+    held = [limiter.acquire() for _ in range(2)]
+    acquired = threading.Event()
+    threading.Thread(target=lambda: (limiter.acquire(), acquired.set()), daemon=True).start()
+    assert not acquired.wait(0.1)
+    limiter.release(held[0], tokens=10)
+    assert acquired.wait(1.0)
+
+
+def test_latency_tracker_waits_for_samples_then_reports_p95():
+    from llm_client import LatencyTracker
+
+    tracker = LatencyTracker(window=100, min_samples=20)
+    for i in range(19):
+        tracker.add(float(i))
+    assert tracker.threshold() is None
+    for i in range(19, 100):
+        tracker.add(float(i))
+    assert tracker.threshold() == 95.0
+
+
+def test_projected_saving_uses_loser_streaming_rate():
+    from llm_client import projected_saving
+
+    # The loser streamed 100 of the 400 chars the winner produced in 2s: ~6s still to go
+    assert projected_saving(2.0, 100, 400) == 6.0
+    assert projected_saving(2.0, 0, 400) == 0.0
+    assert projected_saving(2.0, 500, 400) == 0.0
+
+
+def test_hedge_races_slow_replica_and_first_response_wins(stub_servers):
+    pytest.importorskip("httpx")
+    slow = stub_servers(delay=3.0)
+    fast = stub_servers()
+    client = LLMClient(f"{slow},{fast}", "not-needed", concurrency=2, hedge=True)
+    for _ in range(20):
+        client.latency.add(0.05)
+    start = time.monotonic()
+    result = client.chat("m", [{"role": "user", "content": "hi"}], {})
+    assert time.monotonic() - start < 2.0
+    assert result["endpoint"] == fast
+    assert result["choices"][0]["text"].startswith("ok from")
+    summary = client.hedge_summary()
+    assert summary["hedged"] == 1 and summary["hedge_wins"] == 1
+    client.close()
@@ -0,0 +1,103 @@
+import json
+import random
+
+import pytest
+
+from llm_client import LLMClient, parse_judge_json
+from llm_stub_server import (
+    StubModel,
+    parse_distribution,
+    serve_in_thread,
+    synth_generation,
+    synth_judgement,
+    truncate_tokens,
+)
+from phase1_generate_questions import ROOT, load_generation_template, render_template
+from phase1_score_questions import render_prompt
+
+DOMAIN = {"id": "food_dining", "name": "Food and dining", "description": "Eating at home or out."}
+
+
+def generation_prompt(num_questions=5):
+    return render_template(load_generation_template("advisory"), DOMAIN, {"id": "advisory"}, num_questions)
+
+
+def judge_prompt(question):
+    return render_prompt((ROOT / "prompts" / "judges" / "leakage_salience.md").read_text(), question)
+
+
+def chat(body_messages, **extra):
+    return {"model": "m", "messages": [{"role": "user", "content": body_messages}], **extra}
+
+
+@pytest.mark.parametrize("spec", ["fixed:0.2", "uniform:0.1,0.3", "normal:0.2,0.05", "lognormal:0.2,0.5", "exponential:0.2"])
+def test_parse_distribution_samples_non_negative(spec):
+    sample = parse_distribution(spec)
+    rng = random.Random(0)
+    assert all(sample(rng) >= 0 for _ in range(100))
+
+
+@pytest.mark.parametrize("spec", ["gamma:1,2", "fixed", "uniform:1", "lognormal:x,1"])
+def test_parse_distribution_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_distribution(spec)
+
+
+def test_synth_generation_matches_template_request():
+    questions = json.loads(synth_generation(generation_prompt(7), random.Random(1), leak_rate=0.0))
+    assert len(questions) == 7
+    assert all(q["domain"] == "food_dining" and q["question_type"] == "advisory" for q in questions)
+    assert all(q["question"].endswith("?") and "food and dining" in q["question"] for q in questions)
+    assert synth_generation("Say hello", random.Random(1), 0.0) is None
+
+
+def test_synth_judgement_flags_leaked_questions():
+    leaked = json.loads(synth_judgement(judge_prompt("How do I pay rent in Singapore?"), random.Random(0), 0.0))
+    assert leaked["leakage_score"] == 2
+    clean = judge_prompt("How should a renter check a lease?")
+    # Without disagreement every sample of a question gets the same verdict
+    verdicts = {synth_judgement(clean, random.Random(seed), 0.0) for seed in range(5)}
+    assert len(verdicts) == 1
+
+
+def test_truncate_tokens_cuts_after_limit():
+    assert truncate_tokens('{"a": 1, "b": 2}', 5) == '{"a":'
+    assert truncate_tokens("short", 10) == "short"
+
+
+def test_stub_model_is_deterministic_and_honours_max_tokens():
+    body = chat(generation_prompt(10), max_tokens=20)
+    first = StubModel(ttft="fixed:0").complete(body)
+    second = StubModel(ttft="fixed:0").complete(body)
+    assert first[1]["choices"] == second[1]["choices"]
+    assert first[1]["choices"][0]["finish_reason"] == "length"
+    assert first[1]["usage"]["completion_tokens"] == 20
+
+
+def test_stub_model_retries_draw_fresh_errors():
+    model = StubModel(ttft="fixed:0", error_rate=0.5)
+    body = chat("Say hello")
+    statuses = [model.complete(body)[0] for _ in range(20)]
+    assert 503 in statuses and 200 in statuses
+    assert model.summary()["errors"] == statuses.count(503)
+
+
+def test_stub_model_reports_cached_prefix_tokens():
+    model = StubModel(ttft="fixed:0")
+    model.complete(chat(generation_prompt(5)))
+    usage = model.complete(chat(generation_prompt(6)))[1]["usage"]
+    assert 0 < usage["prompt_tokens_details"]["cached_tokens"] < usage["prompt_tokens"]
+
+
+def test_llm_client_against_stub_server():
+    pytest.importorskip("httpx")
+    server = serve_in_thread(StubModel(ttft="fixed:0", error_rate=0.3))
+    client = LLMClient(f"http://127.0.0.1:{server.server_address[1]}/v1", "x", max_retries=10, backoff_base=0.001)
+    try:
+        response = client.chat("m", [{"role": "user", "content": judge_prompt("How should a renter check a lease?")}], {}, n=3)
+        assert len(response["choices"]) == 3
+        assert all(parse_judge_json(c["text"])["leakage_score"] in (0, 1) for c in response["choices"])
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
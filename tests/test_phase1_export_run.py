@@ -0,0 +1,37 @@
+import json
+import sys
+
+import phase1_export_run
+from artifact_io import gz_path, open_artifact
+from phase1_filter_questions import filter_question
+from run_artifacts import StageWriter, iter_records, sidecar_path, snapshot
+
+
+def write_run(run_dir):
+    run_dir.mkdir(parents=True)
+    records = [
+        {"id": "q1", "question": "How do I renew a rental lease before it expires?", "domain": "housing_utilities"},
+        {"id": "q2", "question": "what", "domain": "food_dining"},
+    ]
+    with open(run_dir / "questions_raw.jsonl", "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    with StageWriter(run_dir / "questions_filtered.jsonl", sidecars=True) as writer:
+        for row, record in enumerate(records):
+            before = snapshot(record)
+            writer.write(row, filter_question(record), before)
+
+
+def test_export_all_compressed(tmp_path, monkeypatch):
+    run_dir = tmp_path / "data" / "runs" / "r"
+    write_run(run_dir)
+    assert sidecar_path(run_dir / "questions_filtered.jsonl").exists()
+    monkeypatch.setattr(phase1_export_run, "ROOT", tmp_path)
+    monkeypatch.setattr(sys, "argv", ["phase1_export_run.py", "--run-id", "r", "--all", "--compress"])
+    assert phase1_export_run.main() == 0
+
+    merged = gz_path(run_dir / "questions_filtered.merged.jsonl")
+    assert merged.exists() and not (run_dir / "questions_filtered.merged.jsonl").exists()
+    with open_artifact(merged) as f:
+        exported = [json.loads(line) for line in f]
+    assert exported == list(iter_records(run_dir / "questions_filtered.jsonl"))
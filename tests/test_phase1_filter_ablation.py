@@ -0,0 +1,67 @@
+import random
+from itertools import combinations
+
+from bench_hotpaths import synth_questions
+from phase1_filter_ablation import FILTER_CHECKS, run_ablation, subset_sums
+from phase1_filter_questions import CHECK_BITS, filter_question
+
+
+def filtered_records(n, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for question in synth_questions(n, leak_rate=0.3, pii_rate=0.1, seed=seed):
+        record = {"question": question, "domain": rng.choice(["food", "housing"]), "question_type": rng.choice(["a", "b"])}
+        records.append(filter_question(record))
+    return records
+
+
+def test_fail_mask_matches_filter_flags():
+    for record in filtered_records(500):
+        filters = record["filters"]
+        mask = filters["fail_mask"]
+        assert filters["passed"] == (mask == 0)
+        assert filters.get("explicit_leakage", False) == bool(mask & CHECK_BITS["explicit_blocklist"])
+        assert filters["is_question"] == (not mask & CHECK_BITS["is_question"])
+        assert filters["pii"] == any(mask & CHECK_BITS[name] for name in FILTER_CHECKS if name.startswith("pii_"))
+
+
+def test_every_check_is_recorded_not_just_the_first():
+    filters = filter_question({"question": "call 555-123-4567 or x@y.com about tipping in london"})["filters"]
+    failed = {name for name in FILTER_CHECKS if filters["fail_mask"] & CHECK_BITS[name]}
+    assert failed == {"explicit_blocklist", "implicit_blocklist", "is_question", "pii_email", "pii_phone"}
+    assert filters["block_category"] == "explicit" and filters["pii_type"] == "email"
+
+
+def test_subset_sums_match_brute_force():
+    records = filtered_records(400, seed=1)
+    results = run_ablation(records, max_k=3)
+    overall = results["overall"]
+    assert overall["total"] == 400
+    assert overall["passed"] == sum(r["filters"]["passed"] for r in records)
+    assert len(overall["combinations"]) == sum(1 for k in range(4) for _ in combinations(FILTER_CHECKS, k))
+    for row in overall["combinations"]:
+        removed = sum(CHECK_BITS[name] for name in row["removed"])
+        survivors = [r for r in records if not r["filters"]["fail_mask"] & ~removed]
+        assert row["survivors"] == len(survivors)
+        assert row["blocklist_hits"] == sum(1 for r in survivors if r["filters"]["blocked"])
+    # The groups partition the run
+    for groups in (results["by_domain"], results["by_type"]):
+        for i, row in enumerate(overall["combinations"]):
+            assert row["survivors"] == sum(g["combinations"][i]["survivors"] for g in groups.values())
+
+
+def test_subset_sums_of_single_mask():
+    counts = [0] * (1 << len(FILTER_CHECKS))
+    counts[0b101] = 7
+    sums = subset_sums(counts)
+    assert sums[0b101] == sums[0b111] == 7
+    assert sums[0b001] == sums[0b100] == sums[0] == 0
+
+
+def test_masks_recomputed_for_older_runs():
+    records = filtered_records(50, seed=2)
+    for record in records[::2]:
+        del record["filters"]["fail_mask"]
+    results = run_ablation(records, max_k=1)
+    assert results["recomputed_masks"] == 25
+    assert results["overall"]["passed"] == sum(r["filters"]["passed"] for r in records)
@@ -0,0 +1,99 @@
+import re
+
+import pytest
+
+from phase1_generate_questions import (
+    ROOT,
+    chunk_seed,
+    merge_chunk_results,
+    plan_chunks,
+    render_chunk_hint,
+    template_order,
+)
+
+
+def test_plan_chunks_splits_evenly():
+    assert plan_chunks(30, 10) == [10, 10, 10]
+    assert plan_chunks(20, 10) == [10, 10]
+
+
+def test_plan_chunks_spreads_remainder():
+    assert plan_chunks(25, 10) == [9, 8, 8]
+    assert sum(plan_chunks(31, 7)) == 31
+
+
+def test_plan_chunks_single_request_when_unchunked():
+    assert plan_chunks(30, None) == [30]
+    assert plan_chunks(30, 30) == [30]
+    assert plan_chunks(30, 50) == [30]
+
+
+@pytest.mark.parametrize("chunk_size", [0, -5])
+def test_plan_chunks_rejects_invalid_size(chunk_size):
+    with pytest.raises(ValueError):
+        plan_chunks(30, chunk_size)
+
+
+def test_chunk_seed_is_deterministic_and_distinct():
+    seed = chunk_seed("run_001", "food_dining", "advisory", 0)
+    assert seed == chunk_seed("run_001", "food_dining", "advisory", 0)
+    assert seed != chunk_seed("run_001", "food_dining", "advisory", 1)
+    assert seed != chunk_seed("run_002", "food_dining", "advisory", 0)
+    assert 0 <= seed < 2**32
+
+
+def test_merge_chunk_results_keeps_successful_chunks():
+    chunks = [{"index": 0}, {"index": 1}, {"index": 2}]
+    results = [
+        {"questions": [{"question": "a?"}, {"question": "b?"}], "raw": "[...]", "error": None},
+        {"questions": [], "raw": None, "error": "timeout"},
+        {"questions": [], "raw": "not json", "error": None},
+    ]
+    merged, failures = merge_chunk_results(chunks, results)
+
+    assert [(c["index"], q["question"]) for c, q in merged] == [(0, "a?"), (0, "b?")]
+    assert failures[0] == (1, "ERROR: timeout")
+    assert failures[1][0] == 2 and failures[1][1].startswith("PARSE_FAIL")
+
+
+def test_merge_chunk_results_preserves_chunk_order():
+    chunks = [{"index": 0}, {"index": 1}]
+    results = [
+        {"questions": [{"question": "first?"}], "raw": "", "error": None},
+        {"questions": [{"question": "second?"}], "raw": "", "error": None},
+    ]
+    merged, failures = merge_chunk_results(chunks, results)
+    assert [q["question"] for _, q in merged] == ["first?", "second?"]
+    assert failures == []
+
+
+def test_chunk_seed_varies_by_round():
+    assert chunk_seed("run_001", "food_dining", "advisory", 0, 1) != chunk_seed(
+        "run_001", "food_dining", "advisory", 0, 2
+    )
+
+
+def test_chunk_hint_rotates_angles_between_rounds():
+    round1 = [render_chunk_hint(i, 3, 1) for i in range(3)]
+    round2 = [render_chunk_hint(i, 3, 2) for i in range(3)]
+    assert not set(round1) & set(round2)
+
+
+@pytest.mark.parametrize("path", sorted((ROOT / "prompts" / "generation").glob("question_gen_*.md")), ids=lambda p: p.stem)
+def test_generation_templates_keep_variables_last(path):
+    # Everything before the final Domain section must be static so buckets share a cached prefix
+    template = path.read_text()
+    static, _, variables = template.rpartition("## Domain\n")
+    assert static and "{{" not in static
+    assert set(re.findall(r"\{\{(\w+)\}\}", variables)) == {"domain_id", "domain_name", "domain_description", "num_questions"}
+
+
+def test_template_order_groups_buckets_by_template():
+    def bucket(domain, qtype, num_chunks):
+        return ({"id": domain}, {"id": qtype}, 10, [{"name": f"{domain}/{qtype}/{i}"} for i in range(num_chunks)])
+
+    buckets = [bucket("food", "advisory", 2), bucket("food", "reflective", 1), bucket("work", "advisory", 1), bucket("work", "reflective", 2)]
+    assert [chunk["name"] for chunk in template_order(buckets)] == [
+        "food/advisory/0", "food/advisory/1", "work/advisory/0",
+        "food/reflective/0", "work/reflective/0", "work/reflective/1",
+    ]
@@ -0,0 +1,66 @@
+import json
+import random
+from collections import Counter
+
+from phase1_report import Reservoir, collect_from_files
+
+
+def write_jsonl(path, records):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def test_reservoir_keeps_short_streams_whole():
+    reservoir = Reservoir(5, random.Random(0))
+    for i in range(3):
+        reservoir.add(i)
+    assert reservoir.items == [0, 1, 2] and reservoir.seen == 3
+
+
+def test_reservoir_is_uniform():
+    counts = Counter()
+    for seed in range(2000):
+        reservoir = Reservoir(2, random.Random(seed))
+        for i in range(10):
+            reservoir.add(i)
+        counts.update(reservoir.items)
+    # Each item is kept with probability 2/10: 400 expected per item
+    assert all(320 < counts[i] < 480 for i in range(10))
+
+
+def test_streaming_report(tmp_path):
+    scored = [
+        {
+            "id": f"q{i}",
+            "question": f"Question {i}?",
+            "domain": f"d{i % 2}",
+            "question_type": "t",
+            "leakage_score": i % 3,
+            "salience_score": 1,
+            "filters": {"passed": True, "dedup_passed": True, "novelty_score": 0.5, "accepted": i % 3 == 0},
+        }
+        for i in range(30)
+    ]
+    write_jsonl(tmp_path / "questions_raw.jsonl", scored + [{"id": "dup", "question": "x"}])
+    write_jsonl(tmp_path / "questions_filtered.jsonl", scored + [{"id": "dup", "filters": {"passed": False, "pii": True}}])
+    write_jsonl(tmp_path / "questions_deduped.jsonl", scored)
+    write_jsonl(tmp_path / "questions_scored.jsonl", scored)
+    write_jsonl(tmp_path / "questions_accepted.jsonl", [r for r in scored if r["filters"]["accepted"]])
+
+    stats = collect_from_files(tmp_path, sample=3, seed=7)
+    assert stats["funnel"] == [
+        ("Raw generated", 31),
+        ("Passed filters", 30),
+        ("Passed dedup", 30),
+        ("Scored", 30),
+        ("Accepted", 10),
+    ]
+    assert stats["filter_stats"]["pii"] == 1
+    assert stats["avg_novelty"] == 0.5
+    assert stats["leakage_dist"] == {0: 10, 1: 10, 2: 10}
+    assert {d: dict(c) for d, c in stats["coverage"].items()} == {"d0": {"t": 5}, "d1": {"t": 5}}
+    assert len(stats["sample_accepted"]) == 3 and all(r["filters"]["accepted"] for r in stats["sample_accepted"])
+    assert all(r["leakage_score"] > 0 for r in stats["sample_rejected"])
+    # Fixed seed: the same audit sample every time
+    assert collect_from_files(tmp_path, sample=3, seed=7)["sample_rejected"] == stats["sample_rejected"]
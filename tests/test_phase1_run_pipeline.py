@@ -0,0 +1,55 @@
+import json
+
+from phase1_run_pipeline import MIN_YIELD, plan_shortfall, write_quota_manifest
+
+DOMAINS = ["food_dining", "housing_utilities"]
+TYPES = ["advisory", "procedural"]
+
+
+def test_full_cells_are_not_planned():
+    coverage = {"food_dining": {"advisory": 10}}
+    generated = {("food_dining", "advisory"): 20}
+    plan = plan_shortfall(generated, coverage, ["food_dining"], ["advisory"], target=10)
+    assert plan == {}
+
+
+def test_every_cell_full_returns_empty_plan():
+    coverage = {d: {t: 12 for t in TYPES} for d in DOMAINS}
+    generated = {(d, t): 30 for d in DOMAINS for t in TYPES}
+    assert plan_shortfall(generated, coverage, DOMAINS, TYPES, target=10) == {}
+
+
+def test_zero_generation_bucket_uses_run_wide_yield():
+    # Run-wide yield is 50%, the empty bucket inherits it through the prior
+    coverage = {"food_dining": {"advisory": 10}}
+    generated = {("food_dining", "advisory"): 20}
+    plan = plan_shortfall(
+        generated, coverage, DOMAINS, ["advisory"], target=10, overgenerate=1.0, max_request=1000
+    )
+    assert plan == {"housing_utilities": {"advisory": 20}}
+
+
+def test_zero_global_yield_falls_back_to_min_yield():
+    generated = {("food_dining", "advisory"): 30}
+    plan = plan_shortfall(
+        generated, {}, ["food_dining"], ["advisory"], target=2, overgenerate=1.0, max_request=1000
+    )
+    assert plan == {"food_dining": {"advisory": round(2 / MIN_YIELD)}}
+
+
+def test_requests_are_clamped():
+    generated = {("food_dining", "advisory"): 100, ("food_dining", "procedural"): 100}
+    coverage = {"food_dining": {"advisory": 99, "procedural": 0}}
+    plan = plan_shortfall(
+        generated, coverage, ["food_dining"], TYPES, target=100, min_request=5, max_request=40
+    )
+    # advisory needs ~1 more question, procedural needs far more than the cap
+    assert plan == {"food_dining": {"advisory": 5, "procedural": 40}}
+
+
+def test_write_quota_manifest_keeps_existing_fields(tmp_path):
+    (tmp_path / "run_manifest.json").write_text(json.dumps({"step": "generate", "total_generated": 5}))
+    write_quota_manifest(tmp_path, 10, [{"round": 1, "cells_full": 0}])
+    manifest = json.loads((tmp_path / "run_manifest.json").read_text())
+    assert manifest["step"] == "generate"
+    assert manifest["quota"] == {"target_accepted_per_bucket": 10, "rounds": [{"round": 1, "cells_full": 0}]}
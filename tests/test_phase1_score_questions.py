@@ -0,0 +1,254 @@
+import json
+from itertools import islice
+
+import pytest
+
+from phase1_score_questions import (
+    CoverageScheduler,
+    StratifiedEstimator,
+    count_accepted_by_cell,
+    stratified_sample_order,
+)
+
+
+def make(i, domain, qtype, accepted=None):
+    filters = {"dedup_passed": True}
+    if accepted is not None:
+        filters["accepted"] = accepted
+    return {"id": f"q{i}", "domain": domain, "question_type": qtype, "filters": filters}
+
+
+def test_scheduler_prefers_least_filled_cell():
+    records = [make(0, "a", "x"), make(1, "a", "x"), make(2, "b", "x"), make(3, "b", "x")]
+    scheduler = CoverageScheduler(records, {("a", "x"): 2}, target=3)
+    order = [r["id"] for r in scheduler]
+    # Cell b starts 3 short and a only 1 short, so b is drained first until it catches up
+    assert order[:2] == ["q2", "q3"]
+    assert set(order) == {"q0", "q1", "q2", "q3"}
+
+
+def test_scheduler_stops_cell_at_target_and_defers_rest():
+    records = [make(i, "a", "x") for i in range(5)]
+    scheduler = CoverageScheduler(records, {}, target=2)
+    scored = []
+    for record in scheduler:
+        scored.append(record["id"])
+        scheduler.record_accepted(record)
+    assert scored == ["q0", "q1"]
+    assert [r["id"] for r in scheduler.deferred()] == ["q2", "q3", "q4"]
+
+
+def test_scheduler_does_not_defer_cells_cut_short_by_limit():
+    records = [make(i, "a", "x") for i in range(3)] + [make(10 + i, "b", "x") for i in range(3)]
+    scheduler = CoverageScheduler(records, {("a", "x"): 1}, target=2)
+    # --limit 2: b (2 short) gets q10, then the 1-short tie goes to a
+    scored = []
+    for record in islice(scheduler, 2):
+        scored.append(record["id"])
+        scheduler.record_accepted(record)
+    assert scored == ["q10", "q0"]
+    # a reached its target; b is still short and was only stopped by the limit
+    assert [r["id"] for r in scheduler.deferred()] == ["q1", "q2"]
+
+
+def test_scheduler_keeps_scoring_cell_with_rejections():
+    records = [make(i, "a", "x") for i in range(3)]
+    scheduler = CoverageScheduler(records, {}, target=1)
+    assert [r["id"] for r in scheduler] == ["q0", "q1", "q2"]
+    assert scheduler.deferred() == []
+
+
+def test_count_accepted_by_cell_requires_dedup_pass():
+    records = [make(0, "a", "x", accepted=True), make(1, "a", "x", accepted=False)]
+    stale = make(2, "a", "x", accepted=True)
+    stale["filters"]["dedup_passed"] = False
+    assert count_accepted_by_cell(records + [stale]) == {("a", "x"): 1}
+
+
+def test_stratified_order_is_proportional_and_seeded():
+    records = [make(i, "a", "x") for i in range(20)] + [make(100 + i, "b", "x") for i in range(10)]
+    order = stratified_sample_order(records, seed=1)
+    assert sorted(r["id"] for r in order) == sorted(r["id"] for r in records)
+    first = order[:9]
+    assert sum(r["domain"] == "a" for r in first) == 6
+    assert [r["id"] for r in order] == [r["id"] for r in stratified_sample_order(records, seed=1)]
+    assert [r["id"] for r in order] != [r["id"] for r in stratified_sample_order(records, seed=2)]
+
+
+def test_stratified_order_covers_every_stratum_first():
+    # 83 cells of 120 questions and one of 5: proportional order alone would reach the small cell after ~1,900 draws
+    records = [make(c * 1000 + i, f"d{c}", "x") for c in range(83) for i in range(120)]
+    records += [make(99000 + i, "small", "x") for i in range(5)]
+    order = stratified_sample_order(records, seed=0)
+    assert sorted(r["id"] for r in order) == sorted(r["id"] for r in records)
+    assert len({r["domain"] for r in order[:84]}) == 84
+    assert order[83]["domain"] == "small"
+    # After the first round the small cell waits its proportional turn again
+    assert sum(r["domain"] == "small" for r in order[:500]) == 1
+
+
+def test_estimator_weights_strata_by_population():
+    estimator = StratifiedEstimator({("a", "x"): 90, ("b", "x"): 10}, ["rate"])
+    for _ in range(10):
+        estimator.add(("a", "x"), {"rate": True})
+        estimator.add(("b", "x"), {"rate": False})
+    point, low, high = estimator.estimate("rate")
+    assert point == 0.9
+    assert low < point < high
+
+
+def test_estimator_interval_shrinks_to_zero_when_population_exhausted():
+    estimator = StratifiedEstimator({("a", "x"): 5}, ["rate"])
+    for hit in [True, True, False, True, False]:
+        estimator.add(("a", "x"), {"rate": hit})
+    assert estimator.estimate("rate") == (0.6, 0.6, 0.6)
+    assert estimator.max_half_width() == 0.0
+
+
+def test_vote_settled_stops_on_initial_agreement():
+    from collections import Counter
+
+    from phase1_score_questions import vote_settled
+
+    assert vote_settled(Counter({(0, 2): 2}), drawn=2, initial=2, max_samples=5)
+    # A split vote keeps sampling until the leader can't be caught
+    assert not vote_settled(Counter({(0, 2): 1, (1, 2): 1}), drawn=2, initial=2, max_samples=5)
+    assert not vote_settled(Counter({(0, 2): 2, (1, 2): 1}), drawn=3, initial=2, max_samples=5)
+    assert vote_settled(Counter({(0, 2): 3, (1, 2): 1}), drawn=4, initial=2, max_samples=5)
+    # A tie at the sample cap isn't "settled"; the caller stops at max_samples regardless
+    assert not vote_settled(Counter({(0, 2): 2, (1, 2): 2}), drawn=4, initial=2, max_samples=4)
+
+
+def test_tally_votes_majority_and_agreement():
+    from phase1_score_questions import tally_votes
+
+    samples = [
+        {"leakage_score": 0, "salience_score": 2, "rationale": "a"},
+        None,
+        {"leakage_score": 1, "salience_score": 2, "rationale": "b"},
+        {"leakage_score": 0, "salience_score": 2, "rationale": "c"},
+    ]
+    result = tally_votes(samples)
+    assert result["parsed"]["rationale"] == "a"
+    assert result["votes"] == [[0, 2], [1, 2], [0, 2]]
+    assert result["agreement"] == round(2 / 3, 3)
+    assert tally_votes([None])["parsed"] is None
+
+
+def test_score_question_voted_draws_more_only_on_split():
+    from phase1_score_questions import score_question_voted
+
+    class FakeClient:
+        def __init__(self, answers):
+            self.answers = list(answers)
+            self.calls = []
+
+        def chat(self, model, messages, params, n=1):
+            self.calls.append(n)
+            drawn, self.answers = self.answers[:n], self.answers[n:]
+            return {"choices": [{"text": t, "finish_reason": "stop"} for t in drawn]}
+
+    agree = '{"leakage_score": 0, "salience_score": 2}'
+    leak = '{"leakage_score": 1, "salience_score": 2}'
+    voting = {"initial": 2, "batch": 2, "max_samples": 6}
+
+    easy = FakeClient([agree, agree])
+    result = score_question_voted(easy, "m", {}, "{{question}}", "q", voting=dict(voting))
+    assert easy.calls == [2] and result["samples"] == 2 and result["agreement"] == 1.0
+
+    hard = FakeClient([agree, leak, agree, agree, leak, leak])
+    result = score_question_voted(hard, "m", {}, "{{question}}", "q", voting=dict(voting))
+    assert hard.calls == [2, 2, 2]
+    assert result["samples"] == 6
+    assert result["parsed"]["leakage_score"] == 0
+    assert result["agreement"] == 0.5
+
+
+def test_score_question_voted_falls_back_only_when_n_is_rejected():
+    httpx = pytest.importorskip("httpx")
+    import openai
+
+    from phase1_score_questions import score_question_voted
+
+    request = httpx.Request("POST", "http://server/v1/chat/completions")
+    agree = '{"leakage_score": 0, "salience_score": 2}'
+
+    class FakeClient:
+        def __init__(self, error):
+            self.error = error
+            self.calls = []
+
+        def chat(self, model, messages, params, n=1):
+            self.calls.append(n)
+            if n > 1:
+                raise self.error
+            return {"choices": [{"text": agree, "finish_reason": "stop"}]}
+
+    rejected = openai.BadRequestError(
+        "Error code: 400 - n must be 1 when using greedy sampling", response=httpx.Response(400, request=request), body=None
+    )
+    client, voting = FakeClient(rejected), {"initial": 2}
+    result = score_question_voted(client, "m", {}, "{{question}}", "q", voting=voting)
+    assert client.calls == [2, 1, 1] and result["samples"] == 2
+    assert voting["use_n"] is False
+
+    for error in (
+        openai.APITimeoutError(request=request),
+        openai.InternalServerError("Error code: 503", response=httpx.Response(503, request=request), body=None),
+        openai.BadRequestError("Error code: 400 - prompt is too long", response=httpx.Response(400, request=request), body=None),
+    ):
+        client, voting = FakeClient(error), {"initial": 2}
+        with pytest.raises(type(error)):
+            score_question_voted(client, "m", {}, "{{question}}", "q", voting=voting)
+        assert voting.get("use_n", True) and client.calls == [2]
+
+
+@pytest.mark.parametrize("store", [False, True])
+def test_prejudged_records_count_as_scored_in_later_rounds(tmp_path, store):
+    from phase1_filter_questions import filter_question
+    from phase1_score_questions import apply_prejudgement, load_prior_scores, records_to_score
+    from run_artifacts import StageWriter, iter_records, load_stage, snapshot, stage_exists
+
+    questions = [
+        "How do I renew a rental lease before it expires?",
+        "What should I bring to a job interview at a bank?",
+        "How should I split a restaurant bill with friends?",
+        "How can I tell if a used car is worth the price?",
+    ]
+    with open(tmp_path / "questions_raw.jsonl", "w") as f:
+        for i, question in enumerate(questions):
+            f.write(json.dumps({"id": f"q{i}", "question": question, "provenance": {}}) + "\n")
+    with StageWriter(tmp_path / "questions_filtered.jsonl", store=store) as writer:
+        for row, record in enumerate(iter_records(tmp_path / "questions_raw.jsonl")):
+            before = snapshot(record)
+            writer.write(row, filter_question(record), before)
+    with StageWriter(tmp_path / "questions_deduped.jsonl", sidecars=True, store=store) as writer:
+        for row, record in enumerate(iter_records(tmp_path / "questions_filtered.jsonl")):
+            before = snapshot(record)
+            record["filters"]["dedup_passed"] = True
+            writer.write(row, record, before)
+
+    def score_round(prejudge_ids):
+        """One --skip-scored round: prejudge some of what is left, leave the rest for later."""
+        scored_path = tmp_path / "questions_scored.jsonl"
+        records = load_stage(tmp_path / "questions_deduped.jsonl")
+        originals = [snapshot(r) for r in records]
+        prior = load_prior_scores(scored_path) if stage_exists(scored_path) else {}
+        stats = {"skipped_already_scored": 0, "prejudged_accept": 0, "prejudged_reject": 0, "accepted": 0}
+        to_score = records_to_score(records, prior, True, stats)
+        for record in to_score:
+            if record["id"] in prejudge_ids:
+                apply_prejudgement(record, 0.99, "accept", stats)
+        with StageWriter(scored_path, sidecars=True, store=store) as writer:
+            for row, record in enumerate(records):
+                writer.write(row, record, originals[row])
+        return [r["id"] for r in to_score], stats
+
+    assert score_round({"q0", "q2"})[0] == ["q0", "q1", "q2", "q3"]
+    to_score, stats = score_round({"q1"})
+    assert to_score == ["q1", "q3"] and stats["skipped_already_scored"] == 2
+    to_score, stats = score_round(set())
+    assert to_score == ["q3"] and stats["skipped_already_scored"] == 3
+    scored = {r["id"]: r for r in iter_records(tmp_path / "questions_scored.jsonl")}
+    assert all(scored[i]["filters"]["prejudged"] and scored[i]["filters"]["accepted"] for i in ("q0", "q1", "q2"))
+    assert not scored["q3"]["filters"].get("accepted")
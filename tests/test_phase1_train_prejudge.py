@@ -0,0 +1,40 @@
+from phase1_train_prejudge import decide, evaluate, extract_features, pick_thresholds, train_logistic, predict_proba
+
+
+def test_features_are_stable_and_include_filter_signals():
+    a = extract_features("How do I pay council tax in London?")
+    assert a == extract_features("How do I pay council tax in London?")
+    assert a != extract_features("How do I split household bills fairly?")
+
+
+def test_pick_thresholds_respects_precision_and_support():
+    scored = [(0.95, 1)] * 40 + [(0.9, 1)] * 9 + [(0.9, 0)] * 1 + [(0.5, 1)] * 5 + [(0.5, 0)] * 5 + [(0.05, 0)] * 30
+    thresholds = pick_thresholds(scored, min_precision=0.97, min_support=20)
+    assert thresholds == {"accept": 0.9, "reject": 0.05}
+
+
+def test_pick_thresholds_keeps_ties_together():
+    # Cutting inside the tied 0.8 group would look precise but isn't achievable
+    scored = [(0.9, 1)] * 20 + [(0.8, 1)] * 5 + [(0.8, 0)] * 5
+    thresholds = pick_thresholds(scored, min_precision=0.95, min_support=10)
+    assert thresholds["accept"] == 0.9
+
+
+def test_decide_and_evaluate():
+    thresholds = {"accept": 0.9, "reject": 0.1}
+    assert decide(0.95, thresholds) == "accept"
+    assert decide(0.05, thresholds) == "reject"
+    assert decide(0.5, thresholds) is None
+    metrics = evaluate([(0.95, 1), (0.05, 1), (0.5, 0), (0.5, 1)], thresholds)
+    assert metrics["auto_decided"] == 2
+    assert metrics["coverage"] == 0.5
+    assert metrics["accuracy_on_decided"] == 0.5
+
+
+def test_train_logistic_separates_leaky_questions():
+    clean = "What should someone check before signing a lease?"
+    leaky = "What should someone check before signing a lease in Singapore?"
+    examples = [(extract_features(clean), 1), (extract_features(leaky), 0)] * 50
+    weights = train_logistic(examples, epochs=5)
+    assert predict_proba(weights, extract_features(clean)) > 0.8
+    assert predict_proba(weights, extract_features(leaky)) < 0.2
@@ -0,0 +1,151 @@
+import argparse
+import json
+
+import pytest
+
+from artifact_io import IncompleteArtifactError, gz_path
+from phase1_filter_questions import filter_question
+from run_artifacts import (
+    StageWriter,
+    apply_delta,
+    check_sidecar_chain,
+    iter_records,
+    record_delta,
+    sidecar_path,
+    snapshot,
+    stage_exists,
+)
+
+
+def write_jsonl(path, records):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def raw_records():
+    return [
+        {"id": "q1", "question": "How do I renew a rental lease before it expires?", "domain": "housing_utilities"},
+        {"id": "q2", "question": "what", "domain": "food_dining"},
+        {"id": "q3", "question": "Where can I pay my electricity bill in Singapore?", "domain": "housing_utilities"},
+    ]
+
+
+def test_delta_round_trip_keeps_only_changes():
+    before = {"id": "q1", "question": "Q?", "filters": {"passed": True, "score_deferred": True}}
+    after = {"id": "q1", "question": "Q?", "leakage_score": 0, "filters": {"passed": True, "accepted": True}}
+    delta = record_delta(before, after)
+    assert delta == {"leakage_score": 0, "filters": {"accepted": True}, "_removed": ["filters.score_deferred"]}
+    assert apply_delta(snapshot(before), delta) == after
+
+
+def test_unchanged_record_writes_nothing(tmp_path):
+    path = tmp_path / "questions_filtered.jsonl"
+    record = {"id": "q1", "filters": {"passed": True}}
+    with StageWriter(path, sidecars=True) as writer:
+        writer.write(0, record, snapshot(record))
+    assert sidecar_path(path).read_text() == ""
+
+
+def test_sidecar_view_matches_full_copy(tmp_path):
+    write_jsonl(tmp_path / "questions_raw.jsonl", raw_records())
+    full_dir = tmp_path / "full"
+    full_dir.mkdir()
+    for directory, sidecars in ((tmp_path, True), (full_dir, False)):
+        with StageWriter(directory / "questions_filtered.jsonl", sidecars) as writer:
+            for row, record in enumerate(raw_records()):
+                before = snapshot(record)
+                writer.write(row, filter_question(record), before)
+    assert not (tmp_path / "questions_filtered.jsonl").exists()
+    assert list(iter_records(tmp_path / "questions_filtered.jsonl")) == list(
+        iter_records(full_dir / "questions_filtered.jsonl")
+    )
+
+
+def test_sparse_sidecars_stack_on_nearest_full_copy(tmp_path):
+    write_jsonl(tmp_path / "questions_raw.jsonl", [{"id": "unused"}])
+    # A full filtered copy stops the walk back to questions_raw.jsonl
+    write_jsonl(tmp_path / "questions_filtered.jsonl", [{"id": f"q{i}", "filters": {"passed": True}} for i in range(3)])
+    write_jsonl(sidecar_path(tmp_path / "questions_deduped.jsonl"), [{"row": 1, "filters": {"dedup_passed": False}}])
+    write_jsonl(sidecar_path(tmp_path / "questions_scored.jsonl"), [{"row": 2, "leakage_score": 1}])
+
+    scored = list(iter_records(tmp_path / "questions_scored.jsonl"))
+    assert [r["id"] for r in scored] == ["q0", "q1", "q2"]
+    assert scored[1]["filters"] == {"passed": True, "dedup_passed": False}
+    assert scored[2]["leakage_score"] == 1
+    assert "leakage_score" not in scored[0]
+
+
+def test_missing_intermediate_stage_is_an_error(tmp_path):
+    write_jsonl(tmp_path / "questions_raw.jsonl", raw_records())
+    write_jsonl(sidecar_path(tmp_path / "questions_deduped.jsonl"), [])
+    assert stage_exists(tmp_path / "questions_deduped.jsonl")
+    with pytest.raises(FileNotFoundError):
+        list(iter_records(tmp_path / "questions_deduped.jsonl"))
+
+
+def test_writer_removes_other_layout(tmp_path):
+    path = tmp_path / "questions_deduped.jsonl"
+    write_jsonl(path, raw_records())
+    StageWriter(path, sidecars=True).close()
+    assert not path.exists() and sidecar_path(path).exists()
+    StageWriter(path, sidecars=False).close()
+    assert path.exists() and not sidecar_path(path).exists()
+
+
+def test_failed_stage_keeps_previous_output(tmp_path):
+    write_jsonl(tmp_path / "questions_raw.jsonl", raw_records())
+    path = tmp_path / "questions_filtered.jsonl"
+    with StageWriter(path) as writer:
+        for row, record in enumerate(raw_records()):
+            writer.write(row, filter_question(record))
+    previous = path.read_text()
+    with pytest.raises(RuntimeError):
+        with StageWriter(path) as writer:
+            writer.write(0, raw_records()[0])
+            raise RuntimeError("judge endpoint down")
+    assert path.read_text() == previous
+    assert [r["id"] for r in iter_records(path)] == ["q1", "q2", "q3"]
+
+    # Never completed in any form: readers refuse it instead of treating it as missing
+    path.unlink()
+    with pytest.raises(IncompleteArtifactError):
+        list(iter_records(path))
+    # Writing the stage in another layout clears the stale temp file
+    StageWriter(path, sidecars=True).close()
+    assert stage_exists(path) and list(iter_records(path))
+
+
+def test_compressed_stages_read_like_plain_ones(tmp_path):
+    write_jsonl(tmp_path / "questions_raw.jsonl", raw_records())
+    plain_dir = tmp_path / "plain"
+    plain_dir.mkdir()
+    write_jsonl(plain_dir / "questions_raw.jsonl", raw_records())
+    for directory, compress in ((tmp_path, True), (plain_dir, False)):
+        with StageWriter(directory / "questions_filtered.jsonl", compress=compress) as writer:
+            for row, record in enumerate(raw_records()):
+                writer.write(row, filter_question(record))
+        with StageWriter(directory / "questions_deduped.jsonl", sidecars=True, compress=compress) as writer:
+            for row, record in enumerate(iter_records(directory / "questions_filtered.jsonl")):
+                before = snapshot(record)
+                record["filters"]["dedup_passed"] = row != 1
+                writer.write(row, record, before)
+    assert gz_path(tmp_path / "questions_filtered.jsonl").exists()
+    assert gz_path(sidecar_path(tmp_path / "questions_deduped.jsonl")).exists()
+    assert stage_exists(tmp_path / "questions_deduped.jsonl")
+    assert list(iter_records(tmp_path / "questions_deduped.jsonl")) == list(
+        iter_records(plain_dir / "questions_deduped.jsonl")
+    )
+
+    # Rewriting uncompressed drops the stale .gz
+    StageWriter(tmp_path / "questions_filtered.jsonl").close()
+    assert not gz_path(tmp_path / "questions_filtered.jsonl").exists()
+
+
+def test_sidecars_need_the_standard_chain():
+    parser = argparse.ArgumentParser()
+    check_sidecar_chain(parser, "questions_filtered.jsonl", "questions_deduped.jsonl")
+    with pytest.raises(SystemExit):
+        check_sidecar_chain(parser, "questions_raw.jsonl", "questions_deduped.jsonl")
+    with pytest.raises(SystemExit):
+        check_sidecar_chain(parser, "questions_raw.jsonl", "custom.jsonl")
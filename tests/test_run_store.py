@@ -0,0 +1,151 @@
+import json
+
+from artifact_io import gz_path, open_artifact
+from phase1_filter_questions import filter_question
+from phase1_report import collect_from_files, collect_from_store
+from run_artifacts import StageWriter, iter_records, lookup_record, query_stored, snapshot, stage_exists
+from run_store import open_store, store_path
+
+
+def write_jsonl(path, records):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def raw_records(n=12):
+    questions = [
+        "How do I renew a rental lease before it expires?",
+        "Where can I pay my electricity bill in Singapore?",
+        "what",
+        "What should I bring to a job interview at a bank?",
+    ]
+    return [
+        {
+            "id": f"q{i}",
+            "question": questions[i % len(questions)],
+            "domain": f"d{i % 2}",
+            "question_type": f"t{i % 3}",
+            "provenance": {"run_id": "r"},
+        }
+        for i in range(n)
+    ]
+
+
+def run_stages(run_dir, sidecars=False, store=False):
+    """Filter, a fake dedup and a fake judge over questions_raw.jsonl, written with the given layout."""
+    stages = [
+        ("questions_raw.jsonl", "questions_filtered.jsonl", filter_question),
+        ("questions_filtered.jsonl", "questions_deduped.jsonl", fake_dedup),
+        ("questions_deduped.jsonl", "questions_scored.jsonl", fake_judge),
+    ]
+    for input_name, output_name, step in stages:
+        records = list(iter_records(run_dir / input_name))
+        with StageWriter(run_dir / output_name, sidecars, store) as writer:
+            for row, record in enumerate(records):
+                before = snapshot(record)
+                writer.write(row, step(record), before)
+
+
+def fake_dedup(record):
+    passed = record["filters"]["passed"] and record["question"].startswith("How")
+    record["filters"]["dedup_passed"] = passed
+    record["filters"]["novelty_score"] = 0.5 if passed else 0.1
+    return record
+
+
+def fake_judge(record):
+    if record["filters"]["dedup_passed"]:
+        record["leakage_score"] = int(record["id"][1:]) % 2
+        record["salience_score"] = 1
+        # Nested fields are updated in place, as the scorer does
+        record["provenance"]["judge_model_id"] = "m"
+        record["filters"]["accepted"] = record["leakage_score"] == 0
+    return record
+
+
+def test_stored_stages_export_the_same_bytes(tmp_path):
+    full_dir, store_dir = tmp_path / "full", tmp_path / "store"
+    for run_dir, store in ((full_dir, False), (store_dir, True)):
+        run_dir.mkdir()
+        write_jsonl(run_dir / "questions_raw.jsonl", raw_records())
+        run_stages(run_dir, store=store)
+
+    assert store_path(store_dir).exists()
+    for name in ("questions_filtered.jsonl", "questions_deduped.jsonl", "questions_scored.jsonl"):
+        assert not (store_dir / name).exists() and stage_exists(store_dir / name)
+        exported = "".join(json.dumps(r) + "\n" for r in iter_records(store_dir / name))
+        assert exported == (full_dir / name).read_text()
+
+
+def test_report_aggregates_match_file_scan(tmp_path):
+    write_jsonl(tmp_path / "questions_raw.jsonl", raw_records())
+    run_stages(tmp_path, store=True)
+    write_jsonl(
+        tmp_path / "questions_accepted.jsonl",
+        [r for r in iter_records(tmp_path / "questions_scored.jsonl") if r["filters"].get("accepted")],
+    )
+
+    from_files = collect_from_files(tmp_path, sample=2)
+    with open_store(tmp_path) as store:
+        from_store = collect_from_store(store, sample=2)
+    for key in ("funnel", "filter_stats", "dedup_rejected", "avg_novelty", "leakage_dist", "salience_dist"):
+        assert from_store[key] == from_files[key]
+    assert {d: dict(c) for d, c in from_store["coverage"].items()} == {d: dict(c) for d, c in from_files["coverage"].items()}
+    assert all(r["filters"]["accepted"] for r in from_store["sample_accepted"])
+    assert all(r["leakage_score"] == 1 for r in from_store["sample_rejected"])
+
+
+def test_indexed_lookups(tmp_path):
+    write_jsonl(tmp_path / "questions_raw.jsonl", raw_records())
+    run_stages(tmp_path, store=True)
+    scored_path = tmp_path / "questions_scored.jsonl"
+
+    record = lookup_record(tmp_path, "q4", "questions_scored.jsonl")
+    assert record == next(r for r in iter_records(scored_path) if r["id"] == "q4")
+    assert lookup_record(tmp_path, "missing", "questions_scored.jsonl") is None
+
+    judged = query_stored(scored_path, "leakage_score IS NOT NULL")
+    assert [r["id"] for r in judged] == [r["id"] for r in iter_records(scored_path) if r.get("leakage_score") is not None]
+
+
+def test_query_needs_the_whole_chain_in_the_store(tmp_path):
+    write_jsonl(tmp_path / "questions_raw.jsonl", raw_records())
+    run_stages(tmp_path, store=True)
+    # Rewriting the filter stage as a file drops it from the store
+    with StageWriter(tmp_path / "questions_filtered.jsonl") as writer:
+        for row, record in enumerate(iter_records(tmp_path / "questions_raw.jsonl")):
+            writer.write(row, filter_question(record))
+    with open_store(tmp_path) as store:
+        assert not store.has_stage("questions_filtered.jsonl")
+    assert query_stored(tmp_path / "questions_scored.jsonl", "leakage_score IS NOT NULL") is None
+    # Readers still stack the remaining stored stages on the full filtered copy
+    assert len(list(iter_records(tmp_path / "questions_scored.jsonl"))) == 12
+
+
+def test_sync_base_is_incremental_and_resets_on_rewrite(tmp_path):
+    raw_path = tmp_path / "questions_raw.jsonl"
+    records = raw_records(6)
+    write_jsonl(raw_path, records[:4])
+    with open_store(tmp_path, create=True) as store:
+        assert store.sync_base(raw_path) == 4
+        with open(raw_path, "a") as f:
+            f.write(json.dumps(records[4]) + "\n" + json.dumps(records[5]))  # last line still being written
+        assert store.sync_base(raw_path) == 5
+        assert store.find_row("q4") == 4 and store.find_row("q5") is None
+
+        write_jsonl(raw_path, raw_records(3)[::-1])
+        assert store.sync_base(raw_path) == 3
+        assert store.find_row("q2") == 0
+
+
+def test_sync_base_reads_compressed_raw(tmp_path):
+    records = raw_records(6)
+    with open_artifact(gz_path(tmp_path / "questions_raw.jsonl"), "w") as f:
+        f.write("".join(json.dumps(r) + "\n" for r in records[:4]))
+    with open_store(tmp_path, create=True) as store:
+        assert store.sync_base(tmp_path / "questions_raw.jsonl") == 4
+        with open_artifact(gz_path(tmp_path / "questions_raw.jsonl"), "a") as f:
+            f.write("".join(json.dumps(r) + "\n" for r in records[4:]))
+        assert store.sync_base(tmp_path / "questions_raw.jsonl") == 6
+        assert store.find_row("q5") == 5
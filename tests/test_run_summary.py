@@ -0,0 +1,69 @@
+import json
+
+from jsonl_index import JsonlFile
+from phase1_compare_runs import load_summary
+from phase1_report import collect
+from run_summary import SUMMARY_NAME, read_summary, run_fingerprint, summarize, write_summary
+
+
+def write_jsonl(path, records, mode="w"):
+    with open(path, mode) as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def make_run(run_dir, n=6):
+    run_dir.mkdir()
+    scored = [
+        {
+            "id": f"q{i}",
+            "domain": "d0",
+            "question_type": "t0",
+            "leakage_score": i % 2,
+            "salience_score": 1,
+            "filters": {"passed": True, "dedup_passed": True, "accepted": i % 2 == 0},
+        }
+        for i in range(n)
+    ]
+    for name in ("questions_raw", "questions_filtered", "questions_deduped", "questions_scored"):
+        write_jsonl(run_dir / f"{name}.jsonl", scored)
+    write_jsonl(run_dir / "questions_accepted.jsonl", [r for r in scored if r["filters"]["accepted"]])
+    write_jsonl(run_dir / "token_usage.jsonl", [
+        {"kind": "judge", "completion_tokens": 100, "truncated": False},
+        {"kind": "judge", "completion_tokens": 300, "truncated": True},
+    ])
+    with open(run_dir / "run_manifest.json", "w") as f:
+        json.dump({"model_id": "m", "timings": {"Score Questions": 2.5}}, f)
+
+
+def test_summary_round_trip(tmp_path):
+    run_dir = tmp_path / "run_a"
+    make_run(run_dir)
+    summary = summarize(run_dir, collect(run_dir, sample=0), run_fingerprint(run_dir))
+    write_summary(run_dir, summary)
+
+    cached = read_summary(run_dir)
+    assert cached == json.loads(json.dumps(summary))
+    assert cached["funnel"]["Accepted"] == 3 and cached["acceptance_rate"] == 0.5
+    assert cached["leakage_distribution"] == {"0": 3, "1": 3}
+    assert cached["coverage"] == {"d0": {"t0": 3}}
+    assert cached["tokens"] == {"judge": {"requests": 2, "completion_tokens": 400, "truncated": 1}}
+    assert cached["timings"] == {"Score Questions": 2.5}
+
+
+def test_summary_is_invalidated_by_run_changes_only(tmp_path):
+    run_dir = tmp_path / "run_a"
+    make_run(run_dir)
+    summary, rebuilt = load_summary(run_dir)
+    assert rebuilt and (run_dir / SUMMARY_NAME).exists()
+
+    # Derived files (indexes, reports) leave the summary valid
+    JsonlFile(run_dir / "questions_raw.jsonl").close()
+    (run_dir / "phase1_report.json").write_text("{}")
+    assert load_summary(run_dir) == (summary, False)
+
+    write_jsonl(run_dir / "questions_raw.jsonl", [{"id": "extra"}], mode="a")
+    assert read_summary(run_dir) is None
+    assert load_summary(run_dir, refresh=False) == (None, False)
+    summary, rebuilt = load_summary(run_dir)
+    assert rebuilt and summary["funnel"]["Raw generated"] == 7
@@ -0,0 +1,94 @@
+import pytest
+
+from llm_stub_server import StubModel, serve_in_thread
+from token_planner import MIN_MAX_TOKENS, MIN_SAMPLES, OVERHEAD_TOKENS, TokenPlanner, fit_rate, load_history, planned_chat
+
+
+def observations(rates, units=10, truncated=False):
+    return [{"units": units, "n": 1, "completion_tokens": rate * units, "truncated": truncated} for rate in rates]
+
+
+def test_fit_rate_needs_enough_untruncated_history():
+    assert fit_rate(observations([40] * (MIN_SAMPLES - 1))) is None
+    assert fit_rate(observations([40] * MIN_SAMPLES, truncated=True)) is None
+    fit = fit_rate(observations(list(range(1, 101))))
+    assert fit["samples"] == 100
+    assert fit["median_per_unit"] == 51
+    assert fit["quantile_per_unit"] == 96
+
+
+def test_fit_rate_is_per_sample_for_n():
+    fit = fit_rate([{"units": 1, "n": 4, "completion_tokens": 200}] * MIN_SAMPLES)
+    assert fit["median_per_unit"] == 50
+
+
+def test_plan_scales_with_units_and_stays_under_profile_cap():
+    planner = TokenPlanner("m", {"generate": observations([40] * 50)}, margin=0.25)
+    assert planner.plan("generate", 10, 2048) == 10 * 40 * 1.25 + OVERHEAD_TOKENS
+    assert planner.plan("generate", 100, 2048) == 2048
+    assert planner.plan("generate", 0, 2048) == MIN_MAX_TOKENS
+    # No history for the judge, or planning switched off: profile value
+    assert planner.plan("judge", 1, 1024) == 1024
+    assert TokenPlanner("m", {"generate": observations([40] * 50)}, enabled=False).plan("generate", 10, 2048) == 2048
+
+
+class FakeClient:
+    def __init__(self, lengths):
+        self.lengths = lengths
+        self.max_tokens_sent = []
+
+    def chat(self, model, messages, params, n=1):
+        self.max_tokens_sent.append(params["max_tokens"])
+        tokens = self.lengths.pop(0)
+        finish = "length" if tokens >= params["max_tokens"] else "stop"
+        return {"choices": [{"text": "x", "finish_reason": finish}], "usage": {"completion_tokens": min(tokens, params["max_tokens"])}}
+
+
+def test_planned_chat_resends_truncated_requests_at_profile_cap():
+    planner = TokenPlanner("m", {"generate": observations([10] * 50)}, margin=0.0)
+    client = FakeClient([500, 120])
+    response = planned_chat(client, planner, "generate", 5, "m", [], {"max_tokens": 2048})
+    assert client.max_tokens_sent == [5 * 10 + OVERHEAD_TOKENS, 2048]
+    assert response["choices"][0]["finish_reason"] == "stop"
+    summary = planner.summary()["generate"]
+    assert summary["requests"] == 2 and summary["truncated"] == 1 and summary["replanned"] == 1
+
+
+def test_summary_reports_prediction_error():
+    planner = TokenPlanner("m", {"judge": observations([30] * 50, units=1)})
+    for tokens in (20, 40):
+        planner.record("judge", 1, 1, 100, {"choices": [{"finish_reason": "stop"}], "usage": {"completion_tokens": tokens}})
+    summary = planner.summary()["judge"]
+    assert summary["predicted_tokens"] == 60
+    assert summary["actual_tokens_where_predicted"] == 60
+    assert summary["mean_abs_error"] == 10
+
+
+@pytest.mark.parametrize("hedge", [False, True])
+def test_stub_server_usage_is_left_out_of_history(tmp_path, hedge):
+    pytest.importorskip("httpx")
+    from llm_client import LLMClient
+
+    server = serve_in_thread(StubModel(ttft="fixed:0"))
+    client = LLMClient(f"http://127.0.0.1:{server.server_address[1]}/v1", "x", hedge=hedge)
+    planner = TokenPlanner("Qwen/QwQ-32B", {})
+    try:
+        planned_chat(client, planner, "judge", 1, "Qwen/QwQ-32B", [{"role": "user", "content": "hi"}], {"max_tokens": 64})
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+    (tmp_path / "bench").mkdir()
+    planner.write_log(tmp_path / "bench")
+    real = tmp_path / "real"
+    real.mkdir()
+    planner.observations = [{**obs, "stub": False} for obs in planner.observations]
+    planner.write_log(real)
+    # Rows logged before the stub flag existed (e.g. an old bench run) can't be trusted either
+    legacy = tmp_path / "legacy"
+    legacy.mkdir()
+    planner.observations = [{k: v for k, v in obs.items() if k not in ("stub", "endpoint")} for obs in planner.observations]
+    planner.write_log(legacy)
+
+    history = load_history(tmp_path, "judge", "Qwen/QwQ-32B")
+    assert len(history) == 1 and history[0]["endpoint"].startswith("http://127.0.0.1")